@@ -0,0 +1,41 @@
+"""post_hashtags_created_index
+
+/hashtags/trending sadece son TRENDING_WINDOW_HOURS içindeki etiketlemeleri
+sayar: pencere (created_at >= ...) bu index'ten range scan, ETag'in max(id) /
+count'u ve hashtag_id'ye göre gruplama index-only. CONCURRENTLY ile kurulur.
+
+Revision ID: a3c8e1f04b52
+Revises: d7a1e5b36c90
+Create Date: 2026-10-21 15:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8e1f04b52'
+down_revision: Union[str, Sequence[str], None] = 'd7a1e5b36c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # yarıda kalmış CONCURRENTLY denemesinin INVALID artığını IF NOT EXISTS atlar
+        valid = op.get_bind().execute(
+            sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_post_hashtags_created')")
+        ).scalar()
+        if valid is False:
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_post_hashtags_created")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_hashtags_created "
+            "ON post_hashtags (created_at, hashtag_id, id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_post_hashtags_created")
@@ -0,0 +1,73 @@
+"""ai usage
+
+ai_requests'e tipli token kolonları (meta->usage'dan) ve kullanıcı/gün/model
+bazında günlük toplam tablosu (ai_usage_daily). Yeni kayıtlarda ikisi de
+services/ai_usage.record() ile insert sırasında dolar; mevcut satırlar burada
+bir kez backfill edilir.
+
+Revision ID: a6d1e8f3c572
+Revises: f2a7c4e19b30
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d1e8f3c572'
+down_revision: Union[str, Sequence[str], None] = 'f2a7c4e19b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # sabit default'lu kolon eklemek PG 11+'da tabloyu yeniden yazmaz
+    op.add_column('ai_requests', sa.Column('prompt_tokens', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('ai_requests', sa.Column('completion_tokens', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'ai_usage_daily',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('model_name', sa.String(length=100), primary_key=True),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+    # generate_post: meta = usage ; rewrite: meta = {"mode": .., **usage}
+    op.execute(
+        """
+        UPDATE ai_requests
+           SET prompt_tokens = coalesce((meta->>'prompt_tokens')::int, 0),
+               completion_tokens = coalesce((meta->>'completion_tokens')::int, 0)
+         WHERE meta ? 'prompt_tokens' OR meta ? 'completion_tokens'
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO ai_usage_daily (user_id, day, model_name, requests, errors,
+                                    prompt_tokens, completion_tokens)
+        SELECT user_id,
+               (created_at AT TIME ZONE 'UTC')::date,
+               coalesce(model_name, 'unknown'),
+               count(*),
+               count(*) FILTER (WHERE coalesce(status, 'success') <> 'success'),
+               sum(prompt_tokens),
+               sum(completion_tokens)
+          FROM ai_requests
+         WHERE user_id IS NOT NULL
+         GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ai_usage_daily')
+    op.drop_column('ai_requests', 'completion_tokens')
+    op.drop_column('ai_requests', 'prompt_tokens')
@@ -0,0 +1,31 @@
+"""post_image_dimensions
+
+Revision ID: b7c2e91d4f10
+Revises: a404c1b53e5a
+Create Date: 2026-10-19 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c2e91d4f10'
+down_revision: Union[str, Sequence[str], None] = 'a404c1b53e5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('post_images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('post_images', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('post_images', sa.Column('bytes_saved', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('post_images', 'bytes_saved')
+    op.drop_column('post_images', 'height')
+    op.drop_column('post_images', 'width')
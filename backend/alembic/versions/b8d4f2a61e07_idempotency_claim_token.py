@@ -0,0 +1,30 @@
+"""idempotency_claim_token
+
+Her sahiplenme rastgele bir claim_token yazar; cevabı kaydetme ve satırı
+bırakma sadece bu token'la yapılır (lease'i kaçıran eski sahip, satırı
+devralan isteğin kaydına dokunamaz).
+
+Revision ID: b8d4f2a61e07
+Revises: a3c8e1f04b52
+Create Date: 2026-10-21 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a61e07'
+down_revision: Union[str, Sequence[str], None] = 'a3c8e1f04b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('claim_token', sa.String(32)))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'claim_token')
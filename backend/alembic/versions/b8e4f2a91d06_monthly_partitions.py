@@ -0,0 +1,287 @@
+"""monthly partitions
+
+likes, comments ve ai_requests'i aylık RANGE partition'lı tablolara çevirir
+(services/partitions.py):
+
+  likes, comments   anahtar post_created_at = posts.created_at; FK artık
+                    (post_id, post_created_at) -> posts(id, created_at).
+                    uq_user_post_like (user_id, post_id, post_created_at)
+  ai_requests       anahtar created_at
+
+PK'lar partition anahtarını içerir: (id, <anahtar>). id'ler aynı sequence'tan
+gelmeye devam eder.
+
+Tablo kopyalanarak dönüştürülür (eski tablo -> yeni partition'lı tablo ->
+INSERT SELECT): büyük kurulumlarda bakım penceresinde çalıştırın; süre
+likes + comments + ai_requests boyutuyla doğru orantılıdır.
+
+Revision ID: b8e4f2a91d06
+Revises: a6d1e8f3c572
+Create Date: 2026-10-20 10:15:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f2a91d06'
+down_revision: Union[str, Sequence[str], None] = 'a6d1e8f3c572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# tablo -> (partition anahtarı, yeni tablo DDL, eski tablodan kopyalama SELECT'i)
+TABLES = {
+    'likes': (
+        'post_created_at',
+        """
+        CREATE TABLE likes (
+            id              integer NOT NULL DEFAULT nextval('likes_id_seq'),
+            user_id         integer NOT NULL CONSTRAINT likes_user_id_fkey REFERENCES users(id) ON DELETE CASCADE,
+            post_id         integer NOT NULL,
+            post_created_at timestamptz NOT NULL,
+            created_at      timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT likes_pkey PRIMARY KEY (id, post_created_at),
+            CONSTRAINT uq_user_post_like UNIQUE (user_id, post_id, post_created_at),
+            CONSTRAINT fk_likes_post FOREIGN KEY (post_id, post_created_at)
+                REFERENCES posts (id, created_at) ON DELETE CASCADE
+        ) PARTITION BY RANGE (post_created_at);
+        CREATE INDEX ix_likes_id ON likes (id);
+        CREATE INDEX ix_likes_user_id ON likes (user_id);
+        CREATE INDEX ix_likes_post_user ON likes (post_id, user_id);
+        """,
+        """
+        INSERT INTO likes (id, user_id, post_id, post_created_at, created_at)
+        SELECT l.id, l.user_id, l.post_id, p.created_at, l.created_at
+          FROM likes_unpartitioned l JOIN posts p ON p.id = l.post_id
+        """,
+    ),
+    'comments': (
+        'post_created_at',
+        """
+        CREATE TABLE comments (
+            id              integer NOT NULL DEFAULT nextval('comments_id_seq'),
+            post_id         integer NOT NULL,
+            post_created_at timestamptz NOT NULL,
+            user_id         integer NOT NULL CONSTRAINT comments_user_id_fkey REFERENCES users(id) ON DELETE CASCADE,
+            content         varchar(500) NOT NULL,
+            created_at      timestamptz NOT NULL DEFAULT now(),
+            status          varchar(20) NOT NULL,
+            safety_label    varchar(50),
+            safety_scores   jsonb,
+            CONSTRAINT comments_pkey PRIMARY KEY (id, post_created_at),
+            CONSTRAINT fk_comments_post FOREIGN KEY (post_id, post_created_at)
+                REFERENCES posts (id, created_at) ON DELETE CASCADE
+        ) PARTITION BY RANGE (post_created_at);
+        CREATE INDEX ix_comments_id ON comments (id);
+        CREATE INDEX ix_comments_user_id ON comments (user_id);
+        CREATE INDEX ix_comments_post_created ON comments (post_id, created_at, id);
+        """,
+        """
+        INSERT INTO comments (id, post_id, post_created_at, user_id, content, created_at,
+                              status, safety_label, safety_scores)
+        SELECT c.id, c.post_id, p.created_at, c.user_id, c.content, c.created_at,
+               c.status, c.safety_label, c.safety_scores
+          FROM comments_unpartitioned c JOIN posts p ON p.id = c.post_id
+        """,
+    ),
+    'ai_requests': (
+        'created_at',
+        """
+        CREATE TABLE ai_requests (
+            id                integer NOT NULL DEFAULT nextval('ai_requests_id_seq'),
+            user_id           integer CONSTRAINT ai_requests_user_id_fkey REFERENCES users(id) ON DELETE SET NULL,
+            type              varchar(50) NOT NULL,
+            input_text        varchar,
+            output_text       varchar,
+            model_name        varchar(100),
+            meta              jsonb,
+            created_at        timestamptz NOT NULL DEFAULT now(),
+            status            varchar(20),
+            prompt_tokens     integer NOT NULL DEFAULT 0,
+            completion_tokens integer NOT NULL DEFAULT 0,
+            CONSTRAINT ai_requests_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        CREATE INDEX ix_ai_requests_id ON ai_requests (id);
+        CREATE INDEX ix_ai_requests_user_id ON ai_requests (user_id);
+        """,
+        """
+        INSERT INTO ai_requests (id, user_id, type, input_text, output_text, model_name, meta,
+                                 created_at, status, prompt_tokens, completion_tokens)
+        SELECT id, user_id, type, input_text, output_text, model_name, meta,
+               created_at, status, prompt_tokens, completion_tokens
+          FROM ai_requests_unpartitioned
+        """,
+    ),
+}
+
+# eski tablodaki anahtarın kaynağı (partition aralığını belirlemek için)
+KEY_SOURCE = {
+    'likes': "SELECT min(p.created_at) FROM likes_unpartitioned l JOIN posts p ON p.id = l.post_id",
+    'comments': "SELECT min(p.created_at) FROM comments_unpartitioned c JOIN posts p ON p.id = c.post_id",
+    'ai_requests': "SELECT min(created_at) FROM ai_requests_unpartitioned",
+}
+
+
+def _month(dt: datetime) -> datetime:
+    dt = dt.astimezone(timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def _next(m: datetime) -> datetime:
+    return datetime(m.year + m.month // 12, m.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+# post_id -> post_created_at bağımlılığı planner'a bildirilmezse post sayfası sorguları
+# satır sayısını çok düşük tahmin edip Sort'lu plan seçer; extended statistics
+# partition'lara miras geçmez (services/partitions.py yeni aylarda aynısını yapar)
+DEPENDENT = {'likes': 'post_id', 'comments': 'post_id'}
+
+
+def _create_statistics(conn, table: str, partition: str) -> None:
+    if table in DEPENDENT:
+        conn.exec_driver_sql(
+            f"CREATE STATISTICS {partition}_dep (dependencies) "
+            f"ON {DEPENDENT[table]}, post_created_at FROM {partition}"
+        )
+
+
+def _create_partitions(conn, table: str, first: datetime) -> None:
+    last = _month(datetime.now(timezone.utc))
+    for _ in range(MONTHS_AHEAD):
+        last = _next(last)
+    m = min(_month(first), _month(datetime.now(timezone.utc)))
+    while m <= last:
+        conn.exec_driver_sql(
+            f"CREATE TABLE {table}_p{m:%Y%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{m.isoformat()}') TO ('{_next(m).isoformat()}')"
+        )
+        _create_statistics(conn, table, f"{table}_p{m:%Y%m}")
+        m = _next(m)
+    conn.exec_driver_sql(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    _create_statistics(conn, table, f"{table}_default")
+
+
+def _rename_aside(table: str, new_name: str) -> None:
+    # index/constraint adları şema genelinde tekil: eskileri _old'a çekilir
+    op.execute(f"ALTER TABLE {table} RENAME TO {new_name}")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN SELECT conname FROM pg_constraint
+                      WHERE conrelid = '{new_name}'::regclass AND contype IN ('p', 'u')
+            LOOP
+                EXECUTE format('ALTER TABLE {new_name} RENAME CONSTRAINT %I TO %I',
+                               r.conname, r.conname || '_old');
+            END LOOP;
+            FOR r IN SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                      WHERE i.indrelid = '{new_name}'::regclass
+                        AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+            LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', r.relname, r.relname || '_old');
+            END LOOP;
+        END $$
+        """
+    )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.create_unique_constraint('uq_posts_id_created', 'posts', ['id', 'created_at'])
+
+    for table, (_key, ddl, copy_sql) in TABLES.items():
+        _rename_aside(table, f"{table}_unpartitioned")
+        for stmt in ddl.split(';'):
+            if stmt.strip():
+                op.execute(stmt)
+        first = conn.execute(sa.text(KEY_SOURCE[table])).scalar() or datetime.now(timezone.utc)
+        _create_partitions(conn, table, first)
+        op.execute(copy_sql)
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    """Partition'lı tabloları tekrar tek tabloya kopyalar (arşivlenmiş partition'lar hariç)."""
+    _rename_aside("likes", "likes_partitioned")
+    op.execute(
+        """
+        CREATE TABLE likes (
+            id         integer NOT NULL DEFAULT nextval('likes_id_seq') PRIMARY KEY,
+            user_id    integer NOT NULL CONSTRAINT likes_user_id_fkey REFERENCES users(id) ON DELETE CASCADE,
+            post_id    integer NOT NULL CONSTRAINT likes_post_id_fkey REFERENCES posts(id) ON DELETE CASCADE,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO likes (id, user_id, post_id, created_at) "
+        "SELECT id, user_id, post_id, created_at FROM likes_partitioned"
+    )
+
+    _rename_aside("comments", "comments_partitioned")
+    op.execute(
+        """
+        CREATE TABLE comments (
+            id            integer NOT NULL DEFAULT nextval('comments_id_seq') PRIMARY KEY,
+            post_id       integer NOT NULL CONSTRAINT comments_post_id_fkey REFERENCES posts(id) ON DELETE CASCADE,
+            user_id       integer NOT NULL CONSTRAINT comments_user_id_fkey REFERENCES users(id) ON DELETE CASCADE,
+            content       varchar(500) NOT NULL,
+            created_at    timestamptz NOT NULL DEFAULT now(),
+            status        varchar(20) NOT NULL,
+            safety_label  varchar(50),
+            safety_scores jsonb
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO comments (id, post_id, user_id, content, created_at, status, safety_label, safety_scores) "
+        "SELECT id, post_id, user_id, content, created_at, status, safety_label, safety_scores "
+        "FROM comments_partitioned"
+    )
+
+    _rename_aside("ai_requests", "ai_requests_partitioned")
+    op.execute(
+        """
+        CREATE TABLE ai_requests (
+            id                integer NOT NULL DEFAULT nextval('ai_requests_id_seq') PRIMARY KEY,
+            user_id           integer CONSTRAINT ai_requests_user_id_fkey REFERENCES users(id) ON DELETE SET NULL,
+            type              varchar(50) NOT NULL,
+            input_text        varchar,
+            output_text       varchar,
+            model_name        varchar(100),
+            meta              jsonb,
+            created_at        timestamptz NOT NULL DEFAULT now(),
+            status            varchar(20),
+            prompt_tokens     integer NOT NULL DEFAULT 0,
+            completion_tokens integer NOT NULL DEFAULT 0
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO ai_requests SELECT id, user_id, type, input_text, output_text, model_name, meta, "
+        "created_at, status, prompt_tokens, completion_tokens FROM ai_requests_partitioned"
+    )
+
+    for table in TABLES:
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_partitioned")   # partition'ları da düşer
+
+    op.create_index('ix_likes_id', 'likes', ['id'])
+    op.create_index('ix_likes_user_id', 'likes', ['user_id'])
+    op.create_unique_constraint('uq_user_post_like', 'likes', ['user_id', 'post_id'])
+    op.create_index('ix_likes_post_user', 'likes', ['post_id', 'user_id'])
+    op.create_index('ix_comments_id', 'comments', ['id'])
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'])
+    op.create_index('ix_comments_post_created', 'comments', ['post_id', 'created_at', 'id'])
+    op.create_index('ix_ai_requests_id', 'ai_requests', ['id'])
+    op.create_index('ix_ai_requests_user_id', 'ai_requests', ['user_id'])
+    op.drop_constraint('uq_posts_id_created', 'posts', type_='unique')
@@ -0,0 +1,43 @@
+"""image_phash
+
+Revision ID: c3d8a5f27e61
+Revises: b7c2e91d4f10
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8a5f27e61'
+down_revision: Union[str, Sequence[str], None] = 'b7c2e91d4f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('post_images', sa.Column('phash', sa.BigInteger(), nullable=True))
+    op.create_index('ix_post_images_phash', 'post_images', ['phash'])
+
+    op.create_table(
+        'blocked_image_hashes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('phash', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('label', sa.String(50)),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_blocked_image_hashes_id', 'blocked_image_hashes', ['id'])
+    op.create_index('ix_blocked_image_hashes_phash', 'blocked_image_hashes', ['phash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_blocked_image_hashes_phash', table_name='blocked_image_hashes')
+    op.drop_index('ix_blocked_image_hashes_id', table_name='blocked_image_hashes')
+    op.drop_table('blocked_image_hashes')
+    op.drop_index('ix_post_images_phash', table_name='post_images')
+    op.drop_column('post_images', 'phash')
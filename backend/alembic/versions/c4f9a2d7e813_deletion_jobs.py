@@ -0,0 +1,55 @@
+"""deletion_jobs + media_deletions
+
+Revision ID: c4f9a2d7e813
+Revises: b8e4f2a91d06
+Create Date: 2026-10-20 14:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f9a2d7e813'
+down_revision: Union[str, Sequence[str], None] = 'b8e4f2a91d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'deletion_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(timezone=True)),
+        sa.Column('last_error', sa.String(500)),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint('kind', 'target_id', name='uq_deletion_jobs_target'),
+    )
+    op.create_index('ix_deletion_jobs_id', 'deletion_jobs', ['id'])
+    op.create_index(
+        'ix_deletion_jobs_ready', 'deletion_jobs', ['available_at', 'id'],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+    op.create_table(
+        'media_deletions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('storage_key', sa.String(255), nullable=False, unique=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('media_deletions')
+    op.drop_index('ix_deletion_jobs_ready', table_name='deletion_jobs')
+    op.drop_index('ix_deletion_jobs_id', table_name='deletion_jobs')
+    op.drop_table('deletion_jobs')
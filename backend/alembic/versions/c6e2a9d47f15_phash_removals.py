@@ -0,0 +1,38 @@
+"""phash_removals
+
+Silinen post resimleri için tombstone tablosu: soft-delete transaction'ında
+yazılır, her process'in bellek phash indeksi catch_up'ta (id > watermark)
+okuyup düşer. Eski satırlar deletion worker tarafından budanır.
+
+Revision ID: c6e2a9d47f15
+Revises: b8d4f2a61e07
+Create Date: 2026-10-22 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e2a9d47f15'
+down_revision: Union[str, Sequence[str], None] = 'b8d4f2a61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'phash_removals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_phash_removals_created_at', 'phash_removals', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_phash_removals_created_at', table_name='phash_removals')
+    op.drop_table('phash_removals')
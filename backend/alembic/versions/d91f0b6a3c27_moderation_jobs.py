@@ -0,0 +1,46 @@
+"""moderation_jobs
+
+Revision ID: d91f0b6a3c27
+Revises: c3d8a5f27e61
+Create Date: 2026-10-19 13:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91f0b6a3c27'
+down_revision: Union[str, Sequence[str], None] = 'c3d8a5f27e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'moderation_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(timezone=True)),
+        sa.Column('last_error', sa.String(500)),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_moderation_jobs_id', 'moderation_jobs', ['id'])
+    # worker'ın claim sorgusu sadece kuyruktaki satırlara bakar
+    op.create_index(
+        'ix_moderation_jobs_ready', 'moderation_jobs', ['available_at', 'id'],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_moderation_jobs_ready', table_name='moderation_jobs')
+    op.drop_index('ix_moderation_jobs_id', table_name='moderation_jobs')
+    op.drop_table('moderation_jobs')
@@ -0,0 +1,81 @@
+"""hot_query_indexes
+
+Feed, profil, yorum, like ve hashtag sorgularının index-ordered scan
+yapabilmesi için composite / partial indexler. CONCURRENTLY ile kurulur;
+tablo yazmaya kilitlenmez (bu yüzden transaction dışında çalışır).
+
+Revision ID: e5b3c8d0a942
+Revises: d91f0b6a3c27
+Create Date: 2026-10-19 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b3c8d0a942'
+down_revision: Union[str, Sequence[str], None] = 'd91f0b6a3c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_posts_feed",
+     "ON posts (created_at DESC, id DESC) WHERE status = 'published'"),
+    ("ix_posts_user_created",
+     "ON posts (user_id, created_at DESC, id DESC)"),
+    ("ix_comments_post_created",
+     "ON comments (post_id, created_at, id)"),
+    ("ix_likes_post_user",
+     "ON likes (post_id, user_id)"),
+    ("ix_post_hashtags_tag_post",
+     "ON post_hashtags (hashtag_id, post_id)"),
+    ("ix_post_images_post_created",
+     "ON post_images (post_id, created_at, id)"),
+]
+
+# Yukarıdaki composite indexlerin ön eki olan tek kolonlu indexler: gereksiz yazma
+# maliyeti + planner'ın sıralı composite yerine bunları seçmesine yol açıyorlar.
+REDUNDANT = [
+    ("ix_posts_user_id", "ON posts (user_id)"),
+    ("ix_comments_post_id", "ON comments (post_id)"),
+    ("ix_likes_post_id", "ON likes (post_id)"),
+    ("ix_post_hashtags_hashtag_id", "ON post_hashtags (hashtag_id)"),
+    ("ix_post_images_post_id", "ON post_images (post_id)"),
+]
+
+
+def _create_index(name: str, body: str) -> None:
+    """
+    Yarıda kalmış bir CREATE INDEX CONCURRENTLY, INVALID bir index bırakır;
+    IF NOT EXISTS onu "var" sayıp geçer ve sonra eski indexler silinir. Önce
+    geçersiz artığı kaldırıp yeniden kuruyoruz.
+    """
+    valid = op.get_bind().execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if valid is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {body}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, body in INDEXES:
+            _create_index(name, body)
+        # yenileri hazır olduktan sonra eskileri kaldır
+        for name, _body in REDUNDANT:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, body in REDUNDANT:
+            _create_index(name, body)
+        for name, _body in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
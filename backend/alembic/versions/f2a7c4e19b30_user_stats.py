@@ -0,0 +1,58 @@
+"""user_stats
+
+Profil sayaçları tablosu (post sayısı, alınan beğeni/yorum, verilen beğeni).
+Yazma yollarında artımlı güncellenir; mevcut veriler burada tek seferde
+doldurulur. Sonradan onarım: python -m services.user_stats rebuild
+
+Revision ID: f2a7c4e19b30
+Revises: e5b3c8d0a942
+Create Date: 2026-10-19 16:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c4e19b30'
+down_revision: Union[str, Sequence[str], None] = 'e5b3c8d0a942'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('post_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('likes_received', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('comments_received', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('likes_given', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+
+    # backfill: tablo yeni olduğu için tek set-based INSERT yeterli
+    op.execute(
+        """
+        INSERT INTO user_stats (user_id, post_count, likes_received, comments_received, likes_given)
+        SELECT u.id,
+               coalesce(p.n, 0), coalesce(lr.n, 0), coalesce(cr.n, 0), coalesce(lg.n, 0)
+          FROM users u
+          LEFT JOIN (SELECT user_id, count(*) AS n FROM posts WHERE status = 'published'
+                      GROUP BY user_id) p ON p.user_id = u.id
+          LEFT JOIN (SELECT p.user_id, count(*) AS n FROM likes l JOIN posts p ON p.id = l.post_id
+                      GROUP BY p.user_id) lr ON lr.user_id = u.id
+          LEFT JOIN (SELECT p.user_id, count(*) AS n FROM comments c JOIN posts p ON p.id = c.post_id
+                      WHERE c.status = 'published'
+                      GROUP BY p.user_id) cr ON cr.user_id = u.id
+          LEFT JOIN (SELECT user_id, count(*) AS n FROM likes
+                      GROUP BY user_id) lg ON lg.user_id = u.id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_stats')
@@ -1,34 +1,259 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from core.database import get_db, engine, Base
-from routers import users, auth, posts, ai, hashtags
+from core.database import get_db, engine, Base, SessionLocal
+from routers import users, auth, posts, ai, hashtags, realtime, admin
 from fastapi.staticfiles import StaticFiles
-from pathlib import Path
 from core.config import settings
+from core.health import readiness
+from core import ai_client
 from fastapi.middleware.cors import CORSMiddleware
+from core.compression import CompressionMiddleware
+from core.rate_limit import RateLimitMiddleware, rate_limiter
+from core.idempotency import IdempotencyMiddleware, idempotency_store, idempotency_janitor
+from core.profiling import ProfilingMiddleware, profile_store
+from core.tracing import TracingMiddleware, tracer, writer_from_settings, instrument_engine
+from services.phash import phash_index
+from services.storage import storage
+from services.realtime import realtime_hub
+from services.hashtag_graph import hashtag_graph
+from services import embeddings
+from services import partitions
+from services.deletion import deletion_worker
+from moderation import worker as moderation_worker
+from moderation.service import content_safety
+
+log = logging.getLogger("app")
+
+
+# ---------- ısınma adımları (import sırasında DEĞİL, lifespan içinde) ----------
+def _ensure_partitions():
+    # likes/comments/ai_requests için bu ay + ileri aylar (insert'ler default'a düşmesin)
+    partitions.partition_maintainer.run_once()
+
+def _create_schema():
+    # tabloları oluştur (dev); prod'da DB_CREATE_ALL=false + alembic
+    Base.metadata.create_all(bind=engine)
+    # create_all partition'lı tabloları partition'sız kurar: aynı adımda tamamlanır
+    _ensure_partitions()
+
+def _build_phash_index():
+    # near-duplicate / engellenmiş resim indeksi bellekte kurulur
+    db = SessionLocal()
+    try:
+        phash_index.rebuild(db)
+    finally:
+        db.close()
+
+def _warmup_steps():
+    steps = []
+    if settings.DB_CREATE_ALL:
+        steps.append(("schema", _create_schema))
+    else:
+        steps.append(("partitions", _ensure_partitions))
+    steps.append(("phash_index", _build_phash_index))
+    return steps
+
+
+async def _warmup():
+    """
+    DB ya da başka bir bağımlılık henüz hazır değilse process çökmez:
+    adımlar backoff ile tekrar denenir, bu sürede /readyz 503 döner.
+    """
+    pending = _warmup_steps()
+    for name, _fn in pending:
+        readiness.expect(name)
+
+    delay = 1.0
+    while pending:
+        failed = []
+        for name, fn in pending:
+            try:
+                await asyncio.to_thread(fn)
+                readiness.mark_ready(name)
+            except Exception as e:
+                log.warning("warmup step %s failed: %s", name, e)
+                readiness.mark_failed(name, str(e))
+                failed.append((name, fn))
+        pending = failed
+        if pending:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # span exporter'ı ilk istekten önce (moderasyon worker'ları da span açar)
+    if settings.TRACING_ENABLED:
+        instrument_engine(engine)
+        tracer.start(writer_from_settings())
+
+    warmup = asyncio.create_task(_warmup())
+
+    # async moderasyon modunda kuyruğu bu process içinde de tüket
+    if settings.MODERATION_MODE == "async" and settings.MODERATION_WORKERS > 0:
+        moderation_worker.start_workers()
+
+    # canlı sayaçlar: bu process'in LISTEN bağlantısı (DB yoksa kendisi backoff ile dener)
+    if settings.REALTIME_ENABLED:
+        realtime_hub.start(asyncio.get_running_loop())
+
+    # ilgili hashtag / benzer post indeksi: snapshot ya da DB'den arka planda kurulur
+    if settings.HASHTAG_GRAPH_ENABLED:
+        hashtag_graph.start()
+
+    # post embedding'leri: writer.lock'u alan tek process yazar, diğerleri sadece okur
+    if settings.EMBEDDING_ENABLED and settings.EMBEDDING_WORKER:
+        embeddings.embedding_worker.start()
+
+    # aylık partition bakımı (ilk tur ısınma adımında)
+    if settings.PARTITION_MAINTENANCE_SECONDS > 0:
+        partitions.partition_maintainer.start()
+
+    # süresi dolan Idempotency-Key cevapları
+    if settings.IDEMPOTENCY_ENABLED:
+        idempotency_janitor.start()
+
+    # soft-delete edilmiş post/hesapların satırları + medya dosyaları (batch'li)
+    if settings.DELETION_WORKERS > 0:
+        deletion_worker.start()
+
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        moderation_worker.stop_workers()
+        realtime_hub.stop()
+        hashtag_graph.stop()
+        embeddings.embedding_worker.stop()
+        partitions.partition_maintainer.stop()
+        deletion_worker.stop()
+        idempotency_janitor.stop()
+        tracer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# en içte: 429 cevapları da CORS başlıklarını alsın (tarayıcı Retry-After'ı okuyabilsin)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+# rate limit'in dışında: kaydedilmiş cevabın tekrarı limit harcamaz; limiter'ın
+# reddedeceği istek için satır alınmaz (peek)
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(
+        IdempotencyMiddleware,
+        store=idempotency_store,
+        limiter=rate_limiter if settings.RATE_LIMIT_ENABLED else None,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
         "http://localhost:5173",   # dev
-        "http://localhost:5174",  
-        # prod domain 
+        "http://localhost:5174",
+        # prod domain
     ],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After", "X-Profile-Id", "X-Trace-Id", "Idempotent-Replayed"],
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
-# media klasörü oluştur + servis et
-MEDIA_DIR = Path(settings.MEDIA_ROOT)
-MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/media", StaticFiles(directory=str(MEDIA_DIR)), name="media")
+# en dışta: sıkıştırma ve CORS dahil isteğin tamamı profile girer
+if settings.PROFILE_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        sample_paths=tuple(settings.PROFILE_SAMPLE_PATHS),
+        interval_ms=settings.PROFILE_INTERVAL_MS,
+        max_seconds=settings.PROFILE_MAX_SECONDS,
+        max_concurrent=settings.PROFILE_MAX_CONCURRENT,
+    )
+# profilin de dışında: SERVER span'i isteğin toplam süresini ölçer (tracer başlamadıysa geçer)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+# local sürücüde medya buradan servis edilir; s3'te URL'ler bucket/CDN'e gider
+if settings.STORAGE_BACKEND.lower() == "local":
+    app.mount("/media", StaticFiles(directory=str(storage.root)), name="media")
+
+
+@app.get("/healthz")
+async def healthz():
+    # liveness: process ayakta ve event loop cevap veriyor (bağımlılıklara bakılmaz)
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    # readiness: DB havuzu + ısınma adımları + bağımlılık durumu
+    checks: dict = {}
+    ok = True
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["db"] = {"ready": True, "pool": engine.pool.status()}
+    except Exception as e:
+        ok = False
+        checks["db"] = {"ready": False, "error": str(e)[:300]}
+
+    warm = readiness.snapshot()
+    checks["warmup"] = warm
+    ok = ok and readiness.is_ready()
+
+    if settings.MODERATION_MODE == "async" and settings.MODERATION_WORKERS > 0:
+        alive = moderation_worker.alive_count()
+        checks["moderation_workers"] = {"ready": alive > 0, "alive": alive}
+        ok = ok and alive > 0
+
+    if settings.RATE_LIMIT_ENABLED:
+        checks["rate_limit"] = rate_limiter.stats()
+
+    if settings.REALTIME_ENABLED:
+        # dinleyici kopuksa push gelmez ama API çalışır: sadece bilgi
+        checks["realtime"] = realtime_hub.stats()
+
+    if settings.HASHTAG_GRAPH_ENABLED:
+        # hazır değilken öneri endpoint'leri boş liste döner: sadece bilgi
+        checks["hashtag_graph"] = hashtag_graph.stats()
+
+    checks["partitions"] = partitions.partition_maintainer.stats()
+
+    if settings.TRACING_ENABLED:
+        # export hatası / düşen span'ler istekleri etkilemez: sadece bilgi
+        checks["tracing"] = tracer.stats()
+
+    if settings.IDEMPOTENCY_ENABLED:
+        checks["idempotency"] = idempotency_store.stats()
+
+    if settings.DELETION_WORKERS > 0:
+        # kuyruk gecikirse sadece silme yavaşlar (içerik zaten gizli): sadece bilgi
+        checks["deletion"] = deletion_worker.stats()
+
+    if settings.EMBEDDING_ENABLED:
+        # indeks boşken /similar boş liste döner: sadece bilgi
+        checks["embeddings"] = embeddings.stats()
+
+    # harici servisler: sadece bilgi amaçlı (config yoksa ilgili endpoint'ler hata verir)
+    checks["dependencies"] = {
+        "azure_openai": {"configured": ai_client.is_configured(), **ai_client.ai_scheduler.stats()},
+        "content_safety": {"configured": content_safety.is_configured()},
+    }
 
-# tabloları oluştur (dev)
-Base.metadata.create_all(bind=engine)
+    return JSONResponse(
+        status_code=200 if ok else 503,
+        content={"status": "ready" if ok else "not_ready", "checks": checks},
+    )
 
 @app.get("/ping-db")
 def ping_db(db: Session = Depends(get_db)):
@@ -44,3 +269,5 @@ app.include_router(users.router)
 app.include_router(posts.router)
 app.include_router(ai.router)
 app.include_router(hashtags.router)
+app.include_router(realtime.router)
+app.include_router(admin.router)
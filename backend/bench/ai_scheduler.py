@@ -0,0 +1,180 @@
+# bench/ai_scheduler.py
+"""
+AIScheduler'ın davranış kontrolü: gerçek openai client'ı (core.ai_client.get_client)
+yerel sahte sunucuya (bench/fake_openai.py) yönlendirilir, istekler
+_scheduled_completion üzerinden gönderilir.
+
+  eşzamanlılık   sunucuda aynı anda en fazla max_concurrency istek
+  429            retry-after / retry-after-ms'e uyulur, sonra başarı; haklar
+                 tükenince AIUpstreamError(rate_limited, retry_after) -> 503 + Retry-After
+  TPM bütçesi    başlangıç bütçesi bitince istekler tpm/60 token/sn hızında başlar
+  adil kuyruk    çok istek atan kullanıcı, sonradan gelenin önünü kesmez (round-robin)
+  kuyruk dolu    bekleyen istek max_queue'da: AIQueueFull -> 503 + ETA;
+                 max_queue=0: boş slota giden istek kabul, bekleyecek olan reddedilir
+
+DB ve Azure gerekmez; ~10 sn sürer, bir kontrol tutmazsa exit code 1.
+
+  python -m bench.ai_scheduler
+"""
+import asyncio
+import sys
+import time
+
+from fastapi import HTTPException
+
+from bench.fake_openai import FakeOpenAI, FakeServer
+from core import ai_client
+from core.ai_scheduler import AIQueueFull, AIScheduler, AIUpstreamError, estimate_tokens
+
+# 3 karakter prompt + 3 karakter çıktı: maliyet sabit ve küçük
+PROMPT = "abc"
+COST = estimate_tokens(prompt_chars=len(PROMPT), max_output_chars=len(PROMPT))
+
+
+def _use(scheduler: AIScheduler) -> AIScheduler:
+    ai_client.ai_scheduler = scheduler       # _scheduled_completion modül global'ini kullanır
+    return scheduler
+
+
+def _scheduler(**kw) -> AIScheduler:
+    opts = {"max_concurrency": 4, "tpm_budget": 10 ** 6, "max_queue": 1000, "max_retries": 3,
+            "base_backoff": 0.05, "max_backoff": 5.0}
+    opts.update(kw)
+    return _use(AIScheduler(**opts))
+
+
+async def _call(user: str):
+    return await ai_client._scheduled_completion(
+        user_key=user, messages=[{"role": "user", "content": PROMPT}],
+        max_output_chars=len(PROMPT), temperature=0.0,
+    )
+
+
+# ---------- senaryolar: (ad, ok, açıklama) ----------
+async def concurrency(fake: FakeOpenAI):
+    fake.reset(latency=0.2)
+    _scheduler(max_concurrency=3)
+    t = time.monotonic()
+    await asyncio.gather(*[_call(f"u{i}") for i in range(12)])
+    took = time.monotonic() - t
+    return "eşzamanlılık", fake.max_inflight == 3 and took >= 0.8, \
+        f"sunucuda en fazla {fake.max_inflight} (sınır 3), 12 istek {took:.2f}s"
+
+
+async def retry_after(fake: FakeOpenAI):
+    ok, notes = True, []
+    for ms in (False, True):
+        fake.reset(reject_next=2, retry_after=0.3, retry_after_ms=ms)
+        _scheduler()
+        resp = await _call("u")
+        gaps = [b.at - a.at for a, b in zip(fake.hits, fake.hits[1:])]
+        statuses = [h.status for h in fake.hits]
+        good = resp.choices[0].message.content and statuses == [429, 429, 200] and min(gaps) >= 0.3
+        ok &= bool(good)
+        notes.append(f"{'retry-after-ms' if ms else 'retry-after'}: {statuses} aralık {min(gaps):.2f}s")
+    return "429 + retry-after", ok, "; ".join(notes)
+
+
+async def retries_exhausted(fake: FakeOpenAI):
+    from routers.ai import _busy_error
+
+    fake.reset(reject_next=10, retry_after=0.1)
+    _scheduler(max_retries=2)
+    try:
+        await _call("u")
+        return "retry hakkı biter", False, "hata beklenirdi"
+    except AIUpstreamError as e:
+        err = _busy_error(max(e.retry_after or 0, ai_client.ai_scheduler.eta_seconds()))
+        ok = e.rate_limited and e.retry_after == 0.1 and len(fake.hits) == 3 \
+            and err.status_code == 503 and err.headers.get("Retry-After") == "1"
+        return "retry hakkı biter", ok, \
+            f"{len(fake.hits)} deneme, rate_limited={e.rate_limited} retry_after={e.retry_after} -> {err.status_code}"
+
+
+async def tpm_budget(fake: FakeOpenAI):
+    # bütçe 60 istek; 63. isteğin başlaması ~3 sn sürmeli (saniyede 1 isteklik dolum)
+    fake.reset(usage_tokens=COST)
+    _scheduler(max_concurrency=100, tpm_budget=60 * COST)
+    t = time.monotonic()
+    await asyncio.gather(*[_call(f"u{i % 5}") for i in range(63)])
+    took = time.monotonic() - t
+    starts = sorted(h.at - t for h in fake.hits)
+    # her an başlamış istek sayısı <= başlangıç bütçesi + dolum
+    within = all(i + 1 <= 60 + at * 1.0 + 1 for i, at in enumerate(starts))
+    return "TPM bütçesi", within and 2.5 <= took <= 4.5, \
+        f"63 istek {took:.2f}s (beklenen ~3s), bütçe aşımı {'yok' if within else 'VAR'}"
+
+
+async def fair_queue(fake: FakeOpenAI):
+    fake.reset(latency=0.05)
+    _scheduler(max_concurrency=1)
+    done: list[str] = []
+
+    async def tracked(user: str):
+        await _call(user)
+        done.append(user)
+
+    heavy = [asyncio.create_task(tracked("heavy")) for _ in range(8)]
+    await asyncio.sleep(0.01)
+    light = [asyncio.create_task(tracked("light")) for _ in range(2)]
+    await asyncio.gather(*heavy, *light)
+    last_light = max(i for i, u in enumerate(done) if u == "light")
+    return "adil kuyruk", last_light <= 4, f"sıra: {' '.join(u[0] for u in done)} (h=heavy, l=light)"
+
+
+async def queue_full(fake: FakeOpenAI):
+    from routers.ai import _busy_error
+
+    fake.reset(latency=0.5)
+    sched = _scheduler(max_concurrency=1, max_queue=2)
+    tasks = [asyncio.create_task(_call(f"u{i}")) for i in range(3)]
+    await asyncio.sleep(0.05)
+    try:
+        await _call("late")
+        ok, note = False, "AIQueueFull beklenirdi"
+    except AIQueueFull as e:
+        err: HTTPException = _busy_error(e.eta_seconds)
+        ok = e.eta_seconds > 0 and err.status_code == 503 and int(err.headers["Retry-After"]) >= 1
+        note = f"1 çalışan + 2 bekleyen, 4. istek {err.status_code} eta={e.eta_seconds}s"
+    await asyncio.gather(*tasks)
+
+    # max_queue=0: bekleme kuyruğu yok ama boş slota giden istek kabul edilir
+    sched = _scheduler(max_concurrency=1, max_queue=0)
+    first = asyncio.create_task(_call("a"))
+    await asyncio.sleep(0.05)
+    try:
+        await _call("b")
+        rejected = False
+    except AIQueueFull:
+        rejected = True
+    await first
+    await _call("c")
+    ok &= rejected and sched.stats()["queued"] == 0
+    return "kuyruk dolu / max_queue=0", ok, note + f"; max_queue=0: boşta kabul, doluyken red={rejected}"
+
+
+SCENARIOS = (concurrency, retry_after, retries_exhausted, tpm_budget, fair_queue, queue_full)
+
+
+async def run(fake: FakeOpenAI) -> int:
+    failed = 0
+    for scenario in SCENARIOS:
+        name, ok, note = await scenario(fake)
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: {note}")
+        failed += not ok
+    return failed
+
+
+def main() -> int:
+    fake = FakeOpenAI()
+    with FakeServer(fake) as server:
+        ai_client.AZURE_ENDPOINT = server.url
+        ai_client.AZURE_API_KEY = "fake"
+        ai_client.AZURE_DEPLOYMENT = "fake"
+        ai_client.get_client.cache_clear()
+        failed = asyncio.run(run(fake))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# bench/embeddings.py
+"""
+Embedding vektör indeksinin recall + gecikme ölçümü (DB ve model gerekmez).
+
+Sentetik, kümelenmiş 384 boyutlu vektörler (gerçek cümle embedding'lerine
+benzer şekilde konu kümeleri + gürültü) VectorWriter ile diske yazılır, IVF
+eğitilir; VectorIndex aramaları brute-force sonuçlarıyla kıyaslanır:
+
+  - korpus boyu başına: yazma / eğitme süresi, float16 dosya boyutu
+  - nprobe başına: recall@k (brute-force'a göre), p50 / p95 sorgu süresi
+  - eğitimden sonra eklenen satırların (kuyruk) bulunduğunun kontrolü
+
+  python -m bench.embeddings --sizes 10000,50000,200000
+  python -m bench.embeddings --model   # + gerçek modelle CPU encode hızı (torch gerekir)
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from services.vector_index import VectorIndex, VectorWriter, normalize
+
+DIM = 384
+
+
+def _corpus(n: int, rng: np.random.Generator, topics: int = 200) -> np.ndarray:
+    centers = normalize(rng.standard_normal((topics, DIM)))
+    labels = rng.integers(0, topics, size=n)
+    noise = 0.8 * rng.standard_normal((n, DIM)) / np.sqrt(DIM)
+    # gürültü normu ~0.8: aynı konudaki cümleler ~0.6 kosinüs, farklı konular ~0
+    return normalize(centers[labels] + noise)
+
+
+def _pct(xs: list[float], p: float) -> float:
+    return float(np.percentile(xs, p)) * 1e3
+
+
+def _bench_size(n: int, args, rng: np.random.Generator) -> bool:
+    vecs = _corpus(n, rng)
+    ids = np.arange(1, n + 1, dtype=np.int64)
+    with tempfile.TemporaryDirectory() as root:
+        t = time.perf_counter()
+        writer = VectorWriter(root, DIM, "bench")
+        for s in range(0, n, 10_000):
+            writer.append(ids[s:s + 10_000], vecs[s:s + 10_000])
+        t_append = time.perf_counter() - t
+        t = time.perf_counter()
+        meta = writer.rewrite(train=True)
+        t_train = time.perf_counter() - t
+        size_mb = os.path.getsize(writer.files["vecs"]) / 1e6
+
+        # eğitimden sonra eklenenler kuyrukta aranır
+        extra = _corpus(args.tail, rng)
+        extra_ids = np.arange(n + 1, n + args.tail + 1, dtype=np.int64)
+        writer.append(extra_ids, extra)
+        stored = np.vstack([vecs, extra]).astype(np.float16).astype(np.float32)
+        all_ids = np.concatenate([ids, extra_ids])
+
+        index = VectorIndex(root, ivf_min_rows=0)
+        index.refresh(force=True)
+        print(f"\n{n} vektör (+{args.tail} kuyruk): yazma={t_append:.2f}s  eğitim={t_train:.2f}s  "
+              f"liste={meta['n_lists']}  dosya={size_mb:.1f}MB")
+
+        queries = normalize(stored[rng.choice(len(stored), args.queries)] +
+                            0.05 * rng.standard_normal((args.queries, DIM)))
+        truth = []
+        brute_t = []
+        for q in queries:
+            t = time.perf_counter()
+            top = np.argsort(-(stored @ q))[:args.k]
+            brute_t.append(time.perf_counter() - t)
+            truth.append(set(all_ids[top].tolist()))
+        print(f"  brute-force (float32, bellekte): p50={_pct(brute_t, 50):.2f}ms  p95={_pct(brute_t, 95):.2f}ms")
+
+        index.ivf_min_rows = 10 ** 12      # aynı dosyalar üstünde brute-force (float32 kopya + mmap kuyruk)
+        index.refresh(force=True)
+        index._build_lookup()
+        lat = []
+        for q in queries:
+            t = time.perf_counter()
+            index.search(q, args.k)
+            lat.append(time.perf_counter() - t)
+        print(f"  brute-force (VectorIndex):       p50={_pct(lat, 50):.2f}ms  p95={_pct(lat, 95):.2f}ms")
+        index.ivf_min_rows = 0
+        index._build_lookup()
+
+        ok = True
+        for nprobe in args.nprobe:
+            lat, hits = [], 0
+            for q, want in zip(queries, truth):
+                t = time.perf_counter()
+                got = index.search(q, args.k, nprobe=nprobe)
+                lat.append(time.perf_counter() - t)
+                hits += len(want.intersection(pid for pid, _s in got))
+            recall = hits / (args.k * len(queries))
+            print(f"  IVF nprobe={nprobe:3d}: recall@{args.k}={recall:.3f}  "
+                  f"p50={_pct(lat, 50):.2f}ms  p95={_pct(lat, 95):.2f}ms")
+
+        # kuyruk satırları IVF'te de bulunmalı
+        found = sum(
+            index.search(extra[i], 1, nprobe=1)[0][0] == extra_ids[i]
+            for i in range(min(20, args.tail))
+        )
+        if found != min(20, args.tail):
+            ok = False
+            print(f"  FAIL kuyruk: {found}/{min(20, args.tail)}")
+        return ok
+
+
+def _bench_model(batch: int) -> None:
+    from core.config import settings
+    from services.embeddings import Encoder
+
+    enc = Encoder(settings.EMBEDDING_MODEL, settings.EMBEDDING_THREADS)
+    t = time.perf_counter()
+    dim = enc.ensure_loaded()
+    print(f"\nmodel {settings.EMBEDDING_MODEL}: dim={dim} yükleme={time.perf_counter() - t:.1f}s")
+    texts = [f"Bugün sahilde gün batımını izledik #deniz #tatil {i}" for i in range(batch * 8)]
+    enc.encode(texts[:batch])
+    t = time.perf_counter()
+    for s in range(0, len(texts), batch):
+        enc.encode(texts[s:s + batch])
+    dt = time.perf_counter() - t
+    print(f"  encode: {len(texts) / dt:.0f} metin/s (batch={batch}, threads={settings.EMBEDDING_THREADS})")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,50000,200000")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", default="1,4,8,16,32")
+    ap.add_argument("--tail", type=int, default=1000, help="eğitimden sonra eklenen vektör sayısı")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--model", action="store_true", help="gerçek modelle encode hızını da ölç")
+    ap.add_argument("--batch", type=int, default=32)
+    args = ap.parse_args()
+    args.nprobe = [int(x) for x in args.nprobe.split(",")]
+    rng = np.random.default_rng(args.seed)
+
+    ok = all([_bench_size(int(n), args, rng) for n in args.sizes.split(",")])
+    if args.model:
+        _bench_model(args.batch)
+    print(f"\n{'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
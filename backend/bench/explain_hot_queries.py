@@ -0,0 +1,304 @@
+# bench/explain_hot_queries.py
+"""
+Sıcak sorgu şekilleri için EXPLAIN tabanlı regresyon kontrolü.
+
+Sorgular elle yazılmaz: router'ların ve services/post_cards'ın sorgu kurucuları
+(_feed_query, _profile_query, _comments_query, page_counts'ın toplu sorguları,
+...) import edilip derlenir, yani kontrol edilen plan üretimdekiyle aynıdır.
+
+Her sorgunun planı (EXPLAIN FORMAT JSON) gezilir; hedef tablolarda Seq Scan
+veya index sırası yerine ayrı bir Sort düğümü varsa hata verir (exit code 1).
+Partition'lı tablolarda (likes, comments, ai_requests) taranan partition sayısı
+da sınırlanır: plan-time pruning EXPLAIN'de, çalışma anı pruning'i (initplan /
+correlated subquery) EXPLAIN ANALYZE'da "Actual Loops > 0" olan partition'lardan
+sayılır. Örnek veri 12 aya yayılır, yani pruning olmazsa sınır aşılır.
+CI'da boş bir veritabanına karşı --seed ile çalıştırılabilir:
+
+  DATABASE_URL=postgresql+psycopg2://... python -m bench.explain_hot_queries --seed 20000
+"""
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from core.database import SessionLocal, engine, Base
+from models.models import Posts, Hashtags
+from services import partitions
+
+
+@dataclass
+class HotQuery:
+    name: str
+    build: object                       # (db, ids) -> Query / Select
+    no_seq_scan: set[str]               # bu tablolarda Seq Scan yasak
+    no_sort: bool = True                # sıralama index'ten gelmeli
+    max_partitions: dict = field(default_factory=dict)   # parent tablo -> en fazla taranan partition
+    analyze: bool = False               # çalışma anı pruning'i için EXPLAIN ANALYZE
+    _plan: dict = field(default=None, repr=False)
+
+
+SEED_SQL = """
+INSERT INTO users (username, email, hashed_password, role, is_active)
+SELECT 'bench_u' || g, 'bench_u' || g || '@example.com', 'x', 'user', true
+  FROM generate_series(1, :users) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO posts (user_id, content, created_at, status, source)
+SELECT u.id, 'bench post ' || g, now() - (g * :spread || ' seconds')::interval,
+       CASE WHEN g % 20 = 0 THEN 'review' ELSE 'published' END, 'user'
+  FROM generate_series(1, :posts) g
+  JOIN LATERAL (SELECT id FROM users ORDER BY id OFFSET (g % :users) LIMIT 1) u ON true;
+
+INSERT INTO comments (post_id, post_created_at, user_id, content, created_at, status)
+SELECT p.id, p.created_at, p.user_id, 'bench comment', p.created_at + (c || ' seconds')::interval, 'published'
+  FROM posts p, generate_series(1, 5) c;
+
+-- viral post: newest published post gets many comments
+INSERT INTO comments (post_id, post_created_at, user_id, content, created_at, status)
+SELECT p.id, p.created_at, p.user_id, 'bench hot comment', p.created_at + (c || ' seconds')::interval, 'published'
+  FROM (SELECT id, user_id, created_at FROM posts WHERE status = 'published'
+         ORDER BY created_at DESC, id DESC LIMIT 1) p,
+       generate_series(1, :hot_comments) c;
+
+INSERT INTO likes (user_id, post_id, post_created_at)
+SELECT u.id, p.id, p.created_at
+  FROM posts p
+  JOIN LATERAL (SELECT id FROM users ORDER BY id OFFSET (p.id % :users) LIMIT 3) u ON true
+ON CONFLICT DO NOTHING;
+
+INSERT INTO hashtags (tag)
+SELECT 'benchtag' || g FROM generate_series(1, :tags) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO post_hashtags (post_id, hashtag_id)
+SELECT p.id, h.id
+  FROM posts p
+  JOIN hashtags h ON h.tag = 'benchtag' || (p.id % :tags + 1)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO post_images (post_id, stored_filename, content_type, size_bytes, created_at)
+SELECT p.id, 'bench/' || p.id || '.jpg', 'image/jpeg', 1000, p.created_at
+  FROM posts p
+ON CONFLICT DO NOTHING;
+
+INSERT INTO ai_requests (user_id, type, input_text, output_text, created_at, status)
+SELECT u.id, 'rewrite', 'bench in', 'bench out', now() - (g * :spread * 4 || ' seconds')::interval, 'success'
+  FROM generate_series(1, :posts / 4) g
+  JOIN LATERAL (SELECT id FROM users ORDER BY id OFFSET (g % :users) LIMIT 1) u ON true;
+"""
+
+
+def seed(db, n_posts: int) -> None:
+    # en yeni post "viral": yorum sayfası sıralı index taramasını asıl bu durumda kullanmalı
+    params = {
+        "users": max(10, n_posts // 50),
+        "posts": n_posts,
+        "tags": max(50, n_posts // 5),
+        "hot_comments": max(1000, n_posts // 5),
+        "spread": 365 * 86400 // n_posts,    # post'lar son 12 aya yayılır
+    }
+    for stmt in SEED_SQL.split(";"):
+        if stmt.strip():
+            db.execute(text(stmt), params)
+    db.commit()
+    # eski aylar default partition'a düştü: aylık partition'lara taşınır
+    partitions.maintain()
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+def _sample_ids(db) -> dict:
+    user_id = db.query(Posts.user_id).filter(Posts.status == "published").limit(1).scalar()
+    post_ids = [r[0] for r in (
+        db.query(Posts.id).filter(Posts.status == "published")
+        .order_by(Posts.created_at.desc(), Posts.id.desc()).limit(20).all()
+    )]
+    tag = db.query(Hashtags.tag).order_by(Hashtags.id).limit(1).scalar()
+    keys = dict(db.query(Posts.id, Posts.created_at).filter(Posts.id.in_(post_ids)).all()) if post_ids else {}
+    return {
+        "user_id": user_id, "post_ids": post_ids, "post_id": post_ids[0] if post_ids else None, "tag": tag,
+        "post_created_at": keys.get(post_ids[0]) if post_ids else None,
+        "post_keys": set(keys.values()),
+    }
+
+
+def hot_queries() -> list[HotQuery]:
+    # router'ların / kart üretiminin gerçek sorguları: şekilleri değişirse kontrol de değişir
+    from routers.hashtags import _hashtag_posts_query
+    from routers.posts import _comments_query, _feed_query, _post_card_query
+    from routers.users import _profile_query
+    from services.ai_export import CHUNK_ROWS, ExportFilter, _chunk_stmt
+    from services.post_cards import (
+        _comment_counts_query, _images_query, _like_counts_query, _liked_query, _tags_query,
+    )
+
+    return [
+        HotQuery("feed page", lambda db, ids: _feed_query(db, 20), {"posts"}),
+        HotQuery(
+            "user profile posts",
+            lambda db, ids: _profile_query(db, ids["user_id"], ("published",), 30),
+            {"posts"},
+        ),
+        HotQuery(
+            "own profile posts (published + pending)",
+            lambda db, ids: _profile_query(db, ids["user_id"], ("published", "pending"), 30),
+            {"posts"},
+        ),
+        HotQuery(
+            "comments page",
+            lambda db, ids: _comments_query(db, ids["post_id"], ids["post_created_at"]).limit(51),
+            {"comments"},
+            max_partitions={"comments": 1},
+        ),
+        HotQuery(
+            "comments page (key via initplan)",
+            lambda db, ids: (
+                _comments_query(db, ids["post_id"], partitions.post_created_at(ids["post_id"])).limit(51)
+            ),
+            {"comments"},
+            # parametreye dependency istatistiği uygulanmaz, tahmin düşük kalır ve planner
+            # sıralar; burada sadece çalışma anı pruning'i ölçülür. Router'lar anahtarı sabit verir.
+            no_sort=False,
+            max_partitions={"comments": 1},
+            analyze=True,
+        ),
+        HotQuery(
+            "like counts for page",
+            lambda db, ids: _like_counts_query(db, ids["post_ids"], ids["post_keys"]),
+            {"likes"},
+            no_sort=False,
+            max_partitions={"likes": 2},    # sayfa ay sınırına denk gelebilir
+        ),
+        HotQuery(
+            "comment counts for page",
+            lambda db, ids: _comment_counts_query(db, ids["post_ids"], ids["post_keys"]),
+            {"comments"},
+            no_sort=False,
+            max_partitions={"comments": 2},
+        ),
+        HotQuery(
+            "liked_by_me for page",
+            lambda db, ids: _liked_query(db, ids["post_ids"], ids["post_keys"], ids["user_id"]),
+            {"likes"},
+            max_partitions={"likes": 2},
+        ),
+        HotQuery(
+            "post card (detail)",
+            lambda db, ids: (
+                _post_card_query(db, ids["user_id"])
+                .filter(Posts.id == ids["post_id"], Posts.status == "published")
+            ),
+            {"posts", "likes", "comments", "post_images", "post_hashtags"},
+            no_sort=False,   # array_agg(ORDER BY) birkaç satırı kendi sıralar
+            max_partitions={"likes": 1, "comments": 1},   # correlated subquery: çalışma anı pruning
+            analyze=True,
+        ),
+        HotQuery(
+            "hashtag posts",
+            lambda db, ids: _hashtag_posts_query(db, ids["tag"], 20),
+            {"post_hashtags", "hashtags"},
+            no_sort=False,   # join sonrası top-N sort küçük kümede kabul edilebilir
+        ),
+        HotQuery(
+            "images for page",
+            lambda db, ids: _images_query(db, ids["post_ids"]),
+            {"post_images"},
+            no_sort=False,   # sayfadaki birkaç satır kendi sıralanır
+        ),
+        HotQuery(
+            "hashtags for page",
+            lambda db, ids: _tags_query(db, ids["post_ids"]),
+            {"post_hashtags"},
+            no_sort=False,
+        ),
+        HotQuery(
+            "ai_requests export chunk (one week)",
+            lambda db, ids: _chunk_stmt(
+                ExportFilter(since=ids["week_start"], until=ids["week_start"] + timedelta(days=7)),
+                0, CHUNK_ROWS,
+            ),
+            set(),
+            no_sort=False,
+            max_partitions={"ai_requests": 2},   # hafta ay sınırını geçebilir
+        ),
+    ]
+
+
+def _walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []) or []:
+        yield from _walk(child)
+
+
+_PARTITION_RE = re.compile(r"^(?P<parent>.+)_(p\d{6}|default)$")
+
+
+def check(db, q: HotQuery, ids: dict) -> list[str]:
+    built = q.build(db, ids)
+    stmt = getattr(built, "statement", built)    # ORM Query ya da Core Select
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    options = "ANALYZE, FORMAT JSON" if q.analyze else "FORMAT JSON"
+    raw = db.execute(text(f"EXPLAIN ({options}) " + sql)).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    q._plan = plan
+
+    problems = []
+    scanned: dict[str, set] = {}
+    for node in _walk(plan):
+        if q.analyze and node.get("Actual Loops", 1) == 0:
+            continue    # "never executed": çalışma anında elenen partition
+        nt = node.get("Node Type")
+        rel = node.get("Relation Name")
+        m = _PARTITION_RE.match(rel or "")
+        parent = m.group("parent") if m else rel
+        if nt == "Seq Scan" and parent in q.no_seq_scan:
+            problems.append(f"Seq Scan on {rel}")
+        if q.no_sort and nt in ("Sort", "Incremental Sort"):
+            problems.append(f"{nt} ({', '.join(node.get('Sort Key', []))})")
+        if m:
+            scanned.setdefault(parent, set()).add(rel)
+    for parent, limit in q.max_partitions.items():
+        n = len(scanned.get(parent, ()))
+        if n > limit:
+            problems.append(f"{n} partitions of {parent} scanned (max {limit})")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", type=int, default=0, help="önce bu kadar post ile örnek veri üret")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    partitions.maintain()
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db, args.seed)
+        ids = _sample_ids(db)
+        ids["week_start"] = db.execute(text("SELECT now() - interval '60 days'")).scalar()
+        if not ids["post_ids"]:
+            print("veri yok; --seed ile çalıştırın")
+            return 2
+
+        failed = 0
+        for q in hot_queries():
+            problems = check(db, q, ids)
+            status = "OK  " if not problems else "FAIL"
+            print(f"{status} {q.name}" + (f": {'; '.join(problems)}" if problems else ""))
+            if args.verbose:
+                print(json.dumps(q._plan, indent=2))
+            failed += bool(problems)
+        return 1 if failed else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# bench/export_zip.py
+"""
+/users/me/export ZIP üreticisinin bellek profili.
+
+Sentetik bir kullanıcı için N post (+ her birine resim) oluşturur, ZIP'i
+diske akıtarak üretir ve tracemalloc tepe değerini raporlar; ZIP'i de doğrular.
+Tepe bellek post sayısıyla büyümemeli.
+
+  python -m bench.export_zip --posts 200 --posts 2000 --image-kb 256
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zipfile
+
+from core.database import SessionLocal
+from models.models import Users, Posts, PostImages
+from services.export import user_export_zip
+from services.storage import storage, new_media_key
+
+
+def _seed(n_posts: int, image_kb: int) -> tuple[int, list[str]]:
+    db = SessionLocal()
+    keys: list[str] = []
+    try:
+        u = Users(username=f"bench_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@bench.local",
+                  first_name="bench", last_name="export", hashed_password="x", role="user")
+        db.add(u)
+        db.flush()
+        blob = os.urandom(image_kb * 1024)
+        for i in range(n_posts):
+            p = Posts(user_id=u.id, content=f"bench post {i}", status="published")
+            db.add(p)
+            db.flush()
+            key = new_media_key("image/jpeg", prefix="bench")
+            storage.put(key, blob, "image/jpeg")
+            keys.append(key)
+            db.add(PostImages(post_id=p.id, stored_filename=key, content_type="image/jpeg", size_bytes=len(blob)))
+        db.commit()
+        return u.id, keys
+    finally:
+        db.close()
+
+
+def _cleanup(user_id: int, keys: list[str]) -> None:
+    storage.delete_many(keys)
+    db = SessionLocal()
+    try:
+        db.query(Users).filter(Users.id == user_id).delete()   # posts/images CASCADE
+        db.commit()
+    finally:
+        db.close()
+
+
+def _measure(user_id: int) -> tuple[float, int, float, int]:
+    with tempfile.NamedTemporaryFile(suffix=".zip") as out:
+        tracemalloc.start()
+        t = time.perf_counter()
+        for chunk in user_export_zip(user_id):
+            out.write(chunk)
+        elapsed = time.perf_counter() - t
+        _cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out.flush()
+        size = os.path.getsize(out.name)
+        with zipfile.ZipFile(out.name) as zf:
+            bad = zf.testzip()
+            entries = len(zf.namelist())
+        if bad is not None:
+            raise SystemExit(f"FAIL bozuk kayıt: {bad}")
+    return peak / 1024 / 1024, size, elapsed, entries
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, action="append", help="tekrar verilebilir")
+    ap.add_argument("--image-kb", type=int, default=256)
+    args = ap.parse_args()
+
+    for n in args.posts or [200, 2000]:
+        user_id, keys = _seed(n, args.image_kb)
+        try:
+            peak_mb, size, elapsed, entries = _measure(user_id)
+        finally:
+            _cleanup(user_id, keys)
+        print(f"{n:6d} post  zip={size / 1024 / 1024:8.1f} MB  kayıt={entries:6d}  "
+              f"tepe bellek={peak_mb:6.2f} MB  süre={elapsed:6.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
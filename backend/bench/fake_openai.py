@@ -0,0 +1,160 @@
+# bench/fake_openai.py
+"""
+Yerel sahte Azure OpenAI sunucusu (chat completions), AIScheduler'ı gerçek
+openai client'ı üzerinden sınamak için.
+
+  POST /openai/deployments/{deployment}/chat/completions
+
+Davranış FakeOpenAI alanlarıyla ayarlanır: gecikme, sıradaki N isteğe 429
+(retry-after / retry-after-ms başlığıyla), usage.total_tokens. Her isteğin
+zamanı, sonucu ve o anki eşzamanlı istek sayısı kaydedilir.
+
+Ayrı process olarak da çalışır; uygulama AZURE_ENDPOINT ile buna yönlendirilir:
+
+  python -m bench.fake_openai --port 8089 --latency 0.5 --rate-limit-every 5
+  AZURE_ENDPOINT=http://127.0.0.1:8089 AZURE_API_KEY=x AZURE_DEPLOYMENT=fake uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# sahte model cevabı: generate_social_post ve rewrite_text'in beklediği alanlar
+_CONTENT = {"content": "fake post", "hashtags": ["fake"], "image_prompt": None, "rewritten_text": "fake rewrite"}
+
+
+@dataclass
+class Hit:
+    at: float               # time.monotonic()
+    status: int
+    inflight: int
+
+
+@dataclass
+class FakeOpenAI:
+    latency: float = 0.0
+    reject_next: int = 0                 # sıradaki bu kadar isteğe 429
+    rate_limit_every: int = 0            # her N. isteğe 429 (0 = kapalı)
+    retry_after: Optional[float] = 1.0   # 429'daki retry-after (saniye); None = başlık yok
+    retry_after_ms: bool = False         # saniye yerine retry-after-ms başlığı
+    usage_tokens: Optional[int] = None   # None: prompt uzunluğundan kaba hesap
+    hits: list[Hit] = field(default_factory=list)
+    max_inflight: int = 0
+    _inflight: int = 0
+    _count: int = 0
+
+    def reset(self, **changes) -> None:
+        self.__init__(**changes)
+
+    def _rate_limited(self) -> bool:
+        self._count += 1
+        if self.reject_next > 0:
+            self.reject_next -= 1
+            return True
+        return bool(self.rate_limit_every) and self._count % self.rate_limit_every == 0
+
+    async def completions(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        self._inflight += 1
+        self.max_inflight = max(self.max_inflight, self._inflight)
+        inflight = self._inflight
+        try:
+            if self._rate_limited():
+                self.hits.append(Hit(time.monotonic(), 429, inflight))
+                headers = {}
+                if self.retry_after is not None:
+                    if self.retry_after_ms:
+                        headers["retry-after-ms"] = str(int(self.retry_after * 1000))
+                    else:
+                        headers["retry-after"] = str(self.retry_after)
+                return JSONResponse(
+                    {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                    status_code=429, headers=headers,
+                )
+            self.hits.append(Hit(time.monotonic(), 200, inflight))
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self._inflight -= 1
+
+        prompt = math.ceil(sum(len(m.get("content") or "") for m in body.get("messages", [])) / 3)
+        total = self.usage_tokens if self.usage_tokens is not None else prompt + 20
+        return JSONResponse({
+            "id": f"chatcmpl-fake-{self._count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.path_params["deployment"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(_CONTENT)},
+            }],
+            "usage": {
+                "prompt_tokens": min(prompt, total),
+                "completion_tokens": total - min(prompt, total),
+                "total_tokens": total,
+            },
+        })
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/openai/deployments/{deployment}/chat/completions", self.completions, methods=["POST"]),
+        ])
+
+
+class FakeServer:
+    """Sahte sunucuyu arka plan thread'inde çalıştırır (with bloğu boyunca)."""
+
+    def __init__(self, fake: FakeOpenAI, port: int = 0):
+        self.fake = fake
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(
+            fake.app(), host="127.0.0.1", port=self.port, log_level="warning", lifespan="off",
+        ))
+        self._thread = threading.Thread(target=self._server.run, name="fake-openai", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "FakeServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--rate-limit-every", type=int, default=0)
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    args = ap.parse_args()
+    fake = FakeOpenAI(latency=args.latency, rate_limit_every=args.rate_limit_every, retry_after=args.retry_after)
+    uvicorn.run(fake.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# bench/hashtag_graph.py
+"""
+Hashtag co-occurrence indeksinin doğruluk + gecikme kontrolü (DB yok).
+
+Sentetik post/etiket dağılımı (Zipf benzeri) ile base kurulur, üstüne rastgele
+ekleme/silme delta'sı uygulanır; related_tags / similar_posts sonuçları kaba
+kuvvet hesabıyla karşılaştırılır ve sorgu süreleri raporlanır.
+
+  python -m bench.hashtag_graph --posts 200000 --tags 5000
+"""
+import argparse
+import math
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+import services.hashtag_graph as hg
+from services.hashtag_graph import HashtagGraph, _Base, load_snapshot, save_snapshot
+
+
+def _make_posts(n_posts: int, n_tags: int, seed: int) -> dict[int, tuple[int, ...]]:
+    rnd = random.Random(seed)
+    weights = [1 / i for i in range(1, n_tags + 1)]
+    tag_range = range(1, n_tags + 1)
+    return {
+        p: tuple(sorted(set(rnd.choices(tag_range, weights=weights, k=rnd.randint(1, 5)))))
+        for p in range(1, n_posts + 1)
+    }
+
+
+def _base_from(posts: dict, n_tags: int) -> _Base:
+    pc, tc = [], []
+    for p, ts in posts.items():
+        pc.extend([p] * len(ts))
+        tc.extend(ts)
+    tag_ids = np.arange(1, n_tags + 1, dtype=np.int64)
+    return _Base.from_pairs(pc, tc, tag_ids, [f"t{i}" for i in tag_ids], 0, time.time())
+
+
+def _brute_related(truth: dict, tag: int, limit: int) -> list[tuple[str, int]]:
+    f, co = Counter(), Counter()
+    for ts in truth.values():
+        f.update(ts)
+        if tag in ts:
+            co.update(t for t in ts if t != tag)
+    ranked = sorted(
+        ((c / math.sqrt(f[tag] * f[t]), c, t) for t, c in co.items()),
+        key=lambda x: (-round(x[0], 9), -x[1], x[2]),
+    )
+    return [(f"t{t}", c) for _s, c, t in ranked[:limit]]
+
+
+def _brute_similar(truth: dict, post_id: int, limit: int) -> list[int]:
+    f = Counter()
+    for ts in truth.values():
+        f.update(ts)
+    tags = set(truth[post_id])
+    w = {t: math.log1p(len(truth) / f[t]) for t in tags}
+    scored = [
+        (sum(w[t] for t in ts if t in tags), q)
+        for q, ts in truth.items() if q != post_id and tags.intersection(ts)
+    ]
+    return [q for _s, q in sorted(scored, key=lambda x: (-round(x[0], 6), -x[1]))[:limit]]
+
+
+def _timed(fn, rounds: int) -> float:
+    t = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t) / rounds * 1e6
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=50_000)
+    ap.add_argument("--tags", type=int, default=1000)
+    ap.add_argument("--changes", type=int, default=500, help="delta: silinen ve eklenen post sayısı")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+
+    posts = _make_posts(args.posts, args.tags, args.seed)
+    t = time.perf_counter()
+    base = _base_from(posts, args.tags)
+    print(f"base: {args.posts} post, {args.tags} etiket, {base.cooc.nnz} çift  "
+          f"kurulum={time.perf_counter() - t:.2f}s")
+
+    with tempfile.NamedTemporaryFile(suffix=".npz") as tmp:
+        t = time.perf_counter()
+        save_snapshot(base, tmp.name)
+        loaded = load_snapshot(tmp.name)
+        same = (loaded.cooc != base.cooc).nnz == 0
+        print(f"snapshot yaz+oku={time.perf_counter() - t:.2f}s  {'OK' if same else 'FAIL'}")
+
+    graph = HashtagGraph()
+    graph._install(base, "bench")
+    truth = dict(posts)
+    for p in rnd.sample(list(posts), args.changes):
+        graph.remove_post(p)
+        truth.pop(p)
+    for p in range(args.posts + 1, args.posts + args.changes + 1):
+        ts = tuple(sorted(set(rnd.choices(range(1, args.tags + 1), k=3))))
+        truth[p] = ts
+        graph.add_post(p, [(t, f"t{t}") for t in ts])
+
+    ok = same
+    for tag in (1, 2, 10, args.tags // 2):
+        got = [(r.tag, r.count) for r in graph.related_tags(f"t{tag}", 10)]
+        if got != _brute_related(truth, tag, 10):
+            ok = False
+            print(f"  FAIL related t{tag}")
+
+    saved, hg.CANDIDATES_PER_TAG = hg.CANDIDATES_PER_TAG, 10 ** 9   # kaba kuvvetle birebir kıyas için sınırsız
+    for p in rnd.sample(list(truth), 5):
+        if [q for q, _s in graph.similar_posts(p, 20)] != _brute_similar(truth, p, 20):
+            ok = False
+            print(f"  FAIL similar {p}")
+    hg.CANDIDATES_PER_TAG = saved
+    print(f"doğruluk (delta={args.changes * 2} değişiklik): {'OK' if ok else 'FAIL'}")
+
+    sample = rnd.choice(list(truth))
+    print(f"related_tags (delta ile):  {_timed(lambda: graph.related_tags('t3', 10), 500):8.1f} µs")
+    print(f"similar_posts (delta ile): {_timed(lambda: graph.similar_posts(sample, 20), 200):8.1f} µs")
+    clean = HashtagGraph()
+    clean._install(base, "bench")
+    print(f"related_tags (delta yok):  {_timed(lambda: clean.related_tags('t3', 10), 500):8.1f} µs")
+    print(f"similar_posts (delta yok): {_timed(lambda: clean.similar_posts(sample, 20), 200):8.1f} µs")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
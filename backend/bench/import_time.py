@@ -0,0 +1,93 @@
+# bench/import_time.py
+"""
+`import app.main` süresi için bütçe kontrolü (cold start regresyonu).
+
+Her ölçüm temiz bir alt process'te yapılır; medyan bütçeyi aşarsa exit code 1.
+--top ile `python -X importtime` çıktısından en pahalı modüller listelenir:
+
+  python -m bench.import_time --budget 1.5 --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Bu modüller import sırasında YÜKLENMEMELİ (ilk kullanımda lazy import edilir)
+LAZY_MODULES = ("openai", "azure.ai.contentsafety", "boto3", "scipy")
+
+_PROBE = (
+    "import sys, time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t); "
+    "print(','.join(m for m in {mods!r} if m in sys.modules))"
+)
+
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_once() -> tuple[float, list[str]]:
+    out = _run(["-c", _PROBE.format(mods=LAZY_MODULES)]).stdout.strip().splitlines()
+    eager = [m for m in out[-1].split(",") if m] if len(out) > 1 else []
+    return float(out[0]), eager
+
+
+def top_modules(n: int) -> list[tuple[int, str]]:
+    # -X importtime: "import time: self [us] | cumulative | imported package"
+    err = _run(["-X", "importtime", "-c", "import app.main"]).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = [p.strip() for p in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            rows.append((int(parts[1]), parts[2]))
+    # sadece üst seviye modüller (girinti yok) okunaklı bir özet verir
+    top = [(us, name) for us, name in rows if not name.startswith(" ")]
+    return sorted(top, reverse=True)[:n]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float, default=1.5, help="medyan import süresi üst sınırı (s)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=0, help="en pahalı N modülü yazdır")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    samples, eager = [], set()
+    for _ in range(args.runs):
+        t, mods = measure_once()
+        samples.append(t)
+        eager.update(mods)
+
+    median = statistics.median(samples)
+    print(f"import app.main: median={median:.3f}s min={min(samples):.3f}s "
+          f"max={max(samples):.3f}s runs={args.runs} ({time.perf_counter() - started:.1f}s toplam)")
+
+    if args.top:
+        for us, name in top_modules(args.top):
+            print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"FAIL import sırasında yüklenmemesi gereken modüller: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL bütçe aşıldı: {median:.3f}s > {args.budget:.3f}s")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# bench/login_throughput.py
+"""
+Login throughput benchmark'ı (çalışan bir API'ye karşı).
+
+Aynı anda N login isteği atar; bu sırada /ping-db'ye sürekli istek göndererek
+bcrypt yükü altında diğer endpoint'lerin gecikmesini de ölçer.
+
+Kullanım:
+  python -m bench.login_throughput --base-url http://localhost:8000 \
+      --username afurkan --password 1234 --concurrency 16 --total 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def _login_worker(client, queue, args, latencies, failures):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        t = time.perf_counter()
+        r = await client.post(
+            "/auth/token",
+            data={"username": args.username, "password": args.password},
+        )
+        latencies.append(time.perf_counter() - t)
+        if r.status_code != 200:
+            failures.append(r.status_code)
+
+
+async def _probe(client, stop: asyncio.Event, latencies):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await client.get("/ping-db")
+        latencies.append(time.perf_counter() - t)
+        await asyncio.sleep(0.05)
+
+
+async def main(args):
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.total):
+        queue.put_nowait(None)
+
+    login_lat: list[float] = []
+    probe_lat: list[float] = []
+    failures: list[int] = []
+    stop = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        probe = asyncio.create_task(_probe(client, stop, probe_lat))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _login_worker(client, queue, args, login_lat, failures)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    print(f"logins        : {args.total} ({len(failures)} failed)")
+    print(f"throughput    : {args.total / elapsed:.1f} login/s")
+    print(f"login p50/p95 : {_pct(login_lat, 50) * 1000:.0f} / {_pct(login_lat, 95) * 1000:.0f} ms")
+    if probe_lat:
+        print(
+            f"ping-db p50/p95 under load: "
+            f"{statistics.median(probe_lat) * 1000:.0f} / {_pct(probe_lat, 95) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://localhost:8000")
+    ap.add_argument("--username", required=True)
+    ap.add_argument("--password", required=True)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--total", type=int, default=200)
+    asyncio.run(main(ap.parse_args()))
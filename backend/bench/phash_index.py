@@ -0,0 +1,81 @@
+# bench/phash_index.py
+"""
+dHash multi-index'inin (services/phash._MultiIndex) doğruluk + gecikme kontrolü (DB yok).
+
+Rastgele 64-bit hash'lerle indeks kurulur; sorgular var olan hash'lerin 0..7 bit
+bozulmuş kopyaları (yakın kopya) ve rastgele hash'lerdir (ıska). Her sorgunun
+sonucu NumPy popcount ile kaba kuvvet taramasıyla karşılaştırılır; p50/p99
+gecikme --budget-ms ile kıyaslanır (aşılırsa exit code 1).
+
+  python -m bench.phash_index --rows 1000000
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from services.phash import HASH_BITS, MAX_SEARCH_DISTANCE, _MultiIndex
+
+
+def _flip(h: int, bits: int, rnd: random.Random) -> int:
+    for b in rnd.sample(range(HASH_BITS), bits):
+        h ^= 1 << b
+    return h
+
+
+def _brute(hashes: np.ndarray, h: int, max_distance: int) -> list[tuple[int, int]]:
+    d = np.bitwise_count(hashes ^ np.uint64(h))
+    keys = np.nonzero(d <= max_distance)[0]
+    return sorted(((int(k), int(d[k])) for k in keys), key=lambda kd: (kd[1], kd[0]))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--distance", type=int, default=6, help="sorgu mesafesi (PHASH_BLOCK_DISTANCE gibi)")
+    ap.add_argument("--check", type=int, default=200, help="kaba kuvvetle doğrulanan sorgu sayısı")
+    ap.add_argument("--budget-ms", type=float, default=1.0, help="p50 sınırı")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+    distance = min(args.distance, MAX_SEARCH_DISTANCE)
+
+    hashes = np.random.default_rng(args.seed).integers(0, 2 ** 64, size=args.rows, dtype=np.uint64)
+    idx = _MultiIndex()
+    t = time.perf_counter()
+    for key, h in enumerate(hashes.tolist()):
+        idx.add(key, h)
+    print(f"kurulum: {args.rows} hash  {time.perf_counter() - t:.1f}s")
+
+    queries = []
+    for i in range(args.queries):
+        if i % 4 == 3:
+            queries.append(rnd.getrandbits(HASH_BITS))                       # ıska
+        else:
+            src = int(hashes[rnd.randrange(args.rows)])
+            queries.append(_flip(src, rnd.randint(0, distance), rnd))       # yakın kopya
+
+    ok = True
+    for q in queries[:args.check]:
+        if idx.search(q, distance) != _brute(hashes, q, distance):
+            ok = False
+            print(f"  FAIL {q:016x}")
+    print(f"doğruluk ({args.check} sorgu, d<={distance}): {'OK' if ok else 'FAIL'}")
+
+    times = []
+    for q in queries:
+        t = time.perf_counter()
+        idx.search(q, distance)
+        times.append((time.perf_counter() - t) * 1000)
+    p50, p99 = np.percentile(times, [50, 99])
+    within = p50 <= args.budget_ms
+    print(f"search d<={distance}: p50={p50:.3f} ms  p99={p99:.3f} ms  "
+          f"(sınır p50 {args.budget_ms} ms: {'OK' if within else 'FAIL'})")
+    return 0 if ok and within else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench/rate_limit.py
+"""
+Token-bucket backend'lerinin doğruluk + maliyet kontrolü (DB yok).
+
+  python -m bench.rate_limit --backend memory
+  python -m bench.rate_limit --backend redis --redis-url redis://localhost:6379/0
+  python -m bench.rate_limit --backend fake      # fakeredis (Lua için lupa) ile yerel stand-in
+
+Kontroller:
+  - aynı anahtara eşzamanlı N istek: tam olarak `capacity` kadarı geçer (atomiklik)
+  - boş bucket'ta bekleme süresi ~ 1/rate
+  - iki limitli kural: küçük limitin reddettiği istekler büyük limitten token harcamaz
+  - take() başına ortalama süre
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+from core.rate_limit import MemoryBackend, RedisBackend, parse_limit
+
+
+def _backend(args):
+    if args.backend == "memory":
+        return MemoryBackend()
+    if args.backend == "fake":
+        from fakeredis import FakeAsyncRedis   # sadece geliştirme ortamında
+        return RedisBackend("", client=FakeAsyncRedis())
+    return RedisBackend(args.redis_url)
+
+
+async def _run(args) -> int:
+    backend = _backend(args)
+    limit = parse_limit("user", f"{args.capacity}/minute")
+    key = f"bench:{uuid.uuid4().hex}"
+
+    waits = [max(w) for w in await asyncio.gather(
+        *(backend.take([(key, limit)]) for _ in range(args.concurrency))
+    )]
+    allowed = sum(1 for w in waits if w == 0)
+    denied_wait = min((w for w in waits if w > 0), default=0.0)
+    ok = allowed == min(args.capacity, args.concurrency)
+    print(f"{backend.name}: {args.concurrency} eşzamanlı istek -> {allowed} izin "
+          f"(beklenen {min(args.capacity, args.concurrency)}) {'OK' if ok else 'FAIL'}")
+    expected_wait = 1 / limit.rate
+    print(f"  ilk ret bekleme süresi {denied_wait:.2f}s (≈{expected_wait:.2f}s)")
+    if allowed < args.concurrency and not (0 < denied_wait <= expected_wait + 0.1):
+        ok = False
+        print("  FAIL bekleme süresi")
+
+    # ya hepsi ya hiçbiri: small tükendikten sonraki retler big'den düşmemeli
+    small, big = parse_limit("user", "2/minute"), parse_limit("ip", f"{args.capacity}/minute")
+    pair = [(f"{key}:small", small), (f"{key}:big", big)]
+    for _ in range(args.concurrency):
+        await backend.take(pair)
+    left = await backend.take([pair[1]], cost=args.capacity - small.capacity, dry_run=True)
+    atomic = left == [0.0]
+    ok = ok and atomic
+    print(f"  iki limit: retler büyük bucket'tan harcamadı {'OK' if atomic else 'FAIL'}")
+
+    t = time.perf_counter()
+    for i in range(args.rounds):
+        await backend.take([(f"bench:{i % 1000}", limit)])
+    per = (time.perf_counter() - t) / args.rounds * 1e6
+    print(f"  take(): {per:.1f} µs/istek ({args.rounds} tur)")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", choices=("memory", "redis", "fake"), default="memory")
+    ap.add_argument("--redis-url", default="redis://localhost:6379/0")
+    ap.add_argument("--capacity", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=100)
+    ap.add_argument("--rounds", type=int, default=5000)
+    return asyncio.run(_run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# bench/serialize_cards.py
+"""
+Post kartı sayfası için encode maliyeti (DB yok, sadece serileştirme).
+
+  before/model: PostOut(...) + FastAPI response_model yolu (validate + serialize) + JSONResponse
+  before/dict:  dict + jsonable_encoder + JSONResponse (eski hashtags/users yolu)
+  after:        PostCard Struct + FastJSONResponse (önceden derlenmiş msgspec encoder)
+
+  python -m bench.serialize_cards --items 100 --rounds 300
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from core.responses import FastJSONResponse
+from services.post_cards import (
+    PostOut, PostOwner, PostPageOut, PostCard, OwnerCard, PostPage,
+)
+
+
+def _raw_items(n: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": 100_000 + i,
+            "content": f"Örnek paylaşım {i} — " + "lorem ipsum dolor sit amet " * 6,
+            "created_at": now - timedelta(seconds=i * 37),
+            "user_id": 10 + i % 50,
+            "username": f"kullanici_{i % 50}",
+            "like_count": i * 3,
+            "liked_by_me": i % 4 == 0,
+            "comment_count": i % 9,
+            "image_urls": [f"/media/uploads/2025/12/{i:032x}.jpg"] * (i % 3),
+            "hashtags": ["#ai", "#fastapi", "#react"][: i % 4],
+        }
+        for i in range(n)
+    ]
+
+
+def before_model(raw: list[dict], field, loop) -> bytes:
+    page = {
+        "items": [
+            PostOut(
+                id=r["id"], content=r["content"], created_at=r["created_at"],
+                owner=PostOwner(id=r["user_id"], username=r["username"]),
+                like_count=r["like_count"], liked_by_me=r["liked_by_me"],
+                comment_count=r["comment_count"], image_urls=r["image_urls"],
+                hashtags=r["hashtags"],
+            )
+            for r in raw
+        ]
+    }
+    content = loop.run_until_complete(serialize_response(field=field, response_content=page))
+    return JSONResponse(content).body
+
+
+def before_dict(raw: list[dict]) -> bytes:
+    page = {
+        "items": [
+            {
+                "id": r["id"], "content": r["content"], "created_at": r["created_at"],
+                "owner": {"id": r["user_id"], "username": r["username"]},
+                "like_count": r["like_count"], "liked_by_me": r["liked_by_me"],
+                "comment_count": r["comment_count"], "image_urls": r["image_urls"],
+                "hashtags": r["hashtags"],
+            }
+            for r in raw
+        ]
+    }
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def after(raw: list[dict]) -> bytes:
+    page = PostPage(items=[
+        PostCard(
+            id=r["id"], content=r["content"], created_at=r["created_at"],
+            owner=OwnerCard(r["user_id"], r["username"]),
+            like_count=r["like_count"], liked_by_me=r["liked_by_me"],
+            comment_count=r["comment_count"], image_urls=r["image_urls"],
+            hashtags=r["hashtags"],
+        )
+        for r in raw
+    ])
+    return FastJSONResponse(page).body
+
+
+def _normalized(body: bytes) -> list[dict]:
+    # eski dict yolunda status yoktu ve UTC "+00:00" yazılıyordu ("Z" ile aynı an)
+    items = json.loads(body)["items"]
+    for item in items:
+        item.pop("status", None)
+        item["created_at"] = datetime.fromisoformat(item["created_at"].replace("Z", "+00:00"))
+    return items
+
+
+def _time(fn, rounds: int) -> list[float]:
+    fn()  # ısınma
+    out = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=100)
+    ap.add_argument("--rounds", type=int, default=300)
+    args = ap.parse_args()
+
+    raw = _raw_items(args.items)
+    field = create_model_field(name="Response_feed", type_=PostPageOut, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    cases = {
+        "before/model": lambda: before_model(raw, field, loop),
+        "before/dict": lambda: before_dict(raw),
+        "after": lambda: after(raw),
+    }
+
+    bodies = [_normalized(fn()) for fn in cases.values()]
+    if any(b != bodies[0] for b in bodies):
+        print("FAIL çıktılar farklı")
+        return 1
+
+    base = None
+    print(f"{args.items} kart/sayfa, {args.rounds} tur")
+    for name, fn in cases.items():
+        samples = _time(fn, args.rounds)
+        med = statistics.median(samples) * 1000
+        base = base or med
+        print(f"  {name:13s} median={med:7.3f} ms/sayfa  p95={sorted(samples)[int(len(samples) * .95)] * 1000:7.3f} ms"
+              f"  ({base / med:4.1f}x)")
+    loop.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,80 @@
 import json
-from typing import Any, Dict, Optional
-from openai import AsyncAzureOpenAI  # DİKKAT: Azure client
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional
 from core.config import settings
+from core.ai_scheduler import AIScheduler, estimate_tokens
+from core.tracing import tracer, KIND_CLIENT
 
 AZURE_API_KEY = settings.AZURE_API_KEY
 AZURE_ENDPOINT = settings.AZURE_ENDPOINT
 AZURE_DEPLOYMENT = settings.AZURE_DEPLOYMENT
 
-if not AZURE_API_KEY or not AZURE_ENDPOINT or not AZURE_DEPLOYMENT:
-    raise RuntimeError("Azure OpenAI yapılandırması eksik!")
 
-# Azure client
-client = AsyncAzureOpenAI(
-    api_key=AZURE_API_KEY,
-    azure_endpoint=AZURE_ENDPOINT,
-    api_version="2024-02-15-preview",  # önerilen sürüm
+def is_configured() -> bool:
+    return bool(AZURE_API_KEY and AZURE_ENDPOINT and AZURE_DEPLOYMENT)
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """
+    Azure client ilk AI isteğinde kurulur (import sırasında değil):
+    eksik config uygulamanın açılmasını engellemez, sadece /ai/* çağrıları hata verir.
+    """
+    if not is_configured():
+        raise RuntimeError("Azure OpenAI yapılandırması eksik!")
+
+    from openai import AsyncAzureOpenAI  # DİKKAT: Azure client (ağır import)
+
+    return AsyncAzureOpenAI(
+        api_key=AZURE_API_KEY,
+        azure_endpoint=AZURE_ENDPOINT,
+        api_version="2024-02-15-preview",  # önerilen sürüm
+        max_retries=0,  # retry/backoff'u scheduler yönetiyor
+    )
+
+# Tüm Azure OpenAI çağrıları buradan geçer (eşzamanlılık + TPM bütçesi + adil kuyruk)
+ai_scheduler = AIScheduler(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    tpm_budget=settings.AI_TPM_BUDGET,
+    max_queue=settings.AI_MAX_QUEUE,
+    max_retries=settings.AI_MAX_RETRIES,
 )
 
+
+async def _scheduled_completion(
+    *,
+    user_key: Hashable,
+    messages: list[dict],
+    max_output_chars: Optional[int],
+    temperature: float,
+):
+    cost = estimate_tokens(
+        prompt_chars=sum(len(m["content"]) for m in messages),
+        max_output_chars=max_output_chars,
+    )
+    client = get_client()
+    with tracer.span("ai.chat_completion", {
+        "ai.model": AZURE_DEPLOYMENT,
+        "ai.temperature": temperature,
+        "ai.estimated_tokens": cost,
+    }, kind=KIND_CLIENT) as sp:
+        response = await ai_scheduler.submit(
+            lambda: client.chat.completions.create(
+                model=AZURE_DEPLOYMENT,
+                temperature=temperature,
+                response_format={"type": "json_object"},  # JSON mode
+                messages=messages,
+            ),
+            user_key=user_key,
+            cost=cost,
+        )
+        usage = response.usage
+        if usage is not None:
+            sp.set("ai.prompt_tokens", usage.prompt_tokens)
+            sp.set("ai.completion_tokens", usage.completion_tokens)
+            sp.set("ai.total_tokens", usage.total_tokens)
+    return response
+
 async def generate_social_post(
     *,
     topic: str,
@@ -24,6 +82,7 @@ async def generate_social_post(
     audience: str,
     want_image: bool,
     max_length: int,
+    user_key: Hashable = "anonymous",
 ) -> Dict[str, Any]:
 
     system_prompt = (
@@ -68,10 +127,10 @@ AÇIKLAMALAR:
 
     user_prompt += f"\n\nKULLANICI_GÖRSEL_ISTIYOR_MU: {str(want_image).lower()}\n"
 
-    response = await client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
+    response = await _scheduled_completion(
+        user_key=user_key,
         temperature=0.7,
-        response_format={"type": "json_object"},  # JSON mode
+        max_output_chars=max_length,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -97,6 +156,7 @@ async def rewrite_text(
     mode: str = "grammar",  # "grammar" | "improve" | "shorten" | "expand"
     target_tone: Optional[str] = None,
     max_length: Optional[int] = None,
+    user_key: Hashable = "anonymous",
 ) -> Dict[str, Any]:
     """
     Verilen metni, belirtilen moda göre yeniden yazar.
@@ -167,10 +227,10 @@ AÇIKLAMALAR:
 - Emoji kullanacaksan çok abartma (maksimum 2-3).
 """
 
-    response = await client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
+    response = await _scheduled_completion(
+        user_key=user_key,
         temperature=0.3,  # rewrite için biraz daha düşük tutulabilir
-        response_format={"type": "json_object"},
+        max_output_chars=max_length or len(text) * 2,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
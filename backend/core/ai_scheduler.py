@@ -0,0 +1,318 @@
+# core/ai_scheduler.py
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from core.tracing import tracer
+
+T = TypeVar("T")
+
+_retryable: Optional[tuple[type[BaseException], ...]] = None
+
+
+def retryable_errors() -> tuple[type[BaseException], ...]:
+    """
+    Tekrar denenebilir upstream hataları (429, 5xx, timeout, bağlantı).
+    openai paketi ağır; import süresine binmesin diye ilk ihtiyaçta yüklenir.
+    """
+    global _retryable
+    if _retryable is None:
+        from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+        _retryable = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+    return _retryable
+
+
+# Kaba token tahmini: Türkçe metinde ~3 karakter = 1 token
+CHARS_PER_TOKEN = 3
+# JSON şeması / rol başlıkları için sabit pay
+RESPONSE_OVERHEAD_TOKENS = 64
+
+
+class AIQueueFull(Exception):
+    """Kuyruk dolu; istemciye hızlıca 503 + tahmini bekleme süresi dönülmeli."""
+
+    def __init__(self, eta_seconds: float):
+        super().__init__(f"AI kuyruğu dolu (tahmini bekleme {eta_seconds:.1f}s)")
+        self.eta_seconds = eta_seconds
+
+
+class AIUpstreamError(Exception):
+    """Retry hakları tükendi; route bunu 503 (rate limit) veya 502'ye çevirir."""
+
+    def __init__(self, cause: BaseException, *, rate_limited: bool, retry_after: Optional[float]):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+
+
+def estimate_tokens(*, prompt_chars: int, max_output_chars: Optional[int]) -> int:
+    """
+    Prompt uzunluğu + beklenen çıktı uzunluğundan token maliyeti tahmini.
+    max_output_chars yoksa makul bir üst sınır (1000 karakter) varsayılır.
+    """
+    out_chars = max_output_chars or 1000
+    return (
+        math.ceil(prompt_chars / CHARS_PER_TOKEN)
+        + math.ceil(out_chars / CHARS_PER_TOKEN)
+        + RESPONSE_OVERHEAD_TOKENS
+    )
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Azure/OpenAI 429 cevabındaki retry-after(-ms) başlığını okur."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(float(ms) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    sec = headers.get("retry-after")
+    if sec:
+        try:
+            return max(float(sec), 0.0)
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass
+class _Ticket:
+    user_key: Hashable
+    cost: int
+    future: asyncio.Future = field(repr=False)
+
+
+class AIScheduler:
+    """
+    Azure OpenAI çağrıları için global yönetici:
+      - aynı anda en fazla `max_concurrency` çağrı
+      - dakikalık token bütçesi (token bucket, saniyede tpm/60 dolar)
+      - kullanıcılar arasında round-robin (adil kuyruk)
+      - retry-after'a uyan, jitter'lı exponential backoff
+      - bekleyen istek sayısı max_queue'ya ulaştıysa beklemeden AIQueueFull (-> 503 + ETA);
+        max_queue=0: bekleme kuyruğu yok, sadece hemen başlayabilen istekler kabul edilir
+
+    Tek event loop içinde çalışır; kilit yerine senkron `_pump` kullanılır.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int,
+        tpm_budget: int,
+        max_queue: int,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tpm_budget = max(1, tpm_budget)
+        self.max_queue = max(0, max_queue)
+        self.max_retries = max(0, max_retries)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._rate = self.tpm_budget / 60.0          # token / saniye
+        self._tokens = float(self.tpm_budget)
+        self._last_refill = time.monotonic()
+
+        self._queues: Dict[Hashable, deque[_Ticket]] = {}
+        self._order: deque[Hashable] = deque()       # sırası gelen kullanıcılar
+        self._pending = 0
+        self._pending_tokens = 0
+        self._running = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self._avg_latency = 2.0                      # EWMA, saniye
+
+    # ---------- dış API ----------
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "running": self._running,
+            "queued": self._pending,
+            "queued_tokens": self._pending_tokens,
+            "tokens_available": int(self._tokens),
+            "avg_latency_s": round(self._avg_latency, 3),
+        }
+
+    def eta_seconds(self, extra_cost: int = 0) -> float:
+        """Yeni gelen bir isteğin tahmini bekleme süresi."""
+        self._refill()
+        need = self._pending_tokens + extra_cost - self._tokens
+        token_wait = max(need, 0) / self._rate
+        slot_wait = (self._pending / self.max_concurrency) * self._avg_latency
+        return round(max(token_wait, slot_wait), 1)
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        *,
+        user_key: Hashable,
+        cost: int,
+    ) -> T:
+        """
+        `call` sırası gelince (slot + token bütçesi) çalıştırılır.
+        Sonuçta `usage.total_tokens` varsa tahmin ile gerçek arasındaki fark bütçeye yansıtılır.
+        """
+        cost = min(max(1, int(cost)), self.tpm_budget)
+
+        # max_queue sadece BEKLEYEN istekleri sınırlar: hemen başlayabilecek istek
+        # (slot ve bütçe var, önünde kimse yok) kuyruğa girmez; 0 = bekleme kuyruğu yok
+        if self._pending >= self.max_queue and not self._can_start(cost):
+            raise AIQueueFull(self.eta_seconds(cost))
+
+        with tracer.span("ai.queue_wait", {"ai.queue.pending": self._pending, "ai.cost": cost}):
+            await self._acquire(user_key, cost)
+
+        started = time.monotonic()
+        try:
+            result = await self._call_with_retry(call)
+        except BaseException:
+            self._release(started)
+            raise
+
+        actual = _usage_total_tokens(result)
+        if actual is not None:
+            # tahmin fazlaysa iade, azsa borç
+            self._tokens = min(self._tokens + (cost - actual), float(self.tpm_budget))
+        self._release(started)
+        return result
+
+    # ---------- kuyruk ----------
+    async def _acquire(self, user_key: Hashable, cost: int) -> None:
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(user_key=user_key, cost=cost, future=loop.create_future())
+
+        q = self._queues.get(user_key)
+        if q is None:
+            q = self._queues[user_key] = deque()
+            self._order.append(user_key)
+        q.append(ticket)
+        self._pending += 1
+        self._pending_tokens += cost
+
+        self._pump()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # slot verilmişti ama istemci gitti -> geri bırak
+                self._running -= 1
+                self._tokens = min(self._tokens + cost, float(self.tpm_budget))
+                self._pump()
+            else:
+                self._drop(ticket)
+            raise
+
+    def _drop(self, ticket: _Ticket) -> None:
+        q = self._queues.get(ticket.user_key)
+        if q is None or ticket not in q:
+            return
+        q.remove(ticket)
+        self._pending -= 1
+        self._pending_tokens -= ticket.cost
+        if not q:
+            del self._queues[ticket.user_key]
+            try:
+                self._order.remove(ticket.user_key)
+            except ValueError:
+                pass
+
+    def _can_start(self, cost: int) -> bool:
+        self._refill()
+        return not self._pending and self._running < self.max_concurrency and cost <= self._tokens
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self._tokens + elapsed * self._rate, float(self.tpm_budget))
+
+    def _pump(self) -> None:
+        self._refill()
+
+        while self._running < self.max_concurrency and self._order:
+            key = self._order[0]
+            q = self._queues[key]
+            ticket = q[0]
+
+            if ticket.cost > self._tokens:
+                # bütçe dolana kadar bekle; sıradaki kullanıcı da aynı bütçeyi paylaşıyor
+                self._schedule((ticket.cost - self._tokens) / self._rate)
+                return
+
+            q.popleft()
+            self._order.popleft()
+            if q:
+                self._order.append(key)   # round-robin: kullanıcı sona geçer
+            else:
+                del self._queues[key]
+
+            self._pending -= 1
+            self._pending_tokens -= ticket.cost
+            self._tokens -= ticket.cost
+            self._running += 1
+            ticket.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+
+        def _fire():
+            self._timer = None
+            self._pump()
+
+        self._timer = loop.call_later(max(delay, 0.01), _fire)
+
+    def _release(self, started: float) -> None:
+        self._running -= 1
+        elapsed = time.monotonic() - started
+        self._avg_latency = 0.8 * self._avg_latency + 0.2 * elapsed
+        self._pump()
+
+    # ---------- retry ----------
+    async def _call_with_retry(self, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if not isinstance(e, retryable_errors()):
+                    raise
+                if attempt >= self.max_retries:
+                    raise AIUpstreamError(
+                        e,
+                        rate_limited=getattr(e, "status_code", None) == 429,
+                        retry_after=_retry_after_seconds(e),
+                    ) from e
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    # full jitter: [0, min(max, base * 2^n)]
+                    cap = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                    delay = random.uniform(0, cap)
+                else:
+                    delay = min(delay, self.max_backoff) + random.uniform(0, self.base_backoff)
+                attempt += 1
+                tracer.current_span().set("ai.retries", attempt)
+                await asyncio.sleep(delay)
+
+
+def _usage_total_tokens(result: Any) -> Optional[int]:
+    usage = getattr(result, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return int(total) if total is not None else None
@@ -0,0 +1,180 @@
+# core/compression.py
+"""
+Accept-Encoding'e göre br / gzip sıkıştırma (saf ASGI middleware).
+
+- Sadece metin/JSON içerik; resimler, SSE (text/event-stream) ve zaten
+  encode edilmiş cevaplar olduğu gibi geçer.
+- Tek parça cevaplar `minimum_size` altındaysa sıkıştırılmaz (küçük JSON'da CPU israfı).
+- Streaming cevaplar parça parça sıkıştırılır ve her parçada flush edilir,
+  yani istemci veriyi beklemeden alır.
+- brotli paketi yoksa sadece gzip sunulur.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # opsiyonel bağımlılık
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_PREFIXES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "text/",
+)
+NEVER_COMPRESS = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str, *, allow_br: bool = True) -> Optional[str]:
+    """Accept-Encoding q değerlerine göre en iyi desteklenen kodlama (br > gzip)."""
+    prefs: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[token] = q
+
+    star = prefs.get("*")
+    candidates = (["br"] if allow_br and brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for enc in candidates:
+        q = prefs.get(enc, star if star is not None else 0.0)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, *, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._c = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.flush()
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _Responder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    def __init__(self, mw: CompressionMiddleware, encoding: str, send: Send):
+        self.mw = mw
+        self.encoding = encoding
+        self._send = send
+        self._start: Optional[Message] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        ctype = headers.get("content-type", "").lower()
+        if ctype.startswith(NEVER_COMPRESS):
+            return False
+        return ctype.startswith(COMPRESSIBLE_PREFIXES)
+
+    async def send(self, message: Message) -> None:
+        mtype = message["type"]
+
+        if mtype == "http.response.start":
+            self._start = message
+            self._passthrough = not self._compressible(Headers(raw=message["headers"]))
+            if self._passthrough:
+                await self._send(message)
+            return
+
+        if mtype != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self._compressor is None:
+            # ilk gövde parçası: küçük tek parça cevap -> olduğu gibi
+            if not more and len(body) < self.mw.minimum_size:
+                await self._send(self._start)
+                await self._send(message)
+                return
+
+            self._compressor = _Compressor(
+                self.encoding,
+                gzip_level=self.mw.gzip_level,
+                brotli_quality=self.mw.brotli_quality,
+            )
+            headers = MutableHeaders(raw=self._start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                # gövde byte'ları değişti: strong ETag artık doğru değil
+                headers["ETag"] = "W/" + headers["etag"]
+
+            if not more:
+                data = self._compressor.compress(body) + self._compressor.finish()
+                headers["Content-Length"] = str(len(data))
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": data})
+                return
+
+            del headers["Content-Length"]
+            await self._send(self._start)
+
+        if more:
+            data = self._compressor.compress(body) + self._compressor.flush()
+        else:
+            data = self._compressor.compress(body) + self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more})
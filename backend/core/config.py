@@ -1,3 +1,4 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 
@@ -10,23 +11,166 @@ class Settings(BaseSettings):
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 240   
 
+    # Parola hash (core/passwords.py)
+    BCRYPT_ROUNDS: int = 12           # değişirse eski hash'ler login'de yenilenir
+    BCRYPT_WORKERS: int = 2           # bcrypt için ayrılan thread sayısı
+
+    # JSON cevap sıkıştırma (core/compression.py); bundan küçük cevaplar olduğu gibi gider
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4   # 4-5: JSON için hız/oran dengesi iyi
+
+    # Rate limiting (core/rate_limit.py): route bazlı token bucket, kullanıcı + IP
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"    # "memory" (tek node) | "redis" (replikalar arası ortak)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_TRUST_PROXY: bool = True   # nginx/ingress X-Forwarded-For'u istemci IP'si ile yazar
+    RATE_LIMIT_OVERRIDES: dict[str, str] = {}   # örn. {"ai.user": "30/minute", "like_toggle.ip": ""} ("" = kapalı)
+
+    # İstek bazlı sampling profiler (core/profiling.py): admin "X-Profile: 1" header'ı veya örnekleme
+    PROFILE_ENABLED: bool = True
+    PROFILE_SAMPLE_RATE: float = 0.0            # 0.01 = isteklerin %1'i (admin token'ı gerekmez)
+    PROFILE_SAMPLE_PATHS: list[str] = []        # örnekleme sadece bu öneklerde, örn. ["/posts/feed"]; boş = hepsi
+    PROFILE_INTERVAL_MS: float = 1.0
+    PROFILE_MAX_SECONDS: float = 30.0           # daha uzun isteklerde örnekleme durur (truncated)
+    PROFILE_MAX_CONCURRENT: int = 2             # process başına aynı anda profillenen istek
+    PROFILE_DIR: str = str(Path(__file__).resolve().parent.parent / "var" / "profiles")
+    PROFILE_MAX_FILES: int = 200                # halka tampon: en eskiler silinir
+
+    # Idempotency-Key (core/idempotency.py): post/yorum oluşturma ve /ai/* tekrarlarında kaydedilmiş cevap
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_LEASE_SECONDS: int = 120        # işleyen process çökerse anahtar bu süre sonra devredilir
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0      # eşzamanlı kopya en fazla bu kadar bekler, sonra 409
+    IDEMPOTENCY_POLL_SECONDS: float = 0.2       # ilk istek başka process'teyse yoklama aralığı
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 64 * 1024   # daha büyük cevaplar saklanmaz
+    IDEMPOTENCY_PURGE_SECONDS: int = 600
+
+    # Span'ler (core/tracing.py): create_post adımları, DB sorguları, moderasyon, Azure OpenAI
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "imageapp-api"
+    TRACING_SAMPLE_RATE: float = 1.0            # traceparent'sız isteklerde; gelen sampled bayrağına uyulur
+    TRACING_EXPORTER: str = "jsonl"             # "jsonl" (TRACING_FILE) | "otlp" (TRACING_OTLP_ENDPOINT)
+    TRACING_FILE: str = str(Path(__file__).resolve().parent.parent / "var" / "traces" / "spans.jsonl")
+    TRACING_FILE_MAX_MB: int = 100              # aşınca spans.jsonl.1'e döner (tek yedek)
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"   # OTLP/HTTP JSON
+    TRACING_MAX_QUEUE: int = 10000              # dolarsa span düşürülür (istek beklemez)
+    TRACING_EXPORT_BATCH: int = 512
+    TRACING_FLUSH_SECONDS: float = 2.0
+    TRACING_DB_STATEMENT_CHARS: int = 1000
+
+    # dev'de tabloları startup'ta create_all ile oluştur; prod'da alembic kullanılır (false)
+    DB_CREATE_ALL: bool = True
+
     MEDIA_ROOT: str = str(Path(__file__).resolve().parent.parent / "data")
     MAX_UPLOAD_MB: int = 5      # opsiyonel
 
-    AZURE_API_KEY: str
-    AZURE_ENDPOINT: str
-    AZURE_DEPLOYMENT: str
+    # Medya depolama (services/storage.py): "local" (MEDIA_ROOT) | "s3" (S3 uyumlu, MinIO vb.)
+    STORAGE_BACKEND: str = "local"
+    MEDIA_PUBLIC_BASE_URL: str = ""       # CDN önündeyse örn. https://cdn.example.com/media ; boşsa /media veya presigned URL
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""             # boş = AWS; MinIO için http://minio:9000
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_ADDRESSING_STYLE: str = "path"     # MinIO path-style ister
+    S3_MAX_POOL_CONNECTIONS: int = 32     # process başına HTTP bağlantı havuzu
+    S3_MULTIPART_THRESHOLD_MB: int = 8    # bu boyuttan büyük nesneler multipart yüklenir
+    S3_MULTIPART_CHUNK_MB: int = 8
+    S3_UPLOAD_CONCURRENCY: int = 4        # bir multipart upload içindeki paralel parça sayısı
+    S3_PRESIGN_SECONDS: int = 3600        # MEDIA_PUBLIC_BASE_URL yoksa presigned GET süresi
+
+    # Upload normalizasyonu (services/images.py)
+    IMAGE_MAX_EDGE: int = 2048            # uzun kenar bundan büyükse küçültülür
+    IMAGE_MAX_PIXELS: int = 40_000_000    # decompression bomb sınırı
+    IMAGE_JPEG_QUALITY: int = 82
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_WORKERS: int = 2                # process pool boyutu
+    PHASH_BLOCK_DISTANCE: int = 6         # engellenmiş resme bu Hamming mesafesi içindeyse direkt blok
+    PHASH_CATCH_UP_OVERLAP: int = 1000    # catch_up her turda son N id'yi yeniden okur (geç commit eden satırlar)
+    PHASH_REMOVAL_RETENTION_HOURS: int = 24  # phash_removals tombstone'ları bu kadar tutulur; daha uzun
+                                          # catch_up yapmamış process indeksini baştan kurar
+
+    # Boş bırakılırsa uygulama yine açılır; ilgili özellikler ilk kullanımda hata verir
+    AZURE_API_KEY: str = ""
+    AZURE_ENDPOINT: str = ""
+    AZURE_DEPLOYMENT: str = ""
+
+    # Azure OpenAI çağrı yöneticisi (core/ai_scheduler.py)
+    AI_MAX_CONCURRENCY: int = 4
+    AI_TPM_BUDGET: int = 30000        # deployment'ın dakikalık token kotası
+    AI_MAX_QUEUE: int = 50            # slot/bütçe bekleyen istek sınırı; üstünde hızlıca 503 (0 = bekleme yok)
+    AI_MAX_RETRIES: int = 3
+    AI_DAILY_TOKEN_QUOTA: int = 0     # kullanıcı başına günlük (UTC) prompt+completion token; 0 = kotasız
     model_config = SettingsConfigDict(
         env_file=".env", 
         env_file_encoding="utf-8"
     )
 
-    CONTENT_SAFETY_ENDPOINT: str
-    CONTENT_SAFETY_KEY: str
-    CONTENT_SAFETY_TEXT_BLOCK_SEVERITY: int
-    CONTENT_SAFETY_TEXT_REVIEW_SEVERITY: int
-    CONTENT_SAFETY_IMAGE_BLOCK_SEVERITY: int
-    CONTENT_SAFETY_IMAGE_REVIEW_SEVERITY: int
+    CONTENT_SAFETY_ENDPOINT: str = ""
+    CONTENT_SAFETY_KEY: str = ""
+    CONTENT_SAFETY_TEXT_BLOCK_SEVERITY: int = 4
+    CONTENT_SAFETY_TEXT_REVIEW_SEVERITY: int = 2
+    CONTENT_SAFETY_IMAGE_BLOCK_SEVERITY: int = 4
+    CONTENT_SAFETY_IMAGE_REVIEW_SEVERITY: int = 2
+
+    # "sync": istek Azure'u bekler | "async": pending olarak kaydet, worker moderasyon yapar
+    MODERATION_MODE: str = "sync"
+    MODERATION_WORKERS: int = 2           # API process'i içinde başlatılan worker thread sayısı (0 = kapalı)
+    MODERATION_BATCH_SIZE: int = 8
+    MODERATION_POLL_SECONDS: float = 1.0
+    MODERATION_LEASE_SECONDS: int = 120   # worker çökerse iş bu süre sonra tekrar alınır
+    MODERATION_MAX_ATTEMPTS: int = 5
+
+    # Canlı beğeni/yorum sayaçları (services/realtime.py): Postgres LISTEN/NOTIFY + WebSocket/SSE
+    REALTIME_ENABLED: bool = True
+    REALTIME_MAX_IDS: int = 200              # bir bağlantının izleyebileceği post sayısı
+    REALTIME_MAX_CONNECTIONS: int = 2000     # worker başına
+    REALTIME_COALESCE_MS: int = 250          # bu süredeki olaylar tek mesajda birleştirilir
+    REALTIME_HEARTBEAT_SECONDS: int = 20     # SSE keep-alive (proxy timeout'ları için)
+
+    # İlgili hashtag / benzer post indeksi (services/hashtag_graph.py): bellekte seyrek matris
+    HASHTAG_GRAPH_ENABLED: bool = True
+    HASHTAG_GRAPH_REFRESH_SECONDS: int = 600   # base DB'den bu aralıkla yeniden kurulur (0 = sadece artımlı)
+    HASHTAG_GRAPH_SNAPSHOT_PATH: str = ""      # boş = <tmp>/hashtag_graph.npz (MEDIA_ROOT'a koyma: /media'dan servis edilir)
+    TRENDING_WINDOW_HOURS: int = 7 * 24        # /hashtags/trending son N saatteki etiketlemeleri sayar
+
+    # Benzer post / anlamsal arama (services/embeddings.py, services/vector_index.py): yerel CPU modeli
+    EMBEDDING_ENABLED: bool = False
+    EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_DIR: str = str(Path(__file__).resolve().parent.parent / "var" / "embeddings")   # MEDIA_ROOT dışında
+    EMBEDDING_WORKER: bool = True          # API process'i içinde yazar thread'i (ayrı process: python -m services.embeddings worker)
+    EMBEDDING_BATCH: int = 32
+    EMBEDDING_THREADS: int = 2             # torch CPU thread sayısı
+    EMBEDDING_POLL_SECONDS: float = 5.0
+    EMBEDDING_SWEEP_SECONDS: int = 600     # geç yayınlanan / silinen post taraması + sıkıştırma
+    EMBEDDING_IVF_MIN_ROWS: int = 20_000   # altında brute-force (NumPy), üstünde IVF
+    EMBEDDING_NPROBE: int = 8              # IVF'te bakılan liste sayısı (recall <-> gecikme)
+
+    # Aylık range partition bakımı (services/partitions.py): likes, comments, ai_requests
+    PARTITION_MONTHS_AHEAD: int = 3                    # bu ay + N ay önceden oluşturulur
+    PARTITION_MAINTENANCE_SECONDS: int = 6 * 3600      # arka plan bakım aralığı (ilk tur startup'ta)
+    PARTITION_RETENTION_MONTHS: dict[str, int] = {}    # sadece ai_requests, örn. {"ai_requests": 12}; yok/0 = arşivleme yok
+    PARTITION_ARCHIVE_SCHEMA: str = "archive"          # detach edilen partition'lar buraya taşınır
+
+    # Post / hesap silme (services/deletion.py): istek soft-delete yapar, bağımlı satırlar arka planda
+    DELETION_WORKERS: int = 1                # API process'i içinde worker thread sayısı (0 = kapalı)
+    DELETION_BATCH_SIZE: int = 2000          # transaction başına silinen satır
+    DELETION_PAUSE_SECONDS: float = 0.05     # batch'ler arası bekleme (replika gecikmesi / kilit baskısı için)
+    DELETION_POLL_SECONDS: float = 2.0
+    DELETION_LEASE_SECONDS: int = 120        # her batch'te uzatılır; worker çökerse iş bu süre sonra tekrar alınır
+    DELETION_MAX_ATTEMPTS: int = 10
+    DELETION_MEDIA_BATCH: int = 200          # tek seferde storage'dan silinen dosya
+
+    @field_validator("PARTITION_RETENTION_MONTHS")
+    @classmethod
+    def _retention_only_ai_requests(cls, v: dict[str, int]) -> dict[str, int]:
+        # likes/comments post'un created_at'i ile bölünüyor: eski bir ayın partition'ı o ay
+        # açılmış ve hâlâ yayında olan post'ların beğeni/yorumlarıdır, arşivlemek canlı veri kaybı.
+        bad = sorted(set(v) - {"ai_requests"})
+        if bad:
+            raise ValueError(f"retention sadece ai_requests için ayarlanabilir: {', '.join(bad)}")
+        return v
 
 
 settings = Settings()
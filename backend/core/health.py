@@ -0,0 +1,40 @@
+# core/health.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict
+
+
+class Readiness:
+    """
+    Startup'ta ısınan bileşenlerin (şema, bellek içi indeksler, ...) durumu.
+    /readyz hepsi hazır olana kadar 503 döner; k8s trafiği sadece ısınmış pod'lara yollar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict[str, Any]] = {}
+
+    def expect(self, name: str) -> None:
+        with self._lock:
+            self._components.setdefault(name, {"ready": False, "error": None, "since": None})
+
+    def mark_ready(self, name: str) -> None:
+        with self._lock:
+            self._components[name] = {"ready": True, "error": None, "since": time.time()}
+
+    def mark_failed(self, name: str, error: str) -> None:
+        with self._lock:
+            self._components[name] = {"ready": False, "error": error[:300], "since": None}
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["ready"] for c in self._components.values())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._components.items()}
+
+
+readiness = Readiness()
@@ -0,0 +1,443 @@
+# core/idempotency.py
+"""
+Pahalı yazmalar için Idempotency-Key desteği (saf ASGI middleware).
+
+Mobil istemci timeout sonrası aynı isteği tekrar gönderdiğinde moderasyon,
+resim yazma ve LLM token'ları ikinci kez harcanmasın diye:
+
+  - İlk istek (kullanıcı, anahtar) satırını "işleniyor" olarak alır, cevabı
+    idempotency_keys tablosuna yazılır (IDEMPOTENCY_TTL_SECONDS boyunca).
+  - Sonraki tekrarlar tek bir indeksli sorgu ile kaydedilmiş cevabı alır
+    (Idempotent-Replayed: true); route hiç çalışmaz.
+  - İlk istek hâlâ sürerken gelen kopya onu bekler: aynı process'teyse
+    sonucuna katılır, değilse satırı IDEMPOTENCY_POLL_SECONDS aralıkla yoklar.
+    IDEMPOTENCY_WAIT_SECONDS içinde bitmezse 409 + Retry-After.
+  - Anahtar başka bir route / path ile kullanılmışsa 422.
+
+Saklanmayan cevaplar (satır bırakılır, tekrar isteği route'u yeniden çalıştırır):
+5xx, 408/409/425/429, gövdesi IDEMPOTENCY_MAX_RESPONSE_BYTES'tan büyük olanlar
+ve istisna ile biten istekler. İşleyen process çökerse satır
+IDEMPOTENCY_LEASE_SECONDS sonra bir sonraki tekrara devredilir. Her sahiplenme
+rastgele bir claim_token yazar; cevabı kaydetme / satırı bırakma sadece bu
+token'la yapılır: lease'i kaçırmış eski sahip, devralanın satırına dokunamaz.
+
+Middleware rate limiter'ın dışındadır (kaydedilmiş cevabın tekrarı limit
+harcamaz); limiter isteği zaten reddedecekse (peek, token almadan) satır hiç
+alınmaz: 429 başına INSERT + DELETE yok, sadece kayıtlı cevap var mı diye bakılır.
+
+Header yoksa, route listede değilse ya da geçerli token yoksa (route zaten
+401 döner) istek olduğu gibi geçer. Parmak izi method + path + query'dir:
+multipart boundary her denemede değiştiği için gövde karşılaştırılmaz.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import BYTEA, JSONB
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.database import engine
+from core.rate_limit import RateLimiter, _client_ip, _user_id_from
+from core.responses import encode_json
+
+log = logging.getLogger("idempotency")
+
+HEADER = b"idempotency-key"
+_KEY_RE = re.compile(r"^[\x21-\x7e]{1,255}$")
+_NOT_STORED = {408, 409, 425, 429}
+
+# (ad, method, path regex): moderasyon + storage ve ücretli LLM çağrıları
+DEFAULT_ROUTES: Sequence[tuple[str, str, str]] = (
+    ("post_create", "POST", r"^/posts/?$"),
+    ("comment_create", "POST", r"^/posts/\d+/comments/?$"),
+    ("ai_generate", "POST", r"^/ai/generate-post/?$"),
+    ("ai_rewrite", "POST", r"^/ai/rewrite-post/?$"),
+)
+
+# Tek ifade: satırı al (yoksa / süresi dolmuşsa / sahibi lease'i kaçırdıysa)
+# ya da mevcut satırı döndür.
+_CLAIM_SQL = text("""
+WITH claimed AS (
+    INSERT INTO idempotency_keys AS k
+        (user_id, idem_key, fingerprint, claim_token, locked_until, expires_at, created_at)
+    VALUES (
+        :uid, :key, :fp, :token,
+        now() + make_interval(secs => :lease),
+        now() + make_interval(secs => :ttl),
+        now()
+    )
+    ON CONFLICT (user_id, idem_key) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint,
+            claim_token = EXCLUDED.claim_token,
+            status_code = NULL,
+            response_headers = NULL,
+            response_body = NULL,
+            locked_until = EXCLUDED.locked_until,
+            expires_at = EXCLUDED.expires_at,
+            created_at = EXCLUDED.created_at
+        WHERE k.expires_at < now()
+           OR (k.status_code IS NULL AND k.locked_until < now())
+    RETURNING 1
+)
+SELECT true AS claimed, NULL::text AS fingerprint, NULL::smallint AS status_code,
+       NULL::jsonb AS response_headers, NULL::bytea AS response_body
+FROM claimed
+UNION ALL
+SELECT false, k.fingerprint, k.status_code, k.response_headers, k.response_body
+FROM idempotency_keys k
+WHERE k.user_id = :uid AND k.idem_key = :key
+  AND NOT EXISTS (SELECT 1 FROM claimed)
+""")
+
+# sadece satırı hâlâ bu sahiplenme tutuyorsa (token eşleşirse)
+_COMPLETE_SQL = text("""
+UPDATE idempotency_keys
+SET status_code = :status, response_headers = :headers, response_body = :body, locked_until = NULL
+WHERE user_id = :uid AND idem_key = :key AND claim_token = :token AND status_code IS NULL
+""").bindparams(bindparam("headers", type_=JSONB), bindparam("body", type_=BYTEA))
+
+_RELEASE_SQL = text("""
+DELETE FROM idempotency_keys
+WHERE user_id = :uid AND idem_key = :key AND claim_token = :token AND status_code IS NULL
+""")
+
+_LOOKUP_SQL = text("""
+SELECT fingerprint, status_code, response_headers, response_body
+FROM idempotency_keys
+WHERE user_id = :uid AND idem_key = :key AND expires_at >= now()
+""")
+
+_PURGE_SQL = text("""
+DELETE FROM idempotency_keys
+WHERE ctid IN (
+    SELECT ctid FROM idempotency_keys WHERE expires_at < now() LIMIT :limit
+)
+""")
+
+
+class Stored:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: list, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        *,
+        ttl_seconds: int,
+        lease_seconds: int,
+        wait_seconds: float,
+        poll_seconds: float,
+        max_response_bytes: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.max_response_bytes = max_response_bytes
+        self.routes = [(name, method, re.compile(p)) for name, method, p in DEFAULT_ROUTES]
+        # aynı process'te süren ilk istekler: kopyalar DB'yi yoklamadan sonucu bekler
+        self._inflight: dict[tuple[int, str], asyncio.Future] = {}
+        self.counts: Counter = Counter()
+        self.purged = 0
+        self.errors = 0
+
+    def match(self, method: str, path: str) -> Optional[str]:
+        for name, m, pattern in self.routes:
+            if m == method and pattern.match(path):
+                return name
+        return None
+
+    # ---------- DB (thread'de çalışır) ----------
+    def _claim(self, uid: int, key: str, fp: str, token: str):
+        params = {
+            "uid": uid, "key": key, "fp": fp, "token": token,
+            "lease": self.lease_seconds, "ttl": self.ttl_seconds,
+        }
+        for _ in range(3):
+            with engine.begin() as conn:
+                row = conn.execute(_CLAIM_SQL, params).first()
+            if row is not None:
+                return row
+            # eşzamanlı insert bizim snapshot'tan sonra commit edildi: tekrar bak
+            time.sleep(0.01)
+        raise RuntimeError("idempotency claim did not settle")
+
+    def _complete(self, uid: int, key: str, token: str, stored: Stored) -> None:
+        with engine.begin() as conn:
+            conn.execute(_COMPLETE_SQL, {
+                "uid": uid, "key": key, "token": token, "status": stored.status,
+                "headers": stored.headers, "body": stored.body,
+            })
+
+    def _release(self, uid: int, key: str, token: str) -> None:
+        with engine.begin() as conn:
+            conn.execute(_RELEASE_SQL, {"uid": uid, "key": key, "token": token})
+
+    def _lookup(self, uid: int, key: str):
+        with engine.connect() as conn:
+            return conn.execute(_LOOKUP_SQL, {"uid": uid, "key": key}).first()
+
+    def purge_expired(self, batch: int = 5000) -> int:
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                n = conn.execute(_PURGE_SQL, {"limit": batch}).rowcount
+            total += n
+            if n < batch:
+                break
+        self.purged += total
+        return total
+
+    def stats(self) -> dict:
+        return {
+            **{k: self.counts[k] for k in ("executed", "replayed", "joined", "conflict", "mismatch", "throttled")},
+            "inflight": len(self._inflight),
+            "purged": self.purged,
+            "errors": self.errors,
+        }
+
+
+def _fingerprint(scope: Scope) -> str:
+    raw = f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')}"
+    return hashlib.sha256(raw.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+async def _send_json(send: Send, status: int, detail: dict, extra: Sequence[tuple[bytes, bytes]] = ()) -> None:
+    body = encode_json({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *extra,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send: Send, stored: Stored) -> None:
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in stored.headers]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, *, store: IdempotencyStore, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.store = store
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        raw_key = None
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                raw_key = value.decode("latin-1").strip()
+                break
+        if raw_key is None or self.store.match(scope["method"], scope["path"]) is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not _KEY_RE.match(raw_key):
+            await _send_json(send, 400, {"message": "Idempotency-Key 1-255 yazdırılabilir ASCII karakter olmalı."})
+            return
+        uid = _user_id_from(Headers(scope=scope))
+        if uid is None:
+            await self.app(scope, receive, send)
+            return
+
+        store = self.store
+        ident = (uid, raw_key)
+        fp = _fingerprint(scope)
+        if await self._throttled(scope, uid):
+            await self._pass_throttled(scope, receive, send, uid, raw_key, fp)
+            return
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + store.wait_seconds
+        waited = False
+
+        while True:
+            try:
+                row = await asyncio.to_thread(store._claim, uid, raw_key, fp, token)
+            except Exception as e:
+                # DB sorunu: idempotency olmadan devam (rate limiter gibi fail-open)
+                store.errors += 1
+                log.warning("idempotency claim failed: %s", e)
+                await self.app(scope, receive, send)
+                return
+
+            if row.claimed:
+                await self._execute(scope, receive, send, ident, token)
+                return
+            if row.fingerprint != fp:
+                store.counts["mismatch"] += 1
+                await _send_json(send, 422, {"message": "Bu Idempotency-Key başka bir istek için kullanılmış."})
+                return
+            if row.status_code is not None:
+                store.counts["joined" if waited else "replayed"] += 1
+                await _replay(send, Stored(row.status_code, row.response_headers or [], bytes(row.response_body or b"")))
+                return
+
+            # ilk istek hâlâ sürüyor
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                store.counts["conflict"] += 1
+                await _send_json(
+                    send, 409,
+                    {"message": "Aynı Idempotency-Key ile gönderilen istek hâlâ işleniyor."},
+                    [(b"retry-after", b"1")],
+                )
+                return
+            waited = True
+            fut = store._inflight.get(ident)
+            if fut is not None:
+                # aynı process: bitince satır kesinleşmiş olur, tekrar bakmak yeter
+                try:
+                    await asyncio.wait_for(asyncio.shield(fut), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(store.poll_seconds, remaining))
+
+    async def _throttled(self, scope: Scope, uid: int) -> bool:
+        if self.limiter is None:
+            return False
+        rule = self.limiter.match(scope["method"], scope["path"])
+        if rule is None:
+            return False
+        wait = await self.limiter.peek(rule, user_id=uid, ip=_client_ip(scope, Headers(scope=scope)))
+        return wait > 0
+
+    async def _pass_throttled(self, scope: Scope, receive: Receive, send: Send,
+                              uid: int, key: str, fp: str) -> None:
+        """Limit dolu: satır alınmaz; kayıtlı cevap varsa replay, yoksa içteki limiter 429 döner."""
+        self.store.counts["throttled"] += 1
+        try:
+            row = await asyncio.to_thread(self.store._lookup, uid, key)
+        except Exception as e:
+            self.store.errors += 1
+            log.warning("idempotency lookup failed: %s", e)
+            row = None
+        if row is not None and row.status_code is not None and row.fingerprint == fp:
+            self.store.counts["replayed"] += 1
+            await _replay(send, Stored(row.status_code, row.response_headers or [], bytes(row.response_body or b"")))
+            return
+        await self.app(scope, receive, send)
+
+    async def _execute(self, scope: Scope, receive: Receive, send: Send,
+                       ident: tuple[int, str], token: str) -> None:
+        store = self.store
+        uid, key = ident
+        fut = asyncio.get_running_loop().create_future()
+        store._inflight[ident] = fut
+        status = 0
+        headers: list = []
+        chunks: list[bytes] = []
+        size = 0
+        settled = False
+
+        async def settle(complete: bool) -> None:
+            nonlocal settled
+            settled = True
+            keep = (
+                complete and status < 500 and status not in _NOT_STORED
+                and size <= store.max_response_bytes
+            )
+            try:
+                if keep:
+                    await asyncio.to_thread(store._complete, uid, key, token, Stored(status, headers, b"".join(chunks)))
+                else:
+                    await asyncio.to_thread(store._release, uid, key, token)
+            except Exception as e:
+                store.errors += 1
+                log.warning("idempotency store failed: %s", e)
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", ())]
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= store.max_response_bytes:
+                    chunks.append(body)
+                if not message.get("more_body", False) and not settled:
+                    # istemci cevabı almadan kaydedilir: hemen gelen tekrar replay alır
+                    await settle(True)
+            await send(message)
+
+        store.counts["executed"] += 1
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            if not settled:
+                # istisna / yarım kalan cevap: satır bırakılır, tekrar isteği yeniden çalışır
+                await settle(False)
+            store._inflight.pop(ident, None)
+            fut.set_result(None)
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lease_seconds=settings.IDEMPOTENCY_LEASE_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+    poll_seconds=settings.IDEMPOTENCY_POLL_SECONDS,
+    max_response_bytes=settings.IDEMPOTENCY_MAX_RESPONSE_BYTES,
+)
+
+
+# ---------- arka plan ----------
+class IdempotencyJanitor:
+    """Süresi dolan satırları IDEMPOTENCY_PURGE_SECONDS aralıkla siler."""
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="idempotency-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.IDEMPOTENCY_PURGE_SECONDS):
+            try:
+                self.store.purge_expired()
+            except Exception as e:
+                self.store.errors += 1
+                log.warning("idempotency purge failed: %s", e)
+
+
+idempotency_janitor = IdempotencyJanitor(idempotency_store)
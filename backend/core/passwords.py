@@ -0,0 +1,54 @@
+# core/passwords.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+from core.config import settings
+
+# bcrypt maliyeti config'ten gelir. min=max=default -> farklı cost ile üretilmiş
+# her hash "needs_update" sayılır ve login sırasında sessizce yeniden hash'lenir.
+bcrypt_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt saf CPU; event loop'u ve FastAPI'nin genel threadpool'unu bloklamasın diye
+# ayrı ve sınırlı bir executor. Kuyruk da sınırlı: fazlası semaphore'da bekler.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_WORKERS,
+    thread_name_prefix="bcrypt",
+)
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.BCRYPT_WORKERS * 4)
+    return _slots
+
+
+async def _run(fn, *args):
+    async with _get_slots():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(bcrypt_context.hash, password)
+
+
+async def verify_password(password: str, hashed: str | None) -> tuple[bool, Optional[str]]:
+    """
+    (doğru_mu, yeni_hash) döner.
+    yeni_hash None değilse kayıtlı hash eski cost ile üretilmiş demektir; DB'ye yazılmalı.
+    hashed yoksa da aynı süreyi harcarız (kullanıcı var/yok zamanlamadan anlaşılmasın).
+    """
+    if not hashed:
+        await _run(bcrypt_context.dummy_verify)
+        return False, None
+    return await _run(bcrypt_context.verify_and_update, password, hashed)
@@ -0,0 +1,418 @@
+# core/profiling.py
+"""
+Tek istek için, isteğe bağlı sampling profiler (saf ASGI middleware).
+
+Tetikleme:
+  - admin token'ı ile gelen "X-Profile: 1" header'ı
+  - PROFILE_SAMPLE_RATE > 0 ise isteklerin bu oranı (PROFILE_SAMPLE_PATHS
+    önekleriyle daraltılabilir)
+Tetiklenmeyen istekte iş sadece header listesinin taranmasıdır: thread,
+trace hook, ek allocation yok.
+
+Profil alınan istekte ayrı bir thread her PROFILE_INTERVAL_MS'te
+sys._current_frames() ile yığınları okur ve sadece bu isteğe ait olanları alır:
+  - event loop thread'i: yığında bu isteğin middleware frame'i varsa
+  - threadpool thread'i (anyio / concurrent.futures): çalıştırdığı işin
+    contextvars context'i bu isteğinse (sync endpoint, dependency, storage ...);
+    isteğin await zincirinin altına eklenir
+  - hiçbiri: istek bir şey bekliyor; await zinciri + "[await]"
+Örnekler gerçek geçen süreyle ağırlıklandırılır (GIL yüzünden aralık kayabilir).
+Process pool'daki işler (resim normalizasyonu) ayrı process'te çalışır, görünmez.
+
+Sonuç PROFILE_DIR'e speedscope formatında yazılır; dizin halka tampondur
+(en fazla PROFILE_MAX_FILES, en eskiler silinir). Cevaba X-Profile-Id eklenir:
+
+  GET /admin/profiles
+  GET /admin/profiles/{id}?format=speedscope   -> https://www.speedscope.app
+  GET /admin/profiles/{id}?format=collapsed    -> flamegraph.pl / inferno
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures.thread
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+
+log = logging.getLogger("profiling")
+
+PROFILE_ID_PATTERN = r"^[0-9]{13}-[0-9a-f]{6}$"
+_PROFILE_ID_RE = re.compile(PROFILE_ID_PATTERN)
+AWAIT_FRAME = ("[await]", "", 0)
+
+_current: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "profile_session", default=None
+)
+
+
+# ---------- threadpool işlerinin context'i ----------
+def _worker_run_codes() -> dict:
+    """Threadpool işini context.run ile çağıran frame'lerin code nesneleri -> context okuyucu."""
+    codes = {}
+    try:
+        from anyio._backends._asyncio import WorkerThread     # run_in_threadpool
+        codes[WorkerThread.run.__code__] = lambda f: f.f_locals.get("context")
+    except (ImportError, AttributeError):   # pragma: no cover
+        pass
+
+    def _work_item(f):
+        # asyncio.to_thread / run_in_executor: fn = partial(context.run, func)
+        fn = getattr(f.f_locals.get("self"), "fn", None)
+        return getattr(getattr(fn, "func", None), "__self__", None)
+
+    codes[concurrent.futures.thread._WorkItem.run.__code__] = _work_item
+    return codes
+
+
+_WORKER_RUN_CODES = _worker_run_codes()
+
+
+# ---------- oturum ----------
+class ProfileSession:
+    def __init__(self, task: Optional[asyncio.Task], root, interval: float, max_seconds: float):
+        self.task = task
+        self.root = root                        # isteğin middleware coroutine frame'i
+        self.loop_thread = threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames: dict[tuple, int] = {}
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self.truncated = False
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Event loop'tan çağrılır: beklemez (join finish'te)."""
+        self.ended = time.perf_counter()
+        self._stop.set()
+
+    def finish(self) -> None:
+        self._thread.join()
+
+    # ---------- örnekleme ----------
+    def _run(self) -> None:
+        last = time.perf_counter()
+        deadline = last + self.max_seconds
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now > deadline:
+                self.truncated = True
+                return
+            stack = self._sample(me)
+            if stack:
+                self.samples.append([self._frame_id(k) for k in stack])
+                self.weights.append((now - last) * 1000.0)
+            last = now
+
+    def _sample(self, me: int) -> list[tuple]:
+        frames = sys._current_frames()
+        own = _stack_until(frames.get(self.loop_thread), self.root)
+        if own is not None:
+            return [_key(f) for f in own]
+
+        awaiting = self._await_chain()
+        for tid, f in frames.items():
+            if tid in (me, self.loop_thread):
+                continue
+            inner = self._worker_stack(f)
+            if inner is not None:
+                return awaiting + [_key(x) for x in inner]
+        return awaiting + [AWAIT_FRAME]
+
+    def _await_chain(self) -> list[tuple]:
+        # askıdaki coroutine zinciri: kökten (middleware) beklenen yere
+        out: list[tuple] = []
+        coro = self.task.get_coro() if self.task is not None else None
+        seen_root = False
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            if frame is self.root:
+                seen_root = True
+            if seen_root:
+                out.append(_key(frame))
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        return out
+
+    def _worker_stack(self, leaf) -> Optional[list]:
+        chain = []
+        f = leaf
+        while f is not None:
+            reader = _WORKER_RUN_CODES.get(f.f_code)
+            if reader is not None:
+                try:
+                    ctx = reader(f)
+                except Exception:
+                    return None
+                if isinstance(ctx, contextvars.Context) and ctx.get(_current) is self:
+                    chain.reverse()
+                    return chain
+                return None
+            chain.append(f)
+            f = f.f_back
+        return None
+
+    def _frame_id(self, key: tuple) -> int:
+        i = self.frames.get(key)
+        if i is None:
+            i = self.frames[key] = len(self.frames)
+        return i
+
+    # ---------- çıktı ----------
+    @property
+    def duration_ms(self) -> float:
+        return ((self.ended or time.perf_counter()) - self.started) * 1000.0
+
+    def speedscope(self, name: str) -> dict:
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [
+                {"name": n, "file": file, "line": line} if file else {"name": n}
+                for n, file, line in self.frames
+            ]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(self.weights), 3),
+                "samples": self.samples,
+                "weights": [round(w, 3) for w in self.weights],
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "core.profiling",
+        }
+
+
+def _key(frame) -> tuple:
+    code = frame.f_code
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+
+def _stack_until(leaf, root) -> Optional[list]:
+    """leaf'ten köke kadar (dahil) frame'ler kök -> yaprak sırasıyla; kök yığında yoksa None."""
+    chain = []
+    f = leaf
+    while f is not None:
+        chain.append(f)
+        if f is root:
+            chain.reverse()
+            return chain
+        f = f.f_back
+    return None
+
+
+# ---------- halka tampon ----------
+def _short_path(path: str) -> str:
+    marker = "site-packages" + os.sep
+    i = path.rfind(marker)
+    if i >= 0:
+        return path[i + len(marker):]
+    base = str(Path(__file__).resolve().parent.parent) + os.sep
+    return path[len(base):] if path.startswith(base) else path
+
+
+def collapsed(doc: dict) -> str:
+    """speedscope -> "a;b;c <mikrosaniye>" satırları (flamegraph.pl / inferno girdisi)."""
+    names = [
+        f"{fr['name']} ({_short_path(fr['file'])}:{fr['line']})" if fr.get("file") else fr["name"]
+        for fr in doc["shared"]["frames"]
+    ]
+    totals: dict[str, float] = {}
+    prof = doc["profiles"][0]
+    for stack, w in zip(prof["samples"], prof["weights"]):
+        key = ";".join(names[i] for i in stack)
+        totals[key] = totals.get(key, 0.0) + w
+    return "".join(f"{k} {max(int(v * 1000), 1)}\n" for k, v in totals.items())
+
+
+class ProfileStore:
+    """
+    PROFILE_DIR altında <id>.json (speedscope) + <id>.meta.json. id zaman sıralıdır;
+    en fazla max_files profil tutulur. Birden çok worker process aynı dizine yazabilir
+    (dosyalar atomik yazılır, silme yarışları yok sayılır).
+    """
+
+    def __init__(self, root: str, max_files: int):
+        self.root = Path(root)
+        self.max_files = max_files
+
+    @staticmethod
+    def new_id() -> str:
+        return f"{int(time.time() * 1000):013d}-{secrets.token_hex(3)}"
+
+    def _write(self, path: Path, data: bytes) -> None:
+        tmp = path.with_name(f".tmp-{path.name}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def save(self, profile_id: str, meta: dict, doc: dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        # önce profil, sonra meta: listede görünen her profil indirilebilir
+        self._write(self.root / f"{profile_id}.json", json.dumps(doc, separators=(",", ":")).encode())
+        self._write(self.root / f"{profile_id}.meta.json", json.dumps(meta).encode())
+        self._trim()
+
+    def _ids(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name[:-len(".meta.json")] for p in self.root.glob("*.meta.json"))
+
+    def _trim(self) -> None:
+        ids = self._ids()
+        for old in ids[:max(len(ids) - self.max_files, 0)]:
+            for suffix in (".meta.json", ".json"):
+                try:
+                    (self.root / f"{old}{suffix}").unlink()
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit: int) -> list[dict]:
+        out = []
+        for pid in reversed(self._ids()):
+            try:
+                out.append(json.loads((self.root / f"{pid}.meta.json").read_bytes()))
+            except (FileNotFoundError, ValueError):
+                continue      # bu sırada silindi / yarım
+            if len(out) >= limit:
+                break
+        return out
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID_RE.match(profile_id):
+            return None
+        p = self.root / f"{profile_id}.json"
+        return p if p.is_file() else None
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+
+# ---------- middleware ----------
+def _admin_from(headers: Headers) -> Optional[str]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
+    except JWTError:
+        return None
+    return payload.get("sub") if payload.get("role") == "admin" else None
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        sample_paths: tuple[str, ...] = (),
+        interval_ms: float = 1.0,
+        max_seconds: float = 30.0,
+        max_concurrent: int = 2,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.sample_paths = tuple(sample_paths)
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.max_concurrent = max_concurrent
+        self.active = 0
+
+    def _trigger(self, scope: Scope) -> Optional[tuple[str, Optional[str]]]:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                if value.strip().lower() in (b"1", b"true"):
+                    admin = _admin_from(Headers(scope=scope))
+                    if admin is not None:
+                        return "header", admin
+                break
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            if not self.sample_paths or scope["path"].startswith(self.sample_paths):
+                return "sampled", None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if self.active >= self.max_concurrent:
+            # profiler thread'leri sınırlı: bu istek profilsiz geçer
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.new_id()
+        status_code = 0
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        session = ProfileSession(asyncio.current_task(), sys._getframe(), self.interval, self.max_seconds)
+        token = _current.set(session)
+        self.active += 1
+        started_at = time.time()
+        session.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            session.stop()
+            _current.reset(token)
+            self.active -= 1
+            route = scope.get("route")
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status_code,
+                "duration_ms": round(session.duration_ms, 2),
+                "trigger": trigger[0],
+                "admin": trigger[1],
+                "started_at": started_at,
+                "pid": os.getpid(),
+            }
+            await asyncio.to_thread(self._store, session, meta)
+
+    def _store(self, session: ProfileSession, meta: dict) -> None:
+        session.finish()
+        meta["samples"] = len(session.samples)
+        meta["truncated"] = session.truncated
+        name = f"{meta['method']} {meta['route'] or meta['path']}"
+        try:
+            self.store.save(meta["id"], meta, session.speedscope(name))
+        except OSError as e:
+            log.warning("profile %s could not be stored: %s", meta["id"], e)
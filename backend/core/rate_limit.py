@@ -0,0 +1,343 @@
+# core/rate_limit.py
+"""
+Route bazlı token-bucket rate limiting (saf ASGI middleware).
+
+Her kural bir (method, path regex) eşleşmesi ve bir/birkaç limitten oluşur:
+  scope="user"  -> JWT'deki kullanıcı id'si (token yoksa/geçersizse IP'ye düşer)
+  scope="ip"    -> istemci IP'si (RATE_LIMIT_TRUST_PROXY ise X-Forwarded-For'un ilki)
+
+Limit yazımı: "20/minute", "5/second", "100/hour"; opsiyonel burst: "20/minute;burst=5".
+Bucket kapasitesi burst (yoksa sayı), dolum hızı sayı/periyot.
+
+Backend'ler:
+  memory  tek node; process içi sözlük (LRU ile sınırlı)
+  redis   çok replika; Redis protokolü konuşan her sunucu (Redis, Valkey, Dragonfly,
+          testte fakeredis). Bucket güncellemesi tek Lua script ile atomik, saat
+          sunucunun TIME'ı (replikalar arası saat kayması etkilemez).
+
+Backend hata verirse istek GEÇER (fail-open) ve sayaçta görünür: rate limiter
+yüzünden API'nin tamamen durması, limitsiz kalmasından daha kötü.
+
+429 cevapları Retry-After taşır; sayaçlar stats() ile /readyz'de görünür.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+from core.responses import encode_json
+
+log = logging.getLogger("rate_limit")
+
+BACKEND_RETRY_SECONDS = 5
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Limit:
+    scope: str        # user | ip
+    capacity: int     # burst
+    rate: float       # token / saniye
+    spec: str
+
+
+def parse_limit(scope: str, spec: str) -> Limit:
+    body, _, opts = spec.partition(";")
+    count, _, period = body.strip().partition("/")
+    if period.strip() not in _PERIODS:
+        raise ValueError(f"Geçersiz limit: {spec!r}")
+    n = int(count)
+    burst = n
+    opts = opts.strip()
+    if opts:
+        key, _, val = opts.partition("=")
+        if key.strip() != "burst":
+            raise ValueError(f"Geçersiz limit: {spec!r}")
+        burst = int(val)
+    return Limit(scope=scope, capacity=burst, rate=n / _PERIODS[period.strip()], spec=spec.strip())
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    method: str
+    path: re.Pattern
+    limits: tuple[Limit, ...]
+
+
+# Varsayılanlar; RATE_LIMIT_OVERRIDES ile "kural.scope" -> spec değiştirilebilir
+DEFAULT_RULES: Sequence[tuple[str, str, str, dict[str, str]]] = (
+    # bcrypt: IP başına kaba kuvvet / CPU tüketimi
+    ("auth_token", "POST", r"^/auth/token/?$", {"ip": "10/minute"}),
+    ("auth_register", "POST", r"^/auth/?$", {"ip": "5/minute"}),
+    # moderasyon + resim normalizasyonu + storage
+    ("post_create", "POST", r"^/posts/?$", {"user": "10/minute;burst=5", "ip": "30/minute"}),
+    ("comment_create", "POST", r"^/posts/\d+/comments/?$", {"user": "20/minute;burst=10", "ip": "60/minute"}),
+    ("like_toggle", "POST", r"^/posts/\d+/like-toggle/?$", {"user": "60/minute;burst=20", "ip": "240/minute"}),
+    # tüm hesabın ZIP'i: storage + DB'yi uzun süre meşgul eder
+    ("user_export", "GET", r"^/users/me/export/?$", {"user": "3/hour", "ip": "10/hour"}),
+    # ücretli LLM çağrıları
+    ("ai", "POST", r"^/ai/", {"user": "10/minute;burst=3", "ip": "30/minute"}),
+)
+
+
+def build_rules(overrides: Optional[dict[str, str]] = None) -> list[Rule]:
+    overrides = overrides or {}
+    rules = []
+    for name, method, pattern, limits in DEFAULT_RULES:
+        specs = dict(limits)
+        for scope in ("user", "ip"):
+            key = f"{name}.{scope}"
+            if key in overrides:
+                specs[scope] = overrides[key]
+        parsed = tuple(parse_limit(scope, spec) for scope, spec in specs.items() if spec)
+        rules.append(Rule(name, method, re.compile(pattern), parsed))
+    return rules
+
+
+# ---------- backend'ler ----------
+Bucket = tuple[str, Limit]
+
+
+class MemoryBackend:
+    """Tek process; event loop içinde çağrıldığı için kilit gerekmez."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._max_keys = max_keys
+
+    async def take(self, buckets: Sequence[Bucket], cost: float = 1.0, *, dry_run: bool = False) -> list[float]:
+        """
+        Bucket başına bekleme süresi (0 = izin). Token'lar sadece HEPSİ izin verirse
+        ve dry_run değilse alınır: bir limitin reddettiği istek diğerlerinden harcamaz.
+        """
+        now = time.monotonic()
+        levels = []
+        waits = []
+        for key, limit in buckets:
+            tokens, ts = self._buckets.get(key, (float(limit.capacity), now))
+            tokens = min(float(limit.capacity), tokens + (now - ts) * limit.rate)
+            levels.append(tokens)
+            waits.append(0.0 if tokens >= cost else (cost - tokens) / limit.rate)
+        if dry_run or any(waits):
+            return waits
+        for (key, _limit), tokens in zip(buckets, levels):
+            self._buckets.pop(key, None)
+            self._buckets[key] = (tokens - cost, now)
+        # en uzun süredir dokunulmayan bucket'lar dolmuştur; atmak "tam dolu" ile aynı
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return waits
+
+
+# KEYS = bucket'lar; ARGV: cost, dry_run(1/0), sonra bucket başına capacity, rate (token/sn)
+# -> bucket başına bekleme_ms (hepsi 0 ise izin). Önce tüm bucket'lar kontrol edilir,
+# token'lar sadece hepsi izin verirse (ve dry_run değilse) tek seferde düşülür.
+_TOKEN_BUCKET_LUA = """
+local cost = tonumber(ARGV[1])
+local dry_run = tonumber(ARGV[2]) == 1
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+local waits = {}
+local denied = false
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[1 + i * 2])
+  local rate = tonumber(ARGV[2 + i * 2])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1])
+  local ts = tonumber(state[2])
+  if tokens == nil then
+    tokens = capacity
+    ts = now
+  end
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  levels[i] = tokens
+  if tokens >= cost then
+    waits[i] = 0
+  else
+    waits[i] = math.ceil((cost - tokens) / rate * 1000)
+    denied = true
+  end
+end
+if not denied and not dry_run then
+  for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - cost), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+  end
+end
+return waits
+"""
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str, *, prefix: str = "rl:", timeout: float = 0.25, client=None):
+        if client is None:
+            import redis.asyncio as aioredis   # opsiyonel bağımlılık; memory modunda yüklenmez
+            client = aioredis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def take(self, buckets: Sequence[Bucket], cost: float = 1.0, *, dry_run: bool = False) -> list[float]:
+        args: list = [cost, 1 if dry_run else 0]
+        for _key, limit in buckets:
+            args += [limit.capacity, limit.rate]
+        waits = await self._script(keys=[self._prefix + key for key, _limit in buckets], args=args)
+        return [int(w) / 1000.0 for w in waits]
+
+
+def make_backend():
+    if settings.RATE_LIMIT_BACKEND.lower() == "redis":
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+
+# ---------- middleware ----------
+class RateLimiter:
+    def __init__(self, rules: list[Rule], backend=None):
+        self.rules = rules
+        self._backend = backend
+        self.throttled: Counter[str] = Counter()    # "kural.scope" -> 429 sayısı
+        self.backend_errors = 0
+        self._down_until = 0.0   # backend hata verince kısa süre hiç sorulmaz (her istek timeout beklemesin)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = make_backend()
+        return self._backend
+
+    def match(self, method: str, path: str) -> Optional[Rule]:
+        for rule in self.rules:
+            if rule.method == method and rule.path.match(path):
+                return rule
+        return None
+
+    def _buckets(self, rule: Rule, user_id: Optional[int], ip: str) -> list[Bucket]:
+        out = []
+        for limit in rule.limits:
+            if limit.scope == "user" and user_id is not None:
+                ident = f"u{user_id}"
+            else:
+                ident = f"ip{ip}"
+            out.append((f"{rule.name}:{limit.scope}:{ident}", limit))
+        return out
+
+    async def _take(self, rule: Rule, user_id: Optional[int], ip: str, dry_run: bool) -> list[float]:
+        if time.monotonic() < self._down_until:
+            return []
+        try:
+            return await self.backend.take(self._buckets(rule, user_id, ip), dry_run=dry_run)
+        except Exception as e:
+            self.backend_errors += 1
+            self._down_until = time.monotonic() + BACKEND_RETRY_SECONDS
+            log.warning("rate limit backend error (fail-open %ss): %s", BACKEND_RETRY_SECONDS, e)
+            return []
+
+    async def check(self, rule: Rule, *, user_id: Optional[int], ip: str) -> float:
+        """
+        Tüm limitler izin verirse hepsinden birer token alır (ya hepsi ya hiçbiri);
+        en uzun bekleme süresini döner (0 = izin).
+        """
+        waits = await self._take(rule, user_id, ip, dry_run=False)
+        for limit, w in zip(rule.limits, waits):
+            if w > 0:
+                self.throttled[f"{rule.name}.{limit.scope}"] += 1
+        return max(waits, default=0.0)
+
+    async def peek(self, rule: Rule, *, user_id: Optional[int], ip: str) -> float:
+        """check() gibi ama token almaz ve sayaç tutmaz: isteğin reddedileceğini önceden görmek için."""
+        return max(await self._take(rule, user_id, ip, dry_run=True), default=0.0)
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.RATE_LIMIT_BACKEND.lower(),
+            "throttled": dict(self.throttled),
+            "throttled_total": sum(self.throttled.values()),
+            "backend_errors": self.backend_errors,
+        }
+
+
+def _user_id_from(headers: Headers) -> Optional[int]:
+    auth = headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
+    except JWTError:
+        return None
+    uid = payload.get("id")
+    return uid if isinstance(uid, int) else None
+
+
+def _client_ip(scope: Scope, headers: Headers) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        fwd = headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, *, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self.limiter.match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        wait = await self.limiter.check(
+            rule, user_id=_user_id_from(headers), ip=_client_ip(scope, headers)
+        )
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = max(1, math.ceil(wait))
+        body = encode_json({
+            "detail": {
+                "message": "Çok fazla istek, lütfen biraz sonra tekrar deneyin.",
+                "retry_after_seconds": retry_after,
+            }
+        })
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+rate_limiter = RateLimiter(build_rules(settings.RATE_LIMIT_OVERRIDES))
@@ -0,0 +1,94 @@
+# core/responses.py
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Iterator
+
+import anyio
+import msgspec
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _enc_hook(obj: Any) -> Any:
+    # msgspec'in tanımadığı tipler (eski kodun döndürdüğü pydantic modelleri vb.)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise NotImplementedError(f"JSON'a çevrilemeyen tip: {type(obj)!r}")
+
+
+# Encoder bir kez kurulur; Struct tipleri için alan sırası/isimleri önceden derlenir
+_encoder = msgspec.json.Encoder(enc_hook=_enc_hook)
+
+
+def encode_json(content: Any) -> bytes:
+    return _encoder.encode(content)
+
+
+class FastJSONResponse(Response):
+    """
+    msgspec.Struct / dict / list içeriği doğrudan bytes'a çevirir.
+
+    Endpoint bu response'u kendisi döndürdüğünde FastAPI response_model ile
+    tekrar validate + jsonable_encoder yapmaz; response_model sadece OpenAPI
+    dokümantasyonu için kalır.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return _encoder.encode(content)
+
+
+# ---------- conditional GET ----------
+# Cevaplar görüntüleyene özel (liked_by_me): paylaşılan cache tutmasın, her seferinde sorsun
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": REVALIDATE_CACHE_CONTROL,
+        "Vary": "Authorization",
+    }
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match weak comparison (RFC 9110 13.1.2): W/ öneki yok sayılır, liste ve * desteklenir."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(t) == wanted for t in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+# ---------- streaming ----------
+async def iterate_closing(gen: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Senkron (DB/dosya okuyan) generator'ı threadpool'da parça parça çalıştırır.
+    İstemci koparsa StreamingResponse bu async generator'ı iptal eder; finally'de
+    senkron generator da kapatılır, yani onun finally blokları (cursor, session,
+    dosya) GC'yi beklemeden hemen çalışır ve iş durur.
+    """
+    try:
+        while True:
+            chunk = await run_in_threadpool(next, gen, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # iptal edilmiş scope'ta await hemen tekrar iptal olur; kapanış korunmalı
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(gen.close)
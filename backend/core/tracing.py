@@ -0,0 +1,574 @@
+# core/tracing.py
+"""
+OpenTelemetry tarzı span'ler (bağımlılıksız): bir isteğin hangi adımda ne kadar
+beklediği tek tek görülsün diye.
+
+  with tracer.span("images.normalize", {"image.count": 3}) as sp:
+      ...
+      sp.set("image.bytes_out", total)
+
+- Bağlam: contextvars. Sync endpoint'ler, run_in_threadpool ve asyncio.to_thread
+  context'i kopyalar, span'ler doğru parent'a bağlanır. Process pool'a geçmez.
+- Gelen istek: W3C "traceparent" header'ı varsa aynı trace'e eklenir (sampled
+  bayrağına uyulur). Yoksa nginx'in X-Request-Id'si ($request_id, 32 hex) trace
+  id olarak kullanılır: nginx access log'u ile aynı kimlik. İkisi de yoksa yeni
+  id üretilir ve TRACING_SAMPLE_RATE uygulanır.
+- DB: engine'e bağlanan SQLAlchemy event'leri her sorguyu "db <OP>" span'i yapar
+  (sadece kayıt edilen bir span'in altındaysa; arka plan sorguları trace açmaz).
+- Export: bitmiş span'ler kuyruğa atılır, ayrı thread batch'ler halinde
+  TRACING_EXPORTER'a yazar:
+    "jsonl": TRACING_FILE (her satır bir span; TRACING_FILE_MAX_MB'de .1'e döner)
+    "otlp":  TRACING_OTLP_ENDPOINT (OTLP/HTTP JSON, örn. collector :4318/v1/traces)
+  Kuyruk doluysa span düşürülür; istek asla export'u beklemez.
+
+Kapalıyken (TRACING_ENABLED=false) span() paylaşılan no-op nesneyi döner.
+
+Tek istek için adım adım süreler (jsonl):
+  python -m core.tracing show <trace_id>      # trace id cevapta X-Trace-Id
+  python -m core.tracing slow [limit]          # en yavaş istekler
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Coroutine, Iterator, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+
+log = logging.getLogger("app.tracing")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_HEX32 = re.compile(r"^[0-9a-f]{32}$")
+_ZERO_TRACE = "0" * 32
+_FORM_TYPES = ("multipart/form-data", "application/x-www-form-urlencoded")
+
+# OTLP SpanKind
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind", "recording",
+        "attributes", "status", "status_message", "start_ns", "end_ns", "_t0",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        *,
+        kind: int = KIND_INTERNAL,
+        recording: bool = True,
+        attributes: Optional[dict] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.recording = recording
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "unset"
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self._t0 = time.perf_counter_ns()
+
+    def set(self, key: str, value: Any) -> None:
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        for k, v in attributes.items():
+            self.set(k, v)
+
+    def record_error(self, exc: BaseException) -> None:
+        if not self.recording:
+            return
+        self.status = "error"
+        self.status_message = f"{type(exc).__name__}: {exc}"[:300]
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.recording else '00'}"
+
+    def end(self) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._t0)
+        if self.recording:
+            tracer._export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class _NoopSpan(Span):
+    """Tracing kapalıyken / örneklenmeyen dalda dönen paylaşılan nesne."""
+
+    def __init__(self):
+        super().__init__("noop", _ZERO_TRACE, None, recording=False)
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+# ---------- export ----------
+class _JsonlWriter:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def write(self, spans: list[Span], resource: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lines = "".join(
+            json.dumps({**s.to_dict(), **resource}, ensure_ascii=False, default=str) + "\n"
+            for s in spans
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            size = f.tell()
+        if self.max_bytes and size > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+
+    def close(self) -> None:
+        pass
+
+
+def _otlp_value(v: Any) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_attributes(attrs: dict) -> list[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items()]
+
+
+class _OtlpWriter:
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        import httpx
+
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=timeout)
+
+    def write(self, spans: list[Span], resource: dict) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes(resource)},
+                "scopeSpans": [{
+                    "scope": {"name": "imageapp"},
+                    "spans": [{
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                        "name": s.name,
+                        "kind": s.kind,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": _otlp_attributes(s.attributes),
+                        "status": (
+                            {"code": 2, "message": s.status_message or ""}
+                            if s.status == "error" else {"code": 0}
+                        ),
+                    } for s in spans],
+                }],
+            }],
+        }
+        resp = self.client.post(self.endpoint, json=body)
+        resp.raise_for_status()
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class Tracer:
+    def __init__(
+        self,
+        *,
+        service_name: str,
+        sample_rate: float = 1.0,
+        max_queue: int = 10000,
+        batch_size: int = 512,
+        flush_seconds: float = 2.0,
+        db_statement_chars: int = 1000,
+    ):
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.db_statement_chars = db_statement_chars
+        self.enabled = False
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+        self._queue: queue.Queue[Optional[Span]] = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_error_log = 0.0
+
+    # ---------- yaşam döngüsü ----------
+    def start(self, writer) -> None:
+        if self._thread is not None:
+            return
+        self._writer = writer
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self.enabled = False
+        self._queue.put(None)   # kalanları yazıp çıkar
+        self._thread.join(timeout)
+        self._thread = None
+        self._writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+    # ---------- span'ler ----------
+    def current_span(self) -> Span:
+        return _current.get() or _NOOP
+
+    def start_span(
+        self,
+        name: str,
+        attributes: Optional[dict] = None,
+        *,
+        kind: int = KIND_INTERNAL,
+        parent: Optional[Span] = None,
+        root: bool = True,
+    ) -> Span:
+        """
+        Context'e KOYMADAN span başlatır (çağıran end() eder). Parent yoksa
+        root=True ise yeni trace açılır (örnekleme oranına göre), değilse no-op.
+        """
+        if not self.enabled:
+            return _NOOP
+        parent = parent or _current.get()
+        if parent is not None:
+            if not parent.recording:
+                return _NOOP
+            return Span(name, parent.trace_id, parent.span_id, kind=kind, attributes=attributes)
+        if not root or random.random() >= self.sample_rate:
+            return _NOOP
+        return Span(name, secrets.token_hex(16), None, kind=kind, attributes=attributes)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict] = None, *, kind: int = KIND_INTERNAL) -> Iterator[Span]:
+        sp = self.start_span(name, attributes, kind=kind)
+        if sp is _NOOP:
+            yield sp
+            return
+        token = _current.set(sp)
+        try:
+            yield sp
+        except BaseException as e:
+            sp.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            sp.end()
+
+    def _export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        resource = {"service.name": self.service_name, "process.pid": os.getpid()}
+        stopping = False
+        while not stopping:
+            batch: list[Span] = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    # kuyrukta kalanlar da yazılsın
+                    while True:
+                        try:
+                            rest = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if rest is not None:
+                            batch.append(rest)
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            try:
+                self._writer.write(batch, resource)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                self.dropped += len(batch)
+                now = time.monotonic()
+                if now - self._last_error_log > 60:
+                    self._last_error_log = now
+                    log.warning("trace export failed (%d spans dropped): %s", len(batch), e)
+
+
+tracer = Tracer(
+    service_name=settings.TRACING_SERVICE_NAME,
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    max_queue=settings.TRACING_MAX_QUEUE,
+    batch_size=settings.TRACING_EXPORT_BATCH,
+    flush_seconds=settings.TRACING_FLUSH_SECONDS,
+    db_statement_chars=settings.TRACING_DB_STATEMENT_CHARS,
+)
+
+
+def writer_from_settings():
+    if settings.TRACING_EXPORTER.lower() == "otlp":
+        return _OtlpWriter(settings.TRACING_OTLP_ENDPOINT)
+    return _JsonlWriter(settings.TRACING_FILE, settings.TRACING_FILE_MAX_MB * 1024 * 1024)
+
+
+# ---------- SQLAlchemy ----------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sp = tracer.start_span(
+        "db " + (statement.lstrip().split(None, 1) or ["?"])[0].upper(),
+        {"db.system": "postgresql", "db.statement": statement[: tracer.db_statement_chars]},
+        kind=KIND_CLIENT,
+        root=False,
+    )
+    if sp is not _NOOP:
+        if executemany:
+            sp.set("db.executemany", True)
+        context._trace_span = sp
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sp = getattr(context, "_trace_span", None)
+    if sp is not None:
+        context._trace_span = None
+        sp.set("db.rows", cursor.rowcount if cursor.rowcount >= 0 else None)
+        sp.end()
+
+
+def _handle_error(exception_context):
+    ctx = exception_context.execution_context
+    sp = getattr(ctx, "_trace_span", None) if ctx is not None else None
+    if sp is not None:
+        ctx._trace_span = None
+        sp.record_error(exception_context.original_exception)
+        sp.end()
+
+
+def instrument_engine(engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------- ASGI ----------
+def _incoming_parent(scope: Scope) -> tuple[Optional[str], Optional[str], Optional[bool], Optional[str]]:
+    """(trace_id, parent_span_id, sampled, request_id)"""
+    traceparent = request_id = None
+    for name, value in scope["headers"]:
+        if name == b"traceparent":
+            traceparent = value.decode("latin-1").strip().lower()
+        elif name == b"x-request-id":
+            request_id = value.decode("latin-1").strip()
+    if traceparent:
+        m = _TRACEPARENT.match(traceparent)
+        if m and m.group(1) != _ZERO_TRACE and m.group(2) != "0" * 16:
+            return m.group(1), m.group(2), bool(int(m.group(3), 16) & 1), request_id
+    if request_id and _HEX32.match(request_id.lower()) and request_id != _ZERO_TRACE:
+        return request_id.lower(), None, None, request_id
+    return None, None, None, request_id
+
+
+class TracingMiddleware:
+    """Her HTTP isteği için SERVER span'i; cevaba X-Trace-Id eklenir."""
+
+    def __init__(self, app: ASGIApp, *, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled, request_id = _incoming_parent(scope)
+        if sampled is None:
+            sampled = random.random() < self.tracer.sample_rate
+        attrs = {
+            "http.request.method": scope["method"],
+            "url.path": scope["path"],
+            "http.request_id": request_id,
+        }
+        server = Span(
+            scope["method"],
+            trace_id or secrets.token_hex(16),
+            parent_id,
+            kind=KIND_SERVER,
+            recording=sampled,
+            attributes={k: v for k, v in attrs.items() if v is not None} if sampled else None,
+        )
+        token = _current.set(server)
+
+        async def send_with_trace(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                server.set("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    server.status = "error"
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-trace-id", server.trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            server.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                server.name = f"{scope['method']} {route}"
+                server.set("http.route", route)
+            server.end()
+
+
+class TracedRoute(APIRoute):
+    """
+    Form gövdeli endpoint'lerde upload + multipart parse ayrı "http.parse_form"
+    span'i olur. Form burada okunur; FastAPI'nin handler'ı Starlette'in
+    önbelleğe aldığı aynı formu kullanır (dosyaları da o kapatır).
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request) -> Response:
+            if tracer.enabled and request.headers.get("content-type", "").startswith(_FORM_TYPES):
+                length = request.headers.get("content-length", "")
+                with tracer.span("http.parse_form", {"http.request.body.size": int(length) if length.isdigit() else None}) as sp:
+                    form = await request.form()
+                    items = form.multi_items()
+                    files = sum(1 for _k, v in items if isinstance(v, StarletteUploadFile))
+                    sp.set("form.fields", len(items) - files)
+                    sp.set("form.files", files)
+            return await handler(request)
+
+        return traced_handler
+
+
+# ---------- CLI (jsonl) ----------
+def _read_spans(path: str) -> Iterator[dict]:
+    for p in (path + ".1", path):
+        try:
+            with open(p, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def _print_tree(spans: list[dict]) -> None:
+    children: dict[Optional[str], list[dict]] = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_span_id"] if s["parent_span_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+    t0 = min(s["start_time_unix_nano"] for s in spans)
+
+    def walk(parent, depth):
+        for s in sorted(children.get(parent, []), key=lambda x: x["start_time_unix_nano"]):
+            offset = (s["start_time_unix_nano"] - t0) / 1e6
+            attrs = {k: v for k, v in s["attributes"].items() if k != "db.statement"}
+            if "db.statement" in s["attributes"]:
+                attrs["sql"] = " ".join(s["attributes"]["db.statement"].split())[:80]
+            err = "  !" + (s["status_message"] or "error") if s["status"] == "error" else ""
+            print(f"{offset:9.2f} {s['duration_ms']:9.2f}  {'  ' * depth}{s['name']}  {attrs}{err}")
+            walk(s["span_id"], depth + 1)
+
+    print(f"{'start ms':>9} {'dur ms':>9}  span")
+    walk(None, 0)
+
+
+def main(argv: list[str]) -> int:
+    path = settings.TRACING_FILE
+    if len(argv) >= 2 and argv[0] == "show":
+        spans = [s for s in _read_spans(path) if s["trace_id"] == argv[1].lower()]
+        if not spans:
+            print("trace bulunamadı")
+            return 1
+        _print_tree(spans)
+        return 0
+    if argv and argv[0] == "slow":
+        limit = int(argv[1]) if len(argv) > 1 else 20
+        roots = [s for s in _read_spans(path) if s["kind"] == KIND_SERVER]
+        for s in sorted(roots, key=lambda x: -x["duration_ms"])[:limit]:
+            print(f"{s['duration_ms']:9.2f}  {s['trace_id']}  {s['name']}  {s['attributes'].get('http.response.status_code')}")
+        return 0
+    print("kullanım: python -m core.tracing show <trace_id> | slow [limit]")
+    return 2
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main(sys.argv[1:]))
@@ -1,5 +1,5 @@
 from core.database import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean, func, UniqueConstraint
+from sqlalchemy import Column, Date, DateTime, ForeignKey, ForeignKeyConstraint, Integer, BigInteger, SmallInteger, String, Boolean, LargeBinary, func, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 
 class Users(Base):
@@ -11,21 +11,34 @@ class Users(Base):
     first_name      = Column(String(45))
     last_name       = Column(String(45))
     hashed_password = Column(String(200))
-    is_active       = Column(Boolean, default=True)
+    is_active       = Column(Boolean, default=True)   # False: hesap silindi, satır arka planda kaldırılır
     role            = Column(String(45))
     bio             = Column(String(300))
     created_at      = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    # profil sayaçları; yazma yollarında artımlı güncellenir (services/user_stats.py),
+    # sapma olursa `python -m services.user_stats rebuild` ile onarılır
+    user_id           = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    post_count        = Column(Integer, nullable=False, default=0, server_default="0")   # published
+    likes_received    = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_received = Column(Integer, nullable=False, default=0, server_default="0")   # published
+    likes_given       = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at        = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class Posts(Base):
     __tablename__ = "posts"
 
     id                    = Column(Integer, primary_key=True, index=True)
-    user_id               = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id               = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content               = Column(String(1000), nullable=False)
     created_at            = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    status                = Column(String(20), nullable=False, default="published")  # published | blocked | review
+    status                = Column(String(20), nullable=False, default="published")  # published | blocked | review | pending | deleted
     source                = Column(String(20), nullable=False, default="user")       # user | ai
     safety_label          = Column(String(50))
     safety_scores         = Column(JSONB)
@@ -33,61 +46,211 @@ class Posts(Base):
     generated_from_prompt = Column(String(500))
     model_name            = Column(String(100))
 
+    __table_args__ = (
+        # feed: status='published' ORDER BY created_at DESC, id DESC
+        Index("ix_posts_feed", created_at.desc(), id.desc(), postgresql_where=text("status = 'published'")),
+        # profil listeleri: user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_posts_user_created", user_id, created_at.desc(), id.desc()),
+        # likes/comments'in (post_id, post_created_at) FK hedefi (partition anahtarı)
+        UniqueConstraint("id", "created_at", name="uq_posts_id_created"),
+    )
+
 
 class PostImages(Base):
     __tablename__ = "post_images"
 
     id              = Column(Integer, primary_key=True, index=True)
-    post_id         = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    post_id         = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
     stored_filename = Column(String(255), unique=True, nullable=False)
     content_type    = Column(String(100), nullable=False)
     size_bytes      = Column(Integer, nullable=False)
+    width           = Column(Integer)
+    height          = Column(Integer)
+    bytes_saved     = Column(Integer)   # orijinal upload - normalize edilmiş boyut
+    phash           = Column(BigInteger, index=True)  # 64-bit dHash (signed saklanır)
     description     = Column(String(200))
     created_at      = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("ix_post_images_post_created", post_id, created_at, id),
+    )
+
+
+class BlockedImageHashes(Base):
+    __tablename__ = "blocked_image_hashes"
+
+    # moderasyonda engellenen resimlerin dHash'leri; yakın kopyalar Azure'a gitmeden reddedilir
+    id         = Column(Integer, primary_key=True, index=True)
+    phash      = Column(BigInteger, nullable=False, index=True)
+    user_id    = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    label      = Column(String(50))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class PhashRemovals(Base):
+    __tablename__ = "phash_removals"
+
+    # silinen post resimlerinin tombstone'ları: her process'in phash indeksi
+    # catch_up'ta id > son görülen id ile okuyup kendi kopyasından düşer
+    id         = Column(Integer, primary_key=True)
+    image_id   = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class ModerationJobs(Base):
+    __tablename__ = "moderation_jobs"
+
+    # async moderasyon kuyruğu (moderation/queue.py); worker'lar FOR UPDATE SKIP LOCKED ile alır
+    id           = Column(Integer, primary_key=True, index=True)
+    kind         = Column(String(20), nullable=False)        # post | comment
+    target_id    = Column(Integer, nullable=False)
+    status       = Column(String(20), nullable=False, default="queued")  # queued | done | failed
+    attempts     = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_until = Column(DateTime(timezone=True))
+    last_error   = Column(String(500))
+    created_at   = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_moderation_jobs_ready", "available_at", "id", postgresql_where=text("status = 'queued'")),
+    )
+
+
+class DeletionJobs(Base):
+    __tablename__ = "deletion_jobs"
+
+    # soft-delete edilmiş post/kullanıcıların arka planda parça parça silinmesi (services/deletion.py)
+    id           = Column(Integer, primary_key=True, index=True)
+    kind         = Column(String(20), nullable=False)        # post | user
+    target_id    = Column(Integer, nullable=False)
+    status       = Column(String(20), nullable=False, default="queued")  # queued | failed
+    attempts     = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_until = Column(DateTime(timezone=True))
+    last_error   = Column(String(500))
+    created_at   = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "target_id", name="uq_deletion_jobs_target"),
+        Index("ix_deletion_jobs_ready", "available_at", "id", postgresql_where=text("status = 'queued'")),
+    )
+
+
+class MediaDeletions(Base):
+    __tablename__ = "media_deletions"
+
+    # satırı silinmiş resimlerin storage anahtarları; dosyalar DB commit'inden sonra
+    # worker tarafından silinir (storage hatası satırı kuyrukta bırakır, kayıp olmaz)
+    id          = Column(Integer, primary_key=True)
+    storage_key = Column(String(255), unique=True, nullable=False)
+    attempts    = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at  = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class IdempotencyKeys(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Idempotency-Key header'lı pahalı yazmaların ilk cevabı (core/idempotency.py);
+    # tekrarlar bunu alır, expires_at geçince arka planda silinir
+    user_id          = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    idem_key         = Column(String(255), primary_key=True)
+    fingerprint      = Column(String(64), nullable=False)   # sha256(method + path + query)
+    claim_token      = Column(String(32))                   # sahiplenme başına rastgele; complete/release bununla
+    status_code      = Column(SmallInteger)                 # NULL: ilk istek hâlâ işleniyor
+    response_headers = Column(JSONB)
+    response_body    = Column(LargeBinary)
+    locked_until     = Column(DateTime(timezone=True))      # işleyen process çökerse sonraki tekrar devralır
+    expires_at       = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at       = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 
 class AIRequests(Base):
     __tablename__ = "ai_requests"
 
-    id          = Column(Integer, primary_key=True, index=True)
+    # created_at'e göre aylık range partition (services/partitions.py); PK anahtarı içermek zorunda
+    id          = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id     = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     type        = Column(String(50), nullable=False)
     input_text  = Column(String)
     output_text = Column(String)
     model_name  = Column(String(100))
     meta        = Column(JSONB)
-    created_at  = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at  = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
     status      = Column(String(20), default="success")
+    # meta['usage']'dan insert sırasında kopyalanır: toplamlar JSONB parse etmeden alınır
+    prompt_tokens     = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class AIUsageDaily(Base):
+    __tablename__ = "ai_usage_daily"
+
+    # kullanıcı + gün (UTC) + model başına toplamlar; ai_requests insert'i ile aynı
+    # transaction'da artımlı güncellenir (services/ai_usage.py). Kota kontrolü buradan okur.
+    user_id           = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day               = Column(Date, primary_key=True)
+    model_name        = Column(String(100), primary_key=True)
+    requests          = Column(Integer, nullable=False, default=0, server_default="0")
+    errors            = Column(Integer, nullable=False, default=0, server_default="0")
+    prompt_tokens     = Column(BigInteger, nullable=False, default=0, server_default="0")
+    completion_tokens = Column(BigInteger, nullable=False, default=0, server_default="0")
 
 
 class Likes(Base):
     __tablename__ = "likes"
 
-    id          = Column(Integer, primary_key=True, index=True)
-    user_id     = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    post_id     = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
-    created_at  = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # beğenilen post'un created_at'ine göre aylık range partition (services/partitions.py).
+    # post_id -> post_created_at fonksiyonel bağımlı: anahtarı içeren uq_user_post_like
+    # "kullanıcı başına post'ta tek beğeni" kuralını aynen korur
+    id              = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_id         = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    post_id         = Column(Integer, nullable=False)
+    post_created_at = Column(DateTime(timezone=True), primary_key=True)
+    created_at      = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (
-        UniqueConstraint("user_id", "post_id", name="uq_user_post_like"),
+        ForeignKeyConstraint(
+            ["post_id", "post_created_at"], ["posts.id", "posts.created_at"],
+            ondelete="CASCADE", name="fk_likes_post",
+        ),
+        UniqueConstraint("user_id", "post_id", "post_created_at", name="uq_user_post_like"),
+        # post başına sayım + liked_by_me (post_id IN ... AND user_id = ?) index-only
+        Index("ix_likes_post_user", "post_id", "user_id"),
+        {"postgresql_partition_by": "RANGE (post_created_at)"},
     )
 
 
 class Comments(Base):
     __tablename__ = "comments"
 
-    id            = Column(Integer, primary_key=True, index=True)
-    post_id       = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
-    user_id       = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    content       = Column(String(500), nullable=False)
-    created_at    = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # likes gibi: yorumlanan post'un created_at'ine göre aylık range partition
+    id              = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    post_id         = Column(Integer, nullable=False)
+    post_created_at = Column(DateTime(timezone=True), primary_key=True)
+    user_id         = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    content         = Column(String(500), nullable=False)
+    created_at      = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # ✅ yeni
-    status        = Column(String(20), nullable=False, default="published")  # published | blocked | review
+    status        = Column(String(20), nullable=False, default="published")  # published | blocked | review | pending | deleted
 
     safety_label  = Column(String(50))
     safety_scores = Column(JSONB)
 
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["post_id", "post_created_at"], ["posts.id", "posts.created_at"],
+            ondelete="CASCADE", name="fk_comments_post",
+        ),
+        # yorum listesi: post_id = ? AND status ... ORDER BY created_at, id
+        Index("ix_comments_post_created", post_id, created_at, id),
+        {"postgresql_partition_by": "RANGE (post_created_at)"},
+    )
+
 # models/models.py (senin dosyana ek)
 
 class Hashtags(Base):
@@ -102,9 +265,13 @@ class PostHashtags(Base):
 
     id         = Column(Integer, primary_key=True, index=True)
     post_id    = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
-    hashtag_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), nullable=False, index=True)
+    hashtag_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (
         UniqueConstraint("post_id", "hashtag_id", name="uq_post_hashtag"),
+        # hashtag -> postlar (posts_by_hashtag)
+        Index("ix_post_hashtags_tag_post", "hashtag_id", "post_id"),
+        # trending penceresi: created_at aralığı, sayım/gruplama index-only
+        Index("ix_post_hashtags_created", "created_at", "hashtag_id", "id"),
     )
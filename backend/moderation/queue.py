@@ -0,0 +1,84 @@
+# moderation/queue.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.models import ModerationJobs
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    kind: str          # post | comment
+    target_id: int
+    attempts: int
+
+
+def enqueue(db: Session, kind: str, target_id: int) -> None:
+    """
+    Moderasyon işini kuyruğa ekler. Commit ETMEZ: post/yorum ile aynı transaction'da
+    yazılır, böylece ya ikisi birden kalıcı olur ya hiçbiri.
+    """
+    db.add(ModerationJobs(kind=kind, target_id=target_id, status="queued"))
+
+
+_CLAIM_SQL = text("""
+    UPDATE moderation_jobs
+       SET locked_until = now() + make_interval(secs => :lease),
+           attempts = attempts + 1
+     WHERE id IN (
+            SELECT id
+              FROM moderation_jobs
+             WHERE status = 'queued'
+               AND available_at <= now()
+               AND (locked_until IS NULL OR locked_until < now())
+             ORDER BY available_at, id
+             FOR UPDATE SKIP LOCKED
+             LIMIT :batch
+           )
+ RETURNING id, kind, target_id, attempts
+""")
+
+
+def claim_batch(db: Session, *, batch: int, lease_seconds: int) -> list[ClaimedJob]:
+    """
+    Hazır işlerden en fazla `batch` tanesini kiralar ve hemen commit eder.
+    SKIP LOCKED sayesinde worker'lar birbirini beklemez; kiralama (locked_until)
+    sayesinde Azure çağrısı sırasında uzun süre açık transaction tutulmaz.
+    Worker çökerse iş, kira bitince başka bir worker tarafından tekrar alınır.
+    """
+    rows = db.execute(_CLAIM_SQL, {"batch": batch, "lease": lease_seconds}).all()
+    db.commit()
+    return [ClaimedJob(id=r.id, kind=r.kind, target_id=r.target_id, attempts=r.attempts) for r in rows]
+
+
+def complete(db: Session, job_id: int) -> None:
+    """Başarılı iş silinir (tablo küçük kalır). Commit çağırana ait: hedef güncellemesiyle aynı transaction."""
+    db.execute(text("DELETE FROM moderation_jobs WHERE id = :id"), {"id": job_id})
+
+
+def retry_later(db: Session, job_id: int, *, delay_seconds: float, error: str) -> None:
+    db.execute(
+        text("""
+            UPDATE moderation_jobs
+               SET available_at = now() + make_interval(secs => :delay),
+                   locked_until = NULL,
+                   last_error = :err
+             WHERE id = :id
+        """),
+        {"id": job_id, "delay": delay_seconds, "err": error[:500]},
+    )
+
+
+def mark_failed(db: Session, job_id: int, *, error: str) -> None:
+    db.execute(
+        text("""
+            UPDATE moderation_jobs
+               SET status = 'failed', locked_until = NULL, last_error = :err
+             WHERE id = :id
+        """),
+        {"id": job_id, "err": error[:500]},
+    )
@@ -2,10 +2,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, List
 
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.contentsafety import ContentSafetyClient
-from azure.ai.contentsafety.models import AnalyzeTextOptions, AnalyzeImageOptions, ImageData
 from core.config import settings
+from core.tracing import tracer, KIND_CLIENT
 
 
 @dataclass
@@ -17,41 +15,61 @@ class ModerationDecision:
 
 class AzureContentSafetyService:
     def __init__(self):
-        endpoint = settings.CONTENT_SAFETY_ENDPOINT
-        key = settings.CONTENT_SAFETY_KEY
-        if not endpoint or not key:
-            raise RuntimeError("CONTENT_SAFETY_ENDPOINT / CONTENT_SAFETY_KEY missing")
-
-        self.client = ContentSafetyClient(endpoint, AzureKeyCredential(key))
+        self.endpoint = settings.CONTENT_SAFETY_ENDPOINT
+        self.key = settings.CONTENT_SAFETY_KEY
+        self._client = None
 
         self.text_block = int(settings.CONTENT_SAFETY_TEXT_BLOCK_SEVERITY)
         self.text_review = int(settings.CONTENT_SAFETY_TEXT_REVIEW_SEVERITY)
         self.img_block = int(settings.CONTENT_SAFETY_IMAGE_BLOCK_SEVERITY)
         self.img_review = int(settings.CONTENT_SAFETY_IMAGE_REVIEW_SEVERITY)
 
+    def is_configured(self) -> bool:
+        return bool(self.endpoint and self.key)
+
+    @property
+    def client(self):
+        # Azure SDK ilk moderasyonda yüklenir; eksik config import'ta değil burada hata verir
+        if self._client is None:
+            if not self.is_configured():
+                raise RuntimeError("CONTENT_SAFETY_ENDPOINT / CONTENT_SAFETY_KEY missing")
+            from azure.core.credentials import AzureKeyCredential
+            from azure.ai.contentsafety import ContentSafetyClient
+
+            self._client = ContentSafetyClient(self.endpoint, AzureKeyCredential(self.key))
+        return self._client
+
     def analyze_text(self, text: str) -> Dict[str, Any]:
         if not (text or "").strip():
             return {"max_severity": 0, "categories": {}}
 
-        resp = self.client.analyze_text(AnalyzeTextOptions(text=text))
-        # categories: Hate, SelfHarm, Sexual, Violence (severity)
-        cats = {r.category: int(r.severity) for r in (resp.categories_analysis or [])}
-        max_sev = max(cats.values(), default=0)
+        from azure.ai.contentsafety.models import AnalyzeTextOptions
+
+        with tracer.span("moderation.analyze_text", {"text.length": len(text)}, kind=KIND_CLIENT) as sp:
+            resp = self.client.analyze_text(AnalyzeTextOptions(text=text))
+            # categories: Hate, SelfHarm, Sexual, Violence (severity)
+            cats = {r.category: int(r.severity) for r in (resp.categories_analysis or [])}
+            max_sev = max(cats.values(), default=0)
+            sp.set("moderation.max_severity", max_sev)
         return {"max_severity": max_sev, "categories": cats}
 
     def analyze_images(self, images_bytes: List[bytes]) -> Dict[str, Any]:
         if not images_bytes:
             return {"max_severity": 0, "per_image": []}
 
+        from azure.ai.contentsafety.models import AnalyzeImageOptions, ImageData
+
         per = []
         max_sev = 0
 
         for idx, b in enumerate(images_bytes):
-            resp = self.client.analyze_image(
-                AnalyzeImageOptions(image=ImageData(content=b))
-            )
-            cats = {r.category: int(r.severity) for r in (resp.categories_analysis or [])}
-            sev = max(cats.values(), default=0)
+            with tracer.span("moderation.analyze_image", {"image.index": idx, "image.size": len(b)}, kind=KIND_CLIENT) as sp:
+                resp = self.client.analyze_image(
+                    AnalyzeImageOptions(image=ImageData(content=b))
+                )
+                cats = {r.category: int(r.severity) for r in (resp.categories_analysis or [])}
+                sev = max(cats.values(), default=0)
+                sp.set("moderation.max_severity", sev)
             per.append({"idx": idx, "max_severity": sev, "categories": cats})
             if sev > max_sev:
                 max_sev = sev
@@ -72,9 +90,12 @@ class AzureContentSafetyService:
         return ModerationDecision("published", "safe", {"text": text_result, "image": image_result})
 
     def moderate(self, *, text: str, images_bytes: List[bytes]) -> ModerationDecision:
-        tr = self.analyze_text(text)
-        ir = self.analyze_images(images_bytes)
-        return self.decide(tr, ir)
+        with tracer.span("moderation.moderate", {"image.count": len(images_bytes)}) as sp:
+            tr = self.analyze_text(text)
+            ir = self.analyze_images(images_bytes)
+            decision = self.decide(tr, ir)
+            sp.set("moderation.decision", decision.decision)
+        return decision
 
 
 content_safety = AzureContentSafetyService()
@@ -0,0 +1,303 @@
+# moderation/worker.py
+"""
+Async moderasyon worker'ı (MODERATION_MODE=async).
+
+API process'i içinde thread olarak başlatılır (MODERATION_WORKERS > 0) veya
+ayrı bir process olarak çalıştırılabilir:
+
+  python -m moderation.worker
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from core.config import settings
+from core.database import SessionLocal
+from core.tracing import tracer
+from models.models import Posts, Comments, PostImages, BlockedImageHashes, PostHashtags, Hashtags
+from moderation import queue
+from moderation.service import content_safety, ModerationDecision
+from services.storage import storage
+from services.realtime import publish_counts
+from services import user_stats
+from services.hashtag_graph import hashtag_graph
+
+log = logging.getLogger("moderation.worker")
+
+
+@dataclass
+class _Target:
+    """Moderasyona giren içeriğin kilitsiz okunmuş anlık görüntüsü."""
+    kind: str                     # post | comment
+    id: int
+    content: str
+    user_id: int
+    post_id: Optional[int] = None                 # comment: yorumlanan post
+    post_created_at: Optional[datetime] = None    # comment: partition anahtarı
+    images: list = field(default_factory=list)    # post: [(stored_filename, phash)]
+
+
+def _load_targets(jobs: list[queue.ClaimedJob]) -> dict[tuple[str, int], _Target]:
+    """
+    Batch'teki hâlâ pending olan post/yorumları tek kısa okuma transaction'ında alır.
+    Satır kilidi yok: karar yazılırken status='pending' koşulu ile tekrar kontrol edilir.
+    """
+    post_ids = [j.target_id for j in jobs if j.kind == "post"]
+    comment_ids = [j.target_id for j in jobs if j.kind == "comment"]
+    out: dict[tuple[str, int], _Target] = {}
+    db = SessionLocal()
+    try:
+        if post_ids:
+            for pid, uid, content in (
+                db.query(Posts.id, Posts.user_id, Posts.content)
+                .filter(Posts.id.in_(post_ids), Posts.status == "pending")
+                .all()
+            ):
+                out[("post", pid)] = _Target("post", pid, content, uid)
+            for pid, fname, ph in (
+                db.query(PostImages.post_id, PostImages.stored_filename, PostImages.phash)
+                .filter(PostImages.post_id.in_([k[1] for k in out]))
+                .order_by(PostImages.post_id, PostImages.created_at.asc(), PostImages.id.asc())
+                .all()
+            ):
+                out[("post", pid)].images.append((fname, ph))
+        if comment_ids:
+            for cid, uid, content, post_id, post_created in (
+                db.query(Comments.id, Comments.user_id, Comments.content, Comments.post_id, Comments.post_created_at)
+                .filter(Comments.id.in_(comment_ids), Comments.status == "pending")
+                .all()
+            ):
+                out[("comment", cid)] = _Target("comment", cid, content, uid, post_id, post_created)
+    finally:
+        db.rollback()
+        db.close()
+    return out
+
+
+def _decide(target: _Target) -> ModerationDecision:
+    # storage + Azure: açık transaction / satır kilidi yok
+    images_bytes = [storage.get(fname) for fname, _ph in target.images]
+    return content_safety.moderate(text=target.content, images_bytes=images_bytes)
+
+
+def _apply_post(db, target: _Target, decision: ModerationDecision) -> None:
+    updated = (
+        db.query(Posts)
+        .filter(Posts.id == target.id, Posts.status == "pending")
+        .update(
+            {"status": decision.decision, "safety_label": decision.label, "safety_scores": decision.scores},
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        return  # bu arada silinmiş / karara bağlanmış: kararı yazma
+
+    if decision.decision == "published":
+        user_stats.post_published(db, target.user_id)
+        # öneri indeksi (commit'ten önce; commit düşerse sonuçlar hydrate'te elenir,
+        # periyodik yenileme de düzeltir)
+        hashtag_graph.add_post(target.id, (
+            db.query(PostHashtags.hashtag_id, Hashtags.tag)
+            .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+            .filter(PostHashtags.post_id == target.id)
+            .all()
+        ))
+
+    if decision.decision == "blocked":
+        # sync moddaki gibi: engellenen resimlerin yakın kopyaları bir daha Azure'a gitmesin
+        per_image = (decision.scores.get("image") or {}).get("per_image") or []
+        for r in per_image:
+            ph = target.images[r["idx"]][1] if r["idx"] < len(target.images) else None
+            if ph is not None and r.get("max_severity", 0) >= content_safety.img_block:
+                db.add(BlockedImageHashes(phash=ph, user_id=target.user_id, label="unsafe_content"))
+
+
+def _apply_comment(db, target: _Target, decision: ModerationDecision) -> None:
+    updated = (
+        db.query(Comments)
+        .filter(
+            Comments.id == target.id,
+            Comments.post_created_at == target.post_created_at,   # tek partition
+            Comments.status == "pending",
+        )
+        .update(
+            {"status": decision.decision, "safety_label": decision.label, "safety_scores": decision.scores},
+            synchronize_session=False,
+        )
+    )
+    if not updated or decision.decision != "published":
+        return
+
+    author_id = db.query(Posts.user_id).filter(Posts.id == target.post_id).scalar()
+    if author_id is not None:
+        user_stats.comment_published(db, author_id)
+    publish_counts(db, target.post_id)   # NOTIFY, job ile aynı commit'te gider
+
+
+_APPLY = {
+    "post": _apply_post,
+    "comment": _apply_comment,
+}
+
+
+def _give_up(db, job: queue.ClaimedJob) -> None:
+    """Deneme hakkı bitti: içerik insan incelemesine düşer (pending'de asılı kalmasın)."""
+    model = Posts if job.kind == "post" else Comments
+    db.query(model).filter(model.id == job.target_id, model.status == "pending").update(
+        {"status": "review", "safety_label": "moderation_unavailable"},
+        synchronize_session=False,
+    )
+
+
+def process_job(job: queue.ClaimedJob, target: Optional[_Target]) -> None:
+    # her iş kendi trace'i: DB sorguları ve Content Safety çağrıları bu span'in altında
+    with tracer.span("moderation.job", {"job.id": job.id, "job.kind": job.kind, "job.attempt": job.attempts}):
+        _process_job(job, target)
+
+
+def _process_job(job: queue.ClaimedJob, target: Optional[_Target]) -> None:
+    decision = None
+    error: Optional[Exception] = None
+    if job.kind not in _APPLY:
+        error = ValueError(f"unknown kind: {job.kind}")
+    elif target is not None:
+        try:
+            decision = _decide(target)
+        except Exception as e:
+            error = e
+
+    # kararı yazma: kısa transaction (hedef güncellemesi + job silme birlikte)
+    db = SessionLocal()
+    try:
+        if error is None:
+            try:
+                if target is not None:
+                    _APPLY[job.kind](db, target, decision)
+                queue.complete(db, job.id)   # hedef yok / zaten karara bağlanmış: sadece iş silinir
+                db.commit()
+                return
+            except Exception as e:
+                db.rollback()
+                error = e
+
+        tracer.current_span().record_error(error)
+        log.warning("moderation job %s failed (attempt %s): %s", job.id, job.attempts, error)
+        if job.kind not in _APPLY:
+            queue.mark_failed(db, job.id, error=str(error))
+        elif job.attempts >= settings.MODERATION_MAX_ATTEMPTS:
+            _give_up(db, job)
+            queue.mark_failed(db, job.id, error=str(error))
+        else:
+            queue.retry_later(db, job.id, delay_seconds=min(2 ** job.attempts, 300), error=str(error))
+        db.commit()
+    finally:
+        db.close()
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    # batch içindeki Azure çağrıları paralel (Content Safety'nin toplu API'si yok)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.MODERATION_BATCH_SIZE),
+                thread_name_prefix="moderation-call",
+            )
+        return _pool
+
+
+def run_once() -> int:
+    """
+    Bir batch kiralar: hedefler tek sorguda okunur, Azure çağrıları paralel
+    yapılır, her karar kendi kısa transaction'ında yazılır. İşlenen iş sayısını döner.
+    """
+    db = SessionLocal()
+    try:
+        jobs = queue.claim_batch(
+            db,
+            batch=settings.MODERATION_BATCH_SIZE,
+            lease_seconds=settings.MODERATION_LEASE_SECONDS,
+        )
+    finally:
+        db.close()
+    if not jobs:
+        return 0
+
+    targets = _load_targets(jobs)
+    if len(jobs) == 1:
+        process_job(jobs[0], targets.get((jobs[0].kind, jobs[0].target_id)))
+        return 1
+
+    pool = _get_pool()
+    futures = [
+        pool.submit(contextvars.copy_context().run, process_job, job, targets.get((job.kind, job.target_id)))
+        for job in jobs
+    ]
+    for f in futures:
+        f.result()
+    return len(jobs)
+
+
+class ModerationWorker(threading.Thread):
+    def __init__(self, name: str, stop_event: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self.stop_event = stop_event
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                n = run_once()
+            except Exception as e:
+                log.exception("moderation worker loop error: %s", e)
+                n = 0
+            if n == 0:
+                self.stop_event.wait(settings.MODERATION_POLL_SECONDS)
+
+
+_stop = threading.Event()
+_workers: list[ModerationWorker] = []
+
+
+def start_workers(count: int | None = None) -> None:
+    count = settings.MODERATION_WORKERS if count is None else count
+    _stop.clear()
+    for i in range(count):
+        w = ModerationWorker(f"moderation-{i}", _stop)
+        w.start()
+        _workers.append(w)
+
+
+def stop_workers(timeout: float = 5.0) -> None:
+    global _pool
+    _stop.set()
+    for w in _workers:
+        w.join(timeout=timeout)
+    _workers.clear()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def alive_count() -> int:
+    return sum(w.is_alive() for w in _workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_workers()
+    try:
+        for w in _workers:
+            w.join()
+    except KeyboardInterrupt:
+        stop_workers()
@@ -0,0 +1,71 @@
+# routers/admin.py
+import json
+from datetime import date, datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+
+from routers.auth import get_current_admin
+from core.responses import iterate_closing
+from core.profiling import PROFILE_ID_PATTERN, collapsed, profile_store
+from services.ai_export import ExportFilter, FORMATS, export_stream
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/ai-requests/export")
+def export_ai_requests(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    type: Optional[str] = Query(None, max_length=50),
+    status: Optional[str] = Query(None, max_length=20),
+    user_id: Optional[int] = Query(None, ge=1),
+    since: Optional[datetime] = Query(None, description="dahil (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="hariç (ISO 8601)"),
+):
+    """
+    ai_requests satırları id sırasıyla, okundukça akıtılır (Content-Length yok).
+    Büyük export'larda bile DB'de uzun transaction açık kalmaz (services/ai_export.py).
+    """
+    flt = ExportFilter(type=type, status=status, user_id=user_id, since=since, until=until)
+    filename = f"ai_requests-{date.today():%Y%m%d}.{format}"
+    return StreamingResponse(
+        iterate_closing(export_stream(flt, format)),
+        media_type=FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/profiles")
+def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """Saklanan istek profilleri, en yenisi önce (route, süre, status, tetikleyen)."""
+    return {"items": profile_store.list(limit)}
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(
+    profile_id: str = Path(..., pattern=PROFILE_ID_PATTERN),
+    format: Literal["speedscope", "collapsed"] = Query("speedscope"),
+):
+    """speedscope: https://www.speedscope.app'e sürükle-bırak; collapsed: flamegraph.pl / inferno girdisi."""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı (halka tampondan düşmüş olabilir)")
+    if format == "speedscope":
+        return FileResponse(
+            path, media_type="application/json",
+            filename=f"profile-{profile_id}.speedscope.json",
+            headers={"Cache-Control": "no-store"},
+        )
+    with open(path, "rb") as f:
+        doc = json.load(f)
+    return PlainTextResponse(
+        collapsed(doc),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"',
+            "Cache-Control": "no-store",
+        },
+    )
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+import math
+
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from core.database import get_db
 from routers.auth import get_current_user
-from models.models import AIRequests
-from core.ai_client import generate_social_post, rewrite_text
+from models.models import AIRequests, AIUsageDaily
+from core.ai_client import generate_social_post, rewrite_text, ai_scheduler
+from core.ai_scheduler import AIQueueFull, AIUpstreamError
+from services import ai_usage
+from services.ai_usage import AIQuotaExceeded
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -39,6 +47,52 @@ class RewritePostResponse(BaseModel):
     rewritten_text: str
     # İleride istersen burada safety_label vs. de ekleyebilirsin.
 
+
+def _busy_error(eta_seconds: float) -> HTTPException:
+    eta = max(1, math.ceil(eta_seconds))
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": "AI servisi şu an yoğun, lütfen biraz sonra tekrar deneyin.",
+            "eta_seconds": eta,
+        },
+        headers={"Retry-After": str(eta)},
+    )
+
+
+def _quota_error(e: AIQuotaExceeded) -> HTTPException:
+    retry = max(1, math.ceil(e.retry_after))
+    return HTTPException(
+        status_code=429,
+        detail={
+            "message": "Günlük AI kullanım kotanız doldu.",
+            "used_today": e.used,
+            "daily_limit": e.limit,
+            "retry_after_seconds": retry,
+        },
+        headers={"Retry-After": str(retry)},
+    )
+
+
+def _upstream_error(db: Session, e: Exception, req: AIRequests) -> HTTPException:
+    """
+    AI çağrısı başarısız: hata satırını kaydeder ve istemciye dönülecek hatayı üretir.
+    Retry'ları tükenmiş 429 -> 503 (Retry-After ile); diğer her şey (retry edilmeyen
+    openai hataları, eksik Azure config'i, modelin bozuk JSON'u) -> 502.
+    """
+    ai_usage.record(db, req)
+    db.commit()
+    if isinstance(e, AIUpstreamError) and e.rate_limited:
+        return _busy_error(max(e.retry_after or 0, ai_scheduler.eta_seconds()))
+    return HTTPException(status_code=502, detail="AI servisine ulaşılamadı")
+
+
+async def _ensure_quota(db: Session, user_id: int) -> None:
+    try:
+        await run_in_threadpool(ai_usage.check_quota, db, user_id)
+    except AIQuotaExceeded as e:
+        raise _quota_error(e)
+
 @router.post("/generate-post", response_model=GeneratePostResponse)
 async def generate_post(
     body: GeneratePostRequest,
@@ -59,14 +113,30 @@ async def generate_post(
         f"Want image: {body.want_image}"
     )
 
-    # --- DEBUG MODU: try/except'i kaldır / çok hafif bırak ---
-    ai_result = await generate_social_post(
-        topic=body.topic,
-        tone=tone,
-        audience=audience,
-        want_image=body.want_image,
-        max_length=body.max_length,
-    )
+    await _ensure_quota(db, user["id"])
+
+    try:
+        ai_result = await generate_social_post(
+            topic=body.topic,
+            tone=tone,
+            audience=audience,
+            want_image=body.want_image,
+            max_length=body.max_length,
+            user_key=user["id"],
+        )
+    except AIQueueFull as e:
+        # kuyruk dolu -> Azure'a hiç gitmeden hızlı 503
+        raise _busy_error(e.eta_seconds)
+    except Exception as e:
+        # retry'lar tükendi (429 ise kotanın açılmasını bekletiyoruz) ya da çağrı/parse hatası
+        raise _upstream_error(db, e, AIRequests(
+            user_id=user["id"],
+            type="generate_post",
+            input_text=stored_prompt,
+            model_name="azure-openai",
+            meta={"error": str(e)},
+            status="error",
+        ))
 
     ai_text = ai_result["content"]
     suggested_hashtags = ai_result.get("hashtags", [])
@@ -83,7 +153,7 @@ async def generate_post(
         meta=meta,
         status="success",
     )
-    db.add(req)
+    ai_usage.record(db, req)
     db.commit()
 
     return GeneratePostResponse(
@@ -104,9 +174,8 @@ async def rewrite_post(
 
     original_text = body.text
 
-    status_str = "success"
-    rewritten = original_text
-    model_name = "azure-openai"
+    await _ensure_quota(db, user["id"])
+
     meta: dict = {"mode": body.mode}
 
     try:
@@ -115,15 +184,24 @@ async def rewrite_post(
             mode=body.mode,
             target_tone=body.target_tone,
             max_length=body.max_length,
+            user_key=user["id"],
         )
-        rewritten = ai_result["rewritten_text"]
-        model_name = ai_result.get("model", "azure-openai")
-        meta.update(ai_result.get("usage", {}))
+    except AIQueueFull as e:
+        raise _busy_error(e.eta_seconds)
     except Exception as e:
-        # rewrite çökse bile API'yi patlatmayalım, orijinali döneriz
-        status_str = "error"
-        rewritten = original_text
-        meta["error"] = str(e)
+        # Orijinal metni 200 ile dönmek hatayı gizliyordu (idempotency katmanı da
+        # o cevabı saklıyordu); generate-post ile aynı şekilde 503/502 dönüyoruz.
+        raise _upstream_error(db, e, AIRequests(
+            user_id=user["id"],
+            type="rewrite",
+            input_text=original_text,
+            model_name="azure-openai",
+            meta={**meta, "error": str(e)},
+            status="error",
+        ))
+
+    rewritten = ai_result["rewritten_text"]
+    meta.update(ai_result.get("usage", {}))
 
     # Log'la
     req = AIRequests(
@@ -131,11 +209,51 @@ async def rewrite_post(
         type="rewrite",
         input_text=original_text,
         output_text=rewritten,
-        model_name=model_name,
+        model_name=ai_result.get("model", "azure-openai"),
         meta=meta,
-        status=status_str,
+        status="success",
     )
-    db.add(req)
+    ai_usage.record(db, req)
     db.commit()
 
     return RewritePostResponse(rewritten_text=rewritten)
+
+
+@router.get("/usage")
+def my_usage(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+    user: dict = Depends(get_current_user),
+):
+    """Son `days` günün (UTC) model bazında token kullanımı + bugünkü kota durumu."""
+    since = ai_usage.utc_today() - timedelta(days=days - 1)
+    rows = (
+        db.query(AIUsageDaily)
+        .filter(AIUsageDaily.user_id == user["id"], AIUsageDaily.day >= since)
+        .order_by(AIUsageDaily.day.desc(), AIUsageDaily.model_name)
+        .all()
+    )
+    items = [
+        {
+            "day": r.day.isoformat(),
+            "model": r.model_name,
+            "requests": r.requests,
+            "errors": r.errors,
+            "prompt_tokens": r.prompt_tokens,
+            "completion_tokens": r.completion_tokens,
+            "total_tokens": r.prompt_tokens + r.completion_tokens,
+        }
+        for r in rows
+    ]
+    today = ai_usage.utc_today().isoformat()
+    used = sum(i["total_tokens"] for i in items if i["day"] == today)
+    return {
+        "since": since.isoformat(),
+        "days": items,
+        "totals": {
+            "requests": sum(i["requests"] for i in items),
+            "prompt_tokens": sum(i["prompt_tokens"] for i in items),
+            "completion_tokens": sum(i["completion_tokens"] for i in items),
+        },
+        "quota": ai_usage.quota_dict(used),
+    }
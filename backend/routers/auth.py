@@ -1,11 +1,12 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from models.models import Users
-from passlib.context import CryptContext
 from core.database import get_db
+from core.passwords import hash_password, verify_password
 from starlette import status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime, timezone
 from jose import JWTError, jwt
@@ -17,8 +18,8 @@ router = APIRouter(
     tags=['auth']
 )
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token') # for decoding
+oauth2_bearer_optional = OAuth2PasswordBearer(tokenUrl='auth/token', auto_error=False)
 
 
 class CreateUserRequest(BaseModel):
@@ -27,7 +28,7 @@ class CreateUserRequest(BaseModel):
     first_name: str
     last_name: str
     password : str
-    role: str
+    role: str = "user"   # kayıtla sadece "user"; admin yetkisi DB'den verilir
 
 
 class Token(BaseModel):
@@ -36,12 +37,23 @@ class Token(BaseModel):
 
 db_dependency = Annotated[Session, Depends(get_db)]
 
-def authenticate_user(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
-    if not user:
-        return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+def _get_user_by_username(username: str, db):
+    return db.query(Users).filter(Users.username == username).first()
+
+def _save_password_hash(user, new_hash: str, db):
+    user.hashed_password = new_hash
+    db.commit()
+    db.refresh(user)
+
+async def authenticate_user(username: str, password: str, db):
+    # sync sorgu threadpool'da, bcrypt kendi executor'unda -> event loop serbest kalır
+    user = await run_in_threadpool(_get_user_by_username, username, db)
+    ok, new_hash = await verify_password(password, user.hashed_password if user else None)
+    if not user or not ok or user.is_active is False:   # silinmekte olan hesap
         return False
+    if new_hash:
+        # BCRYPT_ROUNDS değişmiş: parolayı bildiğimiz tek an, hash'i yeni cost ile güncelle
+        await run_in_threadpool(_save_password_hash, user, new_hash, db)
     return user
 
 def create_access_token(username: str, user_id: int, role: str, expires_delta: timedelta):
@@ -51,7 +63,16 @@ def create_access_token(username: str, user_id: int, role: str, expires_delta: t
     return jwt.encode(encode, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+def _is_active(user_id: int, db) -> bool:
+    # PK lookup; transaction hemen kapatılır, route'un uzun await'leri boyunca açık kalmasın
+    try:
+        row = db.query(Users.is_active).filter(Users.id == user_id).first()
+    finally:
+        db.rollback()
+    return row is not None and row[0] is not False
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db_dependency):
     try: 
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
         username: str = payload.get('sub')
@@ -60,17 +81,39 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
         if username is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail= 'Could not validate user.')
-        return {'username': username, 'id': user_id, 'user_role': user_role}
-    
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail= 'Could not validate user.')
 
+    # token 20 dk geçerli: kapatılan (is_active=false) / silinen hesabın token'ı hemen reddedilir
+    if not await run_in_threadpool(_is_active, user_id, db):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail= 'Could not validate user.')
+    return {'username': username, 'id': user_id, 'user_role': user_role}
+
+
+async def get_optional_user(token: Annotated[Optional[str], Depends(oauth2_bearer_optional)],
+                            db: db_dependency) -> Optional[dict]:
+    """Token yoksa None (anonim okuma); varsa get_current_user gibi doğrulanır."""
+    if token is None:
+        return None
+    return await get_current_user(token, db)
+
+
+async def get_current_admin(current_user: Annotated[dict, Depends(get_current_user)]):
+    if current_user.get('user_role') != 'admin':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail='Bu işlem için admin yetkisi gerekli.')
+    return current_user
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_user(db: db_dependency, 
                       create_user_request: CreateUserRequest):
+    if create_user_request.role != "user":
+        # admin endpoint'leri (/admin/...) role'e güvenir: kayıtla yetki alınamaz
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail='Kayıtla sadece "user" rolü alınabilir.')
     # create_user_model = Users(**create_user_request.dict())
     # böyle yazılırsa yukarıdaki password ile models daki hashed password eşleşemez
     create_user_model = Users(
@@ -79,12 +122,12 @@ async def create_user(db: db_dependency,
         first_name=create_user_request.first_name,
         last_name=create_user_request.last_name,
         role=create_user_request.role,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=await hash_password(create_user_request.password),
         is_active=True
     )
 
     db.add(create_user_model)
-    db.commit()
+    await run_in_threadpool(db.commit)
 
 # { örnek copy-paste
 #   "username": "afurkan",
@@ -92,13 +135,14 @@ async def create_user(db: db_dependency,
 #   "first_name": "ahmet",
 #   "last_name": "furkan",
 #   "password": "1234",
-#   "role": "admin"
+#   "role": "user"
 # }
+# admin: UPDATE users SET role = 'admin' WHERE username = '...';
 
 @router.post("/token", response_model= Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                  db: db_dependency):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail= 'Could not validate user.')
@@ -1,36 +1,95 @@
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from core.config import settings
 from core.database import get_db
-from models.models import Posts, Users, PostHashtags, Hashtags, Likes, Comments, PostImages
+from models.models import Posts, Users, PostHashtags, Hashtags
+from services.post_cards import PostPage, PostPageOut, load_cards, page_counts, page_etag
+from core.responses import FastJSONResponse, etag_headers, etag_matches, not_modified
 from routers.auth import get_current_user
+from services.hashtag_graph import hashtag_graph
 
 router = APIRouter(prefix="/hashtags", tags=["hashtags"])
 db_dep = Annotated[Session, Depends(get_db)]
 user_dep = Annotated[dict, Depends(get_current_user)]
 
 
+# bench/explain_hot_queries bu sorguyu olduğu gibi EXPLAIN eder
+def _hashtag_posts_query(db: Session, tag: str, limit: int, offset: int = 0):
+    return (
+        db.query(Posts, Users.username)
+        .join(Users, Users.id == Posts.user_id)
+        .join(PostHashtags, PostHashtags.post_id == Posts.id)
+        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+        .filter(
+            Posts.status == "published",
+            Hashtags.tag == tag,
+        )
+        .order_by(Posts.created_at.desc(), Posts.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
 @router.get("/trending")
 def trending(
+    request: Request,
     db: db_dep,
     limit: int = Query(10, ge=1, le=50),
 ):
+    # pencere başı saate yuvarlanır: bir saat boyunca aynı pencere (ve ETag) kullanılır
+    since = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) \
+        - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    in_window = PostHashtags.created_at >= since
+
+    # post_hashtags'e sadece insert/delete yapılır ve id'ler artan: pencere başı ile
+    # penceredeki (max id, adet) her değişiklikte değişir. Sayım ix_post_hashtags_created
+    # üzerinde sadece pencereyi tarar (index-only), group by + sort'tan çok daha ucuz.
+    max_id, total = db.query(func.max(PostHashtags.id), func.count(PostHashtags.id)).filter(in_window).one()
+    etag = f'W/"trending-{since:%Y%m%d%H}-{max_id or 0}-{total}-{limit}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     rows = (
-        db.query(Hashtags.tag, func.count(PostHashtags.post_id).label("cnt"))
+        db.query(Hashtags.tag, func.count(PostHashtags.id).label("cnt"))
         .join(PostHashtags, PostHashtags.hashtag_id == Hashtags.id)
+        .filter(in_window)
         .group_by(Hashtags.tag)
-        .order_by(func.count(PostHashtags.post_id).desc(), Hashtags.tag.asc())
+        .order_by(func.count(PostHashtags.id).desc(), Hashtags.tag.asc())
         .limit(limit)
         .all()
     )
-    return {"items": [{"tag": tag, "count": int(cnt)} for tag, cnt in rows]}
+    return FastJSONResponse(
+        {"items": [{"tag": tag, "count": int(cnt)} for tag, cnt in rows]},
+        headers=etag_headers(etag),
+    )
+
 
+@router.get("/{tag}/related")
+def related_hashtags(
+    tag: str,
+    limit: int = Query(10, ge=1, le=50),
+    min_count: int = Query(1, ge=1),
+):
+    """
+    Bu etiketle birlikte en çok kullanılan etiketler (bellekteki co-occurrence
+    indeksinden; DB'ye gitmez). score = ortak / sqrt(f_a * f_b).
+    """
+    tag_clean = tag.strip().lstrip("#").lower()
+    items = hashtag_graph.related_tags(tag_clean, limit=limit, min_count=min_count)
+    return FastJSONResponse({
+        "tag": tag_clean,
+        "items": [{"tag": r.tag, "count": r.count, "score": r.score} for r in items],
+    })
 
-@router.get("/{tag}/posts")
+
+@router.get("/{tag}/posts", response_model=PostPageOut)
 def posts_by_hashtag(
     tag: str,
+    request: Request,
     db: db_dep,
     user: user_dep,
     limit: int = Query(20, ge=1, le=100),
@@ -40,81 +99,12 @@ def posts_by_hashtag(
     if tag_clean.startswith("#"):
         tag_clean = tag_clean[1:]
 
-    rows = (
-        db.query(Posts, Users.username)
-        .join(Users, Users.id == Posts.user_id)
-        .join(PostHashtags, PostHashtags.post_id == Posts.id)
-        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
-        .filter(
-            Posts.status == "published",
-            Hashtags.tag == tag_clean,
-        )
-        .order_by(Posts.created_at.desc(), Posts.id.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
-
-    post_ids = [p.id for (p, _u) in rows]
-    if not post_ids:
-        return {"items": []}
-
-    like_counts_raw = (
-        db.query(Likes.post_id, func.count(Likes.id))
-        .filter(Likes.post_id.in_(post_ids))
-        .group_by(Likes.post_id)
-        .all()
-    )
-    like_counts = {pid: int(cnt) for pid, cnt in like_counts_raw}
-
-    comment_counts_raw = (
-        db.query(Comments.post_id, func.count(Comments.id))
-        .filter(Comments.post_id.in_(post_ids), Comments.status == "published")
-        .group_by(Comments.post_id)
-        .all()
-    )
-    comment_counts = {pid: int(cnt) for pid, cnt in comment_counts_raw}
-
-    liked_post_ids_raw = (
-        db.query(Likes.post_id)
-        .filter(Likes.post_id.in_(post_ids), Likes.user_id == user["id"])
-        .all()
-    )
-    liked_post_ids = {r[0] for r in liked_post_ids_raw}
-
-    images_raw = (
-        db.query(PostImages.post_id, PostImages.stored_filename)
-        .filter(PostImages.post_id.in_(post_ids))
-        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
-        .all()
-    )
-    images_map: dict[int, list[str]] = {}
-    for pid, fname in images_raw:
-        images_map.setdefault(pid, []).append(f"/media/{fname}")
-
-    tags_raw = (
-        db.query(PostHashtags.post_id, Hashtags.tag)
-        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
-        .filter(PostHashtags.post_id.in_(post_ids))
-        .all()
-    )
-    tags_map: dict[int, list[str]] = {}
-    for pid, t in tags_raw:
-        tags_map.setdefault(pid, []).append(f"#{t}")
-
-    items = []
-    for p, username in rows:
-        pid = p.id
-        items.append({
-            "id": pid,
-            "content": p.content,
-            "created_at": p.created_at,
-            "owner": {"id": p.user_id, "username": username},
-            "like_count": like_counts.get(pid, 0),
-            "liked_by_me": pid in liked_post_ids,
-            "comment_count": comment_counts.get(pid, 0),
-            "image_urls": images_map.get(pid, []),
-            "hashtags": tags_map.get(pid, []),
-        })
+    listing = _hashtag_posts_query(db, tag_clean, limit, offset)
+    rows = listing.all()
+    counts = page_counts(db, rows, user["id"])
+    etag = page_etag(rows, counts, user["id"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    return {"items": items}
+    cards = load_cards(db, rows, user["id"], counts)
+    return FastJSONResponse(PostPage(items=cards), headers=etag_headers(etag))
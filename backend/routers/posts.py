@@ -1,62 +1,68 @@
 # routers/posts.py
-from typing import Annotated, List
-from pathlib import Path
-from uuid import uuid4
+import base64
+
+import msgspec
+from typing import Annotated, List, Optional
 
 from fastapi import (
     APIRouter, Depends, HTTPException, status,
-    Query, Path as FPath, UploadFile, File, Form
+    Query, Path as FPath, UploadFile, File, Form, Request
 )
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, tuple_, or_, and_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from core.database import get_db
 from core.config import settings
 from models.models import (
     Posts, Users, Likes, Comments, PostImages,
-    Hashtags, PostHashtags
+    Hashtags, PostHashtags, BlockedImageHashes
 )
-from .auth import get_current_user
+from .auth import get_current_user, get_optional_user
 from pydantic import BaseModel
 from datetime import datetime
-from moderation.service import content_safety
+from moderation.service import content_safety, ModerationDecision
+from moderation import queue as moderation_queue
+from services.images import normalize_images, InvalidImage, NormalizedImage
+from services.phash import phash_index, to_signed64, to_unsigned64
+from services.hashtag_graph import hashtag_graph
+from services import embeddings
+from services.storage import storage, new_media_key
+from services.realtime import publish_counts
+from services import user_stats, deletion
+from services.post_cards import (
+    PostOut, CommentOut, PostFullOut, PostPageOut,
+    CommentCard, OwnerCard, PostFullCard, PostPage,
+    card_from_row, load_cards, card_counter_columns, page_counts, page_etag, cards_etag,
+)
+from core.responses import FastJSONResponse, etag_headers, etag_matches, not_modified
+from core.tracing import tracer, TracedRoute
 
-router = APIRouter(prefix="/posts", tags=["posts"])
+router = APIRouter(prefix="/posts", tags=["posts"], route_class=TracedRoute)  # multipart parse span'i
 
 db_dep = Annotated[Session, Depends(get_db)]
 user_dep = Annotated[dict, Depends(get_current_user)]
-
-MEDIA_DIR = Path(settings.MEDIA_ROOT)
-MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+optional_user_dep = Annotated[Optional[dict], Depends(get_optional_user)]
 
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
 MAX_IMAGE_BYTES = 5 * 1024 * 1024  # 5MB
 MAX_IMAGES_PER_POST = 4
 MAX_HASHTAGS_PER_POST = 8
+MAX_BATCH_IDS = 100
+MAX_SEARCH_CHARS = 200
 
 
 # ---------- yardımcılar ----------
-def _build_storage_path_from_content_type(content_type: str) -> tuple[str, Path]:
-    """
-    Relatif yol + tam dosya yolu üretir.
-    Örn: uploads/2025/12/uuid.jpg  ve  <MEDIA_ROOT>/uploads/2025/12/uuid.jpg
-    """
-    now = datetime.now()
-
-    ext_map = {
-        "image/jpeg": ".jpg",
-        "image/png": ".png",
-        "image/webp": ".webp",
-    }
-    ext = ext_map.get(content_type, ".bin")
-
-    rel = Path("uploads") / f"{now:%Y}" / f"{now:%m}" / f"{uuid4().hex}{ext}"
-    full = Path(settings.MEDIA_ROOT) / rel
-    full.parent.mkdir(parents=True, exist_ok=True)
-
-    # Rel path'ı URL-friendly yap
-    rel_str = str(rel).replace("\\", "/")
-    return rel_str, full
+def _discard_media(keys: list[str]) -> None:
+    # yarım kalan / silinen post'un dosyaları; silinemezse sadece yetim nesne kalır.
+    # Bloklayan storage I/O: async route'lardan run_in_threadpool ile çağrılır
+    if not keys:
+        return
+    try:
+        storage.delete_many(keys)
+    except Exception:
+        pass
 
 def _parse_hashtags(raw: str | None) -> list[str]:
     """
@@ -97,36 +103,143 @@ def _parse_hashtags(raw: str | None) -> list[str]:
     return uniq[:MAX_HASHTAGS_PER_POST]
 
 
-# ---------- Pydantic Response şemalar ----------
-class PostOwner(BaseModel):
-    id: int
-    username: str
+def _async_moderation() -> bool:
+    return settings.MODERATION_MODE == "async"
 
-class PostOut(BaseModel):
-    id: int
-    content: str
-    created_at: datetime
-    owner: PostOwner
-    like_count: int
-    liked_by_me: bool
-    comment_count: int
-    image_urls: list[str] = []
-    hashtags: list[str] = []   # ✅ yeni
+def _visible_post_filter(user_id: Optional[int]):
+    """published herkese; pending sadece sahibine görünür."""
+    if user_id is None:
+        return Posts.status == "published"
+    return or_(
+        Posts.status == "published",
+        and_(Posts.status == "pending", Posts.user_id == user_id),
+    )
+
+def _visible_comment_filter(user_id: Optional[int]):
+    if user_id is None:
+        return Comments.status == "published"
+    return or_(
+        Comments.status == "published",
+        and_(Comments.status == "pending", Comments.user_id == user_id),
+    )
 
-    class Config:
-        orm_mode = True
+def _match_blocked(db: Session, normalized: list) -> list[Optional[int]]:
+    # catch_up DB okur, arama CPU'da döner: async route'tan run_in_threadpool ile çağrılır
+    phash_index.catch_up(db)
+    return [phash_index.match_blocked(n.phash, settings.PHASH_BLOCK_DISTANCE) for n in normalized]
 
-class CommentCreate(BaseModel):
-    content: str
 
-class CommentOut(BaseModel):
-    id: int
-    content: str
-    created_at: datetime
-    owner: PostOwner
+def _remember_blocked_images(db: Session, user_id: int, normalized: list, scores: dict) -> None:
+    """Moderasyonda blok eşiğini aşan resimlerin dHash'ini kaydeder (ayrı commit)."""
+    per_image = (scores.get("image") or {}).get("per_image") or []
+    rows = [
+        BlockedImageHashes(phash=to_signed64(normalized[r["idx"]].phash), user_id=user_id, label="unsafe_content")
+        for r in per_image
+        if r.get("max_severity", 0) >= content_safety.img_block and r["idx"] < len(normalized)
+    ]
+    if not rows:
+        return
+    try:
+        db.add_all(rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        return
+    for r in rows:
+        phash_index.add_blocked(r.id, to_unsigned64(r.phash))
+
+
+def _encode_comment_cursor(created_at: datetime, comment_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{comment_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_comment_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, cid = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(cid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+
+def _post_card_query(db: Session, user_id: int):
+    """
+    Post kartı (PostOut) için gereken her şeyi TEK statement'ta çeken sorgu:
+    sayaçlar, liked_by_me, resimler ve hashtagler correlated subquery olarak gelir.
+    Satır: (Posts, username, like_count, comment_count, liked_by_me, image_files, tags)
+    """
+    like_count, comment_count, liked_by_me = card_counter_columns(user_id)
+    image_files = (
+        select(func.array_agg(aggregate_order_by(
+            PostImages.stored_filename, PostImages.created_at.asc(), PostImages.id.asc()
+        )))
+        .where(PostImages.post_id == Posts.id)
+        .scalar_subquery()
+    )
+    tags = (
+        select(func.array_agg(Hashtags.tag))
+        .select_from(PostHashtags)
+        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+        .where(PostHashtags.post_id == Posts.id)
+        .scalar_subquery()
+    )
+    return (
+        db.query(
+            Posts,
+            Users.username,
+            like_count,
+            comment_count,
+            liked_by_me,
+            image_files.label("image_files"),
+            tags.label("tags"),
+        )
+        .join(Users, Users.id == Posts.user_id)
+    )
+
+# sıcak listeler: bench/explain_hot_queries bu sorguları olduğu gibi EXPLAIN eder
+def _feed_query(db: Session, limit: int, offset: int = 0):
+    return (
+        db.query(Posts, Users.username)
+        .join(Users, Users.id == Posts.user_id)
+        .filter(Posts.status == "published")
+        .order_by(Posts.created_at.desc(), Posts.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def _comments_query(db: Session, post_id: int, post_created: datetime, viewer_id: Optional[int] = None):
+    """Sıralı, limitsiz: çağıran cursor/offset ve limit ekler. Görünürlük /full ile aynı."""
+    return (
+        db.query(Comments, Users.username)
+        .join(Users, Users.id == Comments.user_id)
+        .filter(
+            Comments.post_id == post_id,
+            Comments.post_created_at == post_created,   # tek partition
+            _visible_comment_filter(viewer_id),
+        )
+        .order_by(Comments.created_at.asc(), Comments.id.asc())
+    )
+
 
-    class Config:
-        orm_mode = True
+def _cards_in_order(db: Session, user_id: int, ranked: list[int], limit: int) -> list:
+    # silinmiş/yayında olmayan adaylar burada elenir; sıra ranked'dan gelir
+    if not ranked:
+        return []
+    rows = (
+        _post_card_query(db, user_id)
+        .filter(Posts.id.in_(ranked), Posts.status == "published")
+        .all()
+    )
+    by_id = {card.id: card for card in map(card_from_row, rows)}
+    return [by_id[pid] for pid in ranked if pid in by_id][:limit]
+
+
+def _semantic_unavailable() -> HTTPException:
+    return HTTPException(status_code=503, detail="Anlamsal arama kapalı")
+
+# ---------- Pydantic Request şemalar ----------
+class CommentCreate(BaseModel):
+    content: str
 
 
 # ---------- CREATE POST (multipart) ----------
@@ -156,7 +269,7 @@ async def create_post(
 
     tags = _parse_hashtags(hashtags)  # ["ai", "fastapi"]...
 
-    saved_files: list[Path] = []  # hata olursa silmek için
+    saved_keys: list[str] = []  # hata olursa storage'dan silmek için
 
     try:
         # ------------------------------------------------------------
@@ -164,14 +277,17 @@ async def create_post(
         # ------------------------------------------------------------
         image_payloads: list[tuple[UploadFile, bytes]] = []
 
-        for file in images:
+        for idx, file in enumerate(images):
             if file is None:
                 continue
 
             if file.content_type not in ALLOWED_CONTENT_TYPES:
                 raise HTTPException(status_code=400, detail="Sadece jpg/png/webp kabul edilir")
 
-            data = await file.read()
+            # multipart parse'ta 1MB üstü parçalar geçici dosyaya yazılmış olur: bu okuma disk I/O olabilir
+            with tracer.span("upload.read", {"image.index": idx, "image.content_type": file.content_type}) as sp:
+                data = await file.read()
+                sp.set("image.size", len(data))
             size = len(data)
 
             if size == 0:
@@ -181,16 +297,54 @@ async def create_post(
 
             image_payloads.append((file, data))
 
+        # ------------------------------------------------------------
+        # 1b) Normalizasyon (process pool): decode ile doğrula, EXIF at,
+        #     boyutu sınırla, yeniden sıkıştır
+        # ------------------------------------------------------------
+        try:
+            with tracer.span("images.normalize", {
+                "image.count": len(image_payloads),
+                "image.bytes_in": sum(len(b) for (_f, b) in image_payloads),
+            }) as sp:
+                normalized: list[NormalizedImage] = await normalize_images(
+                    [b for (_f, b) in image_payloads]
+                )
+                sp.set("image.bytes_out", sum(len(n.data) for n in normalized))
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # ------------------------------------------------------------
+        # 1c) Daha önce engellenmiş bir resmin yakın kopyası mı? -> Azure'a hiç gitme
+        # ------------------------------------------------------------
+        if normalized:
+            with tracer.span("phash.match_blocked", {"image.count": len(normalized)}):
+                dists = await run_in_threadpool(_match_blocked, db, normalized)
+            for dist in dists:
+                if dist is not None:
+                    raise HTTPException(
+                        status_code=422,
+                        detail={
+                            "message": "Paylaşım uygunsuz bulundu ve engellendi.",
+                            "label": "known_blocked_image",
+                            "scores": {"phash_distance": dist},
+                        },
+                    )
+
         # ------------------------------------------------------------
         # 2) Azure Content Safety (text + image)
+        #    async modda burada beklenmez: post "pending" yazılır, worker karar verir
         # ------------------------------------------------------------
-        decision = content_safety.moderate(
-            text=content_str,
-            images_bytes=[b for (_f, b) in image_payloads],
-        )
+        if _async_moderation():
+            decision = ModerationDecision("pending", "pending_moderation", {})
+        else:
+            decision = content_safety.moderate(
+                text=content_str,
+                images_bytes=[n.data for n in normalized],
+            )
         print(decision)
-        # blocked -> DB'ye hiç yazma
+        # blocked -> post'u DB'ye hiç yazma; sadece engellenen resimlerin hash'ini sakla
         if decision.decision == "blocked":
+            _remember_blocked_images(db, user["id"], normalized, decision.scores)
             raise HTTPException(
                 status_code=422,
                 detail={
@@ -209,66 +363,93 @@ async def create_post(
             source=source,
             generated_from_prompt=generated_from_prompt,
             model_name=model_name,
-            status=decision.decision,      # "published" | "review"
+            status=decision.decision,      # "published" | "review" | "pending"
             safety_label=decision.label,
             safety_scores=decision.scores,
         )
         db.add(post)
         db.flush()  # post.id oluşur
 
+        if post.status == "pending":
+            moderation_queue.enqueue(db, "post", post.id)  # aynı transaction
+        elif post.status == "published":
+            user_stats.post_published(db, post.user_id)
+
         # ------------------------------------------------------------
         # 4) Hashtags
         # ------------------------------------------------------------
         if tags:
-            existing_rows = (
-                db.query(Hashtags)
-                .filter(Hashtags.tag.in_(tags))
-                .all()
-            )
-            existing_map = {h.tag: h for h in existing_rows}
-
-            hashtag_ids: list[int] = []
-            for t in tags:
-                h = existing_map.get(t)
-                if not h:
-                    h = Hashtags(tag=t)
-                    db.add(h)
-                    db.flush()  # h.id
-                hashtag_ids.append(h.id)
-
-            for hid in hashtag_ids:
-                db.add(PostHashtags(post_id=post.id, hashtag_id=hid))
+            with tracer.span("post.hashtags", {"hashtag.count": len(tags)}) as sp:
+                existing_rows = (
+                    db.query(Hashtags)
+                    .filter(Hashtags.tag.in_(tags))
+                    .all()
+                )
+                existing_map = {h.tag: h for h in existing_rows}
+                sp.set("hashtag.new", len(tags) - len(existing_map))
+
+                hashtag_ids: list[int] = []
+                for t in tags:
+                    h = existing_map.get(t)
+                    if not h:
+                        h = Hashtags(tag=t)
+                        db.add(h)
+                        db.flush()  # h.id
+                    hashtag_ids.append(h.id)
+
+                for hid in hashtag_ids:
+                    db.add(PostHashtags(post_id=post.id, hashtag_id=hid))
 
         # ------------------------------------------------------------
         # 5) Resimleri artık diske yaz + PostImages kaydı
         # ------------------------------------------------------------
         image_urls: list[str] = []
-        for file, data in image_payloads:
-            rel_path, full_path = _build_storage_path_from_content_type(file.content_type)
-
-            full_path.write_bytes(data)
-            saved_files.append(full_path)
+        new_images: list[tuple[PostImages, int]] = []
+        for n in normalized:
+            # content_type artık client'ın beyanından değil decode edilen formattan gelir
+            key = new_media_key(n.content_type)
+
+            with tracer.span("storage.put", {
+                "storage.backend": settings.STORAGE_BACKEND,
+                "storage.key": key,
+                "image.size": len(n.data),
+            }):
+                await run_in_threadpool(storage.put, key, n.data, n.content_type)
+            saved_keys.append(key)
 
             img = PostImages(
                 post_id=post.id,
-                stored_filename=rel_path,   # uploads/2025/12/...
-                content_type=file.content_type,
-                size_bytes=len(data),
+                stored_filename=key,        # uploads/2025/12/... (storage anahtarı)
+                content_type=n.content_type,
+                size_bytes=len(n.data),
+                width=n.width,
+                height=n.height,
+                bytes_saved=n.bytes_saved,
+                phash=to_signed64(n.phash),
                 description=None,
             )
             db.add(img)
+            new_images.append((img, n.phash))
 
-            image_urls.append(f"/media/{rel_path}")
+            image_urls.append(storage.url(key))
 
         # ------------------------------------------------------------
         # 6) commit
         # ------------------------------------------------------------
-        db.commit()
+        with tracer.span("db.commit"):
+            db.commit()
         db.refresh(post)
 
+        for img, h in new_images:
+            phash_index.add_image(img.id, post.id, h)
+        if post.status == "published" and tags:
+            hashtag_graph.add_post(post.id, zip(hashtag_ids, tags))
+
         extra_msg = None
         if post.status == "review":
             extra_msg = "Paylaşım otomatik kontrolde şüpheli bulundu; incelemeye alındı."
+        elif post.status == "pending":
+            extra_msg = "Paylaşım kontrol ediliyor; onaylanınca herkes görebilecek."
 
         return {
             "id": post.id,
@@ -284,113 +465,123 @@ async def create_post(
 
     except HTTPException:
         db.rollback()
-        for p in saved_files:
-            try:
-                p.unlink(missing_ok=True)
-            except Exception:
-                pass
+        await run_in_threadpool(_discard_media, saved_keys)
         raise
 
     except Exception as e:
         db.rollback()
-        for p in saved_files:
-            try:
-                p.unlink(missing_ok=True)
-            except Exception:
-                pass
+        await run_in_threadpool(_discard_media, saved_keys)
         raise HTTPException(status_code=500, detail=f"Post oluşturulamadı: {str(e)}")
 
 
 
 # ---------- FEED ----------
-@router.get("/feed")
+@router.get("/feed", response_model=PostPageOut)
 def public_feed(
+    request: Request,
     db: db_dep,
     user: user_dep,
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
 ):
-    rows = (
-        db.query(Posts, Users.username)
-        .join(Users, Users.id == Posts.user_id)
-        .filter(Posts.status == "published")
-        .order_by(Posts.created_at.desc(), Posts.id.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    listing = _feed_query(db, limit, offset)
+    # değişmemiş sayfa: resim/hashtag sorgularına ve encode'a girmeden 304
+    rows = listing.all()
+    counts = page_counts(db, rows, user["id"])
+    etag = page_etag(rows, counts, user["id"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    if not rows:
-        return {"items": []}
+    cards = load_cards(db, rows, user["id"], counts)
+    return FastJSONResponse(PostPage(items=cards), headers=etag_headers(etag))
 
-    post_ids = [p.id for (p, _username) in rows]
 
-    like_counts_raw = (
-        db.query(Likes.post_id, func.count(Likes.id))
-        .filter(Likes.post_id.in_(post_ids))
-        .group_by(Likes.post_id)
-        .all()
+# ---------- BATCH (bilinen id'ler için kartlar) ----------
+def _parse_post_ids(raw: str) -> list[int]:
+    ids: list[int] = []
+    seen = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            pid = int(part)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Geçersiz post id: {part[:20]}")
+        if pid < 1:
+            raise HTTPException(status_code=400, detail=f"Geçersiz post id: {pid}")
+        if pid not in seen:
+            seen.add(pid)
+            ids.append(pid)
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"En fazla {MAX_BATCH_IDS} id istenebilir")
+    return ids
+
+@router.get("/batch", response_model=PostPageOut)
+def get_posts_batch(
+    request: Request,
+    db: db_dep,
+    user: user_dep,
+    ids: str = Query(..., description="Virgülle ayrılmış post id'leri, örn. 12,7,31 (en fazla 100)"),
+):
+    """
+    Bildirimler, kaydedilenler, deep link ve görünen kartların yenilenmesi için:
+    tüm kartlar tek statement'ta gelir, istek sırası korunur.
+    Yayında olmayan / olmayan id'ler sessizce atlanır.
+    """
+    post_ids = _parse_post_ids(ids)
+    if not post_ids:
+        return FastJSONResponse(PostPage(items=[]))
+
+    listing = (
+        _post_card_query(db, user["id"])
+        .filter(Posts.id.in_(post_ids), Posts.status == "published")
+        .order_by(Posts.id)   # ETag için deterministik sıra; cevap sırası aşağıda
     )
-    like_counts = {post_id: int(cnt) for post_id, cnt in like_counts_raw}
+    # kartlar tek statement'ta geliyor: bir kez üretilip ETag onlardan hesaplanır
+    by_id = {card.id: card for card in map(card_from_row, listing.all())}
+    etag = cards_etag(by_id.values(), user["id"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    comment_counts_raw = (
-        db.query(Comments.post_id, func.count(Comments.id))
-        .filter(
-            Comments.post_id.in_(post_ids),
-            Comments.status == "published",
-        )
-        .group_by(Comments.post_id)
-        .all()
-    )
-    comment_counts = {post_id: int(cnt) for post_id, cnt in comment_counts_raw}
+    cards = [by_id[pid] for pid in post_ids if pid in by_id]
+    return FastJSONResponse(PostPage(items=cards), headers=etag_headers(etag))
 
-    liked_post_ids_raw = (
-        db.query(Likes.post_id)
-        .filter(Likes.post_id.in_(post_ids), Likes.user_id == user["id"])
-        .all()
-    )
-    liked_post_ids = {row[0] for row in liked_post_ids_raw}
 
-    # ✅ resimleri tek seferde çek
-    images_raw = (
-        db.query(PostImages.post_id, PostImages.stored_filename)
-        .filter(PostImages.post_id.in_(post_ids))
-        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
-        .all()
-    )
-    images_map: dict[int, list[str]] = {}
-    for pid, fname in images_raw:
-        images_map.setdefault(pid, []).append(f"/media/{fname}")
+# ---------- ARAMA (metin / anlamsal) ----------
+@router.get("/search", response_model=PostPageOut)
+def search_posts(
+    db: db_dep,
+    user: user_dep,
+    q: str = Query(..., min_length=1, max_length=MAX_SEARCH_CHARS),
+    mode: str = Query("text", pattern="^(text|semantic)$"),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+):
+    """
+    text: içerikte geçen (ILIKE), en yeni önce.
+    semantic: sorgu embed edilir, en yakın post'lar benzerlik sırasıyla (offset yok).
+    """
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Arama metni boş")
 
-    # ✅ hashtagleri tek seferde çek
-    tag_rows = (
-        db.query(PostHashtags.post_id, Hashtags.tag)
-        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
-        .filter(PostHashtags.post_id.in_(post_ids))
+    if mode == "semantic":
+        if not settings.EMBEDDING_ENABLED:
+            raise _semantic_unavailable()
+        ranked = [pid for pid, _score in embeddings.semantic_search(q, limit * 2)]
+        return FastJSONResponse(PostPage(items=_cards_in_order(db, user["id"], ranked, limit)))
+
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    rows = (
+        _post_card_query(db, user["id"])
+        .filter(Posts.status == "published", Posts.content.ilike(pattern, escape="\\"))
+        .order_by(Posts.created_at.desc(), Posts.id.desc())
+        .limit(limit)
+        .offset(offset)
         .all()
     )
-    tags_map: dict[int, list[str]] = {}
-    for pid, tag in tag_rows:
-        tags_map.setdefault(pid, []).append(f"#{tag}")
-
-    items: list[PostOut] = []
-    for (p, username) in rows:
-        pid = p.id
-        items.append(
-            PostOut(
-                id=pid,
-                content=p.content,
-                created_at=p.created_at,
-                owner=PostOwner(id=p.user_id, username=username),
-                like_count=int(like_counts.get(pid, 0)),
-                liked_by_me=(pid in liked_post_ids),
-                comment_count=int(comment_counts.get(pid, 0)),
-                image_urls=images_map.get(pid, []),
-                hashtags=tags_map.get(pid, []),
-            )
-        )
-
-    return {"items": items}
+    return FastJSONResponse(PostPage(items=[card_from_row(r) for r in rows]))
 
 
 # ---------- LIKE TOGGLE ----------
@@ -407,81 +598,184 @@ def toggle_like(
     if not post:
         raise HTTPException(status_code=404, detail="Post bulunamadı")
 
-    like = db.query(Likes).filter(Likes.user_id == user["id"], Likes.post_id == post_id).first()
-
-    if like:
-        db.delete(like)
-        db.commit()
+    # silinen satır sayısına bakılır: aynı anda gelen iki "unlike" sayaçları iki kez düşürmesin
+    removed = (
+        db.query(Likes)
+        .filter(Likes.user_id == user["id"], Likes.post_id == post_id, Likes.post_created_at == post.created_at)
+        .delete(synchronize_session=False)
+    )
+    if removed:
         liked = False
     else:
-        db.add(Likes(user_id=user["id"], post_id=post_id))
-        db.commit()
+        db.add(Likes(user_id=user["id"], post_id=post_id, post_created_at=post.created_at))
+        db.flush()
         liked = True
+    user_stats.like_changed(db, liker_id=user["id"], author_id=post.user_id, delta=1 if liked else -1)
+    db.commit()
 
-    like_count = db.query(func.count(Likes.id)).filter(Likes.post_id == post_id).scalar() or 0
-    return {"post_id": post_id, "liked": liked, "like_count": int(like_count)}
+    # commit'ten sonra say + yayınla: eşzamanlı beğenilerin hepsi görülür
+    like_count, _ = publish_counts(db, post_id)
+    db.commit()
+    return {"post_id": post_id, "liked": liked, "like_count": like_count}
 
 
-# ---------- POST DETAIL ----------
-@router.get("/{post_id}")
-def get_post_detail(
+# ---------- BENZER RESİMLER (near-duplicate) ----------
+@router.get("/{post_id}/similar-images")
+def similar_images(
     db: db_dep,
     user: user_dep,
     post_id: int = FPath(..., ge=1),
+    max_distance: int = Query(6, ge=0, le=7),
+    limit: int = Query(20, ge=1, le=100),
 ):
-    row = (
-        db.query(Posts, Users.username)
-        .join(Users, Users.id == Posts.user_id)
-        .filter(Posts.id == post_id, Posts.status == "published")
-        .first()
+    imgs = (
+        db.query(PostImages.phash)
+        .join(Posts, Posts.id == PostImages.post_id)
+        .filter(PostImages.post_id == post_id, Posts.status == "published", PostImages.phash.isnot(None))
+        .all()
     )
-    if not row:
+    if not imgs:
         raise HTTPException(status_code=404, detail="Post bulunamadı")
 
-    post, username = row
+    phash_index.catch_up(db)
 
-    like_count = db.query(func.count(Likes.id)).filter(Likes.post_id == post_id).scalar() or 0
-    comment_count = (
-        db.query(func.count(Comments.id))
-        .filter(Comments.post_id == post_id, Comments.status == "published")
-        .scalar()
-        or 0
+    # her hedef post için en yakın eşleşen resim
+    best: dict[int, tuple[int, int]] = {}   # post_id -> (distance, image_id)
+    for (ph,) in imgs:
+        for hit in phash_index.similar(to_unsigned64(ph), max_distance, limit * 4):
+            if hit.post_id == post_id:
+                continue
+            cur = best.get(hit.post_id)
+            if cur is None or hit.distance < cur[0]:
+                best[hit.post_id] = (hit.distance, hit.image_id)
+
+    if not best:
+        return {"items": []}
+
+    ranked = sorted(best.items(), key=lambda kv: (kv[1][0], -kv[0]))
+    visible = {
+        pid for (pid,) in
+        db.query(Posts.id).filter(Posts.id.in_([pid for pid, _ in ranked]), Posts.status == "published").all()
+    }
+    ranked = [(pid, v) for pid, v in ranked if pid in visible][:limit]
+
+    files = dict(
+        db.query(PostImages.id, PostImages.stored_filename)
+        .filter(PostImages.id.in_([image_id for _pid, (_d, image_id) in ranked]))
+        .all()
     )
+    return {
+        "items": [
+            {"post_id": pid, "image_url": storage.url(files[image_id]), "distance": d}
+            for pid, (d, image_id) in ranked
+            if image_id in files
+        ]
+    }
+
+
+# ---------- BENZER POSTLAR (ortak hashtag) ----------
+@router.get("/{post_id}/related", response_model=PostPageOut)
+def related_posts(
+    db: db_dep,
+    user: user_dep,
+    post_id: int = FPath(..., ge=1),
+    limit: int = Query(20, ge=1, le=50),
+):
+    """
+    "Buna benzer": ortak hashtag'lerin ağırlığına (nadir etiket daha değerli) göre
+    sıralı post'lar. Aday listesi bellekteki indeksten gelir; kartlar tek sorguyla.
+    """
+    # silinmiş/yayında olmayan adaylar hydrate'te elenir; biraz fazla iste
+    ranked = [pid for pid, _score in hashtag_graph.similar_posts(post_id, limit * 2)]
+    return FastJSONResponse(PostPage(items=_cards_in_order(db, user["id"], ranked, limit)))
+
+
+# ---------- BENZER POSTLAR (metin embedding) ----------
+@router.get("/{post_id}/similar", response_model=PostPageOut)
+def similar_posts(
+    db: db_dep,
+    user: user_dep,
+    post_id: int = FPath(..., ge=1),
+    limit: int = Query(20, ge=1, le=50),
+):
+    """İçeriği anlamca en yakın post'lar (yerel embedding indeksi)."""
+    if not settings.EMBEDDING_ENABLED:
+        raise _semantic_unavailable()
+    if not db.query(Posts.id).filter(Posts.id == post_id, Posts.status == "published").first():
+        raise HTTPException(status_code=404, detail="Post bulunamadı")
+    hits = embeddings.similar_posts(post_id, limit * 2)
+    if hits is None:
+        # yeni post: worker henüz embed etmedi
+        return FastJSONResponse(PostPage(items=[]))
+    ranked = [pid for pid, _score in hits]
+    return FastJSONResponse(PostPage(items=_cards_in_order(db, user["id"], ranked, limit)))
 
-    liked = (
-        db.query(Likes.id)
-        .filter(Likes.post_id == post_id, Likes.user_id == user["id"])
+
+# ---------- POST DETAIL + İLK YORUM SAYFASI ----------
+@router.get("/{post_id}/full", response_model=PostFullOut)
+def get_post_full(
+    db: db_dep,
+    user: user_dep,
+    post_id: int = FPath(..., ge=1),
+    comments_limit: int = Query(50, ge=1, le=100),
+):
+    """
+    Modal açılışı için tek round trip: post kartı (1 statement) + ilk yorum sayfası (1 statement),
+    aynı session/transaction içinde. Devamı için /{post_id}/comments?cursor=... kullanılır.
+    """
+    row = (
+        _post_card_query(db, user["id"])
+        .filter(Posts.id == post_id, _visible_post_filter(user["id"]))
         .first()
-        is not None
     )
+    if not row:
+        raise HTTPException(status_code=404, detail="Post bulunamadı")
 
-    imgs = (
-        db.query(PostImages.stored_filename)
-        .filter(PostImages.post_id == post_id)
-        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
+    comment_rows = (
+        db.query(Comments.id, Comments.content, Comments.created_at, Comments.user_id, Users.username)
+        .join(Users, Users.id == Comments.user_id)
+        .filter(
+            Comments.post_id == post_id,
+            Comments.post_created_at == row[0].created_at,
+            _visible_comment_filter(user["id"]),
+        )
+        .order_by(Comments.created_at.asc(), Comments.id.asc())
+        .limit(comments_limit + 1)
         .all()
     )
-    image_urls = [f"/media/{row[0]}" for row in imgs]
+    has_more = len(comment_rows) > comments_limit
+    comment_rows = comment_rows[:comments_limit]
+
+    card = card_from_row(row)
+    last = comment_rows[-1] if comment_rows else None
+    return FastJSONResponse(PostFullCard(
+        **msgspec.structs.asdict(card),
+        comments=[
+            CommentCard(cid, content, created_at, OwnerCard(uid, username))
+            for cid, content, created_at, uid, username in comment_rows
+        ],
+        comments_next_cursor=(
+            _encode_comment_cursor(last.created_at, last.id) if has_more else None
+        ),
+    ))
 
-    tag_rows = (
-        db.query(Hashtags.tag)
-        .join(PostHashtags, PostHashtags.hashtag_id == Hashtags.id)
-        .filter(PostHashtags.post_id == post_id)
-        .all()
-    )
-    hashtags = [f"#{r[0]}" for r in tag_rows]
-
-    return PostOut(
-        id=post.id,
-        content=post.content,
-        created_at=post.created_at,
-        owner=PostOwner(id=post.user_id, username=username),
-        like_count=int(like_count),
-        liked_by_me=liked,
-        comment_count=int(comment_count),
-        image_urls=image_urls,
-        hashtags=hashtags,
+
+# ---------- POST DETAIL ----------
+@router.get("/{post_id}", response_model=PostOut)
+def get_post_detail(
+    db: db_dep,
+    user: user_dep,
+    post_id: int = FPath(..., ge=1),
+):
+    row = (
+        _post_card_query(db, user["id"])
+        .filter(Posts.id == post_id, _visible_post_filter(user["id"]))
+        .first()
     )
+    if not row:
+        raise HTTPException(status_code=404, detail="Post bulunamadı")
+
+    return FastJSONResponse(card_from_row(row))
 
 
 # ---------- COMMENTS ----------
@@ -495,9 +789,18 @@ def create_comment(
     if user is None:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    post_exists = db.query(Posts.id).filter(Posts.id == post_id, Posts.status == "published").first()
-    if not post_exists:
+    post_row = (
+        db.query(Posts.user_id, Posts.created_at, Posts.status)
+        .filter(Posts.id == post_id, _visible_post_filter(user["id"]))
+        .first()
+    )
+    if post_row is None:
         raise HTTPException(status_code=404, detail="Post bulunamadı")
+    post_author_id, post_created, post_status = post_row
+    # bilinçli: moderasyondaki post'a (sahibi de dahil) yorum yazılmaz; post engellenebilir,
+    # sayaçlar ve canlı yayın sadece published post'lar için tutulur
+    if post_status != "published":
+        raise HTTPException(status_code=409, detail="Post henüz moderasyonda; yayınlanınca yorum yapılabilir")
 
     text = (body.content or "").strip()
     if len(text) < 3:
@@ -507,7 +810,10 @@ def create_comment(
     # ✅ Azure Content Safety: comment text kontrol
     # (yorumda resim yok -> images_bytes=[])
     # ------------------------------------------------------------
-    decision = content_safety.moderate(text=text, images_bytes=[])
+    if _async_moderation():
+        decision = ModerationDecision("pending", "pending_moderation", {})
+    else:
+        decision = content_safety.moderate(text=text, images_bytes=[])
 
     if decision.decision == "blocked":
         raise HTTPException(
@@ -520,11 +826,12 @@ def create_comment(
         )
 
     # "review" ise yorumu yayınlama, incelemeye al
-    # Not: Comments modelinde status var: published | blocked | review
-    comment_status = decision.decision  # published | review
+    # Not: Comments modelinde status var: published | blocked | review | pending
+    comment_status = decision.decision  # published | review | pending
 
     comment = Comments(
         post_id=post_id,
+        post_created_at=post_created,
         user_id=user["id"],
         content=text,
         status=comment_status,
@@ -533,56 +840,73 @@ def create_comment(
     )
 
     db.add(comment)
+    if comment_status == "pending":
+        db.flush()
+        moderation_queue.enqueue(db, "comment", comment.id)
+    elif comment_status == "published":
+        user_stats.comment_published(db, post_author_id)
     db.commit()
     db.refresh(comment)
 
+    if comment.status == "published":
+        publish_counts(db, post_id)
+        db.commit()
+
     owner_username = db.query(Users.username).filter(Users.id == user["id"]).scalar() or "unknown"
 
     # Eğer review ise, istersen kullanıcıya farklı bir mesaj dönmek için
     # CommentOut şeman bunu taşımıyor. Şimdilik aynı response'u dönüyoruz.
     # Frontend'e "review" bilgisini vermek istersen CommentOut'a status alanı eklemen gerekir.
 
-    return CommentOut(
-        id=comment.id,
-        content=comment.content,
-        created_at=comment.created_at,
-        owner=PostOwner(id=user["id"], username=owner_username),
+    return FastJSONResponse(
+        CommentCard(
+            id=comment.id,
+            content=comment.content,
+            created_at=comment.created_at,
+            owner=OwnerCard(user["id"], owner_username),
+            status=comment.status,
+        ),
+        status_code=status.HTTP_201_CREATED,
     )
 
 @router.get("/{post_id}/comments", response_model=List[CommentOut])
 def list_comments(
     post_id: int,
     db: db_dep,
+    user: optional_user_dep,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="/full veya önceki sayfanın X-Next-Cursor değeri"),
 ):
-    post_exists = db.query(Posts.id).filter(Posts.id == post_id, Posts.status == "published").first()
-    if not post_exists:
+    # /full ile aynı görünürlük: sahibine kendi pending post'u ve pending yorumları da
+    viewer_id = user["id"] if user else None
+    post_created = (
+        db.query(Posts.created_at)
+        .filter(Posts.id == post_id, _visible_post_filter(viewer_id))
+        .scalar()
+    )
+    if post_created is None:
         raise HTTPException(status_code=404, detail="Post bulunamadı")
 
-    rows = (
-        db.query(Comments, Users.username)
-        .join(Users, Users.id == Comments.user_id)
-        .filter(
-            Comments.post_id == post_id,
-            Comments.status == "published",
-        )
-        .order_by(Comments.created_at.asc())
-        .limit(limit)
-        .offset(offset)
-        .all()
+    q = _comments_query(db, post_id, post_created, viewer_id)
+    if cursor:
+        # keyset: (created_at, id) > cursor  -> offset taraması yok
+        q = q.filter(tuple_(Comments.created_at, Comments.id) > _decode_comment_cursor(cursor))
+    else:
+        q = q.offset(offset)
+
+    rows = q.limit(limit + 1).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        headers["X-Next-Cursor"] = _encode_comment_cursor(last.created_at, last.id)
+
+    return FastJSONResponse(
+        [CommentCard(c.id, c.content, c.created_at, OwnerCard(c.user_id, username)) for c, username in rows],
+        headers=headers,
     )
 
-    return [
-        CommentOut(
-            id=c.id,
-            content=c.content,
-            created_at=c.created_at,
-            owner=PostOwner(id=c.user_id, username=username),
-        )
-        for c, username in rows
-    ]
-
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_post(
     post_id: int = FPath(..., ge=1),
@@ -592,19 +916,21 @@ def delete_post(
     if user is None:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    post = db.query(Posts).filter(Posts.id == post_id).first()
-    if not post:
+    # kilit: aynı post için eşzamanlı iki silme profil sayaçlarını iki kez düşürmesin
+    post = db.query(Posts).filter(Posts.id == post_id).with_for_update().first()
+    if not post or post.status == "deleted":
         raise HTTPException(status_code=404, detail="Post bulunamadı")
 
     if post.user_id != user["id"]:
         raise HTTPException(status_code=403, detail="Bu postu silemezsin")
 
-    # ilişkiler cascade değilse tek tek sil (güvenli yol)
-    db.query(Likes).filter(Likes.post_id == post_id).delete(synchronize_session=False)
-    db.query(Comments).filter(Comments.post_id == post_id).delete(synchronize_session=False)
-    db.query(PostHashtags).filter(PostHashtags.post_id == post_id).delete(synchronize_session=False)
-    db.query(PostImages).filter(PostImages.post_id == post_id).delete(synchronize_session=False)
+    image_ids = [r[0] for r in db.query(PostImages.id).filter(PostImages.post_id == post_id).all()]
 
-    db.delete(post)
+    # soft-delete + iş kuyruğu: beğeni/yorum/resim satırları ve dosyalar arka planda,
+    # küçük batch'ler halinde silinir (services/deletion.py); istek kilitleri kısa tutar
+    deletion.delete_post(db, post)
     db.commit()
+    phash_index.remove_post(image_ids)
+    hashtag_graph.remove_post(post_id)
+    embeddings.embedding_index.remove(post_id)
     return
\ No newline at end of file
@@ -0,0 +1,137 @@
+# routers/realtime.py
+"""
+Ekrandaki post'ların beğeni/yorum sayaçları için push kanalı.
+
+WebSocket  /realtime/ws
+  istemci -> {"type": "watch", "post_ids": [1, 2, 3]}   (izlenen kümeyi tamamen değiştirir)
+  sunucu  -> {"type": "counts", "items": [{"post_id", "like_count", "comment_count"}, ...]}
+             {"type": "resync"}   (olay kaçmış olabilir; ekranı bir kez yeniden çek)
+             {"type": "error", "detail": "..."}
+
+SSE  GET /realtime/sse?ids=1,2,3
+  event: counts / resync ile aynı gövdeler; izlenen küme bağlantı boyunca sabit.
+
+Sayaçlar sadece yayınlanmış post'lar için herkese açık bilgi; kimlik doğrulama istenmez.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Iterable
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from core.config import settings
+from core.database import SessionLocal
+from core.responses import encode_json
+from services.realtime import realtime_hub, current_counts
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+
+def _snapshot(post_ids: Iterable[int]) -> list[dict]:
+    db = SessionLocal()
+    try:
+        return list(current_counts(db, post_ids).values())
+    finally:
+        db.close()
+
+
+def _valid_ids(raw) -> list[int]:
+    if not isinstance(raw, list) or not all(isinstance(x, int) and x > 0 for x in raw):
+        raise ValueError("post_ids pozitif tamsayı listesi olmalı")
+    ids = list(dict.fromkeys(raw))
+    if len(ids) > settings.REALTIME_MAX_IDS:
+        raise ValueError(f"En fazla {settings.REALTIME_MAX_IDS} post izlenebilir")
+    return ids
+
+
+# ---------- WebSocket ----------
+async def _ws_sender(websocket: WebSocket, sub) -> None:
+    while True:
+        items, resync = await sub.next_batch()
+        if resync:
+            await websocket.send_text(encode_json({"type": "resync"}).decode())
+        if items:
+            await websocket.send_text(encode_json({"type": "counts", "items": items}).decode())
+
+
+@router.websocket("/ws")
+async def counts_ws(websocket: WebSocket):
+    await websocket.accept()
+    sub = realtime_hub.connect()
+    if sub is None:
+        await websocket.close(code=1013)   # try again later
+        return
+
+    sender = asyncio.create_task(_ws_sender(websocket, sub))
+    try:
+        while True:
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                msg = None
+            if not isinstance(msg, dict) or msg.get("type") != "watch":
+                await websocket.send_json({"type": "error", "detail": "Bilinmeyen mesaj"})
+                continue
+            try:
+                ids = _valid_ids(msg.get("post_ids"))
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            added = sub.watch(ids)
+            if added:
+                # fetch ile abonelik arasında kaçan değişiklikler için anlık değer
+                for counts in await run_in_threadpool(_snapshot, added):
+                    sub.push(counts)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        realtime_hub.disconnect(sub)
+
+
+# ---------- SSE ----------
+def _sse(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + encode_json(data) + b"\n\n"
+
+
+@router.get("/sse")
+async def counts_sse(request: Request, ids: str = Query(..., max_length=4000)):
+    try:
+        raw = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz ids")
+    try:
+        post_ids = _valid_ids(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sub = realtime_hub.connect()
+    if sub is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Bağlantı limiti dolu")
+    sub.watch(post_ids)
+
+    async def stream():
+        try:
+            for counts in await run_in_threadpool(_snapshot, post_ids):
+                sub.push(counts)
+            while not await request.is_disconnected():
+                items, resync = await sub.next_batch(timeout=settings.REALTIME_HEARTBEAT_SECONDS)
+                if resync:
+                    yield _sse("resync", {"type": "resync"})
+                if items:
+                    yield _sse("counts", {"type": "counts", "items": items})
+                elif not resync:
+                    yield b": ping\n\n"
+        finally:
+            realtime_hub.disconnect(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
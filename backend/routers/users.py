@@ -1,215 +1,152 @@
 # routers/users.py
-from fastapi import APIRouter, Depends, Query, HTTPException
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from core.database import get_db
 from routers.auth import get_current_user
-from models.models import Users, Posts, Likes, Comments, PostImages, Hashtags, PostHashtags
+from models.models import Users, Posts, UserStats
+from services.user_stats import stats_dict
+from services.post_cards import PostPage, PostPageOut, load_cards, page_counts, page_etag
+from core.responses import FastJSONResponse, etag_headers, etag_matches, not_modified, iterate_closing
+from services.export import user_export_zip
+from services import deletion
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+
+def _user_with_stats(db: Session, user_id: int):
+    # profil sayaçları user_stats'tan tek PK join ile (COUNT/SUM yok)
+    return (
+        db.query(Users, UserStats)
+        .outerjoin(UserStats, UserStats.user_id == Users.id)
+        .filter(Users.id == user_id, Users.is_active.isnot(False))   # silinmekte olan hesap görünmez
+        .first()
+    )
+
+
+# profil listeleri (kendi: published + pending, başkası: published); bench/explain_hot_queries
+# bu sorguyu olduğu gibi EXPLAIN eder
+def _profile_query(db: Session, user_id: int, statuses: tuple[str, ...], limit: int, offset: int = 0):
+    return (
+        db.query(Posts, Users.username)
+        .join(Users, Users.id == Posts.user_id)
+        .filter(Posts.user_id == user_id, Posts.status.in_(statuses))
+        .order_by(Posts.created_at.desc(), Posts.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
 @router.get("/me")
 def get_me(
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    user = db.query(Users).filter(Users.id == current_user["id"]).first()
+    row = _user_with_stats(db, current_user["id"])
+    if row is None:
+        raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    user, stats = row
     return {
         "id": user.id,
         "username": user.username,
         "email": user.email,
         "first_name": user.first_name,
         "last_name": user.last_name,
+        "stats": stats_dict(stats),
     }
 
 
 
+@router.get("/me/export")
+def export_me(current_user: dict = Depends(get_current_user)):
+    """
+    Kullanıcının tüm post'ları, resimleri ve yorumları: ZIP (images/ + manifest.json).
+    Akış halinde üretilir; boyutu bilinmediği için Content-Length yoktur.
+    """
+    filename = f"export-{current_user['username']}-{date.today():%Y%m%d}.zip"
+    return StreamingResponse(
+        iterate_closing(user_export_zip(current_user["id"])),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.delete("/me", status_code=202)
+def delete_me(
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Hesap hemen kapanır, post ve yorumları görünmez olur; satırlar ve dosyalar
+    arka planda parça parça silinir (services/deletion.py). Geri alınamaz.
+    """
+    if not deletion.delete_user(db, current_user["id"]):
+        raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    db.commit()
+    return {"status": "deleting"}
+
+
 # ✅ BUNU /{id} tarzı route'lardan ÖNCE yaz
-@router.get("/me/posts")
+@router.get("/me/posts", response_model=PostPageOut)
 def my_posts(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
     limit: int = Query(30, ge=1, le=100),
     offset: int = Query(0, ge=0),
 ):
-    # sadece published (review istemiyorsan)
-    rows = (
-        db.query(Posts, Users.username)
-        .join(Users, Users.id == Posts.user_id)
-        .filter(Posts.user_id == current_user["id"], Posts.status == "published")
-        .order_by(Posts.created_at.desc(), Posts.id.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
-
-    if not rows:
-        return {"items": []}
-
-    post_ids = [p.id for (p, _u) in rows]
-
-    like_counts_raw = (
-        db.query(Likes.post_id, func.count(Likes.id))
-        .filter(Likes.post_id.in_(post_ids))
-        .group_by(Likes.post_id)
-        .all()
-    )
-    like_counts = {pid: int(cnt) for pid, cnt in like_counts_raw}
+    # published + moderasyonu bekleyenler (pending sadece sahibine görünür)
+    listing = _profile_query(db, current_user["id"], ("published", "pending"), limit, offset)
+    rows = listing.all()
+    counts = page_counts(db, rows, current_user["id"])
+    etag = page_etag(rows, counts, current_user["id"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    comment_counts_raw = (
-        db.query(Comments.post_id, func.count(Comments.id))
-        .filter(Comments.post_id.in_(post_ids), Comments.status == "published")
-        .group_by(Comments.post_id)
-        .all()
-    )
-    comment_counts = {pid: int(cnt) for pid, cnt in comment_counts_raw}
-
-    liked_post_ids_raw = (
-        db.query(Likes.post_id)
-        .filter(Likes.post_id.in_(post_ids), Likes.user_id == current_user["id"])
-        .all()
-    )
-    liked_post_ids = {r[0] for r in liked_post_ids_raw}
-
-    images_raw = (
-        db.query(PostImages.post_id, PostImages.stored_filename)
-        .filter(PostImages.post_id.in_(post_ids))
-        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
-        .all()
-    )
-    images_map = {}
-    for pid, fname in images_raw:
-        images_map.setdefault(pid, []).append(f"/media/{fname}")
-
-    tag_rows = (
-        db.query(PostHashtags.post_id, Hashtags.tag)
-        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
-        .filter(PostHashtags.post_id.in_(post_ids))
-        .all()
-    )
-    tags_map = {}
-    for pid, tag in tag_rows:
-        tags_map.setdefault(pid, []).append(f"#{tag}")
-
-    items = []
-    for (p, username) in rows:
-        pid = p.id
-        items.append(
-            {
-                "id": pid,
-                "content": p.content,
-                "created_at": p.created_at,
-                "owner": {"id": p.user_id, "username": username},
-                "like_count": like_counts.get(pid, 0),
-                "liked_by_me": (pid in liked_post_ids),
-                "comment_count": comment_counts.get(pid, 0),
-                "image_urls": images_map.get(pid, []),
-                "hashtags": tags_map.get(pid, []),
-            }
-        )
-
-    return {"items": items}
+    cards = load_cards(db, rows, current_user["id"], counts)
+    return FastJSONResponse(PostPage(items=cards), headers=etag_headers(etag))
 
 @router.get("/{id}")
 def get_user_by_id(id: int, db: Session = Depends(get_db)):
-    u = db.query(Users).filter(Users.id == id).first()
-    if not u:
+    row = _user_with_stats(db, id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    u, stats = row
 
     return {
         "id": u.id,
         "username": u.username,
         "first_name": u.first_name,
         "last_name": u.last_name,
+        "stats": stats_dict(stats),
     }
 
-@router.get("/{id}/posts")
+@router.get("/{id}/posts", response_model=PostPageOut)
 def user_posts(
     id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),  # token varsa liked_by_me hesaplarız
     limit: int = Query(30, ge=1, le=100),
     offset: int = Query(0, ge=0),
 ):
-    u = db.query(Users.id).filter(Users.id == id).first()
+    u = db.query(Users.id).filter(Users.id == id, Users.is_active.isnot(False)).first()
     if not u:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
 
-    rows = (
-        db.query(Posts, Users.username)
-        .join(Users, Users.id == Posts.user_id)
-        .filter(Posts.user_id == id, Posts.status == "published")
-        .order_by(Posts.created_at.desc(), Posts.id.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
-    if not rows:
-        return {"items": []}
+    listing = _profile_query(db, id, ("published",), limit, offset)
+    viewer_id = current_user["id"] if current_user else None
+    rows = listing.all()
+    counts = page_counts(db, rows, viewer_id)
+    etag = page_etag(rows, counts, viewer_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    post_ids = [p.id for (p, _un) in rows]
-
-    like_counts_raw = (
-        db.query(Likes.post_id, func.count(Likes.id))
-        .filter(Likes.post_id.in_(post_ids))
-        .group_by(Likes.post_id)
-        .all()
-    )
-    like_counts = {pid: int(cnt) for pid, cnt in like_counts_raw}
-
-    comment_counts_raw = (
-        db.query(Comments.post_id, func.count(Comments.id))
-        .filter(Comments.post_id.in_(post_ids), Comments.status == "published")
-        .group_by(Comments.post_id)
-        .all()
-    )
-    comment_counts = {pid: int(cnt) for pid, cnt in comment_counts_raw}
-
-    liked_post_ids = set()
-    if current_user:
-        liked_post_ids_raw = (
-            db.query(Likes.post_id)
-            .filter(Likes.post_id.in_(post_ids), Likes.user_id == current_user["id"])
-            .all()
-        )
-        liked_post_ids = {r[0] for r in liked_post_ids_raw}
-
-    images_raw = (
-        db.query(PostImages.post_id, PostImages.stored_filename)
-        .filter(PostImages.post_id.in_(post_ids))
-        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
-        .all()
-    )
-    images_map: dict[int, list[str]] = {}
-    for pid, fname in images_raw:
-        images_map.setdefault(pid, []).append(f"/media/{fname}")
-
-    tag_rows = (
-        db.query(PostHashtags.post_id, Hashtags.tag)
-        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
-        .filter(PostHashtags.post_id.in_(post_ids))
-        .all()
-    )
-    tags_map: dict[int, list[str]] = {}
-    for pid, tag in tag_rows:
-        tags_map.setdefault(pid, []).append(f"#{tag}")
-
-    items = []
-    for (p, username) in rows:
-        pid = p.id
-        items.append(
-            {
-                "id": pid,
-                "content": p.content,
-                "created_at": p.created_at,
-                "owner": {"id": p.user_id, "username": username},
-                "like_count": like_counts.get(pid, 0),
-                "liked_by_me": (pid in liked_post_ids),
-                "comment_count": comment_counts.get(pid, 0),
-                "image_urls": images_map.get(pid, []),
-                "hashtags": tags_map.get(pid, []),
-            }
-        )
-
-    return {"items": items}
\ No newline at end of file
+    cards = load_cards(db, rows, viewer_id, counts)
+    return FastJSONResponse(PostPage(items=cards), headers=etag_headers(etag))
@@ -0,0 +1,174 @@
+# services/ai_export.py
+"""
+ai_requests tablosunun analiz için dışa aktarımı (NDJSON / CSV).
+
+  GET /admin/ai-requests/export?format=csv&type=rewrite&since=2026-01-01
+  python -m services.ai_export --format ndjson --status error -o errors.ndjson
+
+Milyonlarca satırda bile bellek ve primary dostu:
+  - keyset parçalama: her parça "id > son_id ORDER BY id LIMIT n"; OFFSET yok,
+    her parça PK index'inden kaldığı yerden devam eder
+  - her parça KENDİ kısa READ ONLY transaction'ında, server-side cursor ile
+    (yield_per) okunur; parça bitince transaction kapanır. Uzun süren tek bir
+    transaction olmadığı için VACUUM bekletilmez (bloat yok)
+  - istemciye yazma transaction DIŞINDA yapılır: yavaş istemci DB'de açık
+    bağlantı / snapshot tutmaz
+  - parça hem satır (CHUNK_ROWS) hem byte (CHUNK_BYTES) ile sınırlı; büyük
+    prompt/çıktılar belleği büyütmez
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import select
+
+from core.database import engine
+from core.responses import encode_json
+from models.models import AIRequests, Users
+
+CHUNK_ROWS = 5000
+CHUNK_BYTES = 1024 * 1024
+FETCH_ROWS = 500          # server-side cursor'dan her seferde çekilen satır
+
+COLUMNS = (
+    "id", "created_at", "user_id", "username", "type", "status",
+    "model_name", "prompt_tokens", "completion_tokens", "input_text", "output_text", "meta",
+)
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    type: Optional[str] = None
+    status: Optional[str] = None
+    user_id: Optional[int] = None
+    since: Optional[datetime] = None    # dahil
+    until: Optional[datetime] = None    # hariç
+
+    def clauses(self) -> list:
+        out = []
+        if self.type:
+            out.append(AIRequests.type == self.type)
+        if self.status:
+            out.append(AIRequests.status == self.status)
+        if self.user_id is not None:
+            out.append(AIRequests.user_id == self.user_id)
+        if self.since is not None:
+            out.append(AIRequests.created_at >= self.since)
+        if self.until is not None:
+            out.append(AIRequests.created_at < self.until)
+        return out
+
+
+def _chunk_stmt(f: ExportFilter, after_id: int, limit: int):
+    return (
+        select(
+            AIRequests.id, AIRequests.created_at, AIRequests.user_id, Users.username,
+            AIRequests.type, AIRequests.status, AIRequests.model_name,
+            AIRequests.prompt_tokens, AIRequests.completion_tokens,
+            AIRequests.input_text, AIRequests.output_text, AIRequests.meta,
+        )
+        .outerjoin(Users, Users.id == AIRequests.user_id)
+        .where(AIRequests.id > after_id, *f.clauses())
+        .order_by(AIRequests.id)
+        .limit(limit)
+    )
+
+
+# ---------- satır formatları ----------
+def _ndjson_row(row) -> bytes:
+    return encode_json(dict(zip(COLUMNS, row))) + b"\n"
+
+
+def _csv_encoder() -> tuple[bytes, Callable]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    def line(values) -> bytes:
+        writer.writerow(values)
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+        return data
+
+    def row(r) -> bytes:
+        return line([
+            r.id,
+            r.created_at.isoformat() if r.created_at else "",
+            r.user_id if r.user_id is not None else "",
+            r.username or "",
+            r.type, r.status or "", r.model_name or "",
+            r.prompt_tokens, r.completion_tokens,
+            r.input_text or "", r.output_text or "",
+            encode_json(r.meta).decode() if r.meta is not None else "",
+        ])
+
+    return line(COLUMNS), row
+
+
+def export_stream(f: ExportFilter, fmt: str = "ndjson") -> Iterator[bytes]:
+    if fmt not in FORMATS:
+        raise ValueError(f"Geçersiz format: {fmt!r}")
+    if fmt == "csv":
+        header, encode_row = _csv_encoder()
+        yield header
+    else:
+        encode_row = _ndjson_row
+
+    after_id = 0
+    while True:
+        parts: list[bytes] = []
+        size = 0
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            result = conn.execution_options(yield_per=FETCH_ROWS).execute(
+                _chunk_stmt(f, after_id, CHUNK_ROWS)
+            )
+            n = 0
+            for row in result:
+                data = encode_row(row)
+                parts.append(data)
+                size += len(data)
+                after_id = row.id
+                n += 1
+                if size >= CHUNK_BYTES:
+                    break
+            result.close()
+        # connect() bloğu kapandı: transaction bitti, bağlantı havuza döndü
+        if parts:
+            yield b"".join(parts)
+        if size < CHUNK_BYTES and n < CHUNK_ROWS:
+            return
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(prog="python -m services.ai_export")
+    ap.add_argument("--format", choices=tuple(FORMATS), default="ndjson")
+    ap.add_argument("--type")
+    ap.add_argument("--status")
+    ap.add_argument("--user-id", type=int)
+    ap.add_argument("--since", type=datetime.fromisoformat, help="ISO tarih/saat (dahil)")
+    ap.add_argument("--until", type=datetime.fromisoformat, help="ISO tarih/saat (hariç)")
+    ap.add_argument("-o", "--output", help="dosya (varsayılan stdout)")
+    args = ap.parse_args()
+
+    flt = ExportFilter(type=args.type, status=args.status, user_id=args.user_id,
+                       since=args.since, until=args.until)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(flt, args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    sys.exit(0)
@@ -0,0 +1,109 @@
+# services/ai_usage.py
+"""
+AI token kullanımı: ai_requests'in tipli token kolonları + günlük toplamlar.
+
+Her AIRequests kaydı record() ile eklenir. Bu çağrı:
+  - meta'daki usage'dan prompt_tokens / completion_tokens kolonlarını doldurur
+  - ai_usage_daily (kullanıcı, gün UTC, model) satırını AYNI transaction'da artırır
+
+"Kullanıcı başına günlük token" ve kota kontrolü böylece JSONB taramadan
+PK'dan okunur (kullanıcının o gün kullandığı model başına bir satır; tek
+deployment'ta tek satır).
+
+Kota (AI_DAILY_TOKEN_QUOTA > 0) Azure çağrısından ÖNCE bakılır; yumuşak bir
+sınırdır: aynı anda başlayan istekler birlikte geçebilir, aşım bir isteğin
+tokenı kadardır.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Mapping, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.models import AIRequests, AIUsageDaily
+
+
+class AIQuotaExceeded(Exception):
+    def __init__(self, used: int, limit: int, retry_after: float):
+        super().__init__(f"günlük AI token kotası doldu ({used}/{limit})")
+        self.used = used
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), time(0), tzinfo=timezone.utc)
+    return (midnight - now).total_seconds()
+
+
+def usage_tokens(meta: Optional[Mapping]) -> tuple[int, int]:
+    """OpenAI usage dict'i (response.usage.model_dump()) -> (prompt, completion)."""
+    if not meta:
+        return 0, 0
+    return int(meta.get("prompt_tokens") or 0), int(meta.get("completion_tokens") or 0)
+
+
+def record(db: Session, req: AIRequests) -> AIRequests:
+    """AIRequests'i ekler ve günlük toplamı artırır; commit çağırana ait."""
+    req.prompt_tokens, req.completion_tokens = usage_tokens(req.meta)
+    db.add(req)
+    if req.user_id is None:
+        return req
+
+    stmt = pg_insert(AIUsageDaily).values(
+        user_id=req.user_id,
+        day=utc_today(),
+        model_name=req.model_name or "unknown",
+        requests=1,
+        errors=0 if req.status == "success" else 1,
+        prompt_tokens=req.prompt_tokens,
+        completion_tokens=req.completion_tokens,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AIUsageDaily.user_id, AIUsageDaily.day, AIUsageDaily.model_name],
+        set_={
+            f: getattr(AIUsageDaily, f) + getattr(stmt.excluded, f)
+            for f in ("requests", "errors", "prompt_tokens", "completion_tokens")
+        },
+    )
+    db.execute(stmt)
+    return req
+
+
+def used_today(db: Session, user_id: int) -> int:
+    total = (
+        db.query(func.sum(AIUsageDaily.prompt_tokens + AIUsageDaily.completion_tokens))
+        .filter(AIUsageDaily.user_id == user_id, AIUsageDaily.day == utc_today())
+        .scalar()
+    )
+    return int(total or 0)
+
+
+def check_quota(db: Session, user_id: int) -> None:
+    limit = settings.AI_DAILY_TOKEN_QUOTA
+    if limit <= 0:
+        return
+    used = used_today(db, user_id)
+    # okuma transaction'ı açık kalmasın (istek Azure'u uzun süre bekleyebilir)
+    db.rollback()
+    if used >= limit:
+        raise AIQuotaExceeded(used, limit, _seconds_to_midnight())
+
+
+def quota_dict(used: int) -> dict:
+    limit = settings.AI_DAILY_TOKEN_QUOTA
+    return {
+        "daily_limit": limit if limit > 0 else None,
+        "used_today": used,
+        "remaining_today": max(0, limit - used) if limit > 0 else None,
+        "resets_in_seconds": int(_seconds_to_midnight()),
+    }
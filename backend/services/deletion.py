@@ -0,0 +1,521 @@
+# services/deletion.py
+"""
+Post ve hesap silme: istekte soft-delete, bağımlı satırlar arka planda.
+
+İstek (DELETE /posts/{id}, DELETE /users/me) tek kısa transaction'dır:
+  - post status='deleted' / kullanıcı is_active=false (+ post'ları ve yorumları
+    status='deleted'); okuma yolları zaten status='published' (sahibine pending)
+    filtrelediği için içerik anında görünmez olur
+  - etkilenen profil sayaçları aynı transaction'da düşülür
+  - resimlerin phash_removals tombstone'ları yazılır (diğer process'lerin
+    bellek phash indeksi catch_up'ta düşer)
+  - deletion_jobs'a iş yazılır (aynı transaction: ya ikisi ya hiçbiri)
+
+Worker (FOR UPDATE SKIP LOCKED + kira, moderation kuyruğu gibi):
+  post   likes, comments: DELETION_BATCH_SIZE'lık transaction'lar, arada
+         DELETION_PAUSE_SECONDS; sonra hashtag / resim satırları + post tek
+         transaction'da, resim anahtarları media_deletions'a yazılır
+  user   post'ları (yukarıdaki gibi tek tek), verdiği beğeniler, yazdığı yorumlar,
+         ai_requests.user_id -> NULL (batch'li), en son users satırı
+  medya  media_deletions'taki dosyalar storage'dan silinir (DB commit'inden sonra;
+         storage hatasında satır kuyrukta kalır); saatte bir eski
+         phash_removals satırları budanır
+
+Her batch kendi transaction'ında işin kirasını uzatır. Adımlar "kalanlardan N
+tane sil" şeklinde olduğu için idempotenttir: worker yarıda kalırsa iş kira
+bitince kaldığı yerden devam eder.
+
+  python -m services.deletion worker
+  python -m services.deletion status
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from models.models import (
+    Users, Posts, Comments, PostImages, PostHashtags, DeletionJobs, MediaDeletions,
+)
+from services import user_stats
+from services.embeddings import embedding_index
+from services.hashtag_graph import hashtag_graph
+from services import phash
+from services.phash import phash_index
+from services.storage import storage
+
+log = logging.getLogger("deletion")
+
+
+# ---------- istek tarafı (commit çağırana ait) ----------
+_ENQUEUE_SQL = text("""
+    INSERT INTO deletion_jobs (kind, target_id, status, attempts)
+    VALUES (:kind, :target_id, 'queued', 0)
+    ON CONFLICT (kind, target_id) DO UPDATE
+       SET status = 'queued', attempts = 0, available_at = now(), locked_until = NULL
+""")
+
+
+def enqueue(db: Session, kind: str, target_id: int) -> None:
+    db.execute(_ENQUEUE_SQL, {"kind": kind, "target_id": target_id})
+
+
+def delete_post(db: Session, post: Posts) -> None:
+    """post FOR UPDATE ile yüklenmiş olmalı (eşzamanlı iki silme sayaçları iki kez düşmesin)."""
+    user_stats.post_removed(db, post)      # status değişmeden önce: published mıydı?
+    post.status = "deleted"
+    phash.record_post_removal(db, post.id)
+    enqueue(db, "post", post.id)
+
+
+def delete_user(db: Session, user_id: int) -> bool:
+    """Hesabı kapatır ve içeriğini gizler; False: kullanıcı yok ya da zaten siliniyor."""
+    user = db.query(Users).filter(Users.id == user_id).with_for_update().first()
+    if user is None or user.is_active is False:
+        return False
+    user.is_active = False
+
+    # başkalarının post'larına yazdığı published yorumlar gizleniyor: o yazarların comments_received'ı
+    rows = (
+        db.query(Posts.user_id, func.count(Comments.id))
+        .join(Posts, and_(Posts.id == Comments.post_id, Posts.created_at == Comments.post_created_at))
+        .filter(
+            Comments.user_id == user_id,
+            Comments.status == "published",
+            Posts.status == "published",
+            Posts.user_id != user_id,
+        )
+        .group_by(Posts.user_id)
+        .all()
+    )
+    user_stats.bump(db, {author: {"comments_received": -int(n)} for author, n in rows})
+
+    db.query(Comments).filter(Comments.user_id == user_id, Comments.status != "deleted").update(
+        {"status": "deleted"}, synchronize_session=False
+    )
+    phash.record_user_removal(db, user_id)
+    db.query(Posts).filter(Posts.user_id == user_id, Posts.status != "deleted").update(
+        {"status": "deleted"}, synchronize_session=False
+    )
+    enqueue(db, "user", user_id)
+    return True
+
+
+# ---------- kuyruk ----------
+@dataclass
+class ClaimedJob:
+    id: int
+    kind: str          # post | user
+    target_id: int
+    attempts: int
+
+
+# işler uzun sürer (binlerce batch): tek seferde tek iş kiralanır, kira batch'lerde uzatılır
+_CLAIM_SQL = text("""
+    UPDATE deletion_jobs
+       SET locked_until = now() + make_interval(secs => :lease),
+           attempts = attempts + 1
+     WHERE id = (
+            SELECT id
+              FROM deletion_jobs
+             WHERE status = 'queued'
+               AND available_at <= now()
+               AND (locked_until IS NULL OR locked_until < now())
+             ORDER BY available_at, id
+             FOR UPDATE SKIP LOCKED
+             LIMIT 1
+           )
+ RETURNING id, kind, target_id, attempts
+""")
+
+_EXTEND_SQL = text(
+    "UPDATE deletion_jobs SET locked_until = now() + make_interval(secs => :lease) WHERE id = :id"
+)
+
+
+def claim(db: Session) -> Optional[ClaimedJob]:
+    row = db.execute(_CLAIM_SQL, {"lease": settings.DELETION_LEASE_SECONDS}).first()
+    db.commit()
+    return ClaimedJob(id=row.id, kind=row.kind, target_id=row.target_id, attempts=row.attempts) if row else None
+
+
+class _Interrupted(Exception):
+    """Worker durduruluyor: kira bırakılır, kalan batch'ler sonraki turda."""
+
+
+class _Run:
+    def __init__(self, job_id: Optional[int], stop: threading.Event):
+        self.job_id = job_id
+        self.stop = stop
+        self.rows = 0
+
+    def commit(self, db: Session, rows: int = 0) -> None:
+        # kira uzatma batch ile aynı transaction'da: ilerleme ve kira birlikte kalıcı olur
+        if self.job_id is not None:
+            db.execute(_EXTEND_SQL, {"id": self.job_id, "lease": settings.DELETION_LEASE_SECONDS})
+        db.commit()
+        self.rows += rows
+
+    def pause(self) -> None:
+        if self.stop.wait(settings.DELETION_PAUSE_SECONDS):
+            raise _Interrupted()
+
+
+# ---------- post ----------
+_POST_LIKES_SQL = text("""
+    DELETE FROM likes
+     WHERE post_created_at = :post_created_at
+       AND id IN (SELECT id FROM likes
+                   WHERE post_id = :post_id AND post_created_at = :post_created_at
+                   LIMIT :batch)
+ RETURNING user_id
+""")
+
+_POST_COMMENTS_SQL = text("""
+    DELETE FROM comments
+     WHERE post_created_at = :post_created_at
+       AND id IN (SELECT id FROM comments
+                   WHERE post_id = :post_id AND post_created_at = :post_created_at
+                   LIMIT :batch)
+""")
+
+
+def _purge_post(db: Session, run: _Run, post_id: int) -> None:
+    post = db.query(Posts.id, Posts.created_at, Posts.status).filter(Posts.id == post_id).first()
+    db.rollback()
+    if post is None:
+        return
+    if post.status != "deleted":
+        log.warning("deletion job for post %s skipped: status=%s", post_id, post.status)
+        return
+    params = {"post_id": post_id, "post_created_at": post.created_at, "batch": settings.DELETION_BATCH_SIZE}
+
+    # beğeniler: beğenenlerin likes_given'ı batch ile aynı transaction'da (kullanıcı başına tek beğeni)
+    while True:
+        likers = db.execute(_POST_LIKES_SQL, params).scalars().all()
+        if not likers:
+            break
+        user_stats.bump(db, {uid: {"likes_given": -1} for uid in likers})
+        run.commit(db, len(likers))
+        run.pause()
+
+    # yorumlar: sayaçlar soft-delete'te düşüldü
+    while n := db.execute(_POST_COMMENTS_SQL, params).rowcount:
+        run.commit(db, n)
+        run.pause()
+
+    # kalan küçük kısım (post başına en fazla birkaç satır) + post'un kendisi
+    db.query(PostHashtags).filter(PostHashtags.post_id == post_id).delete(synchronize_session=False)
+    images = db.execute(
+        delete(PostImages).where(PostImages.post_id == post_id)
+        .returning(PostImages.id, PostImages.stored_filename)
+    ).all()
+    if images:
+        db.execute(
+            pg_insert(MediaDeletions)
+            .values([{"storage_key": key} for _id, key in images])
+            .on_conflict_do_nothing(index_elements=[MediaDeletions.storage_key])
+        )
+    db.query(Posts).filter(Posts.id == post_id).delete(synchronize_session=False)
+    run.commit(db, len(images) + 1)
+
+    # bu process'in bellek indeksleri (diğer process'ler phash_removals / periyodik yenilemeyle düşer)
+    phash_index.remove_post([image_id for image_id, _key in images])
+    hashtag_graph.remove_post(post_id)
+    embedding_index.remove(post_id)
+
+
+# ---------- kullanıcı ----------
+# verdiği beğeniler: post sahiplerinin likes_received'ı (silinmiş post'unki post_removed'da düşüldü)
+_USER_LIKES_SQL = text("""
+    WITH gone AS (
+        DELETE FROM likes l
+         USING (SELECT id, post_created_at FROM likes WHERE user_id = :user_id LIMIT :batch) b
+         WHERE l.id = b.id AND l.post_created_at = b.post_created_at
+        RETURNING l.post_id
+    )
+    SELECT p.user_id, count(*) AS total, count(*) FILTER (WHERE p.status <> 'deleted') AS counted
+      FROM gone JOIN posts p ON p.id = gone.post_id
+     GROUP BY p.user_id
+""")
+
+# yazdığı yorumlar: hâlâ published olanlar (soft-delete'ten sonra eski token'la yazılmış
+# olabilir) post sahiplerinin comments_received'ında sayılıyordu -> düşülür
+_USER_COMMENTS_SQL = text("""
+    WITH gone AS (
+        DELETE FROM comments c
+         USING (SELECT id, post_created_at FROM comments WHERE user_id = :user_id LIMIT :batch) b
+         WHERE c.id = b.id AND c.post_created_at = b.post_created_at
+        RETURNING c.post_id, c.status
+    )
+    SELECT p.user_id, count(*) AS total,
+           count(*) FILTER (WHERE gone.status = 'published' AND p.status <> 'deleted') AS counted
+      FROM gone JOIN posts p ON p.id = gone.post_id
+     GROUP BY p.user_id
+""")
+
+# FK ON DELETE SET NULL'ı users silinirken tek dev UPDATE olmasın diye önceden, parça parça
+_USER_AI_REQUESTS_SQL = text("""
+    UPDATE ai_requests a
+       SET user_id = NULL
+      FROM (SELECT id, created_at FROM ai_requests WHERE user_id = :user_id LIMIT :batch) b
+     WHERE a.id = b.id AND a.created_at = b.created_at
+""")
+
+
+def _purge_user(db: Session, run: _Run, user_id: int) -> None:
+    active = db.query(Users.is_active).filter(Users.id == user_id).scalar()
+    db.rollback()
+    if active is None:
+        return
+    if active is not False:
+        log.warning("deletion job for user %s skipped: account is active", user_id)
+        return
+    params = {"user_id": user_id, "batch": settings.DELETION_BATCH_SIZE}
+
+    # status'a bakılmaz: soft-delete'ten sonra eski token'la açılmış post'lar da gider
+    while post_id := (
+        db.query(Posts.id).filter(Posts.user_id == user_id).order_by(Posts.id).limit(1).scalar()
+    ):
+        _hide_and_purge_post(db, run, post_id)
+
+    while rows := db.execute(_USER_LIKES_SQL, params).all():
+        user_stats.bump(db, {r.user_id: {"likes_received": -int(r.counted)} for r in rows})
+        run.commit(db, sum(int(r.total) for r in rows))
+        run.pause()
+
+    while rows := db.execute(_USER_COMMENTS_SQL, params).all():
+        user_stats.bump(db, {r.user_id: {"comments_received": -int(r.counted)} for r in rows})
+        run.commit(db, sum(int(r.total) for r in rows))
+        run.pause()
+
+    while n := db.execute(_USER_AI_REQUESTS_SQL, params).rowcount:
+        run.commit(db, n)
+        run.pause()
+
+    # kalanlar kullanıcı başına küçük: user_stats, ai_usage_daily (CASCADE), blocked_image_hashes (SET NULL)
+    db.query(Users).filter(Users.id == user_id).delete(synchronize_session=False)
+    run.commit(db, 1)
+
+
+def _hide_and_purge_post(db: Session, run: _Run, post_id: int) -> None:
+    # kullanıcı silinirken: soft-delete'ten sonra açılmış post henüz 'deleted' değilse önce gizlenir
+    post = db.query(Posts).filter(Posts.id == post_id).with_for_update().first()
+    if post is not None and post.status != "deleted":
+        user_stats.post_removed(db, post)
+        post.status = "deleted"
+        phash.record_post_removal(db, post_id)
+    run.commit(db)
+    _purge_post(db, run, post_id)
+
+
+_HANDLERS = {
+    "post": _purge_post,
+    "user": _purge_user,
+}
+
+
+def process_job(job: ClaimedJob, stop: threading.Event) -> int:
+    """İşi baştan sona yürütür; silinen satır sayısı."""
+    db = SessionLocal()
+    run = _Run(job.id, stop)
+    try:
+        handler = _HANDLERS.get(job.kind)
+        if handler is None:
+            raise ValueError(f"unknown kind: {job.kind}")
+        handler(db, run, job.target_id)
+        db.execute(delete(DeletionJobs).where(DeletionJobs.id == job.id))
+        db.commit()
+    except _Interrupted:
+        db.rollback()
+        # kapanış deneme sayılmaz; bir sonraki worker hemen devralabilir
+        db.execute(
+            text("UPDATE deletion_jobs SET locked_until = NULL, attempts = attempts - 1 WHERE id = :id"),
+            {"id": job.id},
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log.warning("deletion job %s (%s %s) failed (attempt %s): %s",
+                    job.id, job.kind, job.target_id, job.attempts, e)
+        if job.attempts >= settings.DELETION_MAX_ATTEMPTS:
+            db.execute(
+                text("UPDATE deletion_jobs SET status = 'failed', locked_until = NULL, last_error = :err "
+                     "WHERE id = :id"),
+                {"id": job.id, "err": str(e)[:500]},
+            )
+        else:
+            db.execute(
+                text("UPDATE deletion_jobs SET available_at = now() + make_interval(secs => :delay), "
+                     "locked_until = NULL, last_error = :err WHERE id = :id"),
+                {"id": job.id, "delay": min(2 ** job.attempts, 600), "err": str(e)[:500]},
+            )
+        db.commit()
+        raise
+    finally:
+        db.close()
+    return run.rows
+
+
+# ---------- medya ----------
+def drain_media(limit: int) -> int:
+    """media_deletions'tan en fazla limit dosyayı storage'dan siler; silinen sayısı."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            text("SELECT id, storage_key FROM media_deletions ORDER BY id LIMIT :n FOR UPDATE SKIP LOCKED"),
+            {"n": limit},
+        ).all()
+        if not rows:
+            db.rollback()
+            return 0
+        ids = [r.id for r in rows]
+        try:
+            storage.delete_many([r.storage_key for r in rows])
+        except Exception as e:
+            db.rollback()
+            db.execute(
+                text("UPDATE media_deletions SET attempts = attempts + 1 WHERE id = ANY(:ids)"), {"ids": ids}
+            )
+            db.commit()
+            log.warning("media deletion failed (%s files): %s", len(ids), e)
+            return 0
+        db.execute(delete(MediaDeletions).where(MediaDeletions.id.in_(ids)))
+        db.commit()
+        return len(ids)
+    finally:
+        db.close()
+
+
+def prune_phash_removals() -> int:
+    db = SessionLocal()
+    try:
+        n = phash.prune_removals(db)
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+
+# ---------- worker ----------
+_PRUNE_EVERY_SECONDS = 3600
+
+class DeletionWorker:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.jobs_done = 0
+        self.rows_deleted = 0
+        self.media_deleted = 0
+        self.errors = 0
+        self._pruned_at = 0.0
+
+    def run_once(self) -> int:
+        """Bir iş + bir medya batch'i; yapılan iş sayısı (0 = kuyruk boş)."""
+        done = 0
+        db = SessionLocal()
+        try:
+            job = claim(db)
+        finally:
+            db.close()
+        if job is not None:
+            rows = process_job(job, self._stop)
+            with self._lock:
+                self.jobs_done += 1
+                self.rows_deleted += rows
+            done += 1
+        media = drain_media(settings.DELETION_MEDIA_BATCH)
+        with self._lock:
+            self.media_deleted += media
+            prune = time.monotonic() - self._pruned_at > _PRUNE_EVERY_SECONDS
+            if prune:
+                self._pruned_at = time.monotonic()
+        if prune:
+            prune_phash_removals()
+        return done + media
+
+    def start(self, count: Optional[int] = None) -> None:
+        count = settings.DELETION_WORKERS if count is None else count
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(count):
+            t = threading.Thread(target=self._run, name=f"deletion-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads.clear()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                n = self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                log.warning("deletion worker loop error: %s", e)
+                n = 0
+            if n == 0:
+                self._stop.wait(settings.DELETION_POLL_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "alive": sum(t.is_alive() for t in self._threads),
+            "jobs_done": self.jobs_done,
+            "rows_deleted": self.rows_deleted,
+            "media_deleted": self.media_deleted,
+            "errors": self.errors,
+        }
+
+
+deletion_worker = DeletionWorker()
+
+
+def status() -> dict:
+    db = SessionLocal()
+    try:
+        jobs = db.execute(
+            text("SELECT kind, status, count(*) AS n, min(created_at) AS oldest "
+                 "FROM deletion_jobs GROUP BY kind, status ORDER BY kind, status")
+        ).all()
+        media = db.query(func.count(MediaDeletions.id)).scalar()
+        return {
+            "jobs": [{"kind": r.kind, "status": r.status, "count": r.n, "oldest": r.oldest} for r in jobs],
+            "media_pending": int(media or 0),
+        }
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(prog="python -m services.deletion")
+    ap.add_argument("command", choices=("worker", "status"))
+    args = ap.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(status(), indent=2, default=str))
+        sys.exit(0)
+    deletion_worker.start()
+    try:
+        for t in list(deletion_worker._threads):
+            t.join()
+    except KeyboardInterrupt:
+        deletion_worker.stop()
+    sys.exit(0)
@@ -0,0 +1,310 @@
+# services/embeddings.py
+"""
+Post metinlerinin yerel (CPU) cümle embedding'i + benzer post / anlamsal arama.
+
+  - Encoder: küçük bir sentence-transformers modeli (varsayılan çok dilli
+    MiniLM, 384 boyut) transformers ile yüklenir; mean pooling + L2 normalize.
+    Model ilk kullanımda tembel yüklenir (import süresine etkisi yok).
+  - EmbeddingWorker: yayınlanmış post'ları id sırasıyla toplu (EMBEDDING_BATCH)
+    embed eder ve VectorWriter ile sona ekler. EMBEDDING_DIR/writer.lock
+    (flock) sayesinde birden çok API worker'ı varken sadece biri yazar; lock'u
+    alamayanlar sadece okur. Ayrı process olarak da çalışır:
+        python -m services.embeddings worker
+        python -m services.embeddings rebuild      # her şeyi yeniden embed et
+  - Periyodik tarama (EMBEDDING_SWEEP_SECONDS): geç yayınlanan (pending ->
+    published) post'lar eklenir; silinen / yayından kalkanlar çoksa veya
+    indeks eğitimden bu yana iki katına çıktıysa yeni nesil yazılır (IVF
+    yeniden eğitilir).
+  - embedding_index (VectorIndex): her process'te mmap okuyucu; arama bunun
+    üzerinden yapılır.
+"""
+from __future__ import annotations
+
+import argparse
+import fcntl
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from core.config import settings
+from core.database import SessionLocal
+from models.models import Posts
+from services.vector_index import VectorIndex, VectorWriter, read_meta
+
+log = logging.getLogger("embeddings")
+
+MAX_TOKENS = 128
+DEAD_RATIO = 0.2           # silinmiş satır oranı bunu aşınca sıkıştırılır
+
+
+class Encoder:
+    """
+    Model tek kopya, batch worker ve arama isteği aynı anda kullanır: lock sadece
+    tembel yükleme ve tokenizer içindir (hızlı tokenizer eşzamanlı çağrıda
+    "Already borrowed" verir). Forward pass kilitsizdir; inference_mode'da
+    eşzamanlı çağrılar güvenli, böylece kısa bir arama sorgusu 32'lik bir
+    batch'in bitmesini beklemez.
+    """
+
+    def __init__(self, model_name: str, threads: int):
+        self.model_name = model_name
+        self.threads = threads
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        self._model = None
+        self.dim: Optional[int] = None
+
+    def _load(self) -> None:
+        import torch                                   # ağır bağımlılıklar: sadece embedding açıksa
+        from transformers import AutoModel, AutoTokenizer
+
+        if self.threads > 0:
+            torch.set_num_threads(self.threads)
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self._model = AutoModel.from_pretrained(self.model_name).eval()
+        self.dim = int(self._model.config.hidden_size)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        import torch
+
+        with self._lock:
+            if self._model is None:
+                self._load()
+            batch = self._tokenizer(
+                list(texts), padding=True, truncation=True,
+                max_length=MAX_TOKENS, return_tensors="pt",
+            )
+        with torch.inference_mode():
+            hidden = self._model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled, dim=-1)
+        return pooled.numpy().astype(np.float32)
+
+    def ensure_loaded(self) -> int:
+        with self._lock:
+            if self._model is None:
+                self._load()
+        return self.dim
+
+
+encoder = Encoder(settings.EMBEDDING_MODEL, settings.EMBEDDING_THREADS)
+embedding_index = VectorIndex(
+    settings.EMBEDDING_DIR,
+    nprobe=settings.EMBEDDING_NPROBE,
+    ivf_min_rows=settings.EMBEDDING_IVF_MIN_ROWS,
+)
+
+
+def _published_batch(after_id: int, limit: int) -> list[tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Posts.id, Posts.content)
+            .where(Posts.id > after_id, Posts.status == "published")
+            .order_by(Posts.id)
+            .limit(limit)
+        ).all()
+        return [(r.id, r.content) for r in rows]
+    finally:
+        db.close()
+
+
+def _published_ids() -> np.ndarray:
+    db = SessionLocal()
+    try:
+        ids = db.execute(select(Posts.id).where(Posts.status == "published")).scalars().all()
+        return np.asarray(ids, dtype=np.int64)
+    finally:
+        db.close()
+
+
+def _contents(post_ids: Sequence[int]) -> list[tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Posts.id, Posts.content)
+            .where(Posts.id.in_([int(i) for i in post_ids]), Posts.status == "published")
+            .order_by(Posts.id)
+        ).all()
+        return [(r.id, r.content) for r in rows]
+    finally:
+        db.close()
+
+
+class EmbeddingWorker:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd: Optional[int] = None
+        self.writer: Optional[VectorWriter] = None
+        self.embedded = 0
+        self.errors = 0
+        self._last_sweep = 0.0
+
+    # ---------- writer lock ----------
+    def _acquire(self) -> bool:
+        os.makedirs(settings.EMBEDDING_DIR, exist_ok=True)
+        fd = os.open(os.path.join(settings.EMBEDDING_DIR, "writer.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)       # flock fd ile birlikte bırakılır
+            self._lock_fd = None
+
+    # ---------- iş ----------
+    def _open_writer(self) -> VectorWriter:
+        if self.writer is None:
+            dim = encoder.ensure_loaded()
+            self.writer = VectorWriter(settings.EMBEDDING_DIR, dim, settings.EMBEDDING_MODEL)
+        return self.writer
+
+    def _embed(self, rows: list[tuple[int, str]]) -> None:
+        vecs = encoder.encode([content for _pid, content in rows])
+        self.writer.append([pid for pid, _c in rows], vecs)
+        self.embedded += len(rows)
+
+    def step(self) -> int:
+        """Watermark'tan sonraki yayınlanmış post'lardan bir batch; eklenen sayısı."""
+        writer = self._open_writer()
+        after = int(writer.ids.max()) if writer.rows else 0
+        rows = _published_batch(after, settings.EMBEDDING_BATCH)
+        if rows:
+            self._embed(rows)
+        return len(rows)
+
+    def sweep(self) -> None:
+        """Geç yayınlananları ekle; gerekirse sıkıştır / IVF'i yeniden eğit."""
+        writer = self._open_writer()
+        published = _published_ids()
+        missing = np.setdiff1d(published, writer.ids, assume_unique=False)
+        for s in range(0, len(missing), settings.EMBEDDING_BATCH):
+            rows = _contents(missing[s:s + settings.EMBEDDING_BATCH])
+            if rows:
+                self._embed(rows)
+
+        live = np.isin(writer.ids, published)
+        dead = writer.rows - int(live.sum())
+        trained = writer.meta["trained_rows"]
+        grown = writer.rows >= settings.EMBEDDING_IVF_MIN_ROWS and (not trained or writer.rows >= 2 * trained)
+        if grown or (writer.rows and dead / writer.rows > DEAD_RATIO):
+            meta = writer.rewrite(published, train=True, min_train_rows=settings.EMBEDDING_IVF_MIN_ROWS)
+            log.info("embedding index rewritten: gen=%s rows=%s lists=%s",
+                     meta["generation"], writer.rows, meta["n_lists"])
+        self._last_sweep = time.monotonic()
+
+    def run_once(self) -> None:
+        if self.writer is not None:
+            self.writer.collect()          # ertelenmiş eski nesil dosyaları
+        while self.step() >= settings.EMBEDDING_BATCH and not self._stop.is_set():
+            pass
+        if time.monotonic() - self._last_sweep >= settings.EMBEDDING_SWEEP_SECONDS:
+            self.sweep()
+
+    def rebuild(self) -> None:
+        """Her şeyi baştan embed et (model değişikliği sonrası vb.)."""
+        writer = self._open_writer()
+        writer.rewrite(np.empty(0, dtype=np.int64))
+        while self.step():
+            pass
+        self.sweep()
+
+    # ---------- thread ----------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="embeddings", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        delay = 1.0
+        while not self._stop.is_set():
+            if self._lock_fd is None and not self._acquire():
+                # başka bir process yazıyor; bu process sadece okur
+                self._stop.wait(settings.EMBEDDING_SWEEP_SECONDS)
+                continue
+            try:
+                self.run_once()
+                delay = 1.0
+                wait = settings.EMBEDDING_POLL_SECONDS
+            except Exception as e:
+                self.errors += 1
+                log.warning("embedding worker failed: %s", e)
+                wait = delay
+                delay = min(delay * 2, 60.0)
+            self._stop.wait(wait)
+        self._release()
+
+    def stats(self) -> dict:
+        return {
+            "writer": self._lock_fd is not None,
+            "embedded": self.embedded,
+            "errors": self.errors,
+        }
+
+
+embedding_worker = EmbeddingWorker()
+
+
+def similar_posts(post_id: int, limit: int) -> Optional[list[tuple[int, float]]]:
+    """None: post henüz embed edilmemiş."""
+    embedding_index.refresh()
+    vec = embedding_index.vector(post_id)
+    if vec is None:
+        return None
+    return embedding_index.search(vec, limit, exclude=(post_id,))
+
+
+def semantic_search(query: str, limit: int) -> list[tuple[int, float]]:
+    embedding_index.refresh()
+    meta = read_meta(settings.EMBEDDING_DIR)
+    if meta is None:
+        return []
+    return embedding_index.search(encoder.encode([query])[0], limit)
+
+
+def stats() -> dict:
+    embedding_index.refresh()
+    return {"ready": embedding_index.rows > 0, **embedding_index.stats(), **embedding_worker.stats()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(prog="python -m services.embeddings")
+    ap.add_argument("command", choices=("worker", "rebuild"))
+    args = ap.parse_args()
+
+    w = embedding_worker
+    if not w._acquire():
+        print("başka bir embedding yazarı çalışıyor (writer.lock)", file=sys.stderr)
+        sys.exit(1)
+    if args.command == "rebuild":
+        w.rebuild()
+        print(f"{w.writer.rows} post embed edildi")
+        sys.exit(0)
+    try:
+        while True:
+            w.run_once()
+            time.sleep(settings.EMBEDDING_POLL_SECONDS)
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,241 @@
+# services/export.py
+"""
+Kullanıcının tüm paylaşımlarının ZIP olarak dışa aktarımı (GET /users/me/export).
+
+Bellek kullanımı hesabın büyüklüğünden bağımsızdır:
+  - post'lar keyset ile ("id > son_id ORDER BY id LIMIT EXPORT_BATCH") parça parça
+    okunur; resim/yorum/hashtag'ler parça başına toplu sorgu ile gelir. Her parça
+    KENDİ kısa READ ONLY transaction'ında okunur (services/ai_export.py gibi):
+    resimler storage'dan okunup istemciye yazılırken DB'de açık transaction /
+    snapshot kalmaz, yavaş bir indirme VACUUM'u bekletmez
+  - resimler storage'dan parça parça okunup doğrudan ZIP'e yazılır (ZIP_STORED:
+    jpeg/webp zaten sıkıştırılmış)
+  - ZIP seek edilemeyen bir sink'e yazılır (data descriptor'lı kayıtlar); sink
+    EXPORT_FLUSH_BYTES'a ulaştıkça içi boşaltılıp istemciye gönderilir
+  - manifest.json artımlı yazılır: RAM'de küçük kalır, büyürse diske taşar
+    (SpooledTemporaryFile) ve en sonda ZIP'e kopyalanır
+  - okunamayan resim (storage'da yok, erişim/okuma hatası) export'u kesmez:
+    manifest'te "missing" / "error" olarak işaretlenir
+
+Generator kapatılırsa (istemci koptu) finally'de manifest dosyası kapanır.
+"""
+from __future__ import annotations
+
+import posixpath
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import select, text
+
+from core.database import SessionLocal
+from core.responses import encode_json
+from models.models import Users, Posts, PostImages, Comments, Hashtags, PostHashtags
+from services.storage import storage, StorageError
+
+EXPORT_BATCH = 200
+EXPORT_FLUSH_BYTES = 256 * 1024
+MANIFEST_SPOOL_BYTES = 1024 * 1024
+COPY_CHUNK = 64 * 1024
+EXPORT_FORMAT = 1
+
+
+class _Sink:
+    """ZipFile'ın yazdığı byte'ları biriktirir; tell/seek yok -> zipfile streaming moda geçer."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
+
+
+def _zip_time(dt: datetime | None) -> tuple:
+    dt = (dt or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return dt.timetuple()[:6]
+
+
+def _related(db, batch):
+    post_ids = [p.id for p in batch]
+    images: dict[int, list] = {}
+    for row in (
+        db.query(PostImages.post_id, PostImages.stored_filename, PostImages.content_type,
+                 PostImages.width, PostImages.height)
+        .filter(PostImages.post_id.in_(post_ids))
+        .order_by(PostImages.post_id, PostImages.created_at, PostImages.id)
+    ):
+        images.setdefault(row.post_id, []).append(row)
+
+    comments: dict[int, list] = {}
+    for row in (
+        db.query(Comments.post_id, Comments.id, Comments.content, Comments.created_at, Users.username)
+        .join(Users, Users.id == Comments.user_id)
+        .filter(Comments.post_id.in_(post_ids), Comments.post_created_at.in_({p.created_at for p in batch}),
+                Comments.status == "published")
+        .order_by(Comments.post_id, Comments.created_at, Comments.id)
+    ):
+        comments.setdefault(row.post_id, []).append(
+            {"id": row.id, "author": row.username, "content": row.content, "created_at": row.created_at}
+        )
+
+    tags: dict[int, list[str]] = {}
+    for pid, tag in (
+        db.query(PostHashtags.post_id, Hashtags.tag)
+        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+        .filter(PostHashtags.post_id.in_(post_ids))
+    ):
+        tags.setdefault(pid, []).append(f"#{tag}")
+    return images, comments, tags
+
+
+def _read(fn, *args):
+    """fn(db, *args)'ı kısa, salt okunur bir transaction'da çalıştırır; satırlar dışarı taşınır."""
+    db = SessionLocal()
+    try:
+        db.execute(text("SET TRANSACTION READ ONLY"))
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def _header(db, user_id: int):
+    user = db.get(Users, user_id)
+    if user is None:
+        return None
+    return {
+        "format": EXPORT_FORMAT,
+        "exported_at": datetime.now(timezone.utc),
+        "user": {
+            "id": user.id, "username": user.username, "email": user.email,
+            "first_name": user.first_name, "last_name": user.last_name,
+            "created_at": user.created_at,
+        },
+    }
+
+
+def _post_batch(db, user_id: int, after_id: int):
+    # ORM nesnesi değil satır: identity map'e girmez, parça bitince serbest kalır
+    batch = db.execute(
+        select(Posts.id, Posts.content, Posts.created_at, Posts.status, Posts.source)
+        .where(Posts.user_id == user_id, Posts.status != "deleted", Posts.id > after_id)
+        .order_by(Posts.id)
+        .limit(EXPORT_BATCH)
+    ).all()
+    if not batch:
+        return batch, {}, {}, {}
+    return (batch, *_related(db, batch))
+
+
+def _comment_batch(db, user_id: int, after_id: int):
+    return db.execute(
+        select(Comments.id, Comments.post_id, Comments.content, Comments.created_at, Comments.status)
+        .join(Posts, Posts.id == Comments.post_id)
+        # kendi post'larındaki yorumlar zaten "posts" altında
+        .where(Comments.user_id == user_id, Comments.status != "deleted", Comments.id > after_id,
+               Posts.user_id != user_id)
+        .order_by(Comments.id)
+        .limit(EXPORT_BATCH * 5)
+    ).all()
+
+
+def user_export_zip(user_id: int) -> Iterator[bytes]:
+    header = _read(_header, user_id)
+    if header is None:
+        return
+    sink = _Sink()
+    manifest = tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_BYTES, mode="w+b")
+    try:
+        # {"format":..,"user":{..}} -> son "}" yerine posts dizisi açılır
+        manifest.write(encode_json(header)[:-1] + b',"posts":[')
+
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            sep = b""
+            after_id = 0
+            while True:
+                batch, images, comments, tags = _read(_post_batch, user_id, after_id)
+                if not batch:
+                    break
+                after_id = batch[-1].id
+                # buradan sonrası transaction dışında: storage okuma + istemciye yazma
+
+                for post in batch:
+                    files = []
+                    for n, img in enumerate(images.get(post.id, ()), start=1):
+                        name = f"images/{post.id}/{n}{posixpath.splitext(img.stored_filename)[1]}"
+                        chunks = storage.iter_chunks(img.stored_filename, COPY_CHUNK)
+                        try:
+                            first = next(chunks, b"")
+                        except StorageError:
+                            files.append({"path": None, "missing": True})
+                            continue
+
+                        info = zipfile.ZipInfo(name, date_time=_zip_time(post.created_at))
+                        info.compress_type = zipfile.ZIP_STORED
+                        try:
+                            with zf.open(info, "w") as out:
+                                out.write(first)
+                                for chunk in chunks:
+                                    out.write(chunk)
+                                    if sink.size >= EXPORT_FLUSH_BYTES:
+                                        yield sink.drain()
+                        except StorageError as e:
+                            # ZIP kaydı kısmen yazıldı (geri alınamaz); manifest'te işaretlenir
+                            files.append({"path": name, "error": str(e)})
+                            continue
+                        files.append({
+                            "path": name, "content_type": img.content_type,
+                            "width": img.width, "height": img.height,
+                        })
+                        if sink.size >= EXPORT_FLUSH_BYTES:
+                            yield sink.drain()
+
+                    manifest.write(sep + encode_json({
+                        "id": post.id,
+                        "content": post.content,
+                        "created_at": post.created_at,
+                        "status": post.status,
+                        "source": post.source,
+                        "hashtags": tags.get(post.id, []),
+                        "images": files,
+                        "comments": comments.get(post.id, []),
+                    }))
+                    sep = b","
+
+            # başkalarının post'larına yazdığı yorumlar
+            manifest.write(b'],"comments_written":[')
+            sep = b""
+            after_id = 0
+            while rows := _read(_comment_batch, user_id, after_id):
+                after_id = rows[-1].id
+                for row in rows:
+                    manifest.write(sep + encode_json({
+                        "id": row.id, "post_id": row.post_id, "content": row.content,
+                        "created_at": row.created_at, "status": row.status,
+                    }))
+                    sep = b","
+            manifest.write(b"]}")
+
+            manifest.seek(0)
+            with zf.open("manifest.json", "w") as out:
+                while chunk := manifest.read(COPY_CHUNK):
+                    out.write(chunk)
+                    if sink.size >= EXPORT_FLUSH_BYTES:
+                        yield sink.drain()
+
+        # ZipFile kapanınca central directory yazıldı
+        yield sink.drain()
+    finally:
+        manifest.close()
@@ -0,0 +1,501 @@
+# services/hashtag_graph.py
+"""
+Hashtag birlikte-görülme (co-occurrence) indeksi: ilgili etiketler ve
+"buna benzer" post önerileri post_hashtags üzerinde self-join yapmadan,
+bellekten cevaplanır.
+
+Temel (base) yapı NumPy/SciPy seyrek matrisleridir:
+  A  post x etiket (0/1), published post'lar; satırlar post id, kolonlar hashtag id sıralı
+  C  = AᵀA  etiket x etiket ortak post sayısı; köşegen = etiketin post sayısı
+
+Base toplu olarak kurulur (tek REPEATABLE READ snapshot'ta post_hashtags taraması)
+ve diske yazılır (HASHTAG_GRAPH_SNAPSHOT_PATH, .npz). Process açılırken taze bir
+snapshot varsa DB yerine ondan yüklenir, sonrası post_hashtags.id > watermark ile
+tamamlanır (phash indeksindeki catch_up gibi).
+
+Post oluşturma/yayınlanma/silme base'e dokunmaz; küçük bir delta'ya işlenir
+(eklenen post'lar, silinen post'lar, etiket çifti sayaç farkları). Her
+HASHTAG_GRAPH_REFRESH_SECONDS'ta base DB'den yeniden kurulur ve delta sıfırlanır;
+başka worker'ların yaptığı değişiklikler (özellikle silmeler) bu process'e
+en geç o zaman yansır. Sonuçlar zaten yayın durumuna göre DB'den hydrate edilir.
+
+Skorlar:
+  ilgili etiket   ortak post sayısı / sqrt(f_a * f_b)  (Ochiai / kosinüs)
+  benzer post     ortak etiketlerin idf toplamı, idf = log(1 + N / f_etiket)
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from models.models import Hashtags, PostHashtags, Posts
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+log = logging.getLogger("hashtag_graph")
+
+SNAPSHOT_VERSION = 1
+CANDIDATES_PER_TAG = 5000    # benzer post: etiket başına bakılan en yeni post sayısı
+_FETCH_ROWS = 50_000
+
+
+@dataclass
+class RelatedTag:
+    tag: str
+    count: int
+    score: float
+
+
+def snapshot_path() -> str:
+    return settings.HASHTAG_GRAPH_SNAPSHOT_PATH or os.path.join(tempfile.gettempdir(), "hashtag_graph.npz")
+
+
+class _Base:
+    """Değişmez toplu yapı; yenisi kurulunca tek atamayla değiştirilir."""
+
+    def __init__(self, tag_ids: np.ndarray, tag_names: list[str], post_ids: np.ndarray,
+                 by_post: sparse.csr_matrix, watermark: int, built_at: float):
+        self.tag_ids = tag_ids
+        self.tag_names = tag_names
+        self.tag_by_name = {name: int(tid) for tid, name in zip(tag_ids.tolist(), tag_names)}
+        self.post_ids = post_ids
+        self.by_post = by_post
+        self.by_tag = by_post.tocsc()
+        self.by_tag.sort_indices()          # kolon içinde satırlar = post id sırası (en yeni sonda)
+        self.cooc = (by_post.T @ by_post).tocsr()
+        self.cooc.sort_indices()            # satır içinde komşu etiketler id sırası
+        self.freq = self.cooc.diagonal().astype(np.int64)
+        self.watermark = watermark
+        self.built_at = built_at
+
+    @classmethod
+    def from_pairs(cls, post_col, tag_col, tag_ids: np.ndarray, tag_names: list[str],
+                   watermark: int, built_at: float) -> "_Base":
+        from scipy import sparse                          # ağır import: sadece kurulumda (startup'a binmez)
+
+        post_col = np.asarray(post_col, dtype=np.int64)   # array("q") kopyalanmadan
+        tag_col = np.asarray(tag_col, dtype=np.int64)
+        cols = np.searchsorted(tag_ids, tag_col)
+        ok = cols < len(tag_ids)
+        ok[ok] = tag_ids[cols[ok]] == tag_col[ok]
+        post_ids, rows = np.unique(post_col[ok], return_inverse=True)
+        by_post = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols[ok])),
+            shape=(len(post_ids), len(tag_ids)),
+        )
+        by_post.sum_duplicates()
+        by_post.data[:] = 1
+        return cls(tag_ids, tag_names, post_ids, by_post, watermark, built_at)
+
+    def tag_col(self, hid: int) -> Optional[int]:
+        i = int(np.searchsorted(self.tag_ids, hid))
+        return i if i < len(self.tag_ids) and self.tag_ids[i] == hid else None
+
+    def post_tags(self, post_id: int) -> Optional[tuple[int, ...]]:
+        i = int(np.searchsorted(self.post_ids, post_id))
+        if i >= len(self.post_ids) or self.post_ids[i] != post_id:
+            return None
+        ptr = self.by_post.indptr
+        return tuple(self.tag_ids[self.by_post.indices[ptr[i]:ptr[i + 1]]].tolist())
+
+
+# ---------- kurulum / snapshot ----------
+def _build_from_db(db: Session) -> _Base:
+    # max id, çiftler ve etiket adları aynı snapshot'tan okunsun
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    try:
+        watermark = int(db.query(func.coalesce(func.max(PostHashtags.id), 0)).scalar())
+        posts, tags = array("q"), array("q")
+        result = db.execute(
+            select(PostHashtags.post_id, PostHashtags.hashtag_id)
+            .join(Posts, Posts.id == PostHashtags.post_id)
+            .where(Posts.status == "published", PostHashtags.id <= watermark)
+            .execution_options(yield_per=_FETCH_ROWS)
+        )
+        for part in result.partitions():
+            posts.extend(r[0] for r in part)
+            tags.extend(r[1] for r in part)
+        tag_rows = db.execute(select(Hashtags.id, Hashtags.tag).order_by(Hashtags.id)).all()
+    finally:
+        db.rollback()
+
+    tag_ids = np.fromiter((r[0] for r in tag_rows), dtype=np.int64, count=len(tag_rows))
+    return _Base.from_pairs(posts, tags, tag_ids, [r[1] for r in tag_rows], watermark, time.time())
+
+
+def save_snapshot(base: _Base, path: str) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                version=SNAPSHOT_VERSION,
+                tag_ids=base.tag_ids,
+                tag_names=np.array(base.tag_names, dtype=str),
+                post_ids=base.post_ids,
+                indptr=base.by_post.indptr,
+                indices=base.by_post.indices,
+                watermark=base.watermark,
+                built_at=base.built_at,
+            )
+        os.replace(tmp, path)   # okuyan diğer worker'lar yarım dosya görmez
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def load_snapshot(path: str) -> _Base:
+    from scipy import sparse
+
+    with np.load(path, allow_pickle=False) as z:
+        if int(z["version"]) != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot sürümü uyumsuz: {int(z['version'])}")
+        tag_ids = z["tag_ids"]
+        post_ids = z["post_ids"]
+        indices = z["indices"]
+        by_post = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, z["indptr"]),
+            shape=(len(post_ids), len(tag_ids)),
+        )
+        return _Base(tag_ids, z["tag_names"].tolist(), post_ids, by_post,
+                     int(z["watermark"]), float(z["built_at"]))
+
+
+def _merge_sorted(ids: np.ndarray, vals: np.ndarray, delta: dict[int, int],
+                  insert: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Sıralı (ids, vals) üstüne küçük bir {id: fark} sözlüğü ekler; sıra korunur."""
+    if not delta:
+        return ids, vals
+    keys = np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))
+    dv = np.fromiter(delta.values(), dtype=np.int64, count=len(delta))
+    pos = np.searchsorted(ids, keys)
+    hit = pos < len(ids)
+    hit[hit] = ids[pos[hit]] == keys[hit]
+    vals = vals.astype(np.int64, copy=True)
+    np.add.at(vals, pos[hit], dv[hit])
+    if insert and not hit.all():
+        ids = np.concatenate([ids, keys[~hit]])
+        vals = np.concatenate([vals, dv[~hit]])
+        order = np.argsort(ids, kind="stable")
+        ids, vals = ids[order], vals[order]
+    return ids, vals
+
+
+# ---------- indeks ----------
+class HashtagGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base: Optional[_Base] = None
+        self._source = ""
+        self._log: Optional[list] = None     # refresh sürerken gelen olaylar (sonra tekrar uygulanır)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refresh_errors = 0
+        self._reset_delta()
+
+    def _reset_delta(self) -> None:
+        self._added: dict[int, tuple[int, ...]] = {}
+        self._removed: set[int] = set()
+        self._extra_tags: dict[int, str] = {}        # base'den sonra oluşan etiketler
+        self._extra_by_name: dict[str, int] = {}
+        self._pair_delta: dict[int, dict[int, int]] = {}
+        self._freq_delta: dict[int, int] = {}
+
+    def is_ready(self) -> bool:
+        return self._base is not None
+
+    # ---------- yükleme ----------
+    def _install(self, base: _Base, source: str) -> None:
+        with self._lock:
+            events, self._log = self._log or [], None
+            self._base = base
+            self._source = source
+            self._reset_delta()
+            # idempotent: yeni base olayı zaten içeriyorsa etkisiz
+            for kind, post_id, tags in events:
+                if kind == "add":
+                    self._apply_add(post_id, tags)
+                else:
+                    self._apply_remove(post_id)
+
+    def refresh(self) -> None:
+        """Base'i DB'den yeniden kurar, snapshot'ı günceller."""
+        with self._lock:
+            self._log = []
+        db = SessionLocal()
+        try:
+            base = _build_from_db(db)
+        except Exception:
+            with self._lock:
+                self._log = None
+            raise
+        finally:
+            db.close()
+        self._install(base, "db")
+        try:
+            save_snapshot(base, snapshot_path())
+        except OSError as e:
+            log.warning("hashtag graph snapshot yazılamadı: %s", e)
+
+    def load_or_build(self) -> None:
+        path = snapshot_path()
+        max_age = settings.HASHTAG_GRAPH_REFRESH_SECONDS
+        base = None
+        try:
+            if max_age > 0 and time.time() - os.path.getmtime(path) < max_age:
+                base = load_snapshot(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("hashtag graph snapshot okunamadı, DB'den kurulacak: %s", e)
+        if base is None:
+            self.refresh()
+            return
+        self._install(base, "snapshot")
+        db = SessionLocal()
+        try:
+            self.catch_up(db, base.watermark)
+        finally:
+            db.close()
+
+    def catch_up(self, db: Session, after_id: int) -> None:
+        """Snapshot'tan sonra eklenen published post'lar (post_hashtags PK ile)."""
+        by_post: dict[int, list[tuple[int, str]]] = {}
+        for post_id, hid, tag in (
+            db.query(PostHashtags.post_id, PostHashtags.hashtag_id, Hashtags.tag)
+            .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+            .join(Posts, Posts.id == PostHashtags.post_id)
+            .filter(PostHashtags.id > after_id, Posts.status == "published")
+        ):
+            by_post.setdefault(post_id, []).append((hid, tag))
+        for post_id, tags in by_post.items():
+            self.add_post(post_id, tags)
+
+    # ---------- artımlı güncelleme (commit'ten sonra çağrılır) ----------
+    def add_post(self, post_id: int, tags: Iterable[tuple[int, str]]) -> None:
+        tags = list(tags)
+        with self._lock:
+            if self._log is not None:
+                self._log.append(("add", post_id, tags))
+            self._apply_add(post_id, tags)
+
+    def remove_post(self, post_id: int) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.append(("remove", post_id, None))
+            self._apply_remove(post_id)
+
+    def _base_tags(self, post_id: int) -> Optional[tuple[int, ...]]:
+        return self._base.post_tags(post_id) if self._base is not None else None
+
+    def _tags_of(self, post_id: int) -> Optional[tuple[int, ...]]:
+        if post_id in self._added:
+            return self._added[post_id]
+        if post_id in self._removed:
+            return None
+        return self._base_tags(post_id)
+
+    def _bump(self, hids: tuple[int, ...], sign: int) -> None:
+        for a in hids:
+            self._freq_delta[a] = self._freq_delta.get(a, 0) + sign
+            row = self._pair_delta.setdefault(a, {})
+            for b in hids:
+                row[b] = row.get(b, 0) + sign
+
+    def _apply_add(self, post_id: int, tags: list[tuple[int, str]]) -> None:
+        for hid, name in tags:
+            if self._base is None or self._base.tag_col(hid) is None:
+                self._extra_tags[hid] = name
+                self._extra_by_name[name] = hid
+        if self._tags_of(post_id) is not None:
+            return
+        if post_id in self._removed:
+            # base'de vardı, geri geldi (etiketler değişmez)
+            self._removed.discard(post_id)
+            self._bump(self._base_tags(post_id) or (), +1)
+            return
+        hids = tuple(sorted({hid for hid, _name in tags}))
+        if hids:
+            self._added[post_id] = hids
+            self._bump(hids, +1)
+
+    def _apply_remove(self, post_id: int) -> None:
+        if post_id in self._added:
+            self._bump(self._added.pop(post_id), -1)
+            return
+        hids = self._tags_of(post_id)
+        if hids is not None:
+            self._removed.add(post_id)
+            self._bump(hids, -1)
+
+    # ---------- sorgular ----------
+    def _tag_id(self, name: str) -> Optional[int]:
+        if self._base is not None and name in self._base.tag_by_name:
+            return self._base.tag_by_name[name]
+        return self._extra_by_name.get(name)
+
+    def _tag_name(self, hid: int) -> str:
+        col = self._base.tag_col(hid) if self._base is not None else None
+        return self._base.tag_names[col] if col is not None else self._extra_tags.get(hid, "")
+
+    def _freq(self, hid: int) -> int:
+        col = self._base.tag_col(hid) if self._base is not None else None
+        f = int(self._base.freq[col]) if col is not None else 0
+        return f + self._freq_delta.get(hid, 0)
+
+    def _freqs(self, ids: np.ndarray) -> np.ndarray:
+        """Sıralı etiket id'leri için güncel post sayıları."""
+        f = np.zeros(len(ids), dtype=np.int64)
+        base = self._base
+        if base is not None and len(base.tag_ids):
+            cols = np.minimum(np.searchsorted(base.tag_ids, ids), len(base.tag_ids) - 1)
+            hit = base.tag_ids[cols] == ids
+            f[hit] = base.freq[cols[hit]]
+        _ids, f = _merge_sorted(ids, f, self._freq_delta, insert=False)
+        return f
+
+    def _post_count(self) -> int:
+        n = len(self._base.post_ids) if self._base is not None else 0
+        return n - len(self._removed) + len(self._added)
+
+    def related_tags(self, name: str, limit: int = 10, min_count: int = 1) -> list[RelatedTag]:
+        with self._lock:
+            hid = self._tag_id(name)
+            if hid is None:
+                return []
+            base = self._base
+            col = base.tag_col(hid) if base is not None else None
+            if col is not None:
+                s, e = base.cooc.indptr[col], base.cooc.indptr[col + 1]
+                ids = base.tag_ids[base.cooc.indices[s:e]]
+                counts = base.cooc.data[s:e].astype(np.int64)
+                freqs = base.freq[base.cooc.indices[s:e]]
+            else:
+                ids = counts = freqs = np.empty(0, dtype=np.int64)
+
+            if self._pair_delta:
+                # son yenilemeden beri değişiklik var: küçük delta vektörel olarak eklenir
+                ids, counts = _merge_sorted(ids, counts, self._pair_delta.get(hid, {}))
+                freqs = self._freqs(ids)
+
+            keep = (ids != hid) & (counts >= max(1, min_count))
+            ids, counts, freqs = ids[keep], counts[keep], freqs[keep]
+            if not len(ids):
+                return []
+            f_self = max(1, self._freq(hid))
+            scores = counts / np.sqrt(f_self * np.maximum(freqs, 1))
+            order = np.lexsort((ids, -counts, -scores))[:limit]
+            return [
+                RelatedTag(tag=self._tag_name(int(ids[i])), count=int(counts[i]), score=round(float(scores[i]), 4))
+                for i in order
+            ]
+
+    def similar_posts(self, post_id: int, limit: int = 20) -> list[tuple[int, float]]:
+        """Ortak etiketlerin idf toplamına göre (post_id, skor); eşitlikte yeni post önce."""
+        with self._lock:
+            hids = self._tags_of(post_id)
+            if not hids:
+                return []
+            n = max(1, self._post_count())
+            weights = {h: math.log1p(n / max(1, self._freq(h))) for h in hids}
+
+            base = self._base
+            id_parts, w_parts = [], []
+            if base is not None:
+                for h, w in weights.items():
+                    col = base.tag_col(h)
+                    if col is None:
+                        continue
+                    s, e = base.by_tag.indptr[col], base.by_tag.indptr[col + 1]
+                    rows = base.by_tag.indices[max(s, e - CANDIDATES_PER_TAG):e]
+                    id_parts.append(base.post_ids[rows])
+                    w_parts.append(np.full(len(rows), w))
+            if id_parts:
+                ids, inv = np.unique(np.concatenate(id_parts), return_inverse=True)
+                scores = np.bincount(inv, weights=np.concatenate(w_parts))
+            else:
+                ids, scores = np.empty(0, dtype=np.int64), np.empty(0)
+
+            drop = ids == post_id
+            if self._removed:
+                drop |= np.isin(ids, np.fromiter(self._removed, dtype=np.int64))
+            ids, scores = ids[~drop], scores[~drop]
+
+            extra = [
+                (q, sum(weights.get(h, 0.0) for h in qh))
+                for q, qh in self._added.items() if q != post_id
+            ]
+            extra = [(q, s) for q, s in extra if s > 0]
+            if extra:
+                ids = np.concatenate([ids, np.array([q for q, _ in extra], dtype=np.int64)])
+                scores = np.concatenate([scores, np.array([s for _, s in extra])])
+
+            order = np.lexsort((-ids, -scores))[:limit]
+            return [(int(ids[i]), round(float(scores[i]), 4)) for i in order]
+
+    # ---------- arka plan yenileme ----------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hashtag-graph", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                if self._base is None:
+                    self.load_or_build()
+                else:
+                    self.refresh()
+                delay = 1.0
+                wait = settings.HASHTAG_GRAPH_REFRESH_SECONDS
+                if wait <= 0:
+                    return   # sadece artımlı güncelleme
+            except Exception as e:
+                self.refresh_errors += 1
+                log.warning("hashtag graph build failed: %s", e)
+                wait = delay
+                delay = min(delay * 2, 60.0)
+            self._stop.wait(wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            base = self._base
+            return {
+                "ready": base is not None,
+                "source": self._source or None,
+                "posts": self._post_count(),
+                "tags": (len(base.tag_ids) if base is not None else 0) + len(self._extra_tags),
+                "tag_pairs": int(base.cooc.nnz) if base is not None else 0,
+                "pending_changes": len(self._added) + len(self._removed),
+                "age_seconds": round(time.time() - base.built_at, 1) if base is not None else None,
+                "refresh_errors": self.refresh_errors,
+            }
+
+
+hashtag_graph = HashtagGraph()
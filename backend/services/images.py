@@ -0,0 +1,154 @@
+# services/images.py
+from __future__ import annotations
+
+import asyncio
+import io
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.config import settings
+from services.phash import dhash
+
+
+class InvalidImage(ValueError):
+    """Decode edilemeyen / izin verilmeyen / decompression bomb resim."""
+
+
+@dataclass
+class NormalizedImage:
+    data: bytes
+    content_type: str
+    width: int
+    height: int
+    original_bytes: int
+    phash: int          # 64-bit dHash (işaretsiz)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+# Pillow format adı -> (content_type, save parametreleri)
+_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+
+def _save_kwargs(fmt: str) -> dict:
+    if fmt == "JPEG":
+        return {"quality": settings.IMAGE_JPEG_QUALITY, "optimize": True, "progressive": True}
+    if fmt == "WEBP":
+        return {"quality": settings.IMAGE_WEBP_QUALITY, "method": 4}
+    return {"optimize": True}
+
+
+# metadata taşıyan info anahtarları (EXIF/GPS, ICC, XMP, yorum)
+_METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment")
+# JPEG'de zararsız APP segmentleri: JFIF (APP0) ve Adobe renk dönüşümü (APP14)
+_PLAIN_JPEG_MARKERS = ("APP0", "APP14")
+
+
+def _has_metadata(img: Image.Image) -> bool:
+    if any(k in img.info for k in _METADATA_KEYS):
+        return True
+    if any(marker not in _PLAIN_JPEG_MARKERS for marker, _ in getattr(img, "applist", ())):
+        return True
+    return bool(getattr(img, "text", None))   # PNG tEXt/zTXt/iTXt chunk'ları
+
+
+def normalize_image_bytes(data: bytes) -> NormalizedImage:
+    """
+    (Process pool içinde çalışır; saf CPU.)
+    1) Tamamen decode ederek doğrular; piksel limiti aşan resimler (decompression bomb)
+       ve animasyonlu resimler (APNG / animasyonlu WebP) reddedilir
+    2) EXIF orientation uygulanır, tüm metadata (EXIF/GPS/ICC dışı chunk'lar) atılır
+    3) Uzun kenar IMAGE_MAX_EDGE'i aşıyorsa küçültülür
+    4) Ayarlı kalite ile yeniden encode edilir; küçültme / metadata atma / mod
+       dönüşümü gerekmediyse ve sonuç büyüdüyse orijinal byte'lar saklanır
+    5) Near-duplicate tespiti için dHash hesaplanır
+    """
+    Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+    try:
+        with warnings.catch_warnings():
+            # limit ile 2x limit arası Pillow sadece uyarır; onu da hata say
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+            with Image.open(io.BytesIO(data)) as probe:
+                probe.verify()  # yapısal kontrol (truncated/bozuk dosya)
+
+            img = Image.open(io.BytesIO(data))
+            fmt = img.format
+            if fmt not in _FORMATS:
+                raise InvalidImage("Sadece jpg/png/webp kabul edilir")
+            if getattr(img, "is_animated", False):
+                # yeniden encode sadece ilk kareyi yazar; sessizce kare atmak yerine reddet
+                raise InvalidImage("Animasyonlu resim kabul edilmez")
+            img.load()  # gerçek decode
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise InvalidImage("Resim çözünürlüğü çok büyük")
+    except InvalidImage:
+        raise
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as e:
+        raise InvalidImage("Resim okunamadı veya bozuk") from e
+
+    # orijinal dosya sadece hiçbir şeyin atılması / değişmesi gerekmiyorsa saklanabilir
+    changed = _has_metadata(img)   # EXIF varsa orientation da onunla birlikte gider
+
+    img = ImageOps.exif_transpose(img)
+
+    max_edge = settings.IMAGE_MAX_EDGE
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        changed = True
+
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+        changed = True
+    elif fmt in ("PNG", "WEBP") and img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+        img = img.convert("RGBA")
+        changed = True
+
+    out = io.BytesIO()
+    # exif/icc/pnginfo parametresi verilmediği için metadata yazılmaz
+    img.save(out, format=fmt, **_save_kwargs(fmt))
+    encoded = out.getvalue()
+    if not changed and len(encoded) >= len(data):
+        # zaten sıkı encode edilmiş temiz dosya: yeniden encode sadece büyütür (ve kalite kaybettirir)
+        encoded = data
+
+    return NormalizedImage(
+        data=encoded,
+        content_type=_FORMATS[fmt],
+        width=img.width,
+        height=img.height,
+        original_bytes=len(data),
+        phash=dhash(img),
+    )
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _pool
+
+
+async def normalize_images(images: list[bytes]) -> list[NormalizedImage]:
+    """Post'taki resimleri process pool'da paralel normalize eder (sıra korunur)."""
+    if not images:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    return await asyncio.gather(
+        *[loop.run_in_executor(pool, normalize_image_bytes, b) for b in images]
+    )
@@ -0,0 +1,351 @@
+# services/partitions.py
+"""
+Aylık range partition bakımı: likes, comments, ai_requests.
+
+  likes / comments   anahtar: post_created_at (beğenilen/yorumlanan post'un created_at'i)
+  ai_requests        anahtar: created_at
+
+likes/comments'te anahtar satırın kendi zamanı değil post'un zamanıdır: bir post'un
+bütün beğeni/yorumları aynı partition'dadır, post_id ile yapılan sorgular
+post_created_at verildiğinde tek partition'a iner ve post_id -> post_created_at
+fonksiyonel bağımlı olduğu için uq_user_post_like (user_id, post_id,
+post_created_at) "kullanıcı başına post'ta tek beğeni" kuralını aynen korur.
+
+Her tabloda:
+  <tablo>_pYYYYMM   [ay başı, sonraki ay başı) UTC
+  <tablo>_default   partition'ı henüz olmayan aralık için emniyet; bakım buraya
+                    düşen satırları kendi aylık partition'ına taşır
+
+maintain():
+  - bu ay + PARTITION_MONTHS_AHEAD ay için eksik partition'ları oluşturur
+  - PARTITION_RETENTION_MONTHS[tablo] > 0 ise daha eski partition'ları DETACH
+    edip PARTITION_ARCHIVE_SCHEMA şemasına taşır (silmez; dump/drop operatörde).
+    Sadece ai_requests: likes/comments'in eski ayları eski ama hâlâ yayında olan
+    post'ların verisidir (config bunu yüklenirken reddeder)
+  - replikalar arası advisory lock ile tek seferde bir process çalıştırır
+
+Startup'ta (ısınma adımı) ve arka planda PARTITION_MAINTENANCE_SECONDS'ta bir
+çalışır; elle / cron:
+
+  python -m services.partitions maintain
+  python -m services.partitions status
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+
+from core.config import settings
+from core.database import engine
+from models.models import Posts
+
+log = logging.getLogger("partitions")
+
+ADVISORY_LOCK_KEY = 0x70617274     # "part"
+LOCK_TIMEOUT = "5s"                 # parent'ta uzun kilit beklenmez, sonraki turda denenir
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    name: str
+    key: str
+    # anahtarı fonksiyonel olarak belirleyen kolon: planner post_id ve post_created_at
+    # eşitliklerini bağımsız sayıp satır sayısını ~100 kat düşük tahmin eder (sıralı
+    # index scan yerine bitmap + Sort seçer). Extended statistics partition'lara
+    # miras geçmediği için her partition'da ayrıca oluşturulur.
+    determined_by: Optional[str] = None
+    # eski aylar arşive taşınabilir mi: anahtar satırın kendi zamanıysa evet
+    archivable: bool = False
+
+
+TABLES = (
+    PartitionedTable("likes", "post_created_at", determined_by="post_id"),
+    PartitionedTable("comments", "post_created_at", determined_by="post_id"),
+    PartitionedTable("ai_requests", "created_at", archivable=True),
+)
+
+
+# ---------- sorgu yardımcıları ----------
+def post_created_at(post_id):
+    """
+    post_id'si bilinen ama created_at'i elde olmayan sorgular için: initplan olarak
+    bir kez hesaplanır, likes/comments taraması çalışma anında tek partition'a iner.
+        .filter(Comments.post_id == post_id, Comments.post_created_at == post_created_at(post_id))
+    Sayfalı / sıralı sorgularda anahtarı önce okuyup sabit olarak vermek daha iyidir:
+    parametreye (post_id, post_created_at) dependency istatistiği uygulanmaz.
+    """
+    return select(Posts.created_at).where(Posts.id == post_id).scalar_subquery()
+
+
+# ---------- ay hesapları ----------
+def month_start(dt: datetime) -> datetime:
+    dt = dt.astimezone(timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(m: datetime, n: int) -> datetime:
+    y, mo = divmod(m.month - 1 + n, 12)
+    return datetime(m.year + y, mo + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+_PART_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+# ---------- katalog ----------
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def monthly_partitions(conn: Connection, table: str) -> dict[datetime, str]:
+    rows = conn.execute(
+        text(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = to_regclass(:t)
+            """
+        ),
+        {"t": table},
+    ).scalars()
+    out = {}
+    for name in rows:
+        m = _PART_RE.search(name)
+        if m and name.startswith(table + "_p"):
+            out[datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=timezone.utc)] = name
+    return out
+
+
+def _columns(conn: Connection, table: str) -> list[str]:
+    return list(conn.execute(
+        text(
+            """
+            SELECT attname FROM pg_attribute
+             WHERE attrelid = to_regclass(:t) AND attnum > 0 AND NOT attisdropped
+             ORDER BY attnum
+            """
+        ),
+        {"t": table},
+    ).scalars())
+
+
+# ---------- oluşturma ----------
+def _create_statistics(conn: Connection, t: PartitionedTable, partition: str) -> None:
+    if t.determined_by:
+        conn.exec_driver_sql(
+            f"CREATE STATISTICS IF NOT EXISTS {partition}_dep (dependencies) "
+            f"ON {t.determined_by}, {t.key} FROM {partition}"
+        )
+
+
+def _create_month(t: PartitionedTable, month: datetime) -> str:
+    name = partition_name(t.name, month)
+    lo, hi = month.isoformat(), add_months(month, 1).isoformat()
+    default = f"{t.name}_default"
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        stray = conn.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {t.key} >= :lo AND {t.key} < :hi)"),
+            {"lo": lo, "hi": hi},
+        ).scalar()
+        if not stray:
+            conn.exec_driver_sql(
+                f"CREATE TABLE {name} PARTITION OF {t.name} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+            )
+            _create_statistics(conn, t, name)
+            return name
+        # default'a düşmüş satırlar var: ayrı tabloya taşı, sonra attach et
+        # (ATTACH index/FK'leri parent'tan klonlar ve default'ta çakışan satır kalmadığını doğrular)
+        cols = ", ".join(_columns(conn, t.name))
+        conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {t.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        conn.execute(
+            text(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {default} WHERE {t.key} >= :lo AND {t.key} < :hi RETURNING {cols}
+                )
+                INSERT INTO {name} ({cols}) SELECT {cols} FROM moved
+                """
+            ),
+            {"lo": lo, "hi": hi},
+        )
+        conn.exec_driver_sql(
+            f"ALTER TABLE {t.name} ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        )
+        _create_statistics(conn, t, name)
+        conn.exec_driver_sql(f"ANALYZE {name}")
+    log.info("partition %s created from %s stray rows", name, default)
+    return name
+
+
+def ensure(t: PartitionedTable, months_ahead: int, now: Optional[datetime] = None) -> list[str]:
+    """Eksik aylık partition'ları (ve default'u) oluşturur; oluşturulan adlar."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn, t.name):
+            return []
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {t.name}_default PARTITION OF {t.name} DEFAULT")
+        _create_statistics(conn, t, f"{t.name}_default")
+        stray = conn.execute(
+            text(
+                f"SELECT DISTINCT date_trunc('month', {t.key} AT TIME ZONE 'UTC') "
+                f"FROM {t.name}_default"
+            )
+        ).scalars().all()
+        existing = monthly_partitions(conn, t.name)
+        for name in existing.values():
+            _create_statistics(conn, t, name)      # IF NOT EXISTS; ANALYZE autovacuum'da dolar
+
+    current = month_start(now or datetime.now(timezone.utc))
+    wanted = {add_months(current, i) for i in range(months_ahead + 1)}
+    wanted.update(m.replace(tzinfo=timezone.utc) for m in stray)
+    return [_create_month(t, m) for m in sorted(wanted - set(existing))]
+
+
+# ---------- arşiv ----------
+def archive(t: PartitionedTable, keep_months: int, schema: str,
+            now: Optional[datetime] = None) -> list[str]:
+    """keep_months'tan eski aylık partition'ları detach edip arşiv şemasına taşır."""
+    if keep_months <= 0:
+        return []
+    if not t.archivable:
+        raise ValueError(f"{t.name} arşivlenemez: partition anahtarı {t.key}")
+    with engine.connect() as conn:
+        if not is_partitioned(conn, t.name):
+            return []
+        months = sorted(monthly_partitions(conn, t.name).items())
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -keep_months)
+    done = []
+    for month, name in months:
+        if month >= cutoff:
+            break
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            conn.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            conn.exec_driver_sql(f"ALTER TABLE {t.name} DETACH PARTITION {name}")
+            conn.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA {schema}")
+        log.info("partition %s archived to schema %s", name, schema)
+        done.append(f"{schema}.{name}")
+    return done
+
+
+def maintain(now: Optional[datetime] = None) -> dict:
+    report: dict = {"created": [], "archived": [], "skipped": False}
+    # session seviyesinde kilit: bu bağlantı açık kaldıkça tutulur, işler ayrı transaction'larda
+    with engine.connect() as lock_conn:
+        got = lock_conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY}).scalar()
+        lock_conn.commit()
+        if not got:
+            report["skipped"] = True     # başka bir replika bakım yapıyor
+            return report
+        try:
+            for t in TABLES:
+                report["created"] += ensure(t, settings.PARTITION_MONTHS_AHEAD, now)
+                keep = int(settings.PARTITION_RETENTION_MONTHS.get(t.name, 0))
+                report["archived"] += archive(t, keep, settings.PARTITION_ARCHIVE_SCHEMA, now)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+            lock_conn.commit()
+    return report
+
+
+def status() -> dict:
+    out = {}
+    with engine.connect() as conn:
+        for t in TABLES:
+            if not is_partitioned(conn, t.name):
+                out[t.name] = {"partitioned": False}
+                continue
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+                      FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                     WHERE i.inhparent = to_regclass(:t)
+                     ORDER BY c.relname
+                    """
+                ),
+                {"t": t.name},
+            ).all()
+            out[t.name] = {
+                "partitioned": True,
+                "key": t.key,
+                "partitions": [
+                    {"name": name, "est_rows": max(int(n), 0), "bytes": int(size)}
+                    for name, n, size in rows
+                ],
+            }
+    return out
+
+
+# ---------- arka plan ----------
+class PartitionMaintainer:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[float] = None
+        self.last_report: dict = {}
+        self.errors = 0
+
+    def run_once(self) -> dict:
+        report = maintain()
+        self.last_run = time.time()
+        self.last_report = report
+        return report
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="partitions", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        # ilk tur ısınma adımında yapıldı
+        while not self._stop.wait(settings.PARTITION_MAINTENANCE_SECONDS):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                log.warning("partition maintenance failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "last_run_age_seconds": round(time.time() - self.last_run, 1) if self.last_run else None,
+            "last_created": self.last_report.get("created", []),
+            "last_archived": self.last_report.get("archived", []),
+            "errors": self.errors,
+        }
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(prog="python -m services.partitions")
+    ap.add_argument("command", choices=("maintain", "status"))
+    args = ap.parse_args()
+    result = maintain() if args.command == "maintain" else status()
+    print(json.dumps(result, indent=2, default=str))
+    sys.exit(0)
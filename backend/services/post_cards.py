@@ -0,0 +1,289 @@
+# services/post_cards.py
+"""
+Post kartı şemaları ve kart üretimi (feed, hashtag, profil, detay, /full).
+
+İki paralel tanım var:
+  - pydantic modeller (PostOut, CommentOut, ...): response_model / OpenAPI için
+  - msgspec Struct'lar (PostCard, CommentCard, ...): gerçek response gövdesi
+
+Struct'lar validate edilmeden, önceden derlenmiş encoder ile doğrudan JSON'a
+yazılır (core/responses.py). İki tanımın alanları import anında karşılaştırılır.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+import msgspec
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import func, select, exists, false
+from sqlalchemy.orm import Session
+
+from models.models import Posts, Likes, Comments, PostImages, Hashtags, PostHashtags
+from services.storage import storage
+
+
+# ---------- response şemaları (dokümantasyon) ----------
+class PostOwner(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    username: str
+
+class PostOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    content: str
+    created_at: datetime
+    owner: PostOwner
+    like_count: int
+    liked_by_me: bool
+    comment_count: int
+    image_urls: list[str] = []
+    hashtags: list[str] = []
+    status: str = "published"   # sahibine pending/review bilgisini iletmek için
+
+class CommentOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    content: str
+    created_at: datetime
+    owner: PostOwner
+    status: str = "published"   # yazan kişiye pending/review bilgisini iletmek için
+
+class PostFullOut(PostOut):
+    comments: list[CommentOut] = []
+    comments_next_cursor: Optional[str] = None
+
+class PostPageOut(BaseModel):
+    items: list[PostOut]
+
+
+# ---------- response gövdeleri (msgspec) ----------
+class OwnerCard(msgspec.Struct):
+    id: int
+    username: str
+
+class PostCard(msgspec.Struct):
+    id: int
+    content: str
+    created_at: datetime
+    owner: OwnerCard
+    like_count: int
+    liked_by_me: bool
+    comment_count: int
+    image_urls: list[str] = []
+    hashtags: list[str] = []
+    status: str = "published"
+
+class CommentCard(msgspec.Struct):
+    id: int
+    content: str
+    created_at: datetime
+    owner: OwnerCard
+    status: str = "published"
+
+class PostFullCard(PostCard):
+    comments: list[CommentCard] = []
+    comments_next_cursor: Optional[str] = None
+
+class PostPage(msgspec.Struct):
+    items: list[PostCard]
+
+
+for _struct, _model in (
+    (OwnerCard, PostOwner),
+    (PostCard, PostOut),
+    (CommentCard, CommentOut),
+    (PostFullCard, PostFullOut),
+    (PostPage, PostPageOut),
+):
+    # iki tanım ayrışırsa dokümantasyon yalan söylemesin diye erken patla
+    assert set(_struct.__struct_fields__) == set(_model.model_fields), _struct.__name__
+
+
+# kart JSON'unun şekli değişirse artırılır (eski ETag'ler geçersiz olsun)
+CARD_SCHEMA_VERSION = 1
+
+
+# ---------- sayaçlar ----------
+def card_counter_columns(viewer_id: Optional[int]):
+    """like_count, comment_count, liked_by_me: Posts.id'ye bağlı correlated subquery'ler"""
+    # post_created_at eşitliği: her satır için sadece post'un ayındaki partition taranır
+    like_count = (
+        select(func.count(Likes.id))
+        .where(Likes.post_id == Posts.id, Likes.post_created_at == Posts.created_at)
+        .scalar_subquery()
+    )
+    comment_count = (
+        select(func.count(Comments.id))
+        .where(Comments.post_id == Posts.id, Comments.post_created_at == Posts.created_at,
+               Comments.status == "published")
+        .scalar_subquery()
+    )
+    if viewer_id is None:
+        liked_by_me = false()
+    else:
+        liked_by_me = exists().where(
+            Likes.post_id == Posts.id, Likes.post_created_at == Posts.created_at, Likes.user_id == viewer_id
+        )
+    return (
+        like_count.label("like_count"),
+        comment_count.label("comment_count"),
+        liked_by_me.label("liked_by_me"),
+    )
+
+
+class PageCounts(NamedTuple):
+    """Sayfadaki post'ların sayaçları; ETag ve kartlar aynı sonuçtan üretilir (iki kez sayılmaz)."""
+    likes: dict[int, int]
+    comments: dict[int, int]
+    liked: set[int]
+
+
+# page_counts / load_cards'ın toplu sorguları; bench/explain_hot_queries aynılarını EXPLAIN eder.
+# post_keys (sayfadaki post'ların created_at'leri) partition anahtarıdır: sayfadaki
+# post'ların ayları dışındaki partition'lar plan'da elenir
+def _like_counts_query(db: Session, post_ids: list[int], post_keys: set):
+    return (
+        db.query(Likes.post_id, func.count(Likes.id))
+        .filter(Likes.post_id.in_(post_ids), Likes.post_created_at.in_(post_keys))
+        .group_by(Likes.post_id)
+    )
+
+
+def _comment_counts_query(db: Session, post_ids: list[int], post_keys: set):
+    return (
+        db.query(Comments.post_id, func.count(Comments.id))
+        .filter(Comments.post_id.in_(post_ids), Comments.post_created_at.in_(post_keys),
+                Comments.status == "published")
+        .group_by(Comments.post_id)
+    )
+
+
+def _liked_query(db: Session, post_ids: list[int], post_keys: set, viewer_id: int):
+    return (
+        db.query(Likes.post_id)
+        .filter(Likes.post_id.in_(post_ids), Likes.post_created_at.in_(post_keys),
+                Likes.user_id == viewer_id)
+    )
+
+
+def _images_query(db: Session, post_ids: list[int]):
+    return (
+        db.query(PostImages.post_id, PostImages.stored_filename)
+        .filter(PostImages.post_id.in_(post_ids))
+        .order_by(PostImages.created_at.asc(), PostImages.id.asc())
+    )
+
+
+def _tags_query(db: Session, post_ids: list[int]):
+    return (
+        db.query(PostHashtags.post_id, Hashtags.tag)
+        .join(Hashtags, Hashtags.id == PostHashtags.hashtag_id)
+        .filter(PostHashtags.post_id.in_(post_ids))
+    )
+
+
+def page_counts(db: Session, rows: list, viewer_id: Optional[int]) -> PageCounts:
+    """(Posts, username) satırları için like/yorum sayıları ve liked_by_me: üç toplu sorgu."""
+    if not rows:
+        return PageCounts({}, {}, set())
+    post_ids = [p.id for (p, _username) in rows]
+    post_keys = {p.created_at for (p, _username) in rows}
+
+    like_counts = dict(_like_counts_query(db, post_ids, post_keys).all())
+    comment_counts = dict(_comment_counts_query(db, post_ids, post_keys).all())
+    liked_post_ids: set[int] = set()
+    if viewer_id is not None:
+        liked_post_ids = {pid for (pid,) in _liked_query(db, post_ids, post_keys, viewer_id).all()}
+    return PageCounts(like_counts, comment_counts, liked_post_ids)
+
+
+def _etag(viewer_id: Optional[int], items: Iterable[tuple]) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"v{CARD_SCHEMA_VERSION}|{viewer_id}|{storage.url_version()}".encode())
+    for pid, status, likes, comments, liked in items:
+        h.update(f"|{pid}:{status}:{likes}:{comments}:{int(bool(liked))}".encode())
+    return f'W/"{h.hexdigest()}"'
+
+
+def page_etag(rows: list, counts: PageCounts, viewer_id: Optional[int]) -> str:
+    """
+    Sayfanın sürüm imzası, kartları hydrate etmeden (resim/hashtag sorguları yok):
+    sayfadaki (id, status) + page_counts sonucu. İçerik/resim/hashtag post
+    oluşturulduktan sonra değişmediği için bunlar yeterli; kullanıcı adı değişmez.
+    Presigned URL'ler için storage'ın URL dönemi de eklenir.
+    """
+    return _etag(viewer_id, (
+        (p.id, p.status, counts.likes.get(p.id, 0), counts.comments.get(p.id, 0), p.id in counts.liked)
+        for (p, _username) in rows
+    ))
+
+
+def cards_etag(cards: Iterable[PostCard], viewer_id: Optional[int]) -> str:
+    """Hazır kartlardan page_etag ile aynı imza (kartları tek statement'ta üreten listeler için)."""
+    return _etag(viewer_id, (
+        (c.id, c.status, c.like_count, c.comment_count, c.liked_by_me) for c in cards
+    ))
+
+
+# ---------- kart üretimi ----------
+def card_from_row(row) -> PostCard:
+    """routers.posts._post_card_query satırı (tek statement) -> PostCard"""
+    post, username, like_count, comment_count, liked, image_files, tags = row
+    return PostCard(
+        id=post.id,
+        content=post.content,
+        created_at=post.created_at,
+        owner=OwnerCard(post.user_id, username),
+        like_count=int(like_count or 0),
+        liked_by_me=bool(liked),
+        comment_count=int(comment_count or 0),
+        image_urls=storage.urls(image_files),
+        hashtags=[f"#{t}" for t in (tags or [])],
+        status=post.status,
+    )
+
+
+def load_cards(db: Session, rows: Iterable, viewer_id: Optional[int],
+               counts: Optional[PageCounts] = None) -> list[PostCard]:
+    """
+    (Posts, username) satırlarından kartlar: sayaçlar, liked_by_me, resimler ve
+    hashtag'ler sayfa başına birer toplu sorgu ile çekilir (N+1 yok). ETag için
+    page_counts zaten çağrıldıysa sonucu `counts` ile verilir, tekrar sayılmaz.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    if counts is None:
+        counts = page_counts(db, rows, viewer_id)
+
+    post_ids = [p.id for (p, _username) in rows]
+
+    images_map: dict[int, list[str]] = {}
+    for pid, fname in _images_query(db, post_ids).all():
+        images_map.setdefault(pid, []).append(storage.url(fname))
+
+    tags_map: dict[int, list[str]] = {}
+    for pid, tag in _tags_query(db, post_ids).all():
+        tags_map.setdefault(pid, []).append(f"#{tag}")
+
+    return [
+        PostCard(
+            id=p.id,
+            content=p.content,
+            created_at=p.created_at,
+            owner=OwnerCard(p.user_id, username),
+            like_count=int(counts.likes.get(p.id, 0)),
+            liked_by_me=p.id in counts.liked,
+            comment_count=int(counts.comments.get(p.id, 0)),
+            image_urls=images_map.get(p.id, []),
+            hashtags=tags_map.get(p.id, []),
+            status=p.status,
+        )
+        for (p, username) in rows
+    ]
@@ -0,0 +1,281 @@
+# services/realtime.py
+"""
+Canlı beğeni / yorum sayaçları.
+
+Yayın (publish): toggle_like, create_comment ve moderasyon worker'ı sayaç
+değiştikten sonra `publish_counts` çağırır. Güncel sayaçlar DB'de hesaplanır
+ve `pg_notify('post_counts', ...)` ile yayınlanır; NOTIFY transaction commit
+olunca gider, rollback olursa hiç gitmez.
+
+Dağıtım (fan-out): her API process'inde tek bir dinleyici thread'i ayrı bir
+psycopg2 bağlantısıyla LISTEN eder ve gelen olayları event loop'a aktarır.
+Böylece hangi worker yazarsa yazsın, tüm worker'lardaki bağlantılar olayı alır.
+
+Bağlantı başına birleştirme: bir abonenin izlediği post'lar için gelen olaylar
+post başına son değer olarak biriktirilir; sakin bağlantıda olay hemen, fırtınada
+REALTIME_COALESCE_MS'te en fazla bir mesaj olarak gönderilir (mesaj boyu izlenen
+post sayısıyla sınırlı).
+
+Sadece yayınlanmış post'ların sayaçları yayınlanır ve anlık olarak döner.
+
+Mesajlar mutlak sayaç taşır (delta değil): kaçan/birleşen olaylar sayacı
+kaydırmaz, son mesaj her zaman doğru değeri verir.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+from typing import Iterable, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import engine
+from models.models import Likes, Comments, Posts
+
+log = logging.getLogger("realtime")
+
+CHANNEL = "post_counts"
+
+# sayaçlar + NOTIFY tek statement; commit'ten sonra yeni transaction'da çalıştırılır.
+# post_created_at initplan'dan gelir: likes/comments'te tek partition taranır.
+# Sayaçlar herkese açık sadece yayınlanmış post'lar için: başka durumdaki (pending,
+# blocked, deleted...) post için NOTIFY atılmaz (CASE pg_notify'ı hiç çağırmaz)
+_PUBLISH_SQL = text(
+    """
+    WITH p AS (SELECT created_at, status = 'published' AS visible FROM posts WHERE id = :post_id),
+    c AS (
+        SELECT
+            (SELECT count(*) FROM likes
+              WHERE post_id = :post_id AND post_created_at = (SELECT created_at FROM p)) AS like_count,
+            (SELECT count(*) FROM comments
+              WHERE post_id = :post_id AND post_created_at = (SELECT created_at FROM p)
+                AND status = 'published') AS comment_count
+    )
+    SELECT c.like_count, c.comment_count,
+           CASE WHEN (SELECT visible FROM p) THEN pg_notify(:channel, json_build_object(
+               'post_id', CAST(:post_id AS bigint),
+               'like_count', c.like_count,
+               'comment_count', c.comment_count
+           )::text) END
+    FROM c
+    """
+)
+
+
+def publish_counts(db: Session, post_id: int) -> tuple[int, int]:
+    """
+    Post'un güncel (like_count, comment_count) değerini yayınlar ve döner.
+    Olay çağıranın commit'i ile gider; commit'i çağıran yapar.
+    """
+    like_count, comment_count, _ = db.execute(
+        _PUBLISH_SQL, {"post_id": post_id, "channel": CHANNEL}
+    ).one()
+    return int(like_count), int(comment_count)
+
+
+def current_counts(db: Session, post_ids: Iterable[int]) -> dict[int, dict]:
+    """
+    Yeni izlenmeye başlanan post'lar için anlık sayaçlar (aradaki olaylar kaçmasın).
+    Sadece yayınlanmış post'lar döner; diğer id'ler sessizce atlanır.
+    """
+    ids = list(post_ids)
+    if not ids:
+        return {}
+    # partition anahtarları (post'ların created_at'i): sayımlar sadece ilgili aylara iner
+    visible = dict(
+        db.query(Posts.id, Posts.created_at)
+        .filter(Posts.id.in_(ids), Posts.status == "published")
+        .all()
+    )
+    if not visible:
+        return {}
+    ids = [pid for pid in ids if pid in visible]
+    keys = set(visible.values())
+    likes = dict(
+        db.query(Likes.post_id, func.count(Likes.id))
+        .filter(Likes.post_id.in_(ids), Likes.post_created_at.in_(keys))
+        .group_by(Likes.post_id)
+        .all()
+    )
+    comments = dict(
+        db.query(Comments.post_id, func.count(Comments.id))
+        .filter(Comments.post_id.in_(ids), Comments.post_created_at.in_(keys), Comments.status == "published")
+        .group_by(Comments.post_id)
+        .all()
+    )
+    return {
+        pid: {"post_id": pid, "like_count": int(likes.get(pid, 0)), "comment_count": int(comments.get(pid, 0))}
+        for pid in ids
+    }
+
+
+# ---------- abone (bağlantı başına) ----------
+class Subscriber:
+    def __init__(self, hub: "RealtimeHub"):
+        self._hub = hub
+        self.post_ids: frozenset[int] = frozenset()
+        self._pending: dict[int, dict] = {}
+        self._resync = False
+        self._wakeup = asyncio.Event()
+        self._last_flush = 0.0
+
+    def watch(self, post_ids: Iterable[int]) -> set[int]:
+        """İzlenen kümeyi değiştirir; yeni eklenen id'leri döner."""
+        new = frozenset(post_ids)
+        added = set(new - self.post_ids)
+        self._hub._rewatch(self, self.post_ids, new)
+        self.post_ids = new
+        for pid in list(self._pending):
+            if pid not in new:
+                del self._pending[pid]
+        return added
+
+    def push(self, counts: dict) -> None:
+        self._pending[counts["post_id"]] = counts
+        self._wakeup.set()
+
+    def push_resync(self) -> None:
+        self._resync = True
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> tuple[list[dict], bool]:
+        """
+        Bekleyen olayları (sayaçlar, resync) döner; yoksa ilk olayı bekler, timeout
+        dolarsa ([], False). Olay bekliyorsa hemen gönderilir; sadece bir önceki
+        gönderimden bu yana birleştirme penceresi dolmadıysa kalan süre kadar
+        beklenir (fırtınada bağlantı başına pencerede en fazla bir mesaj).
+        """
+        if not (self._pending or self._resync):
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return [], False
+        loop = asyncio.get_running_loop()
+        wait = self._last_flush + settings.REALTIME_COALESCE_MS / 1000 - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_flush = loop.time()
+        self._wakeup.clear()
+        items, self._pending = list(self._pending.values()), {}
+        resync, self._resync = self._resync, False
+        return items, resync
+
+
+# ---------- hub (process başına) ----------
+class RealtimeHub:
+    def __init__(self):
+        self._by_post: dict[int, set[Subscriber]] = {}
+        self._subscribers: set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listening = False
+
+    # --- abonelik (sadece event loop thread'inden çağrılır) ---
+    def connect(self) -> Optional[Subscriber]:
+        if len(self._subscribers) >= settings.REALTIME_MAX_CONNECTIONS:
+            return None
+        sub = Subscriber(self)
+        self._subscribers.add(sub)
+        return sub
+
+    def disconnect(self, sub: Subscriber) -> None:
+        self._rewatch(sub, sub.post_ids, frozenset())
+        self._subscribers.discard(sub)
+
+    def _rewatch(self, sub: Subscriber, old: frozenset[int], new: frozenset[int]) -> None:
+        for pid in old - new:
+            subs = self._by_post.get(pid)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_post[pid]
+        for pid in new - old:
+            self._by_post.setdefault(pid, set()).add(sub)
+
+    def _dispatch(self, events: list[dict]) -> None:
+        for counts in events:
+            for sub in self._by_post.get(counts["post_id"], ()):
+                sub.push(counts)
+
+    def _dispatch_resync(self) -> None:
+        # dinleyici koptu ve geri geldi: aradaki olaylar kaçmış olabilir
+        for sub in self._subscribers:
+            sub.push_resync()
+
+    # --- dinleyici thread'i ---
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="realtime-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def is_listening(self) -> bool:
+        return self._listening
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._listening,
+            "connections": len(self._subscribers),
+            "watched_posts": len(self._by_post),
+        }
+
+    def _run(self) -> None:
+        delay = 1.0
+        first = True
+        while not self._stop.is_set():
+            try:
+                self._listen(resync=not first)
+                delay = 1.0
+            except Exception as e:
+                log.warning("realtime listener error: %s", e)
+            finally:
+                self._listening = False
+            first = False
+            self._stop.wait(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _listen(self, *, resync: bool) -> None:
+        # havuzdan ayrılmış, bu thread'e özel bağlantı (LISTEN oturum boyunca sürer)
+        fairy = engine.raw_connection()
+        fairy.detach()
+        conn = fairy.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            self._listening = True
+            if resync:
+                self._loop.call_soon_threadsafe(self._dispatch_resync)
+
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                events = []
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        events.append(json.loads(note.payload))
+                    except ValueError:
+                        log.warning("realtime: bozuk payload %r", note.payload[:200])
+                if events:
+                    self._loop.call_soon_threadsafe(self._dispatch, events)
+        finally:
+            conn.close()
+
+
+realtime_hub = RealtimeHub()
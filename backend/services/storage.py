@@ -0,0 +1,345 @@
+# services/storage.py
+"""
+Medya depolama soyutlaması.
+
+Router'lar dosya sistemine doğrudan dokunmaz; `storage` üzerinden
+put / get / delete yapar, URL'leri de sürücü üretir:
+
+  - LocalStorage: MEDIA_ROOT dizini, /media altından servis edilir (dev, tek replika)
+  - S3Storage:    S3 uyumlu bucket (AWS, MinIO ...); multipart upload + bağlantı havuzu
+
+Böylece API pod'ları paylaşılan diske bağlı kalmadan yatay ölçeklenebilir,
+resimlerin önüne CDN konabilir (MEDIA_PUBLIC_BASE_URL).
+
+Mevcut yerel medyayı bucket'a taşımak için:
+
+  STORAGE_BACKEND=s3 S3_BUCKET=... python -m services.storage upload-local
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from core.config import settings
+
+# Yüklenen içerik anahtarları uuid içerir, hiç değişmez -> uzun süre cache'lenebilir
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_EXT_MAP = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
+
+
+class StorageError(Exception):
+    pass
+
+
+def new_media_key(content_type: str, prefix: str = "uploads") -> str:
+    """Örn: uploads/2025/12/<uuid>.jpg (her iki sürücüde de aynı anahtar şeması)"""
+    now = datetime.now()
+    ext = _EXT_MAP.get(content_type, ".bin")
+    return f"{prefix}/{now:%Y}/{now:%m}/{uuid4().hex}{ext}"
+
+
+class StorageBackend(ABC):
+    """
+    Sürücü arayüzü. Anahtarlar her zaman '/' ayraçlı relatif yollardır.
+    Soyut metotları eksik bir sürücü örneklenirken hata verir (ilk çağrıda değil).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        ...
+
+    def put_fileobj(self, key: str, fileobj, content_type: str) -> None:
+        self.put(key, fileobj.read(), content_type)
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    def iter_chunks(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Nesneyi belleğe tamamen almadan parça parça okur (export vb.)."""
+        yield self.get(key)
+
+    def delete(self, key: str) -> None:
+        self.delete_many([key])
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    def urls(self, keys: Iterable[str] | None) -> list[str]:
+        return [self.url(k) for k in (keys or [])]
+
+    def url_version(self) -> str:
+        """URL'ler zamanla değişiyorsa (presigned) değişen bir dönem; ETag'lere eklenir."""
+        return ""
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str, public_base_url: str = ""):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._real_root = os.path.realpath(self.root)
+        self.public_base_url = (public_base_url or "/media").rstrip("/")
+
+    def _path(self, key: str) -> str:
+        # pathlib her parçayı sys.intern'ler; her uuid anahtar process ömrü boyunca
+        # bellekte kalmasın diye os.path ile çözülür
+        p = os.path.realpath(os.path.join(self._real_root, key))
+        if not p.startswith(self._real_root + os.sep):
+            raise StorageError(f"Geçersiz anahtar: {key}")
+        return p
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self._path(key)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        # önce geçici dosya, sonra rename: yarım yazılmış dosya hiç servis edilmez
+        fd, tmp = tempfile.mkstemp(dir=parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise StorageError(f"Bulunamadı: {key}") from e
+
+    def iter_chunks(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError as e:
+            raise StorageError(f"Bulunamadı: {key}") from e
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}/{key}"
+
+    def iter_keys(self) -> Iterable[str]:
+        for p in self.root.rglob("*"):
+            if p.is_file() and not p.name.startswith(".tmp-"):
+                yield p.relative_to(self.root).as_posix()
+
+
+class S3Storage(StorageBackend):
+    """
+    boto3 client thread-safe'tir; process başına tek client ve
+    S3_MAX_POOL_CONNECTIONS boyutunda keep-alive havuzu kullanılır.
+    Büyük nesneler (threshold üstü) TransferManager ile paralel multipart yüklenir.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        *,
+        bucket: str,
+        endpoint_url: str = "",
+        region: str = "us-east-1",
+        access_key: str = "",
+        secret_key: str = "",
+        addressing_style: str = "path",
+        max_pool_connections: int = 32,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunksize: int = 8 * 1024 * 1024,
+        upload_concurrency: int = 4,
+        public_base_url: str = "",
+        presign_seconds: int = 3600,
+    ):
+        if not bucket:
+            raise StorageError("S3_BUCKET ayarlanmamış")
+
+        # boto3 opsiyonel bağımlılık: sadece s3 sürücüsü seçilince yüklenir
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.public_base_url = public_base_url.rstrip("/")
+        self.presign_seconds = presign_seconds
+
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                s3={"addressing_style": addressing_style},
+                connect_timeout=5,
+                read_timeout=30,
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=upload_concurrency,
+            use_threads=upload_concurrency > 1,
+        )
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        self.put_fileobj(key, io.BytesIO(data), content_type)
+
+    def put_fileobj(self, key: str, fileobj, content_type: str) -> None:
+        # upload_fileobj threshold'u aşınca otomatik multipart'a geçer (başarısızsa abort eder)
+        self.client.upload_fileobj(
+            fileobj,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+            Config=self.transfer_config,
+        )
+
+    def get(self, key: str) -> bytes:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey as e:
+            raise StorageError(f"Bulunamadı: {key}") from e
+        return obj["Body"].read()
+
+    def iter_chunks(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey as e:
+            raise StorageError(f"Bulunamadı: {key}") from e
+        except (ClientError, BotoCoreError) as e:
+            # AccessDenied, retry'ları tükenmiş 5xx vb.: çağıran (export) tek dosyayı atlayabilsin
+            raise StorageError(f"Okunamadı: {key}: {e}") from e
+        body = obj["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        except BotoCoreError as e:
+            # okuma yarıda koptu (ReadTimeout, IncompleteRead)
+            raise StorageError(f"Okuma yarıda kaldı: {key}: {e}") from e
+        finally:
+            body.close()   # yarıda bırakılırsa bağlantı havuza dönsün
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for i in range(0, len(keys), 1000):   # DeleteObjects istek başına en fazla 1000 anahtar
+            chunk = keys[i:i + 1000]
+            resp = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+            )
+            errors = resp.get("Errors") or []
+            if errors:
+                raise StorageError(f"{len(errors)} nesne silinemedi: {errors[0].get('Message')}")
+
+    def url_version(self) -> str:
+        if self.public_base_url:
+            return ""
+        # yarım süre dönemleri: 304 ile tutulan bir URL'nin en az presign/2 ömrü kalır
+        return str(int(time.time() // max(self.presign_seconds // 2, 1)))
+
+    def url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presign_seconds,
+        )
+
+
+def _from_settings() -> StorageBackend:
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "local":
+        return LocalStorage(settings.MEDIA_ROOT, settings.MEDIA_PUBLIC_BASE_URL)
+    if backend == "s3":
+        mb = 1024 * 1024
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            addressing_style=settings.S3_ADDRESSING_STYLE,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * mb,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * mb,
+            upload_concurrency=settings.S3_UPLOAD_CONCURRENCY,
+            public_base_url=settings.MEDIA_PUBLIC_BASE_URL,
+            presign_seconds=settings.S3_PRESIGN_SECONDS,
+        )
+    raise StorageError(f"Bilinmeyen STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    return _from_settings()
+
+
+class _LazyStorage:
+    """`storage.put(...)` import anında bucket'a bağlanmadan kullanılabilsin diye vekil."""
+
+    def __getattr__(self, name):
+        return getattr(get_storage(), name)
+
+
+storage: StorageBackend = _LazyStorage()  # type: ignore[assignment]
+
+
+def upload_local(root: str) -> int:
+    """MEDIA_ROOT altındaki mevcut dosyaları seçili sürücüye kopyalar (idempotent)."""
+    src = LocalStorage(root)
+    dst = get_storage()
+    if isinstance(dst, LocalStorage) and dst.root.resolve() == src.root.resolve():
+        return 0
+    ctype = {ext: ct for ct, ext in _EXT_MAP.items()}
+    n = 0
+    for key in src.iter_keys():
+        dst.put(key, src.get(key), ctype.get(Path(key).suffix.lower(), "application/octet-stream"))
+        n += 1
+    return n
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["upload-local"]:
+        print("kullanım: python -m services.storage upload-local [MEDIA_ROOT]")
+        sys.exit(2)
+    count = upload_local(sys.argv[2] if len(sys.argv) > 2 else settings.MEDIA_ROOT)
+    print(f"{count} dosya kopyalandı -> {get_storage().name}")
@@ -0,0 +1,192 @@
+# services/user_stats.py
+"""
+Profil sayaçları (user_stats): post sayısı, alınan beğeni/yorum, verilen beğeni.
+
+Sayaçlar yazma yollarında, yazmanın kendisiyle AYNI transaction içinde artımlı
+güncellenir; profil okuması tek PK lookup'tır (kullanıcının kaç postu olduğundan
+bağımsız). Kurallar sayım sorgularıyla birebir aynıdır:
+
+  post_count         published post'lar
+  likes_received     kullanıcının post'larındaki beğeniler
+  comments_received  kullanıcının post'larındaki published yorumlar
+  likes_given        kullanıcının verdiği beğeniler
+
+Sapma olursa (elle yapılan DB müdahalesi, kullanıcı silme vb.) onarım:
+
+  python -m services.user_stats rebuild [--dry-run] [--batch 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Mapping, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.models import UserStats, Users, Posts, Likes, Comments
+
+STAT_FIELDS = ("post_count", "likes_received", "comments_received", "likes_given")
+
+
+def bump(db: Session, deltas: Mapping[int, Mapping[str, int]]) -> None:
+    """
+    {user_id: {alan: delta}} -> tek upsert statement.
+    Satırlar user_id sırasıyla kilitlenir; iki kullanıcının birbirini aynı anda
+    beğenmesi gibi çapraz güncellemeler deadlock'a girmez.
+    """
+    rows = []
+    for uid in sorted(deltas):
+        d = deltas[uid]
+        if any(d.get(f) for f in STAT_FIELDS):
+            rows.append({"user_id": uid, **{f: int(d.get(f, 0)) for f in STAT_FIELDS}})
+    if not rows:
+        return
+    stmt = pg_insert(UserStats).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            **{f: getattr(UserStats, f) + getattr(stmt.excluded, f) for f in STAT_FIELDS},
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def _merge(*pairs: tuple[int, dict]) -> dict[int, dict]:
+    # aynı kullanıcı iki rolde olabilir (kendi postunu beğenmek): tek satırda birleştir
+    out: dict[int, dict] = {}
+    for uid, d in pairs:
+        acc = out.setdefault(uid, {})
+        for k, v in d.items():
+            acc[k] = acc.get(k, 0) + v
+    return out
+
+
+# ---------- yazma yolları ----------
+def post_published(db: Session, author_id: int) -> None:
+    bump(db, {author_id: {"post_count": 1}})
+
+
+def like_changed(db: Session, *, liker_id: int, author_id: int, delta: int) -> None:
+    bump(db, _merge((liker_id, {"likes_given": delta}), (author_id, {"likes_received": delta})))
+
+
+def comment_published(db: Session, author_id: int) -> None:
+    bump(db, {author_id: {"comments_received": 1}})
+
+
+def post_removed(db: Session, post: Posts) -> None:
+    """
+    Post gizlenmeden (status='deleted') ÖNCE çağrılır: yazarın sayaçları hemen düşer.
+    Beğenenlerin likes_given'ı beğeniler silinirken batch batch düşülür
+    (services/deletion.py); viral bir post'ta yüz binlerce satırı istek beklemez.
+    Yayınlanmamış post sayılmamıştı; beğeni/yorum da alamaz.
+    """
+    if post.status != "published":
+        return
+    likes = (
+        db.query(func.count(Likes.id))
+        .filter(Likes.post_id == post.id, Likes.post_created_at == post.created_at)
+        .scalar() or 0
+    )
+    comments = (
+        db.query(func.count(Comments.id))
+        .filter(Comments.post_id == post.id, Comments.post_created_at == post.created_at,
+                Comments.status == "published")
+        .scalar() or 0
+    )
+    bump(db, {post.user_id: {"post_count": -1, "likes_received": -int(likes), "comments_received": -int(comments)}})
+
+
+# ---------- okuma ----------
+def stats_dict(row: Optional[UserStats]) -> dict[str, int]:
+    if row is None:
+        return {f: 0 for f in STAT_FIELDS}
+    return {f: int(getattr(row, f)) for f in STAT_FIELDS}
+
+
+# ---------- toplu backfill / onarım ----------
+# [lo, hi) aralığındaki kullanıcılar için sayım; her alt sorgu kullanıcı aralığına
+# index üzerinden daraltılır (tüm tablo her batch'te taranmaz)
+_LOCK_SQL = text(
+    "SELECT 1 FROM user_stats WHERE user_id >= :lo AND user_id < :hi ORDER BY user_id FOR UPDATE"
+)
+
+_REBUILD_SQL = text(
+    """
+    WITH fresh AS (
+        SELECT u.id AS user_id,
+               coalesce(p.n, 0)  AS post_count,
+               coalesce(lr.n, 0) AS likes_received,
+               coalesce(cr.n, 0) AS comments_received,
+               coalesce(lg.n, 0) AS likes_given
+          FROM users u
+          LEFT JOIN (SELECT user_id, count(*) AS n FROM posts
+                      WHERE status = 'published' AND user_id >= :lo AND user_id < :hi
+                      GROUP BY user_id) p ON p.user_id = u.id
+          LEFT JOIN (SELECT p.user_id, count(*) AS n FROM likes l JOIN posts p ON p.id = l.post_id
+                      WHERE p.status <> 'deleted' AND p.user_id >= :lo AND p.user_id < :hi
+                      GROUP BY p.user_id) lr ON lr.user_id = u.id
+          LEFT JOIN (SELECT p.user_id, count(*) AS n FROM comments c JOIN posts p ON p.id = c.post_id
+                      WHERE c.status = 'published' AND p.status <> 'deleted'
+                        AND p.user_id >= :lo AND p.user_id < :hi
+                      GROUP BY p.user_id) cr ON cr.user_id = u.id
+          LEFT JOIN (SELECT user_id, count(*) AS n FROM likes
+                      WHERE user_id >= :lo AND user_id < :hi
+                      GROUP BY user_id) lg ON lg.user_id = u.id
+         WHERE u.id >= :lo AND u.id < :hi
+    )
+    INSERT INTO user_stats AS s (user_id, post_count, likes_received, comments_received, likes_given, updated_at)
+    SELECT user_id, post_count, likes_received, comments_received, likes_given, now() FROM fresh
+    ON CONFLICT (user_id) DO UPDATE
+       SET post_count = excluded.post_count,
+           likes_received = excluded.likes_received,
+           comments_received = excluded.comments_received,
+           likes_given = excluded.likes_given,
+           updated_at = now()
+     WHERE (s.post_count, s.likes_received, s.comments_received, s.likes_given)
+           IS DISTINCT FROM
+           (excluded.post_count, excluded.likes_received, excluded.comments_received, excluded.likes_given)
+    """
+)
+
+
+def rebuild(db: Session, *, batch: int = 5000, dry_run: bool = False) -> int:
+    """
+    Tüm kullanıcıların sayaçlarını baştan sayar; eksik ya da yanlış satır sayısını döner.
+    Her batch kendi transaction'ında: mevcut satırlar önce kilitlenir, böylece o
+    aralıkta eşzamanlı artımlı güncellemeler onarım bitene kadar bekler ve kaybolmaz.
+    """
+    max_id = db.query(func.max(Users.id)).scalar() or 0
+    fixed = 0
+    for lo in range(0, max_id + 1, batch):
+        params = {"lo": lo, "hi": lo + batch}
+        # READ COMMITTED: sayım statement'ı kilitler alındıktan sonraki commit'leri görür
+        db.execute(_LOCK_SQL, params)
+        fixed += db.execute(_REBUILD_SQL, params).rowcount or 0
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    return fixed
+
+
+if __name__ == "__main__":
+    from core.database import SessionLocal
+
+    ap = argparse.ArgumentParser(prog="python -m services.user_stats")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild", help="user_stats'ı posts/likes/comments'ten yeniden hesapla")
+    rb.add_argument("--batch", type=int, default=5000, help="transaction başına kullanıcı id aralığı")
+    rb.add_argument("--dry-run", action="store_true", help="sadece kaç satırın yanlış olduğunu say")
+    args = ap.parse_args()
+
+    session = SessionLocal()
+    try:
+        n = rebuild(session, batch=args.batch, dry_run=args.dry_run)
+    finally:
+        session.close()
+    print(f"{n} kullanıcı {'düzeltilmeli' if args.dry_run else 'düzeltildi'}")
+    sys.exit(0)
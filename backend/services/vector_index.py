@@ -0,0 +1,449 @@
+# services/vector_index.py
+"""
+Post embedding'leri için disk üstünde, memory-mapped vektör deposu + IVF indeksi.
+
+Dosyalar (EMBEDDING_DIR, "nesil" = generation numarası):
+  meta.json            aktif nesil, boyut, model, IVF bilgisi (os.replace ile atomik)
+  vecs.<g>.f16         satır x dim float16 (L2-normalize), ham; np.memmap ile açılır
+  lists.<g>.i32        satırın IVF listesi (-1 = henüz eğitilmemiş)
+  ids.<g>.i64          satırın post id'si; EN SON yazılır -> okuyucular için commit noktası
+  centroids.<g>.npy    IVF merkezleri (float32)
+
+Tek yazar (VectorWriter) sadece sona ekler; okuyucular (VectorIndex, her API
+worker'ı) ids dosyasının boyuna bakıp yeni satırları remap ile görür. Yeniden
+eğitme / sıkıştırma yeni bir nesil yazar ve meta.json'ı çevirir; eski nesil
+RETIRE_SECONDS sonra silinir: meta'yı çevirmeden hemen önce okumuş bir okuyucu
+dosyaları yine açabilir (açık mmap'ler silindikten sonra da Linux'ta geçerli
+kalır). Okuyucu yine de dosyaları bulamazsa meta'yı yeniden okur.
+
+Arama: kosinüs benzerliği (vektörler normalize, iç çarpım). Satır sayısı
+EMBEDDING_IVF_MIN_ROWS altındaysa ya da indeks eğitilmemişse parça parça
+brute-force; üstünde IVF: sorgu en yakın nprobe merkezin listelerine + eğitimden
+sonra eklenmiş "kuyruk" satırlarına bakar.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+log = logging.getLogger("vector_index")
+
+META_FILE = "meta.json"
+SCAN_CHUNK = 8192          # brute-force / atama parça boyu (satır)
+TRAIN_SAMPLE = 50_000
+TRAIN_ITERS = 10
+RETIRE_SECONDS = 30.0      # eski nesil dosyaları bu kadar sonra silinir (okuyucu check_interval'ının çok üstü)
+
+
+def _files(root: str, gen: int) -> dict[str, str]:
+    return {
+        "vecs": os.path.join(root, f"vecs.{gen}.f16"),
+        "lists": os.path.join(root, f"lists.{gen}.i32"),
+        "ids": os.path.join(root, f"ids.{gen}.i64"),
+        "centroids": os.path.join(root, f"centroids.{gen}.npy"),
+    }
+
+
+def read_meta(root: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(root, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(root: str, meta: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=root, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(root, META_FILE))
+
+
+def _rows(path: str, row_bytes: int) -> int:
+    try:
+        return os.path.getsize(path) // row_bytes
+    except FileNotFoundError:
+        return 0
+
+
+def _memmap(path: str, dtype, shape: tuple):
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def n_lists_for(rows: int) -> int:
+    return int(min(4096, max(16, 4 * math.sqrt(rows))))
+
+
+# ---------- IVF (spherical k-means) ----------
+def assign(vecs, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vecs), dtype=np.int32)
+    for s in range(0, len(vecs), SCAN_CHUNK):
+        block = np.asarray(vecs[s:s + SCAN_CHUNK], dtype=np.float32)
+        out[s:s + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_ivf(vecs, n_lists: int, *, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = len(vecs)
+    sample = np.sort(rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False))
+    x = np.asarray(vecs[sample], dtype=np.float32)
+    n_lists = min(n_lists, len(x))
+    centroids = x[rng.choice(len(x), size=n_lists, replace=False)].copy()
+    for _ in range(TRAIN_ITERS):
+        a = assign(x, centroids)
+        order = np.argsort(a, kind="stable")
+        counts = np.bincount(a, minlength=n_lists)
+        empty = counts == 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids = normalize(sums)
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+    return centroids
+
+
+# ---------- yazar ----------
+class VectorWriter:
+    """Tek process/thread kullanır (EMBEDDING_DIR/writer.lock ile seçilir)."""
+
+    def __init__(self, root: str, dim: int, model: str, *, retire_after: float = RETIRE_SECONDS):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.dim = dim
+        self.model = model
+        self.retire_after = retire_after
+        self._retired: list[tuple[int, float]] = []     # (nesil, silinme zamanı)
+        meta = read_meta(root)
+        if meta is None or meta.get("dim") != dim or meta.get("model") != model:
+            # ilk kurulum ya da model değişti: boş nesil, her şey yeniden embed edilir
+            old = meta["generation"] if meta else None
+            meta = {"generation": (old or 0) + 1, "dim": dim, "model": model,
+                    "n_lists": 0, "trained_rows": 0}
+            for path in _files(root, meta["generation"]).values():
+                if not path.endswith(".npy"):
+                    open(path, "wb").close()
+            _write_meta(root, meta)
+        # önceki yazarın silemeden kapandığı (ya da az önce bırakılan) eski nesiller
+        for gen in self._stale_generations(meta["generation"]):
+            self._drop_generation(gen)
+        self.meta = meta
+        self.files = _files(root, meta["generation"])
+        self._repair()
+        self.centroids = np.load(self.files["centroids"]) if meta["n_lists"] else None
+        self.ids = np.fromfile(self.files["ids"], dtype=np.int64)
+
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+
+    def _repair(self) -> None:
+        # yarım kalmış ekleme: üç dosya en kısa olanın boyuna kırpılır
+        n = min(
+            _rows(self.files["ids"], 8),
+            _rows(self.files["vecs"], self.dim * 2),
+            _rows(self.files["lists"], 4),
+        )
+        for key, row_bytes in (("ids", 8), ("vecs", self.dim * 2), ("lists", 4)):
+            if _rows(self.files[key], row_bytes) != n or os.path.getsize(self.files[key]) % row_bytes:
+                os.truncate(self.files[key], n * row_bytes)
+
+    def append(self, post_ids: Iterable[int], vecs: np.ndarray) -> None:
+        post_ids = np.asarray(list(post_ids), dtype=np.int64)
+        if not len(post_ids):
+            return
+        vecs = normalize(vecs)
+        if self.centroids is not None:
+            lists = assign(vecs, self.centroids)
+        else:
+            lists = np.full(len(post_ids), -1, dtype=np.int32)
+        for key, data in (("vecs", vecs.astype(np.float16)), ("lists", lists), ("ids", post_ids)):
+            with open(self.files[key], "ab") as f:
+                f.write(data.tobytes())
+        self.ids = np.concatenate([self.ids, post_ids])
+
+    def rewrite(self, keep_ids: Optional[np.ndarray] = None, *, train: bool = False,
+                min_train_rows: int = 0) -> dict:
+        """
+        Yeni nesil: keep_ids dışındaki satırlar atılır (silinen/yayından kalkan post'lar),
+        train ise IVF yeniden eğitilir ve tüm satırlar listelere atanır.
+        """
+        old_gen, old_files = self.meta["generation"], self.files
+        gen = old_gen + 1
+        files = _files(self.root, gen)
+        src = _memmap(old_files["vecs"], np.float16, (self.rows, self.dim))
+        mask = np.isin(self.ids, keep_ids) if keep_ids is not None else np.ones(self.rows, dtype=bool)
+        # aynı post iki kez eklenmişse sonuncusu kalır
+        _, last = np.unique(self.ids[::-1], return_index=True)
+        dedup = np.zeros(self.rows, dtype=bool)
+        dedup[self.rows - 1 - last] = True
+        keep_rows = np.nonzero(mask & dedup)[0]
+
+        with open(files["vecs"], "wb") as f:
+            for s in range(0, len(keep_rows), SCAN_CHUNK):
+                f.write(np.asarray(src[keep_rows[s:s + SCAN_CHUNK]]).tobytes())
+        new_ids = self.ids[keep_rows]
+        vecs = _memmap(files["vecs"], np.float16, (len(new_ids), self.dim))
+
+        centroids = None
+        if train and len(new_ids) >= max(1, min_train_rows):
+            centroids = train_ivf(vecs, n_lists_for(len(new_ids)))
+            np.save(files["centroids"], centroids)
+            lists = assign(vecs, centroids)
+        else:
+            lists = np.full(len(new_ids), -1, dtype=np.int32)
+        lists.tofile(files["lists"])
+        new_ids.tofile(files["ids"])
+
+        meta = {**self.meta, "generation": gen,
+                "n_lists": len(centroids) if centroids is not None else 0,
+                "trained_rows": len(new_ids) if centroids is not None else 0}
+        _write_meta(self.root, meta)
+        self.meta, self.files, self.ids, self.centroids = meta, files, new_ids, centroids
+        self._drop_generation(old_gen)
+        self.collect()
+        return meta
+
+    def _stale_generations(self, current: int) -> set[int]:
+        gens = set()
+        for name in os.listdir(self.root):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[0] in ("vecs", "lists", "ids", "centroids") and parts[1].isdigit():
+                if int(parts[1]) < current:
+                    gens.add(int(parts[1]))
+        return gens
+
+    def _drop_generation(self, gen: int) -> None:
+        """Silmeyi erteler: meta'yı çevirmeden önce okumuş okuyucular dosyaları hâlâ açabilir."""
+        self._retired.append((gen, time.monotonic() + self.retire_after))
+
+    def collect(self, force: bool = False) -> int:
+        """Süresi dolan eski nesillerin dosyalarını siler; silinen nesil sayısı."""
+        now = time.monotonic()
+        due = [gen for gen, at in self._retired if force or at <= now]
+        if not due:
+            return 0
+        self._retired = [(gen, at) for gen, at in self._retired if gen not in due]
+        for gen in due:
+            for path in _files(self.root, gen).values():
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        return len(due)
+
+
+# ---------- okuyucu ----------
+class VectorIndex:
+    """API worker'larında: dosyaları mmap'ler, arar; yazar eklerken kendini günceller."""
+
+    def __init__(self, root: str, *, nprobe: int = 8, ivf_min_rows: int = 20_000,
+                 check_interval: float = 1.0):
+        self.root = root
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._gen: Optional[int] = None
+        self._meta: dict = {}
+        self.rows = 0
+        self._built = 0                   # lookup/liste yapılarının kapsadığı satır sayısı
+        self._removed_rows: set[int] = set()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vecs = np.empty((0, 0), dtype=np.float16)
+        self.lists = np.empty(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_rows = np.empty(0, dtype=np.int64)
+        self._list_rows = np.empty(0, dtype=np.int64)
+        self._list_bounds = np.zeros(1, dtype=np.int64)
+        self._dense = np.empty((0, 0), dtype=np.float32)
+
+    # ---------- yükleme ----------
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        for attempt in range(2):
+            meta = read_meta(self.root)
+            if meta is None:
+                return
+            try:
+                self._open(meta)
+                return
+            except FileNotFoundError:
+                # meta okunduktan sonra nesil çevrilip eskisi silinmiş: yeni meta ile bir kez daha
+                if attempt:
+                    log.warning("vector index generation %s vanished during refresh", meta["generation"])
+
+    def _open(self, meta: dict) -> None:
+        # dosyalar lock dışında açılır; biri eksikse durum değişmeden FileNotFoundError
+        gen = meta["generation"]
+        if self._gen is not None and gen < self._gen:
+            return
+        files = _files(self.root, gen)
+        rows = os.path.getsize(files["ids"]) // 8
+        new_gen = gen != self._gen
+        if not new_gen and rows == self.rows:
+            return
+        centroids = np.load(files["centroids"]) if new_gen and meta["n_lists"] else None
+        dim = meta["dim"]
+        ids = _memmap(files["ids"], np.int64, (rows,))
+        vecs = _memmap(files["vecs"], np.float16, (rows, dim))
+        lists = _memmap(files["lists"], np.int32, (rows,))
+        with self._lock:
+            if gen != self._gen:
+                if self._gen is not None and gen < self._gen:
+                    return
+                self._gen, self._meta = gen, meta
+                self._clear()
+                self._removed_rows = set()
+                self.rows = self._built = 0
+                self.centroids = centroids
+            elif rows <= self.rows:
+                return
+            self.ids, self.vecs, self.lists = ids, vecs, lists
+            self.rows = rows
+            # kuyruk (son kurulumdan sonra eklenenler) büyüdüyse yapıları yeniden kur
+            if rows - self._built > max(10_000, self._built // 10) or self._built == 0:
+                self._build_lookup()
+
+    def _build_lookup(self) -> None:
+        n = self.rows
+        ids = np.asarray(self.ids[:n])
+        order = np.argsort(ids, kind="stable")
+        self._sorted_ids, self._sorted_rows = ids[order], order
+        if self.centroids is not None:
+            lists = np.asarray(self.lists[:n])
+            trained = np.nonzero(lists >= 0)[0]
+            by_list = trained[np.argsort(lists[trained], kind="stable")]
+            self._list_rows = by_list
+            self._list_bounds = np.searchsorted(lists[by_list], np.arange(len(self.centroids) + 1))
+        # brute-force modunda float32 kopya bellekte (float16 -> float32 çevrimi taramanın
+        # ~10 katı sürer); ivf_min_rows satırla sınırlı, IVF'te sadece adaylar çevrilir
+        dense = 0 if self._ivf_active(n) else min(n, self.ivf_min_rows)
+        if dense != len(self._dense):
+            self._dense = np.asarray(self.vecs[:dense], dtype=np.float32)
+        self._built = n
+
+    def _ivf_active(self, built: int) -> bool:
+        return self.centroids is not None and built >= self.ivf_min_rows
+
+    # ---------- sorgular ----------
+    def _row_of(self, post_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self._sorted_ids, post_id, side="right")) - 1
+        row = int(self._sorted_rows[i]) if i >= 0 and self._sorted_ids[i] == post_id else None
+        tail = np.nonzero(np.asarray(self.ids[self._built:self.rows]) == post_id)[0]
+        if len(tail):
+            row = self._built + int(tail[-1])      # en son eklenen kazanır
+        return row
+
+    def vector(self, post_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._row_of(post_id)
+            if row is None or row in self._removed_rows:
+                return None
+            return np.asarray(self.vecs[row], dtype=np.float32)
+
+    def remove(self, post_id: int) -> None:
+        with self._lock:
+            row = self._row_of(post_id)
+            if row is not None:
+                self._removed_rows.add(row)
+
+    def _candidates(self, q: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        if not self._ivf_active(self._built):
+            return None     # brute-force
+        probe = np.argpartition(-(self.centroids @ q), min(nprobe, len(self.centroids) - 1))[:nprobe]
+        parts = [self._list_rows[self._list_bounds[l]:self._list_bounds[l + 1]] for l in probe]
+        parts.append(np.arange(self._built, self.rows))   # eğitim/kurulum sonrası kuyruk
+        # eğitilmeden önce eklenmiş (-1) satırlar yeni nesilde listelenir; o zamana kadar kuyrukta
+        return np.sort(np.concatenate(parts))
+
+    def search(self, q: np.ndarray, k: int = 20, *, exclude: Iterable[int] = (),
+               nprobe: Optional[int] = None) -> list[tuple[int, float]]:
+        """En benzer k post: [(post_id, kosinüs)], azalan."""
+        q = normalize(q).reshape(-1)
+        with self._lock:
+            if self.rows == 0:
+                return []
+            skip = set(self._removed_rows)
+            for pid in exclude:
+                row = self._row_of(pid)
+                if row is not None:
+                    skip.add(row)
+            want = k + len(skip)
+            cand = self._candidates(q, nprobe or self.nprobe)
+
+            best_rows, best_scores = [], []
+            if cand is None:
+                dense = len(self._dense)
+                if dense:
+                    self._keep_top(self._dense @ q, np.arange(dense), want, best_rows, best_scores)
+                for s in range(dense, self.rows, SCAN_CHUNK):
+                    block = np.asarray(self.vecs[s:s + SCAN_CHUNK], dtype=np.float32)
+                    self._keep_top(block @ q, np.arange(s, s + len(block)), want, best_rows, best_scores)
+            else:
+                for s in range(0, len(cand), SCAN_CHUNK):
+                    rows = cand[s:s + SCAN_CHUNK]
+                    block = np.asarray(self.vecs[rows], dtype=np.float32)
+                    self._keep_top(block @ q, rows, want, best_rows, best_scores)
+
+            rows = np.concatenate(best_rows)
+            scores = np.concatenate(best_scores)
+            order = np.argsort(-scores, kind="stable")
+            out = []
+            for i in order:
+                row = int(rows[i])
+                if row in skip:
+                    continue
+                out.append((int(self.ids[row]), round(float(scores[i]), 4)))
+                if len(out) >= k:
+                    break
+            return out
+
+    @staticmethod
+    def _keep_top(scores: np.ndarray, rows: np.ndarray, k: int, acc_rows: list, acc_scores: list) -> None:
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            scores, rows = scores[top], rows[top]
+        acc_rows.append(np.asarray(rows))
+        acc_scores.append(scores)
+        if len(acc_rows) > 8:
+            r, s = np.concatenate(acc_rows), np.concatenate(acc_scores)
+            acc_rows.clear()
+            acc_scores.clear()
+            VectorIndex._keep_top(s, r, k, acc_rows, acc_scores)
+
+    def stats(self) -> dict:
+        return {
+            "generation": self._gen,
+            "model": self._meta.get("model"),
+            "rows": self.rows,
+            "ivf_lists": len(self.centroids) if self.centroids is not None else 0,
+            "ivf_active": self._ivf_active(self._built),
+            "tail_rows": self.rows - self._built,
+            "removed": len(self._removed_rows),
+        }
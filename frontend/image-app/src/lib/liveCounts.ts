@@ -0,0 +1,93 @@
+// src/lib/liveCounts.ts
+// Ekrandaki post'ların beğeni/yorum sayaçlarını WebSocket ile canlı tutar (backend: /realtime/ws).
+import { useEffect, useRef } from "react";
+
+export type LiveCounts = {
+  post_id: number;
+  like_count: number;
+  comment_count: number;
+};
+
+type ServerMessage =
+  | { type: "counts"; items: LiveCounts[] }
+  | { type: "resync" }
+  | { type: "error"; detail: string };
+
+function wsUrl(path: string): string {
+  // VITE_API_BASE_URL "/api" (relatif) ya da "http://localhost:8000" olabilir
+  const url = new URL(`${import.meta.env.VITE_API_BASE_URL}${path}`, window.location.href);
+  url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
+  return url.toString();
+}
+
+/**
+ * postIds değiştikçe izlenen küme sunucuya bildirilir; bağlantı koparsa backoff ile yeniden bağlanır.
+ * onResync: sunucu olay kaçırmış olabilir, liste bir kez yeniden çekilmeli.
+ */
+export function useLiveCounts(
+  postIds: number[],
+  onCounts: (items: LiveCounts[]) => void,
+  onResync?: () => void
+) {
+  const idsRef = useRef<number[]>(postIds);
+  const wsRef = useRef<WebSocket | null>(null);
+  const handlers = useRef({ onCounts, onResync });
+  handlers.current = { onCounts, onResync };
+
+  const key = postIds.join(",");
+
+  useEffect(() => {
+    let closed = false;
+    let delay = 1000;
+    let timer: number | undefined;
+
+    function connect() {
+      const ws = new WebSocket(wsUrl("/realtime/ws"));
+      wsRef.current = ws;
+
+      ws.onopen = () => {
+        delay = 1000;
+        ws.send(JSON.stringify({ type: "watch", post_ids: idsRef.current }));
+      };
+      ws.onmessage = (ev) => {
+        const msg = JSON.parse(ev.data) as ServerMessage;
+        if (msg.type === "counts") handlers.current.onCounts(msg.items);
+        else if (msg.type === "resync") handlers.current.onResync?.();
+      };
+      ws.onclose = () => {
+        wsRef.current = null;
+        if (closed) return;
+        timer = window.setTimeout(connect, delay);
+        delay = Math.min(delay * 2, 30000);
+      };
+    }
+
+    connect();
+    return () => {
+      closed = true;
+      window.clearTimeout(timer);
+      wsRef.current?.close();
+    };
+  }, []);
+
+  useEffect(() => {
+    idsRef.current = postIds;
+    const ws = wsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: "watch", post_ids: postIds }));
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [key]);
+}
+
+/** Gelen sayaçları listeye uygular (diğer alanlara dokunmaz). */
+export function applyLiveCounts<T extends { id: number; like_count: number; comment_count: number }>(
+  items: T[],
+  updates: LiveCounts[]
+): T[] {
+  const byId = new Map(updates.map((u) => [u.post_id, u]));
+  return items.map((p) => {
+    const u = byId.get(p.id);
+    return u ? { ...p, like_count: u.like_count, comment_count: u.comment_count } : p;
+  });
+}
@@ -14,6 +14,7 @@ import {
 import ArrowBackIcon from "@mui/icons-material/ArrowBack";
 
 import { apiFetch } from "../lib/api";
+import { useLiveCounts, applyLiveCounts } from "../lib/liveCounts";
 import { useAuth } from "../context/AuthContext";
 import type { PostItem } from "../types/post";
 import { PostCard } from "../components/PostCard";
@@ -27,6 +28,13 @@ export default function HashtagPage() {
   const [items, setItems] = useState<PostItem[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setErr] = useState<string | null>(null);
+  const [related, setRelated] = useState<{ tag: string; count: number }[]>([]);
+
+  // ekrandaki kartların sayaçları sunucudan push edilir
+  useLiveCounts(
+    items.map((p) => p.id),
+    (updates) => setItems((prev) => applyLiveCounts(prev, updates))
+  );
 
   useEffect(() => {
     if (!tag) return;
@@ -48,6 +56,19 @@ export default function HashtagPage() {
     })();
   }, [tag, token]);
 
+  // birlikte kullanılan etiketler (sunucuda bellekten; hata olursa sessizce gizlenir)
+  useEffect(() => {
+    if (!tag) return;
+    setRelated([]);
+    apiFetch<{ items: { tag: string; count: number }[] }>(
+      `/hashtags/${encodeURIComponent(tag)}/related?limit=8`,
+      undefined,
+      token
+    )
+      .then((resp) => setRelated(Array.isArray(resp.items) ? resp.items : []))
+      .catch(() => setRelated([]));
+  }, [tag, token]);
+
   const title = `#${tag || ""}`;
 
   return (
@@ -114,6 +135,26 @@ export default function HashtagPage() {
             />
           </Box>
 
+          {related.length > 0 && (
+            <Stack direction="row" spacing={1} useFlexGap flexWrap="wrap" sx={{ mt: 1.5 }}>
+              {related.map((r) => (
+                <Chip
+                  key={r.tag}
+                  label={`#${r.tag}`}
+                  size="small"
+                  clickable
+                  onClick={() => nav(`/tag/${encodeURIComponent(r.tag)}`)}
+                  sx={{
+                    color: "rgba(255,255,255,.80)",
+                    backgroundColor: "rgba(255,255,255,.06)",
+                    border: "1px solid rgba(255,255,255,.12)",
+                    fontWeight: 700,
+                  }}
+                />
+              ))}
+            </Stack>
+          )}
+
           <Divider sx={{ my: 2, borderColor: "rgba(255,255,255,.10)" }} />
 
           {error && (
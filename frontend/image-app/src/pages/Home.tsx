@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import { apiFetch } from "../lib/api";
+import { useLiveCounts, applyLiveCounts } from "../lib/liveCounts";
 import { useNavigate, useLocation } from "react-router-dom";
 
 import {
@@ -30,6 +31,13 @@ export default function Home() {
   const [loading, setLoading] = useState(false);
   const [error, setErr] = useState<string | null>(null);
 
+  // ekrandaki kartların sayaçları sunucudan push edilir
+  useLiveCounts(
+    posts.map((p) => p.id),
+    (updates) => setPosts((prev) => applyLiveCounts(prev, updates)),
+    () => load()
+  );
+
   async function load(initial = false) {
     if (loading) return;
 
@@ -3,6 +3,7 @@ import { useEffect, useMemo, useState } from "react";
 import { useNavigate, useLocation } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
 import { apiFetch } from "../lib/api";
+import { useLiveCounts, applyLiveCounts } from "../lib/liveCounts";
 
 import {
   Box,
@@ -29,7 +30,7 @@ import DeleteOutlineIcon from "@mui/icons-material/DeleteOutline";
 import EmailOutlinedIcon from "@mui/icons-material/EmailOutlined";
 import PersonOutlineIcon from "@mui/icons-material/PersonOutline";
 
-import type { PostItem } from "../types/post";
+import type { PostItem, UserStats } from "../types/post";
 import { PostCard } from "../components/PostCard";
 
 type MeInfo = {
@@ -38,6 +39,7 @@ type MeInfo = {
   email?: string;
   first_name?: string;
   last_name?: string;
+  stats?: UserStats;
 };
 
 type PostsResp = { items?: PostItem[] };
@@ -54,6 +56,13 @@ export default function MyProfile() {
   const [loadingMore] = useState(false); // şimdilik pagination yoksa dursun
   const [error, setErr] = useState<string | null>(null);
 
+  // ekrandaki kartların sayaçları sunucudan push edilir
+  useLiveCounts(
+    posts.map((p) => p.id),
+    (updates) => setPosts((prev) => applyLiveCounts(prev, updates)),
+    () => loadAll()
+  );
+
   const [confirmPostId, setConfirmPostId] = useState<number | null>(null);
 
   const initials = useMemo(() => {
@@ -175,6 +184,13 @@ export default function MyProfile() {
                     </Typography>
                   )}
 
+                  {info?.stats && (
+                    <Typography variant="body2" sx={{ color: "rgba(255,255,255,.65)" }}>
+                      {info.stats.post_count} paylaşım · {info.stats.likes_received} beğeni ·{" "}
+                      {info.stats.comments_received} yorum
+                    </Typography>
+                  )}
+
                   {info?.email && (
                     <Stack direction="row" spacing={1} alignItems="center">
                       <EmailOutlinedIcon fontSize="small" sx={{ color: "rgba(255,255,255,.70)" }} />
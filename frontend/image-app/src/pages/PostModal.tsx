@@ -39,6 +39,12 @@ type CommentOut = {
   owner: { id: number; username: string };
 };
 
+// /posts/{id}/full: detay + ilk yorum sayfası tek istekte
+type PostFull = PostDetail & {
+  comments: CommentOut[];
+  comments_next_cursor: string | null;
+};
+
 export default function PostModal() {
   const nav = useNavigate();
   const { id } = useParams();
@@ -71,9 +77,8 @@ export default function PostModal() {
     setLoading(true);
     setErr(null);
     try {
-      const p = await apiFetch<PostDetail>(`/posts/${postId}`, undefined, token);
-      const c = await apiFetch<CommentOut[]>(
-        `/posts/${postId}/comments?limit=50&offset=0`,
+      const { comments: c, ...p } = await apiFetch<PostFull>(
+        `/posts/${postId}/full?comments_limit=50`,
         undefined,
         token
       );
@@ -1,8 +1,9 @@
 import { useParams, useNavigate, useLocation } from "react-router-dom";
 import { useEffect, useMemo, useState } from "react";
 import { apiFetch } from "../lib/api";
+import { useLiveCounts, applyLiveCounts } from "../lib/liveCounts";
 import { useAuth } from "../context/AuthContext";
-import type { PostItem } from "../types/post";
+import type { PostItem, UserStats } from "../types/post";
 import { PostCard } from "../components/PostCard";
 
 import {
@@ -18,7 +19,7 @@ import {
 } from "@mui/material";
 import ArrowBackIcon from "@mui/icons-material/ArrowBack";
 
-type UserInfo = { id: number; username: string; first_name?: string; last_name?: string };
+type UserInfo = { id: number; username: string; first_name?: string; last_name?: string; stats?: UserStats };
 
 export default function UserProfile() {
   const { id } = useParams();
@@ -33,6 +34,13 @@ export default function UserProfile() {
   const [loading, setLoading] = useState(false);
   const [error, setErr] = useState<string | null>(null);
 
+  // ekrandaki kartların sayaçları sunucudan push edilir
+  useLiveCounts(
+    items.map((p) => p.id),
+    (updates) => setItems((prev) => applyLiveCounts(prev, updates)),
+    () => load()
+  );
+
   async function load() {
     if (!userId || loading) return;
 
@@ -128,7 +136,13 @@ export default function UserProfile() {
                 @{owner?.username || "kullanıcı"}
               </Typography>
               <Typography variant="body2" sx={{ color: "rgba(255,255,255,.65)" }}>
-                Paylaşımlar: <b style={{ color: "rgba(255,255,255,.92)" }}>{items.length}</b>
+                Paylaşımlar: <b style={{ color: "rgba(255,255,255,.92)" }}>{owner?.stats?.post_count ?? items.length}</b>
+                {owner?.stats && (
+                  <>
+                    {" · "}Beğeni: <b style={{ color: "rgba(255,255,255,.92)" }}>{owner.stats.likes_received}</b>
+                    {" · "}Yorum: <b style={{ color: "rgba(255,255,255,.92)" }}>{owner.stats.comments_received}</b>
+                  </>
+                )}
               </Typography>
             </Stack>
           </Stack>
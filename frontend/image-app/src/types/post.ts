@@ -16,3 +16,11 @@ export type PostItem = {
   image_urls?: string[];   // ✅
   hashtags?: string[];     // ✅ "#ai" formatında
 };
+
+// GET /users/me ve /users/{id} -> stats (backend user_stats tablosu)
+export type UserStats = {
+  post_count: number;
+  likes_received: number;
+  comments_received: number;
+  likes_given: number;
+};